@@ -3,7 +3,7 @@ from unfold.admin import ModelAdmin as UnfoldModelAdmin
 
 from .models import (
     Income, Sells, Refund,
-    DebitCredit, ProfitLossReport,Payment
+    DebitCredit, LedgerBalance, ProfitLossReport,Payment
 )
 
 # =========================
@@ -74,6 +74,21 @@ class DebitCreditAdmin(UnfoldModelAdmin):
     )
 
 
+@admin.register(LedgerBalance)
+class LedgerBalanceAdmin(UnfoldModelAdmin):
+    list_display = (
+        "id", "owner", "customer_name",
+        "total_debit", "total_credit",
+        "balance", "updated_at"
+    )
+    search_fields = ("customer_name",)
+    readonly_fields = (
+        "owner", "customer_name",
+        "total_debit", "total_credit",
+        "balance", "updated_at"
+    )
+
+
 # =========================
 # Profit & Loss Report
 # =========================
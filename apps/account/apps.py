@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AccountConfig(AppConfig):
     name = 'apps.account'
+
+    def ready(self):
+        import apps.account.signals
@@ -0,0 +1,172 @@
+"""
+Debit/credit ledger balances.
+
+Every DebitCredit row stores the running balance (debit - credit) of its
+(owner, customer) up to and including itself. The current totals live in one
+LedgerBalance row per (owner, customer): a new entry locks that row, takes its
+balance, and adds itself with F() arithmetic, so inserts cost O(1) no matter how
+long the ledger is, and concurrent inserts for the same customer serialize on
+the row lock instead of computing stale balances.
+
+Edits and deletes of existing entries are rare corrections; they recompute the
+running balances of the affected customer in one ordered pass.
+"""
+import logging
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import DebitCredit, LedgerBalance
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+BATCH_SIZE = 500
+
+
+# ----------------------------------
+# Snapshots
+# ----------------------------------
+def _seed_missing(owner_id, customer_names: List[str]) -> None:
+    """Create snapshots for customers that have none yet, from their existing entries."""
+    totals = {
+        row["customer_name"]: row
+        for row in DebitCredit.objects.filter(owner_id=owner_id, customer_name__in=customer_names)
+        .values("customer_name")
+        .annotate(total_debit=Sum("debit"), total_credit=Sum("credit"))
+    }
+    snapshots = []
+    for name in customer_names:
+        row = totals.get(name, {})
+        debit = row.get("total_debit") or ZERO
+        credit = row.get("total_credit") or ZERO
+        snapshots.append(LedgerBalance(
+            owner_id=owner_id,
+            customer_name=name,
+            total_debit=debit,
+            total_credit=credit,
+            balance=debit - credit,
+        ))
+    # a concurrent writer may have created some of them first
+    LedgerBalance.objects.bulk_create(snapshots, ignore_conflicts=True)
+
+
+def lock_balances(owner_id, customer_names: Iterable[str]) -> Dict[str, LedgerBalance]:
+    """
+    Snapshots for the given customers, locked until the surrounding transaction
+    ends (call inside transaction.atomic). Missing ones are created first.
+    """
+    names = sorted(set(customer_names))
+    locked = LedgerBalance.objects.select_for_update().filter(owner_id=owner_id, customer_name__in=names)
+
+    # sorted lock order keeps concurrent multi-customer imports from deadlocking
+    snapshots = {s.customer_name: s for s in locked.order_by("customer_name")}
+    missing = [name for name in names if name not in snapshots]
+    if missing:
+        _seed_missing(owner_id, missing)
+        snapshots = {s.customer_name: s for s in locked.order_by("customer_name")}
+    return snapshots
+
+
+# ----------------------------------
+# Bulk import
+# ----------------------------------
+def bulk_create_entries(owner, entries: Iterable) -> List[DebitCredit]:
+    """
+    Insert many entries for one owner with a single pass over them: running
+    balances are computed in memory from the locked snapshots, then the rows and
+    the snapshots are written in bulk. `entries` are DebitCredit instances or
+    dicts of DebitCredit fields; their order is the ledger order.
+    """
+    objs = [e if isinstance(e, DebitCredit) else DebitCredit(**e) for e in entries]
+    if not objs:
+        return []
+
+    with transaction.atomic():
+        snapshots = lock_balances(owner.pk, (obj.customer_name for obj in objs))
+        for obj in objs:
+            obj.owner = owner
+            obj.apply_entry_type()
+            snapshot = snapshots[obj.customer_name]
+            snapshot.total_debit += obj.debit
+            snapshot.total_credit += obj.credit
+            snapshot.balance += obj.debit - obj.credit
+            obj.balance = snapshot.balance
+
+        now = timezone.now()
+        for snapshot in snapshots.values():
+            snapshot.updated_at = now
+        created = DebitCredit.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+        LedgerBalance.objects.bulk_update(
+            list(snapshots.values()),
+            ["total_debit", "total_credit", "balance", "updated_at"],
+            batch_size=BATCH_SIZE,
+        )
+    return created
+
+
+# ----------------------------------
+# Rebuild
+# ----------------------------------
+def rebuild_customer(owner_id, customer_name) -> int:
+    """Recompute the running balances and snapshot of one customer. Returns rows changed."""
+    with transaction.atomic():
+        list(LedgerBalance.objects.select_for_update().filter(owner_id=owner_id, customer_name=customer_name))
+
+        entries = (
+            DebitCredit.objects.filter(owner_id=owner_id, customer_name=customer_name)
+            .order_by("created_at", "id")
+            .only("id", "debit", "credit", "balance")
+        )
+        total_debit = total_credit = ZERO
+        changed = []
+        count = 0
+        for entry in entries.iterator(chunk_size=2000):
+            count += 1
+            total_debit += entry.debit
+            total_credit += entry.credit
+            if entry.balance != total_debit - total_credit:
+                entry.balance = total_debit - total_credit
+                changed.append(entry)
+        if changed:
+            DebitCredit.objects.bulk_update(changed, ["balance"], batch_size=BATCH_SIZE)
+
+        if not count:
+            LedgerBalance.objects.filter(owner_id=owner_id, customer_name=customer_name).delete()
+            return 0
+        LedgerBalance.objects.update_or_create(
+            owner_id=owner_id,
+            customer_name=customer_name,
+            defaults={
+                "total_debit": total_debit,
+                "total_credit": total_credit,
+                "balance": total_debit - total_credit,
+            },
+        )
+    return len(changed)
+
+
+def rebuild(owner_ids: Iterable[int] = None) -> int:
+    """Recompute every (owner, customer) ledger. Returns the number of customers rebuilt."""
+    pairs = DebitCredit.objects.all()
+    if owner_ids is not None:
+        pairs = pairs.filter(owner_id__in=list(owner_ids))
+    pairs = pairs.values_list("owner_id", "customer_name").distinct().order_by("owner_id", "customer_name")
+
+    count = 0
+    for owner_id, customer_name in pairs.iterator():
+        rebuild_customer(owner_id, customer_name)
+        count += 1
+
+    # snapshots left over from customers without entries
+    stale = LedgerBalance.objects.all()
+    if owner_ids is not None:
+        stale = stale.filter(owner_id__in=list(owner_ids))
+    for snapshot in stale.only("owner_id", "customer_name").iterator():
+        if not DebitCredit.objects.filter(owner_id=snapshot.owner_id, customer_name=snapshot.customer_name).exists():
+            snapshot.delete()
+    logger.info(f"Ledger balances rebuilt for {count} customers")
+    return count
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.account.ledger import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute debit/credit running balances and the per-customer balance snapshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", type=int, action="append", help="Owner user id (repeatable). Default: all owners")
+
+    def handle(self, *args, **options):
+        count = rebuild(options.get("owner"))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ledger balances for {count} customers"))
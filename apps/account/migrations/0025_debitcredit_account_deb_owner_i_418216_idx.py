@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0024_remove_payment_invoice_remove_payments_owner_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='debitcredit',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='account_deb_owner_i_418216_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:08
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_balances(apps, schema_editor):
+    """One snapshot per existing (owner, customer); running balances: manage.py rebuild_ledger_balances."""
+    DebitCredit = apps.get_model("account", "DebitCredit")
+    LedgerBalance = apps.get_model("account", "LedgerBalance")
+
+    rows = (
+        DebitCredit.objects.values("owner_id", "customer_name")
+        .annotate(total_debit=models.Sum("debit"), total_credit=models.Sum("credit"))
+        .order_by()
+    )
+    snapshots = []
+    for row in rows.iterator():
+        debit = row["total_debit"] or Decimal("0.00")
+        credit = row["total_credit"] or Decimal("0.00")
+        snapshots.append(LedgerBalance(
+            owner_id=row["owner_id"],
+            customer_name=row["customer_name"],
+            total_debit=debit,
+            total_credit=credit,
+            balance=debit - credit,
+        ))
+    LedgerBalance.objects.bulk_create(snapshots, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0025_debitcredit_account_deb_owner_i_418216_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_name', models.CharField(max_length=255)),
+                ('total_debit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_credit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('owner', 'customer_name'), name='account_ledger_balance_owner_customer')],
+            },
+        ),
+        migrations.RunPython(seed_balances, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models import Sum
+from django.db.models import F
+from django.utils import timezone
 from decimal import Decimal
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
@@ -152,39 +153,79 @@ class DebitCredit(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=["owner", "created_at", "id"]),
+        ]
 
     def clean(self):
         if self.amount <= 0:
             raise ValidationError({"amount": "Amount must be greater than zero."})
 
+    def apply_entry_type(self):
+        # Auto debit / credit
+        if self.entry_type == 'debit':
+            self.debit = self.amount
+            self.credit = Decimal('0.00')
+        else:
+            self.credit = self.amount
+            self.debit = Decimal('0.00')
+
     def save(self, *args, **kwargs):
+        from .ledger import lock_balances, rebuild_customer
+
         with transaction.atomic():
+            self.apply_entry_type()
+
+            if self._state.adding:
+                # Auto balance (customer + owner wise) from the locked snapshot, O(1) per entry
+                snapshot = lock_balances(self.owner_id, [self.customer_name])[self.customer_name]
+                self.balance = snapshot.balance + self.debit - self.credit
+                super().save(*args, **kwargs)
+                snapshot.add(self.debit, self.credit)
+                return
+
+            # corrections are rare: recompute the affected running balances
+            previous = DebitCredit.objects.filter(pk=self.pk).values_list("owner_id", "customer_name").first()
+            super().save(*args, **kwargs)
+            for owner_id, customer_name in {previous, (self.owner_id, self.customer_name)} - {None}:
+                rebuild_customer(owner_id, customer_name)
 
-            # Auto debit / credit
-            if self.entry_type == 'debit':
-                self.debit = self.amount
-                self.credit = Decimal('0.00')
-            else:
-                self.credit = self.amount
-                self.debit = Decimal('0.00')
 
-            super().save(*args, **kwargs)
+class LedgerBalance(models.Model):
+    """Running totals per (owner, customer), updated under a row lock with every new DebitCredit entry."""
 
-            # Auto balance (customer + owner wise)
-            totals = DebitCredit.objects.filter(
-                owner=self.owner,
-                customer_name=self.customer_name
-            ).aggregate(
-                total_debit=Sum('debit'),
-                total_credit=Sum('credit')
-            )
-
-            balance = (
-                (totals['total_debit'] or Decimal('0.00')) -
-                (totals['total_credit'] or Decimal('0.00'))
-            )
-
-            DebitCredit.objects.filter(pk=self.pk).update(balance=balance)
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='ledger_balances'
+    )
+    customer_name = models.CharField(max_length=255)
+
+    total_debit = models.DecimalField(max_digits=14,decimal_places=2,default=Decimal('0.00'))
+    total_credit = models.DecimalField(max_digits=14,decimal_places=2,default=Decimal('0.00'))
+    balance = models.DecimalField(max_digits=14,decimal_places=2,default=Decimal('0.00'))
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "customer_name"], name="account_ledger_balance_owner_customer"),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} - {self.customer_name}: {self.balance}"
+
+    def add(self, debit, credit):
+        """Apply one entry (the caller holds the row lock from select_for_update)."""
+        LedgerBalance.objects.filter(pk=self.pk).update(
+            total_debit=F('total_debit') + debit,
+            total_credit=F('total_credit') + credit,
+            balance=F('balance') + debit - credit,
+            updated_at=timezone.now(),
+        )
+        self.total_debit += debit
+        self.total_credit += credit
+        self.balance += debit - credit
 
 
 # Profit & Loss (P&L) sectiont
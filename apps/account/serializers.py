@@ -89,6 +89,18 @@ class DebitCreditSerializer(serializers.ModelSerializer):
         validated_data['owner'] = self.context['request'].user
         return super().create(validated_data)
 
+
+class DebitCreditImportSerializer(DebitCreditSerializer):
+    """One row of a bulk import; the owner is always the requesting user."""
+
+    class Meta(DebitCreditSerializer.Meta):
+        read_only_fields = ('owner', 'debit', 'credit', 'balance', 'created_at')
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Amount must be greater than zero.")
+        return value
+
 # Profit & Loss (P&L) sectiont
 class ProfitLossReportSerializer(serializers.ModelSerializer):
 
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .ledger import rebuild_customer
+from .models import DebitCredit
+
+
+@receiver(post_delete, sender=DebitCredit)
+def rebuild_ledger_after_delete(sender, instance, **kwargs):
+    owner_id, customer_name = instance.owner_id, instance.customer_name
+    # after commit, so deleting a whole owner does not rebuild rows that are going away
+    transaction.on_commit(lambda: rebuild_customer(owner_id, customer_name))
@@ -1,3 +1,178 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.account import ledger
+from apps.account.models import DebitCredit, LedgerBalance
+from apps.account.views import DebitCreditImportAPIView
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def make_owner(email="ledger@example.com"):
+    return get_user_model().objects.create_user(email=email, password="pw")
+
+
+def entry(owner, customer, amount, entry_type="debit", voucher="V-1", save=True):
+    obj = DebitCredit(
+        owner=owner, voucher_no=voucher, customer_name=customer,
+        payment_type="cash", entry_type=entry_type, amount=Decimal(amount),
+    )
+    if save:
+        obj.save()
+    return obj
+
+
+def balances(owner, customer):
+    return [
+        str(b) for b in DebitCredit.objects.filter(owner=owner, customer_name=customer)
+        .order_by("created_at", "id").values_list("balance", flat=True)
+    ]
+
+
+def snapshot(owner, customer):
+    s = LedgerBalance.objects.get(owner=owner, customer_name=customer)
+    return str(s.total_debit), str(s.total_credit), str(s.balance)
+
+
+class LedgerBalanceTests(TestCase):
+    def setUp(self):
+        self.owner = make_owner()
+
+    def test_save_keeps_a_running_balance_per_customer(self):
+        entry(self.owner, "Rahim", "100.00")
+        entry(self.owner, "Karim", "50.00")
+        entry(self.owner, "Rahim", "30.00", entry_type="credit")
+
+        self.assertEqual(balances(self.owner, "Rahim"), ["100.00", "70.00"])
+        self.assertEqual(balances(self.owner, "Karim"), ["50.00"])
+        self.assertEqual(snapshot(self.owner, "Rahim"), ("100.00", "30.00", "70.00"))
+
+    def test_bulk_import_continues_from_the_snapshot(self):
+        entry(self.owner, "Rahim", "100.00")
+        created = ledger.bulk_create_entries(self.owner, [
+            {"voucher_no": "V-2", "customer_name": "Rahim", "payment_type": "bank", "entry_type": "credit", "amount": Decimal("40.00")},
+            {"voucher_no": "V-3", "customer_name": "Karim", "payment_type": "cash", "entry_type": "debit", "amount": Decimal("25.00")},
+            entry(self.owner, "Rahim", "15.00", voucher="V-4", save=False),
+        ])
+
+        self.assertEqual(len(created), 3)
+        self.assertEqual(balances(self.owner, "Rahim"), ["100.00", "60.00", "75.00"])
+        self.assertEqual(snapshot(self.owner, "Rahim"), ("115.00", "40.00", "75.00"))
+        self.assertEqual(snapshot(self.owner, "Karim"), ("25.00", "0.00", "25.00"))
+
+    def test_snapshot_updates_apply_on_top_of_the_stored_totals(self):
+        entry(self.owner, "Rahim", "10.00")
+        first = LedgerBalance.objects.get(owner=self.owner, customer_name="Rahim")
+        second = LedgerBalance.objects.get(owner=self.owner, customer_name="Rahim")
+
+        # F() arithmetic: a copy read before the other update does not overwrite it
+        first.add(Decimal("5.00"), Decimal("0.00"))
+        second.add(Decimal("0.00"), Decimal("3.00"))
+        self.assertEqual(snapshot(self.owner, "Rahim"), ("15.00", "3.00", "12.00"))
+
+    def test_rebuild_matches_the_incremental_balances(self):
+        entry(self.owner, "Rahim", "100.00")
+        entry(self.owner, "Rahim", "30.00", entry_type="credit")
+        ledger.bulk_create_entries(self.owner, [
+            {"voucher_no": "V-9", "customer_name": "Rahim", "payment_type": "cash", "entry_type": "debit", "amount": Decimal("12.50")},
+        ])
+        incremental = balances(self.owner, "Rahim"), snapshot(self.owner, "Rahim")
+
+        DebitCredit.objects.filter(owner=self.owner).update(balance=Decimal("0.00"))
+        LedgerBalance.objects.filter(owner=self.owner).delete()
+
+        self.assertEqual(ledger.rebuild_customer(self.owner.pk, "Rahim"), 3)
+        self.assertEqual((balances(self.owner, "Rahim"), snapshot(self.owner, "Rahim")), incremental)
+        # nothing left to fix
+        self.assertEqual(ledger.rebuild_customer(self.owner.pk, "Rahim"), 0)
+
+    def test_correcting_an_entry_recomputes_the_later_balances(self):
+        first = entry(self.owner, "Rahim", "100.00")
+        entry(self.owner, "Rahim", "30.00", entry_type="credit")
+
+        first.amount = Decimal("80.00")
+        first.save()
+        self.assertEqual(balances(self.owner, "Rahim"), ["80.00", "50.00"])
+        self.assertEqual(snapshot(self.owner, "Rahim"), ("80.00", "30.00", "50.00"))
+
+    def test_rebuild_drops_snapshots_without_entries(self):
+        entry(self.owner, "Rahim", "100.00")
+        LedgerBalance.objects.create(owner=self.owner, customer_name="Gone", balance=Decimal("5.00"))
+
+        self.assertEqual(ledger.rebuild([self.owner.pk]), 1)
+        self.assertFalse(LedgerBalance.objects.filter(customer_name="Gone").exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DebitCreditImportTests(TestCase):
+    def setUp(self):
+        self.owner = make_owner()
+
+    def _post(self, entries):
+        request = APIRequestFactory().post("/api/account/debit-credit/import/", {"entries": entries}, format="json")
+        force_authenticate(request, user=self.owner)
+        return DebitCreditImportAPIView.as_view()(request)
+
+    def test_import_creates_entries_for_the_requesting_user(self):
+        other = make_owner("other@example.com")
+        response = self._post([
+            {"voucher_no": "V-1", "customer_name": "Rahim", "payment_type": "cash", "entry_type": "debit", "amount": "100.00", "owner": other.pk},
+            {"voucher_no": "V-2", "customer_name": "Rahim", "payment_type": "cash", "entry_type": "credit", "amount": "20.00"},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["data"], {"created": 2})
+        self.assertEqual(balances(self.owner, "Rahim"), ["100.00", "80.00"])
+        self.assertFalse(DebitCredit.objects.filter(owner=other).exists())
+
+    def test_invalid_row_rejects_the_whole_import(self):
+        response = self._post([
+            {"voucher_no": "V-1", "customer_name": "Rahim", "payment_type": "cash", "entry_type": "debit", "amount": "100.00"},
+            {"voucher_no": "V-2", "customer_name": "Rahim", "payment_type": "cash", "entry_type": "debit", "amount": "0"},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DebitCredit.objects.exists())
+        self.assertFalse(LedgerBalance.objects.exists())
+
+    def test_empty_import_is_rejected(self):
+        self.assertEqual(self._post([]).status_code, 400)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentLedgerTests(TransactionTestCase):
+    """Needs real row locks (PostgreSQL); SQLite runs writers one at a time anyway."""
+
+    def test_concurrent_saves_for_one_customer_serialize_on_the_snapshot(self):
+        owner = make_owner()
+        workers = 8
+        barrier = threading.Barrier(workers)
+        errors = []
+
+        def save():
+            try:
+                barrier.wait()
+                entry(owner, "Rahim", "10.00")
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=save) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        # every entry saw the one before it: no two share a running balance
+        self.assertEqual(
+            sorted(Decimal(b) for b in balances(owner, "Rahim")),
+            [Decimal(10 * i) for i in range(1, workers + 1)],
+        )
+        self.assertEqual(snapshot(owner, "Rahim"), ("80.00", "0.00", "80.00"))
@@ -4,6 +4,7 @@ from .views import (
     CustomerRefundListAPIView,
     CustomerSellsListAPIView,
     DebitCreditReportAPIView,
+    DebitCreditImportAPIView,
     ProfitLossReportAPIView,
     PaymentAPIView
 )
@@ -17,6 +18,7 @@ urlpatterns = [
 
     # Debit Credit
     path('debit-credit/report/', DebitCreditReportAPIView.as_view()),
+    path('debit-credit/import/', DebitCreditImportAPIView.as_view(), name='debit-credit-import'),
 
 
     # Profit & Loss (P&L) sectiont
@@ -13,12 +13,15 @@ from .models import (
     Sells,
     Refund,
     DebitCredit,
+    LedgerBalance,
     ProfitLossReport,Payment
 )
+from .ledger import bulk_create_entries
 from .serializers import (
     IncomeSerializer, 
     CustomerRefundSerializer,
     DebitCreditSerializer,
+    DebitCreditImportSerializer,
     ProfitLossReportSerializer,
     CustomerSellsSerializer,PaymentSerializer
 )
@@ -113,6 +116,7 @@ class CustomerRefundListAPIView(APIView):
 class DebitCreditReportAPIView(APIView):
 
     permission_classes = [IsAuthenticated]
+    cursor_ordering = "created_at"
 
     def get(self, request):
 
@@ -120,9 +124,10 @@ class DebitCreditReportAPIView(APIView):
 
         serializer = DebitCreditSerializer(queryset, many=True)
 
-        totals = queryset.aggregate(
-            total_debit=Sum('debit'),
-            total_credit=Sum('credit')
+        # per-customer snapshots instead of summing the whole ledger
+        totals = LedgerBalance.objects.filter(owner=request.user).aggregate(
+            total_debit=Sum('total_debit'),
+            total_credit=Sum('total_credit')
         )
 
         summary = {
@@ -131,6 +136,15 @@ class DebitCreditReportAPIView(APIView):
             "balance": (totals['total_debit'] or 0) - (totals['total_credit'] or 0),
         }
 
+        # opt-in keyset paging: {"summary", "items", "pagination"} instead of the full table
+        if self.pagination_class().wants_cursor(request):
+            return self.paginated(
+                queryset,
+                DebitCreditSerializer,
+                message="Debit Credit report fetched successfully",
+                extra_data={"summary": summary},
+            )
+
         return self.success(
             message="Debit Credit report fetched successfully",
             status_code=status.HTTP_200_OK,
@@ -140,6 +154,39 @@ class DebitCreditReportAPIView(APIView):
             }
         )
 
+class DebitCreditImportAPIView(APIView):
+
+    permission_classes = [IsAuthenticated]
+    max_entries = 5000
+
+    def post(self, request):
+        entries = request.data.get("entries") if isinstance(request.data, dict) else request.data
+        if not isinstance(entries, list) or not entries:
+            return self.error(
+                message="A non-empty list of entries is required",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(entries) > self.max_entries:
+            return self.error(
+                message=f"At most {self.max_entries} entries per import",
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = DebitCreditImportSerializer(data=entries, many=True, context={"request": request})
+        if not serializer.is_valid():
+            return self.error(
+                message="Invalid data",
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+
+        created = bulk_create_entries(request.user, serializer.validated_data)
+        return self.success(
+            message="Debit Credit entries imported successfully",
+            status_code=status.HTTP_201_CREATED,
+            data={"created": len(created)},
+        )
+
 # Profit & Loss (P&L) sectiont
 class ProfitLossReportAPIView(APIView):
 
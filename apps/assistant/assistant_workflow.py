@@ -1,6 +1,9 @@
-import json, re, logging
-from typing import Dict, Any, Optional
+import asyncio, json, re, logging, weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncIterator, Tuple
 from langgraph.graph import StateGraph, END
+from langgraph.config import get_stream_writer
+from langchain_core.runnables import RunnableLambda
 from langchain_openai import ChatOpenAI
 from django.conf import settings
 from .models import Assistant, AssistantFile
@@ -22,6 +25,95 @@ class AssistantState(Dict[str, Any]):
     call_support_api: Optional[Dict[str, Any]] = None
 
 
+# ----------------------------------
+# Async execution
+# ----------------------------------
+# LLM calls in flight per event loop (one per worker process); the rest wait their turn
+_llm_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def llm_slot():
+    loop = asyncio.get_running_loop()
+    slots = _llm_slots.get(loop)
+    if slots is None:
+        slots = _llm_slots[loop] = asyncio.Semaphore(getattr(settings, "ASSISTANT_LLM_CONCURRENCY", 16))
+    async with slots:
+        yield
+
+
+class ReplyStream:
+    """
+    Incrementally decodes the "reply" string of the JSON object the LLM is
+    asked to produce, so its text can be forwarded while the rest of the
+    object is still being generated. feed() returns the newly decoded text.
+    """
+
+    _START = re.compile(r'"reply"\s*:\s*"')
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self.buffer += chunk or ""
+        if self.done:
+            return ""
+        if self.pos is None:
+            match = self._START.search(self.buffer)
+            if not match:
+                return ""
+            self.pos = match.end()
+
+        out = []
+        buf, i = self.buffer, self.pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            # an escape split across chunks waits for the next one
+            if i + 1 >= len(buf):
+                break
+            code = buf[i + 1]
+            if code == "u":
+                if i + 6 > len(buf):
+                    break
+                try:
+                    out.append(chr(int(buf[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+            else:
+                out.append(self._ESCAPES.get(code, code))
+                i += 2
+        self.pos = i
+        return "".join(out)
+
+
+async def astream_reply(workflow, state: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Run a compiled assistant workflow without blocking the event loop.
+    Yields ("delta", text) as the reply is generated, then ("result", final state).
+    Raises when the LLM fails after reply text was yielded; a failure before
+    that still ends with a result (the "having trouble" answer).
+    """
+    result = {}
+    async for mode, chunk in workflow.astream(state, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            if isinstance(chunk, dict) and chunk.get("reply_delta"):
+                yield "delta", chunk["reply_delta"]
+        else:
+            result = chunk
+    yield "result", result
+
 
 def compile_dynamic_agent(assistant: Assistant):
     """
@@ -84,10 +176,7 @@ def compile_dynamic_agent(assistant: Assistant):
         state["flagged"] = False
         return state
 
-    def call_llm(state: AssistantState):
-        if state.get("flagged"):
-            return state
-
+    def build_prompt(state: AssistantState) -> str:
         user_text = state.get("input_text", "")
         memory = state.get("memory", {}) or {}
         history = state.get("history", []) or []
@@ -97,7 +186,7 @@ def compile_dynamic_agent(assistant: Assistant):
             text = msg.get("text", "")
             formatted_history += f"{sender.capitalize()}: {text}\n"
 
-        prompt = f"""
+        return f"""
 {system_prompt}
 
 User message: {user_text}
@@ -113,28 +202,61 @@ Respond in JSON ONLY with:
 - optional "remember": a short key:value memory update
 """
 
+    def apply_reply(state: AssistantState, content: str):
         try:
-            response = llm.invoke(prompt)
-            content = getattr(response, "content", "") or str(response)
-            try:
-                parsed = json.loads(content)
-            except json.JSONDecodeError:
-                json_match = re.search(r"\{.*\}", content, re.S)
-                parsed = json.loads(json_match.group()) if json_match else {"reply": content}
-
-            state["answer"] = parsed.get("reply", "I'm here to listen.")
-            if "remember" in parsed:
-                state["memory_update"] = parsed["remember"]
-            if "call_support_api" in parsed:
-                state["call_support_api"] = parsed["call_support_api"]
-                print(f"call_support_api: {state['call_support_api']}")
+            parsed = json.loads(content)
+        except json.JSONDecodeError:
+            json_match = re.search(r"\{.*\}", content, re.S)
+            parsed = json.loads(json_match.group()) if json_match else {"reply": content}
+
+        state["answer"] = parsed.get("reply", "I'm here to listen.")
+        if "remember" in parsed:
+            state["memory_update"] = parsed["remember"]
+        if "call_support_api" in parsed:
+            state["call_support_api"] = parsed["call_support_api"]
+            print(f"call_support_api: {state['call_support_api']}")
 
+    def call_llm(state: AssistantState):
+        if state.get("flagged"):
+            return state
+
+        try:
+            response = llm.invoke(build_prompt(state))
+            apply_reply(state, getattr(response, "content", "") or str(response))
         except Exception as e:
             print(f"LLM error: {e}")
             logger.error(f"LLM error: {e}")
             state["answer"] = "I’m having trouble responding right now."
         return state
 
+    async def acall_llm(state: AssistantState):
+        # ainvoke/astream path: async OpenAI client, reply text streamed to the caller as it arrives
+        if state.get("flagged"):
+            return state
+
+        write = get_stream_writer()
+        reply = ReplyStream()
+        content = ""
+        streamed = False
+        try:
+            async with llm_slot():
+                async for chunk in llm.astream(build_prompt(state)):
+                    piece = chunk.content if isinstance(chunk.content, str) else ""
+                    content += piece
+                    delta = reply.feed(piece)
+                    if delta:
+                        streamed = True
+                        write({"reply_delta": delta})
+            apply_reply(state, content)
+        except Exception as e:
+            logger.error(f"LLM error: {e}")
+            if streamed:
+                # part of the reply is already out: a different answer now would not match it,
+                # the caller has to see the failure (astream_reply raises)
+                raise
+            state["answer"] = "I’m having trouble responding right now."
+        return state
+
     def write_memory(state: AssistantState):
         memory_update = state.get("memory_update")
         if memory_update:
@@ -148,7 +270,7 @@ Respond in JSON ONLY with:
     # --------------------------
     workflow = StateGraph(AssistantState)
     workflow.add_node("safety_check", safety_check)
-    workflow.add_node("llm_node", call_llm)
+    workflow.add_node("llm_node", RunnableLambda(call_llm, afunc=acall_llm, name="llm_node"))
     workflow.add_node("memory_node", write_memory)
     workflow.set_entry_point("safety_check")
 
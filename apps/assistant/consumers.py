@@ -7,7 +7,7 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from .utils import get_assistant, create_transcript, get_transcript, get_history, get_assistant_mamory, save_transcript_chunks
 from . models import Transcript
-from .assistant_workflow import compile_dynamic_agent
+from .assistant_workflow import compile_dynamic_agent, astream_reply
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 REALTIME_MODEL = "gpt-4o-realtime-preview"
@@ -54,13 +54,19 @@ class AssistantConsumer(AsyncWebsocketConsumer):
             voice = "bn-BD-NabanitaNeural"
             history = await database_sync_to_async(get_history)(self.transcript)
             memory = await database_sync_to_async(get_assistant_mamory)(self.assistant.id)
-            result = self.workflow.invoke({
+            result = {}
+            # reply text goes out as it is generated; {"text": ...} still carries the full answer
+            async for kind, value in astream_reply(self.workflow, {
                 "input_text": user_message,
                 "history": history,
                 "memory": memory or {},
                 "session_id": self.transcript.id
-                })
-            text = result["answer"]
+                }):
+                if kind == "delta":
+                    await self.send(json.dumps({"type": "text_delta", "text": value}))
+                else:
+                    result = value
+            text = result.get("answer", "")
             if result.get('call_support_api'):
                 await self.send(json.dumps({"call_support_api": result['call_support_api']}))
             await self.send(json.dumps({"text": text}))
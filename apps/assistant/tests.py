@@ -1,3 +1,82 @@
-from django.test import TestCase
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from apps.assistant import assistant_workflow
+from apps.assistant.assistant_workflow import ReplyStream, astream_reply, compile_dynamic_agent
+
+
+def _assistant(**overrides):
+    fields = dict(
+        temperature=0.5,
+        max_tokens=100,
+        system_prompt="Be brief.",
+        crisis_keywords_prompt="",
+        crisis_keywords="",
+        files=SimpleNamespace(all=lambda: []),
+    )
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+class ReplyStreamTests(SimpleTestCase):
+    def test_reply_text_is_decoded_across_chunks(self):
+        stream = ReplyStream()
+        chunks = ['{"re', 'ply": "Say \\', '"hi\\" \\u00', 'e9t\\u00e9', '", "remember": {"a": "b"}}']
+        self.assertEqual("".join(stream.feed(c) for c in chunks), 'Say "hi" été')
+        self.assertTrue(stream.done)
+        self.assertEqual(stream.feed(' "reply": "again"'), "")
+
+
+class AsyncWorkflowTests(SimpleTestCase):
+    def _workflow(self, content, **overrides):
+        def llm(**kwargs):
+            return GenericFakeChatModel(messages=iter([AIMessage(content=content)]))
+
+        with mock.patch.object(assistant_workflow, "ChatOpenAI", llm):
+            return compile_dynamic_agent(_assistant(**overrides))
+
+    def _run(self, workflow, text):
+        async def run():
+            return [item async for item in astream_reply(workflow, {"input_text": text, "history": [], "memory": {}})]
+
+        return asyncio.run(run())
+
+    def test_reply_is_streamed_before_the_result(self):
+        workflow = self._workflow('{"reply": "Your order ships tomorrow.", "remember": {"topic": "order"}}')
+        items = self._run(workflow, "where is my order?")
+        deltas = [value for kind, value in items if kind == "delta"]
+        self.assertGreater(len(deltas), 1)
+        self.assertEqual("".join(deltas), "Your order ships tomorrow.")
+        kind, result = items[-1]
+        self.assertEqual(kind, "result")
+        self.assertEqual(result["answer"], "Your order ships tomorrow.")
+        self.assertEqual(result["memory"], {"topic": "order"})
+
+    def test_crisis_answer_skips_the_llm(self):
+        workflow = self._workflow('{"reply": "unused"}', crisis_keywords_prompt="Please call 999.")
+        items = self._run(workflow, "I want to die")
+        self.assertEqual(items, [("result", mock.ANY)])
+        self.assertEqual(items[0][1]["answer"], "Please call 999.")
+
+    def test_failure_after_streamed_text_is_raised(self):
+        async def astream(prompt):
+            yield AIMessage(content='{"reply": "Your order')
+            raise RuntimeError("connection reset")
+
+        with mock.patch.object(assistant_workflow, "ChatOpenAI", lambda **kwargs: SimpleNamespace(astream=astream)):
+            workflow = compile_dynamic_agent(_assistant())
+
+        received = []
+
+        async def run():
+            async for item in astream_reply(workflow, {"input_text": "hi", "history": [], "memory": {}}):
+                received.append(item)
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run())
+        self.assertEqual(received, [("delta", "Your order")])
@@ -40,6 +40,8 @@ def save_transcript_chunks(transcript, user_text, agent_text, assistant_chunk="a
                 # audio=agent_audio,
             ),
         ]
+        # a turn the assistant never answered has only the caller's side
+        chunks = [chunk for chunk in chunks if chunk.text]
         TranscriptChunk.objects.bulk_create(chunks, ignore_conflicts=True)
     except Exception as e:
         print(f"Error saving transcript chunks: {e}")
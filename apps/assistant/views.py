@@ -22,6 +22,7 @@ from django.core.cache import cache
 from django.urls import reverse
 
 import azure.cognitiveservices.speech as speechsdk
+from apps.call.services import speech_synthesis
 AZURE_SPEECH_KEY = os.environ.get("AZURE_SPEECH_KEY")
 AZURE_REGION = os.environ.get("AZURE_SPEECH_REGION")
 
@@ -580,38 +581,16 @@ class VoicesListView(APIView):
 
 def azure_preview(request, voice_id):
     try:
-        speech_config = speechsdk.SpeechConfig(
-            subscription=AZURE_SPEECH_KEY,
-            region=AZURE_REGION
-        )
-        speech_config.speech_synthesis_voice_name = voice_id
-        speech_config.set_speech_synthesis_output_format(
-            speechsdk.SpeechSynthesisOutputFormat.Audio16Khz32KBitRateMonoMp3
-        )
-
-        # Create a pull stream to read audio as it is generated
-        stream = speechsdk.audio.PullAudioOutputStream()
-        audio_config = speechsdk.audio.AudioOutputConfig(stream=stream)
-
-        synthesizer = speechsdk.SpeechSynthesizer(
-            speech_config=speech_config,
-            audio_config=None  # We'll use the pull stream
-        )
-
         text = get_sample_text_for_voice(voice_id)
+        # the sample text is fixed per voice: synthesized once, then served from the phrase cache
+        audio = speech_synthesis.synthesize(text, voice_id, speech_synthesis.FORMAT_MP3, cache=True)
+        if not audio:
+            return StreamingHttpResponse("Error: speech synthesis failed", status=500)
 
-        # Start synthesis asynchronously
-        result_future = synthesizer.speak_text_async(text)
-
-        # Generator function to yield audio chunks
         def audio_generator():
-            result = result_future.get()
-            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                # Yield bytes in chunks
-                chunk_size = 1024
-                audio_data = result.audio_data
-                for i in range(0, len(audio_data), chunk_size):
-                    yield audio_data[i:i + chunk_size]
+            chunk_size = 1024
+            for i in range(0, len(audio), chunk_size):
+                yield audio[i:i + chunk_size]
 
         response = StreamingHttpResponse(
             audio_generator(),
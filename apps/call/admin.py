@@ -1,6 +1,6 @@
 from django.contrib import admin
 from unfold.admin import ModelAdmin as UnfoldModelAdmin
-from .models import CallLog, CallCampaign
+from .models import CallLog, CallCampaign, OutboundCampaign, OutboundCampaignCall
 
 # =========================
 # Call Log
@@ -52,3 +52,24 @@ class CallCampaignAdmin(UnfoldModelAdmin):
             "fields": ("phone_number", "serial_number")
         }),
     )
+
+
+# =========================
+# Outbound Campaign
+# =========================
+@admin.register(OutboundCampaign)
+class OutboundCampaignAdmin(UnfoldModelAdmin):
+    list_display = ("id", "owner", "assistant", "phone_number", "status", "total", "created_at")
+    list_filter = ("status",)
+    search_fields = ("owner__email", "assistant__name", "phone_number__phone_number")
+    readonly_fields = ("total", "error", "created_at", "updated_at")
+    ordering = ("-created_at",)
+
+
+@admin.register(OutboundCampaignCall)
+class OutboundCampaignCallAdmin(UnfoldModelAdmin):
+    list_display = ("id", "campaign", "row_number", "to_number", "status", "call_status", "call_sid", "dialed_at")
+    list_filter = ("status",)
+    search_fields = ("to_number", "call_sid")
+    raw_id_fields = ("campaign",)
+    ordering = ("campaign", "id")
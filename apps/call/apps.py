@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+
+
+def _start_campaign_watchdog(sender, **kwargs):
+    from .services.campaigns import start_watchdog
+
+    start_watchdog()
 
 
 class CallConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.call'
+
+    def ready(self):
+        # web workers re-dispatch call campaigns whose runner died (services/campaigns.py)
+        request_started.connect(_start_campaign_watchdog, dispatch_uid="call_campaign_watchdog")
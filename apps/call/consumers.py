@@ -2,19 +2,16 @@ import asyncio
 import base64
 import json
 import logging
-import os
-import audioop
 import contextlib
-import wave
-from io import BytesIO
+from collections import deque
+from typing import Optional
 from urllib.parse import parse_qs
 
-import aiohttp
-import azure.cognitiveservices.speech as speechsdk
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 
-from apps.assistant.assistant_workflow import compile_dynamic_agent
+from apps.assistant.assistant_workflow import astream_reply, compile_dynamic_agent
 from apps.assistant.models import Assistant
 from apps.assistant.utils import (
     get_assistant_mamory,
@@ -22,25 +19,24 @@ from apps.assistant.utils import (
     save_transcript_chunks,
 )
 from apps.call.models import CallLog
+from .services import speech_synthesis, tts
+from .services.asr import build_asr
+from .services.vad import SPEECH_END, Endpointer
 from .utils import create_call_transcript
 
 logger = logging.getLogger(__name__)
 
-DEEPGRAM_API_KEY = os.environ.get("DEEPGRAM_API_KEY", "")
-DEEPGRAM_MODEL = os.environ.get("DEEPGRAM_MODEL", "nova-3")
-DEEPGRAM_LANGUAGE = os.environ.get("DEEPGRAM_LANGUAGE", "").strip()
-
-AZURE_SPEECH_KEY = os.environ.get("AZURE_SPEECH_KEY", "")
-AZURE_SPEECH_REGION = os.environ.get("AZURE_SPEECH_REGION", "")
-AZURE_TTS_DEFAULT_VOICE = os.environ.get("AZURE_TTS_DEFAULT_VOICE", "en-US-JennyNeural")
+FALLBACK_REPLY = "Sorry, I had an issue processing that."
 
 
 class TwilioStreamConsumer(AsyncWebsocketConsumer):
     """
     Handles bidirectional Twilio media stream:
-    - inbound media payload (mulaw/8khz) -> buffered ASR
-    - ASR text -> LLM workflow
-    - LLM reply -> TTS (mulaw/8khz) -> Twilio media outbound
+    - inbound media payload (mulaw/8khz) -> VAD endpointing -> streaming ASR
+    - ASR text -> LLM workflow (async, reply tokens streamed)
+    - LLM reply -> sentence by sentence TTS (mulaw/8khz), starting with the first
+      generated sentence -> Twilio media outbound, paced by Twilio mark acknowledgements
+    - caller speech during playback (barge-in) -> Twilio clear + synthesis cancelled
 
     Expected websocket route: /ws/twilio/stream/
     """
@@ -58,19 +54,35 @@ class TwilioStreamConsumer(AsyncWebsocketConsumer):
         self.workflow = None
         self.transcript = None
 
-        self.audio_buffer = bytearray()
-        self.min_buffer_bytes = 12000  # ~1.5 sec at 8k mulaw
+        self.asr = None
+        self.endpointer = Endpointer()
+        # pending transcripts of closed turns, oldest first; answered one at a time by processing_task
+        self.turns = deque()
+        self.turn_ready = asyncio.Event()
         self.processing_task = None
         self.last_text = ""
+        # caller text whose reply was cut off before any of it played; answered with the next turn
+        self.unanswered_text = ""
+
+        self.pacer = tts.PlaybackPacer()
+        self.playback_task = None
+        self.barge_in_at_ms = 0.0
+        self.barge_in_ms = getattr(settings, "CALL_BARGE_IN_MS", 200)
 
         await self.accept()
         logger.info("Twilio stream websocket connected")
 
     async def disconnect(self, close_code):
+        if self._is_speaking():
+            self.playback_task.cancel()
         if self.processing_task and not self.processing_task.done():
             self.processing_task.cancel()
             with contextlib.suppress(asyncio.CancelledError):
                 await self.processing_task
+        if self.asr is not None:
+            await self.asr.close()
+        if self.unanswered_text and self.transcript is not None:
+            await database_sync_to_async(save_transcript_chunks)(self.transcript, self.unanswered_text, "", "")
 
     async def receive(self, text_data=None, bytes_data=None):
         if not text_data:
@@ -91,6 +103,10 @@ class TwilioStreamConsumer(AsyncWebsocketConsumer):
             await self._handle_media(data.get("media", {}))
             return
 
+        if event == "mark":
+            self.pacer.on_mark((data.get("mark") or {}).get("name"))
+            return
+
         if event == "stop":
             logger.info("Twilio stream stopped for call_sid=%s", self.call_sid)
             return
@@ -129,6 +145,13 @@ class TwilioStreamConsumer(AsyncWebsocketConsumer):
 
         await self._backfill_calllog_assistant(self.call_sid, self.assistant.id)
 
+        # connect a synthesizer for the first reply while the caller is still talking
+        asyncio.get_running_loop().run_in_executor(
+            None, speech_synthesis.prewarm, (tts.voice_order(self.assistant) or [""])[0]
+        )
+        self.asr = await build_asr(self.assistant, call_sid=self.call_sid)
+        self.processing_task = asyncio.create_task(self._process_turns())
+
         logger.info(
             "Twilio stream started: call_sid=%s stream_sid=%s assistant_id=%s",
             self.call_sid,
@@ -150,208 +173,215 @@ class TwilioStreamConsumer(AsyncWebsocketConsumer):
             logger.warning("Failed to decode media payload for call_sid=%s", self.call_sid)
             return
 
-        self.audio_buffer.extend(mulaw_chunk)
-
-        if len(self.audio_buffer) < self.min_buffer_bytes:
-            return
-
-        if self.processing_task and not self.processing_task.done():
-            return
-
-        buffered = bytes(self.audio_buffer)
-        self.audio_buffer.clear()
-        self.processing_task = asyncio.create_task(self._process_audio_turn(buffered))
-
-    async def _process_audio_turn(self, mulaw_audio: bytes):
-        text = await self._transcribe_mulaw_audio(mulaw_audio)
-        if not text:
-            return
+        event, speech = self.endpointer.feed(mulaw_chunk)
+        if self._is_speaking() and self.endpointer.turn_ms >= self.barge_in_ms:
+            await self._barge_in()
+        if speech:
+            await self.asr.send_audio(speech)
+        if event == SPEECH_END:
+            # the turn's audio is settled now; its transcript is awaited in order by _process_turns
+            self.turns.append(asyncio.ensure_future(self.asr.end_turn()))
+            self.turn_ready.set()
+
+    async def _next_user_text(self) -> str:
+        """Transcript of the next closed turn, merged with any later turns that are already done."""
+        while not self.turns:
+            self.turn_ready.clear()
+            await self.turn_ready.wait()
+        parts = [await self.turns.popleft()]
+        while self.turns and self.turns[0].done():
+            parts.append(self.turns.popleft().result())
+        return " ".join(p.strip() for p in parts if p and p.strip())
+
+    async def _process_turns(self):
+        while True:
+            try:
+                text = await self._next_user_text()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("ASR failed for call_sid=%s", self.call_sid)
+                continue
 
-        text = text.strip()
-        if not text or text == self.last_text:
-            return
+            if self.unanswered_text:
+                text = f"{self.unanswered_text} {text or ''}".strip()
+                self.unanswered_text = ""
+            if not text or text == self.last_text:
+                continue
 
-        self.last_text = text
-        await self._handle_llm_and_reply(text)
+            self.last_text = text
+            try:
+                await self._handle_llm_and_reply(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Turn handling failed for call_sid=%s", self.call_sid)
 
     async def _handle_llm_and_reply(self, user_text: str):
         history = await database_sync_to_async(get_history)(self.transcript)
         memory = await database_sync_to_async(get_assistant_mamory)(self.assistant.id)
 
+        # reply text flows from the LLM into TTS while it is generated
+        replies = asyncio.Queue()
+        spoken = []
+        playback = self.playback_task = asyncio.create_task(
+            self._stream_tts_to_twilio(self._reply_sentences(replies), cached=(FALLBACK_REPLY,), spoken=spoken)
+        )
+        llm = asyncio.create_task(self._run_llm(user_text, history, memory, replies))
         try:
-            result = await database_sync_to_async(self.workflow.invoke)(
-                {
-                    "input_text": user_text,
-                    "history": history,
-                    "memory": memory or {},
-                    "session_id": self.transcript.id,
-                }
-            )
-            ai_reply = (result or {}).get("answer", "")
-        except Exception:
-            logger.exception("LLM workflow failed for call_sid=%s", self.call_sid)
-            ai_reply = "Sorry, I had an issue processing that."
+            # asyncio.wait: a barge-in cancels the playback, not this turn
+            await asyncio.wait([playback])
+            if self.playback_task is playback:
+                self.playback_task = None
+            if playback.cancelled():
+                # nobody hears the rest of the reply: stop generating it
+                llm.cancel()
+                await asyncio.wait([llm])
+                # cut off by the caller: the transcript keeps what they heard, not the whole reply
+                ai_reply = tts.heard_text(spoken, self.barge_in_at_ms)
+                if not ai_reply:
+                    # cut off before any audio played: the caller had only paused, so
+                    # this text is answered (and stored) together with their next turn
+                    self.unanswered_text = user_text
+                    return
+            else:
+                if playback.exception() is not None:
+                    logger.error("TTS playback failed for call_sid=%s", self.call_sid, exc_info=playback.exception())
+                ai_reply = await llm
+        finally:
+            llm.cancel()
+        if ai_reply is None:
+            # the LLM failed: the caller heard the sentences streamed before that, then the fallback
+            ai_reply = tts.heard_text(spoken, float("inf")) or FALLBACK_REPLY
 
         if not ai_reply:
             return
 
-        await self._stream_tts_to_twilio(ai_reply)
-        await save_transcript_chunks(
+        await database_sync_to_async(save_transcript_chunks)(
             self.transcript,
             user_text,
             ai_reply,
             "",
         )
 
-    async def _transcribe_mulaw_audio(self, mulaw_audio: bytes) -> str:
-        if not DEEPGRAM_API_KEY:
-            logger.error("DEEPGRAM_API_KEY missing")
-            return ""
-
-        pcm_8k = audioop.ulaw2lin(mulaw_audio, 2)
-        pcm_16k, _ = audioop.ratecv(pcm_8k, 2, 1, 8000, 16000, None)
-
-        wav_bytes = self._pcm_to_wav_bytes(pcm_16k, sample_rate=16000)
-
-        assistant_language = str(getattr(self.assistant, "language", "") or "").strip()
-        deepgram_language = DEEPGRAM_LANGUAGE or assistant_language
-        if deepgram_language and "-" in deepgram_language:
-            deepgram_language = deepgram_language.split("-")[0]
+    async def _run_llm(self, user_text: str, history, memory, replies: asyncio.Queue) -> Optional[str]:
+        """
+        Runs the workflow, putting ("delta", text) on replies as the reply is
+        generated and then ("final", answer). When the workflow fails it puts
+        ("error", FALLBACK_REPLY) instead and returns None.
+        """
+        ai_reply = ""
+        try:
+            async for kind, value in astream_reply(
+                self.workflow,
+                {
+                    "input_text": user_text,
+                    "history": history,
+                    "memory": memory or {},
+                    "session_id": self.transcript.id,
+                },
+            ):
+                if kind == "delta":
+                    replies.put_nowait(("delta", value))
+                else:
+                    ai_reply = (value or {}).get("answer", "")
+        except Exception:
+            logger.exception("LLM workflow failed for call_sid=%s", self.call_sid)
+            replies.put_nowait(("error", FALLBACK_REPLY))
+            return None
+        replies.put_nowait(("final", ai_reply))
+        return ai_reply
 
-        url = (
-            "https://api.deepgram.com/v1/listen"
-            f"?model={DEEPGRAM_MODEL}"
-            "&smart_format=true&punctuate=true"
-        )
-        if deepgram_language:
-            url += f"&language={deepgram_language}"
-        headers = {
-            "Authorization": f"Token {DEEPGRAM_API_KEY}",
-            "Content-Type": "audio/wav",
-        }
+    async def _reply_sentences(self, replies: asyncio.Queue):
+        streamed = False
+        fallback = None
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, data=wav_bytes) as resp:
-                if resp.status != 200:
-                    body = await resp.text()
-                    logger.warning(
-                        "Deepgram STT failed call_sid=%s status=%s body=%s",
-                        self.call_sid,
-                        resp.status,
-                        body,
-                    )
-                    return ""
-
-                result = await resp.json()
-                channels = (
-                    result.get("results", {})
-                    .get("channels", [])
-                )
-                if not channels:
-                    return ""
-                alternatives = channels[0].get("alternatives", [])
-                if not alternatives:
-                    return ""
-                return (alternatives[0].get("transcript") or "").strip()
-
-    async def _stream_tts_to_twilio(self, text: str):
+        async def _text():
+            nonlocal streamed, fallback
+            while True:
+                kind, text = await replies.get()
+                if kind == "delta":
+                    streamed = True
+                    yield text
+                elif kind == "error":
+                    fallback = text
+                    return
+                else:
+                    # answers that were not streamed (crisis reply, non-JSON output) are spoken whole
+                    if not streamed:
+                        yield text
+                    return
+
+        async for sentence in tts.stream_sentences(_text()):
+            if fallback:
+                # the text left over when the LLM failed is a cut-off sentence
+                break
+            yield sentence
+        if fallback:
+            yield fallback
+
+    def _is_speaking(self) -> bool:
+        return self.playback_task is not None and not self.playback_task.done()
+
+    async def _barge_in(self):
+        """The caller talks over the reply: stop synthesizing it and drop what Twilio still has queued."""
+        task, self.playback_task = self.playback_task, None
+        task.cancel()
+        self.barge_in_at_ms = self.pacer.played_ms()
+        await self._send_event({"event": "clear", "streamSid": self.stream_sid})
+        self.pacer.reset()
+        logger.info("Barge-in on call_sid=%s", self.call_sid)
+
+    async def _send_event(self, message: dict):
+        await self.send(text_data=json.dumps(message))
+
+    async def _stream_tts_to_twilio(self, sentences, cached=(), spoken=None):
+        """
+        Synthesizes and sends the reply. Each sentence sent is appended to
+        spoken as (sentence, start_ms, end_ms) on the pacer's timeline.
+        """
         if not self.stream_sid:
             return
 
-        if not AZURE_SPEECH_KEY or not AZURE_SPEECH_REGION:
+        if not tts.is_configured():
             logger.error("AZURE_SPEECH_KEY or AZURE_SPEECH_REGION missing")
             return
 
-        preferred_voice = str(getattr(self.assistant, "voice", "") or "").strip().replace('"', "").replace("'", "")
-        voices = [preferred_voice, AZURE_TTS_DEFAULT_VOICE]
-        seen = set()
-        ordered_voices = []
-        for voice in voices:
-            if voice and voice not in seen:
-                seen.add(voice)
-                ordered_voices.append(voice)
-
-        ulaw_audio = b""
-        for voice_name in ordered_voices:
-            ulaw_audio = await asyncio.to_thread(self._synthesize_azure_mulaw, text, voice_name)
-            if ulaw_audio:
-                break
+        audio_bytes = 0
+        async with contextlib.aclosing(
+            tts.synthesize_sentences(sentences, tts.voice_order(self.assistant), cached=cached)
+        ) as audio_stream:
+            async for sentence, audio in audio_stream:
+                audio_bytes += len(audio)
+                if spoken is not None:
+                    # recorded up front: a barge-in can land while the sentence is still being sent
+                    start_ms = self.pacer.sent_ms
+                    spoken.append((sentence, start_ms, start_ms + len(audio) / tts.BYTES_PER_MS))
+                for chunk in tts.chunk_bytes(audio, self.pacer.chunk_bytes):
+                    await self.pacer.wait_for_room()
+                    await self._send_event(
+                        {
+                            "event": "media",
+                            "streamSid": self.stream_sid,
+                            "media": {
+                                "payload": base64.b64encode(chunk).decode("ascii"),
+                            },
+                        }
+                    )
+                    await self._send_event(
+                        {
+                            "event": "mark",
+                            "streamSid": self.stream_sid,
+                            "mark": {"name": self.pacer.sent(len(chunk))},
+                        }
+                    )
 
-        if not ulaw_audio:
+        if not audio_bytes:
             logger.warning("Azure TTS produced no audio for call_sid=%s", self.call_sid)
             return
 
-        for chunk in self._chunk_bytes(ulaw_audio, 320):
-            await self.send(
-                text_data=json.dumps(
-                    {
-                        "event": "media",
-                        "streamSid": self.stream_sid,
-                        "media": {
-                            "payload": base64.b64encode(chunk).decode("ascii"),
-                        },
-                    }
-                )
-            )
-            await asyncio.sleep(0.04)
-
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "event": "mark",
-                    "streamSid": self.stream_sid,
-                    "mark": {"name": "assistant_response_end"},
-                }
-            )
-        )
-
-    @staticmethod
-    def _synthesize_azure_mulaw(text: str, voice_name: str) -> bytes:
-        try:
-            speech_config = speechsdk.SpeechConfig(
-                subscription=AZURE_SPEECH_KEY,
-                region=AZURE_SPEECH_REGION,
-            )
-            speech_config.speech_synthesis_voice_name = voice_name
-            speech_config.set_speech_synthesis_output_format(
-                speechsdk.SpeechSynthesisOutputFormat.Raw8Khz8BitMonoMULaw
-            )
-
-            synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=speech_config,
-                audio_config=None,
-            )
-
-            result = synthesizer.speak_text_async(text).get()
-            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                return bytes(result.audio_data or b"")
-
-            cancellation_details = speechsdk.CancellationDetails.from_result(result)
-            logger.warning(
-                "Azure TTS canceled: reason=%s error=%s voice=%s",
-                cancellation_details.reason,
-                cancellation_details.error_details,
-                voice_name,
-            )
-            return b""
-        except Exception:
-            logger.exception("Azure TTS exception for voice=%s", voice_name)
-            return b""
-
-    @staticmethod
-    def _chunk_bytes(data: bytes, size: int):
-        for i in range(0, len(data), size):
-            yield data[i:i + size]
-
-    @staticmethod
-    def _pcm_to_wav_bytes(pcm_bytes: bytes, sample_rate: int) -> bytes:
-        bio = BytesIO()
-        with wave.open(bio, "wb") as wav_file:
-            wav_file.setnchannels(1)
-            wav_file.setsampwidth(2)
-            wav_file.setframerate(sample_rate)
-            wav_file.writeframes(pcm_bytes)
-        return bio.getvalue()
+        # the reply is still "speaking" (and can be barged in on) until Twilio has played it
+        await self.pacer.drain()
 
     @database_sync_to_async
     def _resolve_assistant(self, call_sid=None, assistant_id=None, assistant_public_id=None, to_number=None):
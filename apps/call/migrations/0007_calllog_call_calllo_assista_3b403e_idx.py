@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0005_assistanthistory'),
+        ('call', '0006_callcampaign'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['assistant', 'created_at', 'id'], name='call_calllo_assista_3b403e_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0005_assistanthistory'),
+        ('call', '0007_calllog_call_calllo_assista_3b403e_idx'),
+        ('phone_number', '0003_phonenumber_calls_per_second_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='call_campaigns/')),
+                ('message', models.TextField(blank=True, default='')),
+                ('voice_url', models.CharField(blank=True, default='', max_length=255)),
+                ('status_callback_url', models.CharField(blank=True, default='', max_length=255)),
+                ('status', models.CharField(choices=[('parsing', 'Parsing'), ('running', 'Running'), ('paused', 'Paused'), ('completed', 'Completed'), ('failed', 'Failed')], default='parsing', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('assistant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbound_campaigns', to='assistant.assistant')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbound_campaigns', to=settings.AUTH_USER_MODEL)),
+                ('phone_number', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbound_campaigns', to='phone_number.phonenumber')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OutboundCampaignCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField()),
+                ('to_number', models.CharField(blank=True, default='', max_length=50)),
+                ('name', models.CharField(blank=True, max_length=50, null=True)),
+                ('designation', models.CharField(blank=True, max_length=50, null=True)),
+                ('company', models.CharField(blank=True, max_length=50, null=True)),
+                ('business_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('dialing', 'Dialing'), ('active', 'Active'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('call_sid', models.CharField(blank=True, db_index=True, max_length=255, null=True)),
+                ('call_status', models.CharField(blank=True, default='', max_length=50)),
+                ('error', models.TextField(blank=True, default='')),
+                ('dialed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calls', to='call.outboundcampaign')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='outboundcampaign',
+            index=models.Index(fields=['owner', 'created_at'], name='call_outbou_owner_i_935357_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outboundcampaigncall',
+            index=models.Index(fields=['campaign', 'status', 'id'], name='call_outbou_campaig_fe03f7_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('call', '0008_outboundcampaign_outboundcampaigncall_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundcampaign',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.db import models
 from apps.assistant.models import Assistant
+from apps.phone_number.models import PhoneNumber
 
 class CallLog(models.Model):
     assistant = models.ForeignKey(
@@ -28,6 +30,7 @@ class CallLog(models.Model):
         db_table = "call_calllog"
         indexes = [
             models.Index(fields=["assistant", "timestamp"]),
+            models.Index(fields=["assistant", "created_at", "id"]),
         ]
 
     def __str__(self):
@@ -61,3 +64,79 @@ class CallCampaign(models.Model):
 
 
     
+
+
+class OutboundCampaign(models.Model):
+    """One uploaded call list; its rows are dialed in the background (services/campaigns.py)."""
+
+    STATUS_PARSING = "parsing"
+    STATUS_RUNNING = "running"
+    STATUS_PAUSED = "paused"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PARSING, "Parsing"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_PAUSED, "Paused"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="outbound_campaigns")
+    assistant = models.ForeignKey(Assistant, on_delete=models.CASCADE, related_name="outbound_campaigns")
+    phone_number = models.ForeignKey(PhoneNumber, on_delete=models.CASCADE, related_name="outbound_campaigns")
+    file = models.FileField(upload_to="call_campaigns/")
+    message = models.TextField(blank=True, default="")
+    # the intro audio is played from {voice_url}/voice?id=...; Twilio reports call ends to status_callback_url
+    voice_url = models.CharField(max_length=255, blank=True, default="")
+    status_callback_url = models.CharField(max_length=255, blank=True, default="")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PARSING)
+    total = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    # last sign of life of the campaign's runner; a stale one is re-dispatched
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["owner", "created_at"])]
+
+    def __str__(self):
+        return f"Campaign {self.pk} | {self.status}"
+
+
+class OutboundCampaignCall(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_DIALING = "dialing"
+    STATUS_ACTIVE = "active"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_DIALING, "Dialing"),
+        (STATUS_ACTIVE, "Active"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    campaign = models.ForeignKey(OutboundCampaign, on_delete=models.CASCADE, related_name="calls")
+    row_number = models.PositiveIntegerField()
+    to_number = models.CharField(max_length=50, blank=True, default="")
+    name = models.CharField(max_length=50, blank=True, null=True)
+    designation = models.CharField(max_length=50, blank=True, null=True)
+    company = models.CharField(max_length=50, blank=True, null=True)
+    business_type = models.CharField(max_length=50, blank=True, null=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    call_sid = models.CharField(max_length=255, blank=True, null=True, db_index=True)
+    call_status = models.CharField(max_length=50, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+    dialed_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["campaign", "status", "id"])]
+
+    def __str__(self):
+        return f"{self.to_number} | {self.status}"
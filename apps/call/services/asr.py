@@ -0,0 +1,371 @@
+"""
+Speech recognition for call turns.
+
+The consumer feeds the audio of each turn (see vad.py) with `send_audio` and,
+when the turn closes, calls `end_turn()`. That call settles the turn's audio
+synchronously and returns an awaitable of its transcript, so the next turn can
+be fed while the previous one is still being recognized.
+
+- DeepgramStreamingASR: one websocket per call. Audio is streamed as it
+  arrives, so by the end of a turn most of it is already transcribed; a
+  Finalize message flushes the rest.
+- DeepgramBatchASR: one POST per turn on a session kept for the call.
+- LocalASR: no network; scripted transcripts, for tests and local runs.
+
+CALL_ASR_MODE picks one ("stream", "batch" or "local"); `build_asr` falls back
+to batch when the websocket cannot be opened.
+"""
+import abc
+import asyncio
+import audioop
+import contextlib
+import json
+import logging
+import os
+import wave
+from collections import deque
+from io import BytesIO
+from typing import Awaitable, Iterable, List, Optional
+
+import aiohttp
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEEPGRAM_API_KEY = os.environ.get("DEEPGRAM_API_KEY", "")
+DEEPGRAM_MODEL = os.environ.get("DEEPGRAM_MODEL", "nova-3")
+DEEPGRAM_LANGUAGE = os.environ.get("DEEPGRAM_LANGUAGE", "").strip()
+
+DEEPGRAM_LISTEN_URL = "https://api.deepgram.com/v1/listen"
+DEEPGRAM_STREAM_URL = "wss://api.deepgram.com/v1/listen"
+
+KEEPALIVE_SECONDS = 5
+RECONNECT_SECONDS = 5
+# 20 ms media frames held while the websocket reopens: 5 s, the default connect timeout
+RECONNECT_BUFFER_FRAMES = 250
+
+
+def deepgram_language(assistant) -> str:
+    language = DEEPGRAM_LANGUAGE or str(getattr(assistant, "language", "") or "").strip()
+    if language and "-" in language:
+        language = language.split("-")[0]
+    return language
+
+
+def pcm_to_wav_bytes(pcm_bytes: bytes, sample_rate: int) -> bytes:
+    bio = BytesIO()
+    with wave.open(bio, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm_bytes)
+    return bio.getvalue()
+
+
+async def _joined(turn: "_Turn", timeout: float) -> str:
+    with contextlib.suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(asyncio.shield(turn.done), timeout)
+    return " ".join(s for s in turn.segments if s).strip()
+
+
+class _Turn:
+    __slots__ = ("segments", "done")
+
+    def __init__(self):
+        self.segments: List[str] = []
+        self.done = asyncio.get_running_loop().create_future()
+
+
+# ----------------------------------
+# Recognizers
+# ----------------------------------
+class BaseASR(abc.ABC):
+    async def start(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def send_audio(self, mulaw: bytes) -> None:
+        ...
+
+    @abc.abstractmethod
+    def end_turn(self) -> Awaitable[str]:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalASR(BaseASR):
+    """Stand-in recognizer: returns the scripted transcripts in order, then ""."""
+
+    def __init__(self, transcripts: Iterable[str] = ()):
+        self.transcripts = deque(transcripts)
+        self.audio = bytearray()
+        self.turn_bytes: List[int] = []
+
+    async def send_audio(self, mulaw: bytes) -> None:
+        self.audio.extend(mulaw)
+
+    def end_turn(self) -> Awaitable[str]:
+        self.turn_bytes.append(len(self.audio))
+        self.audio.clear()
+        text = self.transcripts.popleft() if self.transcripts else ""
+
+        async def _result():
+            return text
+
+        return _result()
+
+
+class DeepgramBatchASR(BaseASR):
+    def __init__(self, language: str = "", call_sid: str = None):
+        self.language = language
+        self.call_sid = call_sid
+        self.audio = bytearray()
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> None:
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=getattr(settings, "CALL_ASR_BATCH_TIMEOUT", 15))
+        )
+
+    async def send_audio(self, mulaw: bytes) -> None:
+        self.audio.extend(mulaw)
+
+    def end_turn(self) -> Awaitable[str]:
+        audio = bytes(self.audio)
+        self.audio.clear()
+        return self._transcribe(audio)
+
+    async def _transcribe(self, mulaw_audio: bytes) -> str:
+        if not mulaw_audio:
+            return ""
+        if not DEEPGRAM_API_KEY:
+            logger.error("DEEPGRAM_API_KEY missing")
+            return ""
+        if self.session is None:
+            await self.start()
+
+        pcm_8k = audioop.ulaw2lin(mulaw_audio, 2)
+        pcm_16k, _ = audioop.ratecv(pcm_8k, 2, 1, 8000, 16000, None)
+        wav_bytes = pcm_to_wav_bytes(pcm_16k, sample_rate=16000)
+
+        params = {"model": DEEPGRAM_MODEL, "smart_format": "true", "punctuate": "true"}
+        if self.language:
+            params["language"] = self.language
+        headers = {
+            "Authorization": f"Token {DEEPGRAM_API_KEY}",
+            "Content-Type": "audio/wav",
+        }
+
+        try:
+            async with self.session.post(DEEPGRAM_LISTEN_URL, params=params, headers=headers, data=wav_bytes) as resp:
+                if resp.status != 200:
+                    body = await resp.text()
+                    logger.warning(
+                        "Deepgram STT failed call_sid=%s status=%s body=%s",
+                        self.call_sid,
+                        resp.status,
+                        body,
+                    )
+                    return ""
+                result = await resp.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Deepgram STT request failed call_sid=%s: %s", self.call_sid, e)
+            return ""
+
+        channels = result.get("results", {}).get("channels", [])
+        if not channels:
+            return ""
+        alternatives = channels[0].get("alternatives", [])
+        if not alternatives:
+            return ""
+        return (alternatives[0].get("transcript") or "").strip()
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class DeepgramStreamingASR(BaseASR):
+    """
+    Raw μ-law is streamed on one websocket for the whole call. Final segments
+    are collected into the open turn; end_turn() sends Finalize and the turn
+    completes when Deepgram answers it (from_finalize) or after
+    CALL_ASR_FINALIZE_TIMEOUT_MS.
+
+    A dropped socket is reopened by a background task so send_audio never waits
+    on a connect: frames are buffered meanwhile and flushed in order once it is
+    open. If the connect fails the buffer is dropped and later frames are
+    discarded until RECONNECT_SECONDS have passed.
+    """
+
+    def __init__(self, language: str = "", call_sid: str = None):
+        self.language = language
+        self.call_sid = call_sid
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._keepalive: Optional[asyncio.Task] = None
+        self._reconnect: Optional[asyncio.Task] = None
+        self._buffer: deque = deque(maxlen=RECONNECT_BUFFER_FRAMES)
+        self._current: Optional[_Turn] = None
+        # turns waiting for their Finalize answer, oldest first
+        self._closing: deque = deque()
+        self._retry_at = 0.0
+        self.finalize_timeout = getattr(settings, "CALL_ASR_FINALIZE_TIMEOUT_MS", 800) / 1000
+
+    def _url_params(self) -> dict:
+        params = {
+            "model": DEEPGRAM_MODEL,
+            "encoding": "mulaw",
+            "sample_rate": "8000",
+            "channels": "1",
+            "punctuate": "true",
+            "smart_format": "true",
+            "interim_results": "false",
+        }
+        if self.language:
+            params["language"] = self.language
+        return params
+
+    async def start(self) -> None:
+        if not DEEPGRAM_API_KEY:
+            raise RuntimeError("DEEPGRAM_API_KEY missing")
+        self.session = self.session or aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=None, connect=getattr(settings, "CALL_ASR_CONNECT_TIMEOUT", 5))
+        )
+        self.ws = await self.session.ws_connect(
+            DEEPGRAM_STREAM_URL,
+            params=self._url_params(),
+            headers={"Authorization": f"Token {DEEPGRAM_API_KEY}"},
+            timeout=aiohttp.ClientWSTimeout(ws_close=2),
+        )
+        # the tasks of a dropped socket would otherwise keep running next to the new ones
+        for task in (self._keepalive, self._reader):
+            if task is not None:
+                task.cancel()
+        self._reader = asyncio.create_task(self._read())
+        self._keepalive = asyncio.create_task(self._keep_alive())
+        logger.info("Deepgram stream opened call_sid=%s", self.call_sid)
+
+    def _reconnect_soon(self) -> None:
+        if self._reconnect is not None:
+            return
+        loop = asyncio.get_running_loop()
+        # media frames arrive every 20 ms; do not start a connect attempt for each of them
+        if loop.time() < self._retry_at:
+            return
+        self._reconnect = asyncio.create_task(self._reopen())
+
+    async def _reopen(self) -> None:
+        try:
+            await self.start()
+            while self._buffer:
+                await self.ws.send_bytes(self._buffer.popleft())
+        except Exception as e:
+            self._retry_at = asyncio.get_running_loop().time() + RECONNECT_SECONDS
+            self._buffer.clear()
+            logger.warning("Deepgram stream reconnect failed call_sid=%s: %s", self.call_sid, e)
+        finally:
+            self._reconnect = None
+
+    def handle_message(self, data: dict) -> None:
+        if data.get("type") != "Results":
+            return
+        alternatives = (data.get("channel") or {}).get("alternatives") or [{}]
+        text = (alternatives[0].get("transcript") or "").strip()
+        # a Finalize answer belongs to the oldest closing turn, anything else to the open one
+        turn = self._closing[0] if self._closing else self._current
+        if turn is not None and text and data.get("is_final"):
+            turn.segments.append(text)
+        if data.get("from_finalize") and self._closing:
+            closed = self._closing.popleft()
+            if not closed.done.done():
+                closed.done.set_result(True)
+
+    async def _read(self):
+        ws = self.ws
+        try:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                try:
+                    self.handle_message(json.loads(msg.data))
+                except json.JSONDecodeError:
+                    continue
+        except Exception as e:
+            logger.warning("Deepgram stream read failed call_sid=%s: %s", self.call_sid, e)
+        logger.info("Deepgram stream closed call_sid=%s code=%s", self.call_sid, ws.close_code)
+
+    async def _keep_alive(self):
+        # Deepgram drops a socket that gets no audio for ~10 s; callers are silent between turns
+        while self.ws is not None and not self.ws.closed:
+            await asyncio.sleep(KEEPALIVE_SECONDS)
+            with contextlib.suppress(Exception):
+                await self.ws.send_str(json.dumps({"type": "KeepAlive"}))
+
+    async def send_audio(self, mulaw: bytes) -> None:
+        if self._current is None:
+            self._current = _Turn()
+        if self._reconnect is not None or self.ws is None or self.ws.closed:
+            self._reconnect_soon()
+            if self._reconnect is not None:
+                self._buffer.append(mulaw)
+            return
+        try:
+            await self.ws.send_bytes(mulaw)
+        except Exception as e:
+            logger.warning("Deepgram stream send failed call_sid=%s: %s", self.call_sid, e)
+
+    def end_turn(self) -> Awaitable[str]:
+        turn, self._current = self._current or _Turn(), None
+        self._closing.append(turn)
+        return self._finish(turn)
+
+    async def _finish(self, turn: _Turn) -> str:
+        if self.ws is not None and not self.ws.closed:
+            with contextlib.suppress(Exception):
+                await self.ws.send_str(json.dumps({"type": "Finalize"}))
+        text = await _joined(turn, self.finalize_timeout)
+        with contextlib.suppress(ValueError):
+            self._closing.remove(turn)
+        return text
+
+    async def close(self) -> None:
+        tasks = [task for task in (self._reconnect, self._keepalive, self._reader) if task is not None]
+        for task in tasks:
+            task.cancel()
+        if self.ws is not None and not self.ws.closed:
+            with contextlib.suppress(Exception):
+                await self.ws.send_str(json.dumps({"type": "CloseStream"}))
+                await self.ws.close()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await task
+        if self.session is not None:
+            await self.session.close()
+        self._buffer.clear()
+        self.ws = self.session = self._reader = self._keepalive = self._reconnect = None
+
+
+async def build_asr(assistant=None, call_sid: str = None, mode: str = None) -> BaseASR:
+    """A started recognizer for one call."""
+    mode = (mode or getattr(settings, "CALL_ASR_MODE", "stream") or "").lower()
+    if mode == "local":
+        return LocalASR()
+
+    language = deepgram_language(assistant)
+    if mode == "stream":
+        asr = DeepgramStreamingASR(language=language, call_sid=call_sid)
+        try:
+            await asr.start()
+            return asr
+        except Exception as e:
+            logger.warning("Deepgram stream unavailable call_sid=%s, using batch ASR: %s", call_sid, e)
+            await asr.close()
+
+    asr = DeepgramBatchASR(language=language, call_sid=call_sid)
+    await asr.start()
+    return asr
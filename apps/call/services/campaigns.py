@@ -0,0 +1,538 @@
+"""
+Outbound call campaigns.
+
+An uploaded call list is stored with its OutboundCampaign and the request
+returns right away. In the background the CSV is read row by row (never
+loaded whole) into OutboundCampaignCall rows, inserted in batches; each row
+is one queued dial job.
+
+A runner then dials the campaign's rows in order, within the limits of its
+caller id (PhoneNumber):
+- concurrency: at most `max_concurrent_calls` calls from the number are
+  dialing or active at once, across all of its campaigns. Twilio reports the
+  end of a call to the status callback, which frees its line; a call never
+  reported is given up on after CALL_CAMPAIGN_CALL_TIMEOUT.
+- rate: at most `calls_per_second` new calls per second from the number,
+  enforced through the shared cache so it holds across workers.
+
+Dials run on a small pool; each one records its own outcome on its row. The
+CallLog/CallCampaign rows of placed calls are bulk inserted by the runner,
+which also pushes the campaign's progress to the owner's notification
+websocket (the progress endpoint reads the same counts).
+
+A runner works for CALL_CAMPAIGN_SLICE_SECONDS and then schedules the next
+slice (on Celery when CALL_CAMPAIGN_MODE="queue", otherwise on an in-process
+pool); a cache lock keeps one runner per campaign. Pausing stops the runner
+after its current dial; resuming schedules a new one. A running runner
+records a heartbeat and refreshes its lock every few seconds; the watchdog
+of each web worker re-dispatches running campaigns whose heartbeat is older
+than CALL_CAMPAIGN_STALE_SECONDS (a runner lost to a worker recycle or a
+deploy). Rows left "dialing" by a dead runner are marked failed rather than
+dialed twice.
+
+Twilio status callbacks are only accepted with a valid X-Twilio-Signature
+and must name the row's own call sid.
+"""
+import csv
+import io
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.utils import timezone
+from twilio.request_validator import RequestValidator
+from twilio.rest import Client
+
+from apps.notification.utils import send_realtime_notification
+from apps.phone_number.models import PhoneNumber
+from ..models import CallCampaign, CallLog, OutboundCampaign, OutboundCampaignCall
+from ..utils import synthesize_speech_memory
+
+logger = logging.getLogger(__name__)
+
+Campaign = OutboundCampaign
+Call = OutboundCampaignCall
+
+EVENT_TYPE = "call_campaign_progress"
+BATCH_SIZE = 500
+POLL_SECONDS = 1
+FLUSH_SECONDS = 2
+
+# CSV header (lower-cased) -> OutboundCampaignCall field
+CSV_COLUMNS = {
+    "name": ("name",),
+    "to_number": ("number", "phone", "phone_number"),
+    "designation": ("designation", "job"),
+    "company": ("company",),
+    "business_type": ("business type", "business_type", "type"),
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_pid = None
+_executors_lock = threading.Lock()
+_watchdog_pid = None
+
+
+def _mode() -> str:
+    return (getattr(settings, "CALL_CAMPAIGN_MODE", "thread") or "").lower()
+
+
+def _stale_seconds() -> int:
+    return getattr(settings, "CALL_CAMPAIGN_STALE_SECONDS", 120)
+
+
+def _get_executor(name: str, workers: int) -> ThreadPoolExecutor:
+    global _executors_pid
+    with _executors_lock:
+        if _executors_pid != os.getpid():
+            _executors.clear()
+            _executors_pid = os.getpid()
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"call-campaign-{name}")
+        return _executors[name]
+
+
+def _in_pool(fn: Callable, *args):
+    try:
+        return fn(*args)
+    except Exception:
+        logger.exception(f"Call campaign job {fn.__name__}{args} failed")
+    finally:
+        # pool threads are long lived; do not keep their DB connections open
+        connections.close_all()
+
+
+@lru_cache(maxsize=1)
+def _twilio() -> Client:
+    return Client(os.getenv("TWILIO_SID"), os.getenv("TWILIO_AUTH"))
+
+
+def valid_twilio_signature(url: str, params: dict, signature: str) -> bool:
+    """X-Twilio-Signature check of a callback Twilio made to url with params."""
+    auth_token = os.getenv("TWILIO_AUTH")
+    if not auth_token or not signature:
+        return False
+    return RequestValidator(auth_token).validate(url, params, signature)
+
+
+def status_callback_url(call: Call) -> str:
+    """The exact callback URL given to Twilio for the row (what its signature covers)."""
+    return f"{call.campaign.status_callback_url}?call={call.pk}"
+
+
+# ----------------------------------
+# Progress
+# ----------------------------------
+def progress(campaign: Campaign) -> dict:
+    counts = dict(campaign.calls.order_by().values_list("status").annotate(n=Count("id")))
+    return {
+        "id": campaign.pk,
+        "status": campaign.status,
+        "total": campaign.total,
+        "error": campaign.error,
+        **{status: counts.get(status, 0) for status, _ in Call.STATUS_CHOICES},
+    }
+
+
+def _notify(campaign: Campaign) -> None:
+    try:
+        send_realtime_notification(campaign.owner_id, {"type": EVENT_TYPE, **progress(campaign)})
+    except Exception as e:
+        logger.warning(f"Progress of call campaign={campaign.pk} not delivered: {e}")
+
+
+# ----------------------------------
+# Upload
+# ----------------------------------
+def row_fields(row: dict) -> dict:
+    """OutboundCampaignCall fields of one CSV row; headers are matched case-insensitively."""
+    row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items() if isinstance(v, str)}
+    fields = {}
+    for field, headers in CSV_COLUMNS.items():
+        value = next((row[h] for h in headers if row.get(h)), "")
+        fields[field] = value[:50]
+    return fields
+
+
+def start_campaign(owner, assistant, phone_number, upload, voice_url="", status_callback_url="") -> Campaign:
+    """Store the upload and parse it after commit."""
+    with transaction.atomic():
+        campaign = Campaign.objects.create(
+            owner=owner,
+            assistant=assistant,
+            phone_number=phone_number,
+            file=upload,
+            message=assistant.first_message or "",
+            voice_url=voice_url.rstrip("/"),
+            status_callback_url=status_callback_url,
+        )
+        transaction.on_commit(lambda: _dispatch("parse", campaign.pk))
+    return campaign
+
+
+def parse_upload(campaign_id) -> None:
+    campaign = Campaign.objects.filter(pk=campaign_id, status=Campaign.STATUS_PARSING).first()
+    if campaign is None:
+        return
+    # a parse interrupted half way starts over
+    campaign.calls.all().delete()
+
+    total = 0
+    batch: List[Call] = []
+    try:
+        with campaign.file.open("rb") as fh:
+            reader = csv.DictReader(io.TextIOWrapper(fh, encoding="utf-8-sig", newline=""))
+            for row_number, row in enumerate(reader, start=1):
+                fields = row_fields(row)
+                if not any(fields.values()):
+                    continue
+                call = Call(campaign=campaign, row_number=row_number, **fields)
+                if not call.to_number:
+                    call.status = Call.STATUS_FAILED
+                    call.error = "Missing phone number"
+                batch.append(call)
+                if len(batch) >= BATCH_SIZE:
+                    Call.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+        Call.objects.bulk_create(batch)
+        total += len(batch)
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        logger.warning(f"Call campaign={campaign_id} upload is not a readable CSV: {e}")
+        Campaign.objects.filter(pk=campaign_id).update(
+            status=Campaign.STATUS_FAILED, error=f"Invalid CSV file: {e}", updated_at=timezone.now()
+        )
+        campaign.refresh_from_db()
+        _notify(campaign)
+        return
+
+    Campaign.objects.filter(pk=campaign_id, status=Campaign.STATUS_PARSING).update(
+        status=Campaign.STATUS_RUNNING, total=total, updated_at=timezone.now()
+    )
+    logger.info(f"Call campaign={campaign_id} queued {total} rows")
+    _dispatch("run", campaign_id)
+
+
+# ----------------------------------
+# Limits
+# ----------------------------------
+def _max_concurrent(number: PhoneNumber) -> int:
+    return number.max_concurrent_calls or getattr(settings, "CALL_CAMPAIGN_MAX_CONCURRENT", 10)
+
+
+def _cps(number: PhoneNumber) -> float:
+    return number.calls_per_second or getattr(settings, "CALL_CAMPAIGN_CPS", 1)
+
+
+def take_dial_slot(number_id, cps: float, clock: Callable[[], float] = time.time, sleep: Callable = time.sleep) -> None:
+    """
+    Block until the number may place another call. Time is cut into slots of
+    1/cps seconds and each slot is claimed once, with an atomic cache add.
+    """
+    interval = 1 / cps
+    while True:
+        now = clock()
+        slot = int(now / interval)
+        if cache.add(f"call_campaign:rate:{number_id}:{slot}", 1, timeout=max(2, math.ceil(2 * interval))):
+            return
+        sleep(max((slot + 1) * interval - now, 0.001))
+
+
+def _claim_next(campaign: Campaign) -> Optional[Call]:
+    """The next queued row, marked dialing; None when nothing is queued or every line is busy."""
+    now = timezone.now()
+    active_since = now - timedelta(seconds=getattr(settings, "CALL_CAMPAIGN_CALL_TIMEOUT", 600))
+    with transaction.atomic():
+        # one claim at a time per caller id, whichever campaign or worker asks
+        number = PhoneNumber.objects.select_for_update().get(pk=campaign.phone_number_id)
+        busy = Call.objects.filter(campaign__phone_number_id=number.pk).filter(
+            Q(status=Call.STATUS_DIALING) | Q(status=Call.STATUS_ACTIVE, dialed_at__gte=active_since)
+        ).count()
+        if busy >= _max_concurrent(number):
+            return None
+        call = campaign.calls.filter(status=Call.STATUS_QUEUED).order_by("id").first()
+        if call is None:
+            return None
+        Call.objects.filter(pk=call.pk).update(status=Call.STATUS_DIALING, dialed_at=now, updated_at=now)
+    call.status = Call.STATUS_DIALING
+    call.dialed_at = now
+    return call
+
+
+# ----------------------------------
+# Dialing
+# ----------------------------------
+def _dial(campaign: Campaign, call: Call) -> Optional[Call]:
+    """Place one call. Records the outcome on the row; returns it when the call was placed."""
+    try:
+        # a personalized intro is heard once; only a fixed one is worth the phrase cache
+        personalized = "<NAME>" in campaign.message
+        text = campaign.message.replace("<NAME>", call.name or "")
+        _, audio_id = synthesize_speech_memory(text, call.to_number, cache=not personalized)
+        if not audio_id:
+            raise RuntimeError("Speech synthesis failed")
+
+        options = {}
+        if campaign.status_callback_url:
+            call.campaign = campaign
+            options = {
+                "status_callback": status_callback_url(call),
+                "status_callback_event": ["completed"],
+                "status_callback_method": "POST",
+            }
+        twilio_call = _twilio().calls.create(
+            to=call.to_number,
+            from_=campaign.phone_number.phone_number,
+            url=f"{campaign.voice_url}/voice?id={audio_id}",
+            record=True,
+            **options,
+        )
+    except Exception as e:
+        logger.warning(f"Call campaign={campaign.pk} row={call.row_number} not dialed: {e}")
+        Call.objects.filter(pk=call.pk).update(
+            status=Call.STATUS_FAILED, error=str(e)[:1000], updated_at=timezone.now()
+        )
+        return None
+
+    call.call_sid = twilio_call.sid
+    # the status callback may already have finished the row
+    Call.objects.filter(pk=call.pk).update(
+        call_sid=call.call_sid,
+        status=Case(When(status=Call.STATUS_DIALING, then=Value(Call.STATUS_ACTIVE)), default=F("status")),
+        updated_at=timezone.now(),
+    )
+    # a status callback that arrived before the sid was stored
+    early_status = cache.get(_early_status_key(call.call_sid))
+    if early_status:
+        record_call_status(call.pk, call.call_sid, early_status)
+    return call
+
+
+def _record_placed(campaign: Campaign, calls: List[Call]) -> None:
+    """Bulk insert the CallLog and CallCampaign rows of placed calls."""
+    if not calls:
+        return
+    with transaction.atomic():
+        CallLog.objects.bulk_create([
+            CallLog(
+                assistant_id=campaign.assistant_id,
+                call_sid=call.call_sid,
+                call_status="ringing",
+                direction="outbound",
+                caller=campaign.phone_number.phone_number,
+                callee=call.to_number,
+            )
+            for call in calls
+        ], batch_size=BATCH_SIZE)
+        contacts = CallCampaign.objects.bulk_create([
+            CallCampaign(
+                phone_number=call.to_number,
+                name=call.name,
+                designation=call.designation,
+                company=call.company,
+                business_type=call.business_type,
+            )
+            for call in calls
+        ], batch_size=BATCH_SIZE)
+        # CallCampaign.save() derives the serial number from the pk; bulk_create does not call it
+        for contact in contacts:
+            contact.serial_number = f"HSBS{1000 + contact.pk}"
+        CallCampaign.objects.bulk_update(contacts, ["serial_number"], batch_size=BATCH_SIZE)
+
+
+def _early_status_key(call_sid: str) -> str:
+    return f"call_campaign:early_status:{call_sid}"
+
+
+def record_call_status(call_id, call_sid: str, call_status: str) -> bool:
+    """Twilio status callback (signature already checked): a campaign call ended and its line is free."""
+    if not call_id or not call_sid or not call_status:
+        return False
+    status = Call.STATUS_COMPLETED if call_status == "completed" else Call.STATUS_FAILED
+    updated = Call.objects.filter(pk=call_id, call_sid=call_sid).update(
+        status=status,
+        call_status=call_status,
+        error="" if status == Call.STATUS_COMPLETED else call_status,
+        updated_at=timezone.now(),
+    )
+    if not updated and Call.objects.filter(pk=call_id, call_sid__isnull=True, status=Call.STATUS_DIALING).exists():
+        # Twilio can report a short call before _dial has stored its sid; _dial applies it
+        cache.set(_early_status_key(call_sid), call_status, timeout=getattr(settings, "CALL_CAMPAIGN_CALL_TIMEOUT", 600))
+    return bool(updated)
+
+
+# ----------------------------------
+# Runner
+# ----------------------------------
+def _fail_interrupted(campaign: Campaign) -> None:
+    # only the lock holder dials, so these were left by a runner that died mid-dial
+    stale = campaign.calls.filter(status=Call.STATUS_DIALING).update(
+        status=Call.STATUS_FAILED, error="Interrupted while dialing", updated_at=timezone.now()
+    )
+    if stale:
+        logger.warning(f"Call campaign={campaign.pk}: {stale} interrupted dials marked failed")
+
+
+def _run(campaign_id, deadline: float, beat: Callable[[], None] = lambda: None) -> bool:
+    """Dial until the deadline, calling beat() every few seconds. Returns True when the campaign needs another slice."""
+    campaign = Campaign.objects.select_related("phone_number").filter(pk=campaign_id).first()
+    if campaign is None or campaign.status != Campaign.STATUS_RUNNING:
+        return False
+    _fail_interrupted(campaign)
+    beat()
+
+    pool = _get_executor("dial", getattr(settings, "CALL_CAMPAIGN_DIAL_WORKERS", 4))
+    futures = []
+    last_flush = time.monotonic()
+    more = True
+
+    def flush(wait=False):
+        nonlocal futures, last_flush
+        if wait:
+            for future in futures:
+                future.exception()
+        done = [f for f in futures if f.done()]
+        futures = [f for f in futures if not f.done()]
+        _record_placed(campaign, [f.result() for f in done if f.result() is not None])
+        campaign.refresh_from_db(fields=["status"])
+        _notify(campaign)
+        beat()
+        last_flush = time.monotonic()
+
+    try:
+        while time.monotonic() < deadline:
+            campaign.refresh_from_db(fields=["status"])
+            if campaign.status != Campaign.STATUS_RUNNING:
+                more = False
+                break
+
+            take_dial_slot(campaign.phone_number_id, _cps(campaign.phone_number))
+            call = _claim_next(campaign)
+            if call is not None:
+                futures.append(pool.submit(_in_pool, _dial, campaign, call))
+            elif not campaign.calls.filter(status=Call.STATUS_QUEUED).exists():
+                flush(wait=True)
+                finished = Campaign.objects.filter(pk=campaign.pk, status=Campaign.STATUS_RUNNING).update(
+                    status=Campaign.STATUS_COMPLETED, updated_at=timezone.now()
+                )
+                if finished:
+                    logger.info(f"Call campaign={campaign.pk} dialed every row")
+                more = False
+                break
+            else:
+                # every line of the number is busy
+                time.sleep(POLL_SECONDS)
+
+            if time.monotonic() - last_flush >= FLUSH_SECONDS:
+                flush()
+    finally:
+        flush(wait=True)
+    return more
+
+
+def run_slice(campaign_id) -> None:
+    """One runner slice, unless another runner holds the campaign."""
+    slice_seconds = getattr(settings, "CALL_CAMPAIGN_SLICE_SECONDS", 240)
+    lock, token = f"call_campaign:{campaign_id}:runner", uuid.uuid4().hex
+    # the lock outlives a dead runner by at most the stale period
+    if not cache.add(lock, token, timeout=_stale_seconds()):
+        return
+
+    def beat():
+        if cache.get(lock) == token:
+            cache.touch(lock, _stale_seconds())
+        Campaign.objects.filter(pk=campaign_id).update(heartbeat_at=timezone.now())
+
+    try:
+        more = _run(campaign_id, time.monotonic() + slice_seconds, beat)
+    finally:
+        if cache.get(lock) == token:
+            cache.delete(lock)
+    if more:
+        _dispatch("run", campaign_id)
+
+
+def _dispatch(step: str, campaign_id) -> None:
+    if _mode() == "queue":
+        try:
+            from ..tasks import parse_call_campaign, run_call_campaign
+
+            (parse_call_campaign if step == "parse" else run_call_campaign).delay(campaign_id)
+            return
+        except Exception as e:
+            logger.exception(f"Call campaign={campaign_id} {step} enqueue failed, using a thread: {e}")
+    fn = parse_upload if step == "parse" else run_slice
+    _get_executor("run", getattr(settings, "CALL_CAMPAIGN_RUNNERS", 4)).submit(_in_pool, fn, campaign_id)
+
+
+# ----------------------------------
+# Pause / resume
+# ----------------------------------
+def pause(campaign: Campaign) -> bool:
+    updated = Campaign.objects.filter(pk=campaign.pk, status=Campaign.STATUS_RUNNING).update(
+        status=Campaign.STATUS_PAUSED, updated_at=timezone.now()
+    )
+    campaign.refresh_from_db()
+    if updated:
+        _notify(campaign)
+    return bool(updated)
+
+
+def resume(campaign: Campaign) -> bool:
+    """Restart a paused campaign, or a running one whose runner is gone."""
+    updated = Campaign.objects.filter(
+        pk=campaign.pk, status__in=[Campaign.STATUS_PAUSED, Campaign.STATUS_RUNNING]
+    ).update(status=Campaign.STATUS_RUNNING, updated_at=timezone.now())
+    campaign.refresh_from_db()
+    if not updated:
+        return False
+    transaction.on_commit(lambda: _dispatch("run", campaign.pk))
+    _notify(campaign)
+    return True
+
+
+# ----------------------------------
+# Watchdog
+# ----------------------------------
+def revive_stale() -> int:
+    """Re-dispatch running campaigns whose runner stopped beating; returns how many."""
+    stale_before = timezone.now() - timedelta(seconds=_stale_seconds())
+    campaign_ids = list(
+        Campaign.objects.filter(status=Campaign.STATUS_RUNNING)
+        .filter(Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True, updated_at__lt=stale_before))
+        .values_list("pk", flat=True)
+    )
+    for campaign_id in campaign_ids:
+        logger.warning(f"Call campaign={campaign_id} has no live runner, dispatching a new one")
+        _dispatch("run", campaign_id)
+    return len(campaign_ids)
+
+
+def _watch() -> None:
+    interval = _stale_seconds()
+    while True:
+        time.sleep(interval)
+        # one sweep per interval across all workers
+        if cache.add("call_campaign:watchdog", 1, timeout=interval):
+            _in_pool(revive_stale)
+
+
+def start_watchdog(**kwargs) -> None:
+    """Start this process's watchdog thread (connected to request_started, so it runs in web workers)."""
+    global _watchdog_pid
+    with _executors_lock:
+        if _watchdog_pid == os.getpid():
+            return
+        _watchdog_pid = os.getpid()
+    threading.Thread(target=_watch, name="call-campaign-watchdog", daemon=True).start()
@@ -0,0 +1,202 @@
+"""
+Azure text-to-speech with warm synthesizers and a phrase audio cache.
+
+Building a SpeechConfig + SpeechSynthesizer per utterance pays for a new
+service connection every time. Synthesizers are kept instead, in a
+per-process pool keyed by (voice, output format); a thread borrows one for an
+utterance and gives it back (a failed one is dropped). The pool is emptied
+after a fork, since SDK handles do not survive one.
+
+Phrases that repeat across calls (campaign intros, the fallback reply, voice
+previews) are synthesized with cache=True: their audio is stored on disk under
+CALL_TTS_CACHE_ROOT, addressed by sha256(format, voice, text), and served from
+there without a TTS round trip. Free-form replies and personalized text
+are not cached. A hit refreshes the file's mtime, and files unused for
+CALL_TTS_CACHE_MAX_AGE_DAYS are pruned (at most once an hour per process).
+"""
+import contextlib
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import azure.cognitiveservices.speech as speechsdk
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+AZURE_SPEECH_KEY = os.environ.get("AZURE_SPEECH_KEY", "")
+AZURE_SPEECH_REGION = os.environ.get("AZURE_SPEECH_REGION", "")
+
+# SpeechSynthesisOutputFormat names -> cache file extension
+FORMAT_MULAW = "Raw8Khz8BitMonoMULaw"  # Twilio media streams
+FORMAT_WAV = "Riff16Khz16BitMonoPcm"  # campaign audio files
+FORMAT_MP3 = "Audio16Khz32KBitRateMonoMp3"  # voice previews
+EXTENSIONS = {FORMAT_MULAW: ".ulaw", FORMAT_WAV: ".wav", FORMAT_MP3: ".mp3"}
+
+_pools: Dict[Tuple[str, str], List[speechsdk.SpeechSynthesizer]] = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+PRUNE_INTERVAL = 3600
+_pruned_at = 0.0
+_prune_lock = threading.Lock()
+
+
+def is_configured() -> bool:
+    return bool(AZURE_SPEECH_KEY and AZURE_SPEECH_REGION)
+
+
+# ----------------------------------
+# Synthesizer pool
+# ----------------------------------
+def _new_synthesizer(voice: str, fmt: str) -> speechsdk.SpeechSynthesizer:
+    speech_config = speechsdk.SpeechConfig(subscription=AZURE_SPEECH_KEY, region=AZURE_SPEECH_REGION)
+    speech_config.speech_synthesis_voice_name = voice
+    speech_config.set_speech_synthesis_output_format(getattr(speechsdk.SpeechSynthesisOutputFormat, fmt))
+    synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+    # connect now instead of on the first utterance
+    with contextlib.suppress(Exception):
+        speechsdk.Connection.from_speech_synthesizer(synthesizer).open(True)
+    return synthesizer
+
+
+def _acquire(voice: str, fmt: str) -> speechsdk.SpeechSynthesizer:
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        idle = _pools.get((voice, fmt))
+        synthesizer = idle.pop() if idle else None
+    return synthesizer or _new_synthesizer(voice, fmt)
+
+
+def _release(voice: str, fmt: str, synthesizer: speechsdk.SpeechSynthesizer) -> None:
+    with _pools_lock:
+        idle = _pools.setdefault((voice, fmt), [])
+        if len(idle) < getattr(settings, "CALL_TTS_POOL_SIZE", 4):
+            idle.append(synthesizer)
+
+
+def prewarm(voice: str, fmt: str = FORMAT_MULAW) -> None:
+    """Have one connected synthesizer idle for (voice, fmt), e.g. while a call is being set up."""
+    if not voice or not is_configured():
+        return
+    with _pools_lock:
+        if _pools_pid == os.getpid() and _pools.get((voice, fmt)):
+            return
+    try:
+        _release(voice, fmt, _acquire(voice, fmt))
+    except Exception:
+        logger.exception("Azure TTS prewarm failed for voice=%s", voice)
+
+
+# ----------------------------------
+# Phrase cache
+# ----------------------------------
+def cache_key(text: str, voice: str, fmt: str) -> str:
+    return hashlib.sha256(f"{fmt}\n{voice}\n{text}".encode("utf-8")).hexdigest()
+
+
+def cache_root() -> Path:
+    return Path(getattr(settings, "CALL_TTS_CACHE_ROOT", Path(settings.BASE_DIR) / "var" / "tts_cache"))
+
+
+def cache_path(text: str, voice: str, fmt: str) -> Path:
+    key = cache_key(text, voice, fmt)
+    return cache_root() / key[:2] / f"{key}{EXTENSIONS.get(fmt, '.bin')}"
+
+
+def cached_audio(text: str, voice: str, fmt: str) -> Optional[bytes]:
+    path = cache_path(text, voice, fmt)
+    try:
+        audio = path.read_bytes() or None
+    except OSError:
+        return None
+    # still in use: keep it out of the next prune
+    with contextlib.suppress(OSError):
+        os.utime(path)
+    return audio
+
+
+def prune_cache(max_age: Optional[float] = None) -> int:
+    """Delete cached audio unused for max_age seconds; returns how many files went."""
+    if max_age is None:
+        max_age = getattr(settings, "CALL_TTS_CACHE_MAX_AGE_DAYS", 30) * 86400
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in cache_root().glob("*/*"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def _maybe_prune() -> None:
+    global _pruned_at
+    with _prune_lock:
+        now = time.monotonic()
+        if _pruned_at and now - _pruned_at < PRUNE_INTERVAL:
+            return
+        _pruned_at = now
+    removed = prune_cache()
+    if removed:
+        logger.info("Pruned %s unused TTS cache files", removed)
+
+
+def _store(path: Path, audio: bytes) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(audio)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning("TTS audio not cached at %s: %s", path, e)
+
+
+# ----------------------------------
+# Synthesis
+# ----------------------------------
+def synthesize(text: str, voice: str, fmt: str = FORMAT_MULAW, cache: bool = False) -> bytes:
+    """Audio of text in fmt, b"" when synthesis fails."""
+    if cache:
+        audio = cached_audio(text, voice, fmt)
+        if audio:
+            return audio
+
+    if not is_configured():
+        logger.error("AZURE_SPEECH_KEY or AZURE_SPEECH_REGION missing")
+        return b""
+
+    audio = b""
+    try:
+        synthesizer = _acquire(voice, fmt)
+        result = synthesizer.speak_text_async(text).get()
+        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+            audio = bytes(result.audio_data or b"")
+            _release(voice, fmt, synthesizer)
+        else:
+            cancellation_details = speechsdk.CancellationDetails.from_result(result)
+            logger.warning(
+                "Azure TTS canceled: reason=%s error=%s voice=%s",
+                cancellation_details.reason,
+                cancellation_details.error_details,
+                voice,
+            )
+    except Exception:
+        logger.exception("Azure TTS exception for voice=%s", voice)
+
+    if cache and audio:
+        _store(cache_path(text, voice, fmt), audio)
+        _maybe_prune()
+    return audio
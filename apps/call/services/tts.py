@@ -0,0 +1,284 @@
+"""
+Speech synthesis and paced playback for call replies.
+
+A reply is split into sentences and synthesized one sentence at a time
+(Raw8Khz8BitMonoMULaw, what Twilio plays; see speech_synthesis.py), with the next sentence synthesized
+while the current one is being sent, so the caller hears the first sentence
+as soon as it is ready instead of after the whole reply. While the LLM is
+still generating, stream_sentences cuts its text into sentences as they
+complete, so synthesis starts on the first one before the reply is finished.
+
+Audio is sent in small chunks, each followed by a Twilio `mark`. Twilio echoes
+a mark back when playback reaches it, so PlaybackPacer knows how much audio is
+still queued on Twilio's side and keeps that at about `lead_ms`: enough to
+ride out network jitter, little enough that a `clear` on barge-in cuts the
+reply off right away. When marks are late or lost, a playout clock running
+`lead_ms` behind real time keeps the reply moving.
+"""
+import asyncio
+import logging
+import os
+import re
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Callable, Collection, Iterable, List, Optional, Tuple, Union
+
+from django.conf import settings
+
+from . import speech_synthesis
+from .speech_synthesis import is_configured
+from .vad import BYTES_PER_MS
+
+logger = logging.getLogger(__name__)
+
+AZURE_TTS_DEFAULT_VOICE = os.environ.get("AZURE_TTS_DEFAULT_VOICE", "en-US-JennyNeural")
+
+MARK_PREFIX = "tts-"
+
+# "।" (dari) and "॥" end Bangla and Hindi sentences
+_SENTENCE_END = re.compile(r"(?<=[.!?…。！？।॥])\s+")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+
+def voice_order(assistant) -> List[str]:
+    """The assistant's voice, then the default one."""
+    preferred = str(getattr(assistant, "voice", "") or "").strip().replace('"', "").replace("'", "")
+    return list(dict.fromkeys(v for v in (preferred, AZURE_TTS_DEFAULT_VOICE) if v))
+
+
+def split_sentences(text: str, min_chars: int = 12, max_chars: int = 240) -> List[str]:
+    """
+    Synthesis units of a reply: sentences, with very short ones joined to the
+    next (one request per "Sure." is not worth it) and very long ones split
+    at clause boundaries.
+    """
+    pieces = []
+    for sentence in _SENTENCE_END.split((text or "").strip()):
+        if len(sentence) > max_chars:
+            pieces.extend(_CLAUSE_END.split(sentence))
+        elif sentence:
+            pieces.append(sentence)
+
+    sentences = []
+    pending = ""
+    for piece in pieces:
+        pending = f"{pending} {piece}" if pending else piece
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+def _ready_cut(text: str, min_chars: int, max_chars: int) -> Optional[int]:
+    """Where the first complete synthesis unit of unfinished text ends, None if it is not complete yet."""
+    for match in _SENTENCE_END.finditer(text):
+        if match.start() >= min_chars:
+            return match.end()
+    if len(text) > max_chars:
+        # a sentence this long is cut at its last clause (or word) boundary that fits
+        clauses = list(_CLAUSE_END.finditer(text, 0, max_chars)) or list(re.finditer(r"\s+", text[:max_chars]))
+        if clauses and clauses[-1].start() > 0:
+            return clauses[-1].end()
+    return None
+
+
+async def stream_sentences(
+    chunks: AsyncIterable[str], min_chars: int = 12, max_chars: int = 240
+) -> AsyncIterator[str]:
+    """split_sentences for text that is still being generated: each unit is yielded once it is complete."""
+    buffer = ""
+    async for chunk in chunks:
+        buffer = (buffer + chunk).lstrip()
+        while (cut := _ready_cut(buffer, min_chars, max_chars)) is not None:
+            sentence, buffer = buffer[:cut].strip(), buffer[cut:]
+            yield sentence
+    for sentence in split_sentences(buffer, min_chars, max_chars):
+        yield sentence
+
+
+def heard_text(spoken: Iterable[Tuple[str, float, float]], played_ms: float) -> str:
+    """
+    The part of a reply the caller heard before cutting it off. spoken holds
+    (sentence, start_ms, end_ms) of each sentence on the pacer's timeline; a
+    sentence cut off midway is kept up to the word its share of audio reached.
+    """
+    heard = []
+    for sentence, start_ms, end_ms in spoken:
+        if played_ms >= end_ms:
+            heard.append(sentence)
+            continue
+        if played_ms > start_ms:
+            cut = int(len(sentence) * (played_ms - start_ms) / (end_ms - start_ms))
+            # the word the cut lands in was not finished
+            partial = sentence[:cut].rpartition(" ")[0].rstrip()
+            if partial:
+                heard.append(f"{partial}…")
+        break
+    return " ".join(heard)
+
+
+def chunk_bytes(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+# ----------------------------------
+# Synthesis
+# ----------------------------------
+def synthesize_mulaw(text: str, voice_name: str, cache: bool = False) -> bytes:
+    return speech_synthesis.synthesize(text, voice_name, speech_synthesis.FORMAT_MULAW, cache=cache)
+
+
+async def _aiter(items: Union[Iterable, AsyncIterable]):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def synthesize_sentences(
+    sentences: Union[Iterable[str], AsyncIterable[str]],
+    voices: Iterable[str],
+    synthesize: Callable[[str, str], bytes] = None,
+    cached: Collection[str] = (),
+) -> AsyncIterator[Tuple[str, bytes]]:
+    """
+    (sentence, μ-law audio) of each sentence, in order. The next sentence is synthesized
+    while the caller handles the current one; with an async source (see
+    stream_sentences) that is as soon as the sentence arrives. The first voice
+    that produces audio is kept for the rest of the reply. Use with
+    contextlib.aclosing so cancelling the caller also drops the synthesis
+    still in flight. Sentences in `cached` are fixed phrases whose audio is
+    cached (see speech_synthesis).
+    """
+    if synthesize is None:
+        def synthesize(sentence, voice):
+            return synthesize_mulaw(sentence, voice, cache=sentence in cached)
+    voices = list(voices)
+
+    async def _one(sentence):
+        for voice in list(voices):
+            audio = await asyncio.to_thread(synthesize, sentence, voice)
+            if audio:
+                if voices[0] != voice:
+                    voices[:] = [voice]
+                return sentence, audio
+        return sentence, b""
+
+    # one synthesis ahead of the caller: the producer waits for a slot before starting the next sentence
+    ahead = asyncio.Semaphore(1)
+    pending: asyncio.Queue = asyncio.Queue()
+
+    async def _produce():
+        try:
+            async for sentence in _aiter(sentences):
+                await ahead.acquire()
+                pending.put_nowait(asyncio.ensure_future(_one(sentence)))
+        finally:
+            pending.put_nowait(None)
+
+    producer = asyncio.ensure_future(_produce())
+    try:
+        while (task := await pending.get()) is not None:
+            sentence, audio = await task
+            ahead.release()
+            if audio:
+                yield sentence, audio
+        # a failing sentence source fails the reply
+        await producer
+    finally:
+        # the SDK call itself cannot be interrupted; its result is just dropped
+        producer.cancel()
+        while not pending.empty():
+            task = pending.get_nowait()
+            if task is not None:
+                task.cancel()
+
+
+# ----------------------------------
+# Playback pacing
+# ----------------------------------
+class PlaybackPacer:
+    """
+    Tracks audio sent to Twilio against what Twilio reports as played (marks).
+    One per call; reset() after a `clear`.
+    """
+
+    def __init__(self, lead_ms: int = None, chunk_ms: int = None, clock: Callable[[], float] = None):
+        self.lead_ms = lead_ms if lead_ms is not None else getattr(settings, "CALL_TTS_LEAD_MS", 400)
+        chunk_ms = chunk_ms if chunk_ms is not None else getattr(settings, "CALL_TTS_CHUNK_MS", 100)
+        self.chunk_bytes = max(1, int(chunk_ms * BYTES_PER_MS))
+        self._clock = clock or (lambda: asyncio.get_running_loop().time())
+        self._acked = asyncio.Event()
+        self._seq = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything queued; marks of earlier audio are ignored from now on."""
+        self.sent_ms = 0.0
+        self.acked_ms = 0.0
+        self._marks = {}
+        self._playhead = 0.0
+        self._last = None
+
+    def _advance(self) -> None:
+        # playout runs in real time but never ahead of what was sent (an empty buffer plays nothing)
+        now = self._clock()
+        if self._last is not None:
+            self._playhead = min(self.sent_ms, self._playhead + (now - self._last) * 1000)
+        self._last = now
+
+    def sent(self, nbytes: int) -> str:
+        """Account for nbytes of audio sent; returns the name of the mark to send after it."""
+        self._advance()
+        self.sent_ms += nbytes / BYTES_PER_MS
+        self._seq += 1
+        name = f"{MARK_PREFIX}{self._seq}"
+        self._marks[name] = self.sent_ms
+        return name
+
+    def on_mark(self, name: str) -> bool:
+        position = self._marks.pop(name, None)
+        if position is None:
+            return False
+        # marks come back in order: anything before this one was played as well
+        self._marks = {n: p for n, p in self._marks.items() if p > position}
+        self.acked_ms = max(self.acked_ms, position)
+        self._playhead = max(self._playhead, position)
+        self._acked.set()
+        return True
+
+    def played_ms(self) -> float:
+        self._advance()
+        return max(self.acked_ms, self._playhead - self.lead_ms)
+
+    def queued_ms(self) -> float:
+        return self.sent_ms - self.played_ms()
+
+    async def _wait_ack(self, timeout: float) -> None:
+        self._acked.clear()
+        # not wait_for: on 3.11 it drops a cancel (barge-in) that lands as the mark arrives
+        acked = asyncio.ensure_future(self._acked.wait())
+        try:
+            await asyncio.wait([acked], timeout=max(timeout, 0.005))
+        finally:
+            acked.cancel()
+
+    async def wait_for_room(self) -> None:
+        """Until no more than lead_ms is queued on Twilio's side."""
+        while (excess := self.queued_ms() - self.lead_ms) > 0:
+            # without a mark, the lagging clock frees `excess` ms in that many ms
+            await self._wait_ack(excess / 1000)
+
+    async def drain(self) -> None:
+        """Until everything sent was played: acknowledged, or overdue by lead_ms on the clock."""
+        self._advance()
+        deadline = self._clock() + (self.sent_ms - max(self.acked_ms, self._playhead) + self.lead_ms) / 1000
+        while self.acked_ms < self.sent_ms and (left := deadline - self._clock()) > 0:
+            await self._wait_ack(left)
@@ -0,0 +1,105 @@
+"""
+Energy based voice activity detection and turn endpointing for 8 kHz μ-law
+call audio (Twilio media frames are 20 ms / 160 bytes).
+
+A frame is speech when its RMS is well above an adaptive noise floor. A turn
+opens after `start_ms` of continuous speech (short clicks and pops never open
+one) and closes after `end_silence_ms` of silence, or at `max_turn_ms`. Only
+the audio of a turn is handed to ASR, starting with `preroll_ms` of what came
+just before it so the first syllable is not clipped.
+"""
+import audioop
+from collections import deque
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+BYTES_PER_MS = 8  # 8 kHz, 1 byte per μ-law sample
+
+SPEECH_START = "speech_start"
+SPEECH_END = "speech_end"
+
+
+def frame_rms(mulaw: bytes) -> int:
+    return audioop.rms(audioop.ulaw2lin(mulaw, 2), 2)
+
+
+class Endpointer:
+    def __init__(
+        self,
+        min_rms: int = None,
+        ratio: float = None,
+        start_ms: int = None,
+        end_silence_ms: int = None,
+        max_turn_ms: int = None,
+        preroll_ms: int = None,
+    ):
+        self.min_rms = min_rms if min_rms is not None else getattr(settings, "CALL_VAD_MIN_RMS", 300)
+        self.ratio = ratio if ratio is not None else getattr(settings, "CALL_VAD_NOISE_RATIO", 2.5)
+        self.start_ms = start_ms if start_ms is not None else getattr(settings, "CALL_VAD_START_MS", 60)
+        self.end_silence_ms = (
+            end_silence_ms if end_silence_ms is not None else getattr(settings, "CALL_VAD_END_SILENCE_MS", 700)
+        )
+        self.max_turn_ms = max_turn_ms if max_turn_ms is not None else getattr(settings, "CALL_VAD_MAX_TURN_MS", 15000)
+        preroll_ms = preroll_ms if preroll_ms is not None else getattr(settings, "CALL_VAD_PREROLL_MS", 300)
+
+        self.noise_floor = float(self.min_rms) / self.ratio
+        self.in_speech = False
+        self._voiced_ms = 0
+        self._silence_ms = 0
+        self._turn_ms = 0
+        self._preroll = deque()
+        self._preroll_bytes = 0
+        self._preroll_limit = preroll_ms * BYTES_PER_MS
+
+    @property
+    def turn_ms(self) -> float:
+        """How long the open turn has lasted so far (0 outside of one)."""
+        return self._turn_ms if self.in_speech else 0
+
+    def is_speech(self, mulaw: bytes) -> bool:
+        rms = frame_rms(mulaw)
+        speech = rms >= max(self.min_rms, self.noise_floor * self.ratio)
+        if not speech:
+            # the floor follows the line noise, not the caller
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+        return speech
+
+    def _remember(self, mulaw: bytes) -> None:
+        self._preroll.append(mulaw)
+        self._preroll_bytes += len(mulaw)
+        while self._preroll and self._preroll_bytes - len(self._preroll[0]) >= self._preroll_limit:
+            self._preroll_bytes -= len(self._preroll.popleft())
+
+    def _take_preroll(self) -> bytes:
+        audio = b"".join(self._preroll)
+        self._preroll.clear()
+        self._preroll_bytes = 0
+        return audio
+
+    def feed(self, mulaw: bytes) -> Tuple[Optional[str], bytes]:
+        """
+        Process one frame. Returns (event, audio): event is SPEECH_START,
+        SPEECH_END or None, and audio is what belongs to the current turn
+        (empty outside of one).
+        """
+        duration = len(mulaw) / BYTES_PER_MS
+        speech = self.is_speech(mulaw)
+
+        if not self.in_speech:
+            self._remember(mulaw)
+            self._voiced_ms = self._voiced_ms + duration if speech else 0
+            if self._voiced_ms < self.start_ms:
+                return None, b""
+            self.in_speech = True
+            self._silence_ms = 0
+            self._turn_ms = self._voiced_ms
+            return SPEECH_START, self._take_preroll()
+
+        self._turn_ms += duration
+        self._silence_ms = 0 if speech else self._silence_ms + duration
+        if self._silence_ms >= self.end_silence_ms or self._turn_ms >= self.max_turn_ms:
+            self.in_speech = False
+            self._voiced_ms = 0
+            return SPEECH_END, mulaw
+        return None, mulaw
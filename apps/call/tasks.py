@@ -114,4 +114,22 @@ def sync_twilio_call_logs():
             log.cost = data["p"]
             log.save()
 
-    return "Twilio call logs synced."
\ No newline at end of file
+    return "Twilio call logs synced."
+
+@shared_task(ignore_result=True)
+def parse_call_campaign(campaign_id):
+    """Reads an uploaded call list into queued rows (CALL_CAMPAIGN_MODE=queue)."""
+    from .services.campaigns import parse_upload
+
+    parse_upload(campaign_id)
+
+
+@shared_task(ignore_result=True)
+def run_call_campaign(campaign_id):
+    """
+    One dialing slice of a campaign; it enqueues the next slice itself.
+    Not acks_late: a redelivered slice could dial a row twice.
+    """
+    from .services.campaigns import run_slice
+
+    run_slice(campaign_id)
@@ -1,3 +1,670 @@
-from django.test import TestCase
+import asyncio
+import audioop
+import base64
+import json
+import math
+import os
+import struct
+import tempfile
+from collections import deque
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from twilio.request_validator import RequestValidator
+
+from apps.assistant import assistant_workflow
+from apps.assistant.models import Assistant
+from apps.call.models import OutboundCampaign, OutboundCampaignCall
+from apps.call.services import campaigns, speech_synthesis, tts
+from apps.phone_number.models import PhoneNumber
+from apps.call.services import asr as asr_module
+from apps.call.services.asr import BaseASR, DeepgramStreamingASR, LocalASR
+from apps.call.services.vad import SPEECH_END, SPEECH_START, Endpointer
+
+
+def _frame(amplitude, ms=20):
+    samples = 8 * ms
+    pcm = b"".join(
+        struct.pack("<h", int(amplitude * math.sin(2 * math.pi * 440 * i / 8000))) for i in range(samples)
+    )
+    return audioop.lin2ulaw(pcm, 2)
+
+
+SPEECH = _frame(8000)
+SILENCE = _frame(20)
+
+
+def _endpointer():
+    return Endpointer(min_rms=300, ratio=2.5, start_ms=60, end_silence_ms=200, max_turn_ms=2000, preroll_ms=100)
+
+
+class EndpointerTests(SimpleTestCase):
+    def test_turn_opens_on_speech_and_closes_on_silence(self):
+        vad = _endpointer()
+        events = [vad.feed(frame)[0] for frame in [SILENCE] * 10 + [SPEECH] * 10 + [SILENCE] * 10]
+        self.assertEqual([e for e in events if e], [SPEECH_START, SPEECH_END])
+        self.assertEqual(events.index(SPEECH_START), 12)
+        # closed after 200 ms (10 frames) of silence
+        self.assertEqual(events.index(SPEECH_END), 29)
+
+    def test_short_click_does_not_open_a_turn(self):
+        vad = _endpointer()
+        events = [vad.feed(frame)[0] for frame in [SILENCE] * 5 + [SPEECH] + [SILENCE] * 20]
+        self.assertFalse(any(events))
+
+    def test_only_turn_audio_with_preroll_is_forwarded(self):
+        vad = _endpointer()
+        forwarded = b"".join(vad.feed(frame)[1] for frame in [SILENCE] * 20 + [SPEECH] * 5 + [SILENCE] * 10)
+        # 100 ms preroll + the rest of the speech + the closing silence, none of the leading silence
+        self.assertEqual(len(forwarded), 800 + 2 * 160 + 10 * 160)
+
+    def test_long_turn_is_cut_at_max_length(self):
+        vad = _endpointer()
+        events = [vad.feed(SPEECH)[0] for _ in range(120)]
+        self.assertIn(SPEECH_END, events)
+
+
+class StreamingASRTests(SimpleTestCase):
+    def test_local_asr_returns_scripted_turns(self):
+        async def run():
+            asr = LocalASR(["hello", "bye"])
+            await asr.send_audio(SPEECH)
+            first = await asr.end_turn()
+            second = await asr.end_turn()
+            return first, second, await asr.end_turn(), asr.turn_bytes
+
+        self.assertEqual(asyncio.run(run()), ("hello", "bye", "", [160, 0, 0]))
+
+    def test_finalize_answer_completes_the_closing_turn(self):
+        async def run():
+            asr = DeepgramStreamingASR()
+            asr.finalize_timeout = 1
+            await asr.send_audio(b"")  # not connected: only opens the turn
+            asr.handle_message({"type": "Results", "is_final": True, "channel": {"alternatives": [{"transcript": "I need"}]}})
+            pending = asyncio.ensure_future(asr.end_turn())
+            await asyncio.sleep(0)
+            asr.handle_message({
+                "type": "Results", "is_final": True, "from_finalize": True,
+                "channel": {"alternatives": [{"transcript": "a refund"}]},
+            })
+            return await pending
+
+        self.assertEqual(asyncio.run(run()), "I need a refund")
+
+
+class FakeSocket:
+    def __init__(self):
+        self.closed = False
+        self.close_code = None
+        self.sent = []
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def send_str(self, data):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.Event().wait()
+
+
+class FakeSession:
+    """ws_connect blocks until `opened` is set, then hands out `socket` (or raises `error`)."""
+
+    def __init__(self):
+        self.opened = asyncio.Event()
+        self.socket = FakeSocket()
+        self.error = None
+        self.connects = 0
+
+    async def ws_connect(self, *args, **kwargs):
+        self.connects += 1
+        await self.opened.wait()
+        if self.error:
+            raise self.error
+        return self.socket
+
+    async def close(self):
+        pass
+
+
+@mock.patch.object(asr_module, "DEEPGRAM_API_KEY", "test-key")
+class StreamingReconnectTests(SimpleTestCase):
+    def _dropped_asr(self):
+        asr = DeepgramStreamingASR()
+        asr.session = FakeSession()
+        asr.ws = SimpleNamespace(closed=True)
+        return asr
+
+    def test_frames_are_buffered_while_the_socket_reopens(self):
+        async def run():
+            asr = self._dropped_asr()
+            # send_audio returns without waiting on the connect
+            await asyncio.wait_for(asr.send_audio(b"a"), 0.1)
+            await asyncio.wait_for(asr.send_audio(b"b"), 0.1)
+            self.assertEqual(asr.session.connects, 1)
+
+            asr.session.opened.set()
+            await asr._reconnect
+            await asr.send_audio(b"c")
+            sent = asr.ws.sent
+            await asr.close()
+            return sent
+
+        self.assertEqual(asyncio.run(run()), [b"a", b"b", b"c"])
+
+    def test_failed_reconnect_drops_frames_until_the_retry_delay(self):
+        async def run():
+            asr = self._dropped_asr()
+            asr.session.error = OSError("unreachable")
+            await asr.send_audio(b"a")
+            asr.session.opened.set()
+            await asr._reconnect
+            await asr.send_audio(b"b")
+            result = asr.session.connects, list(asr._buffer), asr._reconnect
+            await asr.close()
+            return result
+
+        self.assertEqual(asyncio.run(run()), (1, [], None))
+
+    def test_recognizers_must_implement_the_turn_api(self):
+        with self.assertRaises(TypeError):
+            BaseASR()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TTSPlaybackTests(SimpleTestCase):
+    def test_reply_is_split_into_sentences(self):
+        self.assertEqual(
+            tts.split_sentences("Sure. Your order ships tomorrow! Anything else I can help with?"),
+            ["Sure. Your order ships tomorrow!", "Anything else I can help with?"],
+        )
+        self.assertEqual(tts.split_sentences("Hi."), ["Hi."])
+
+    def test_bangla_reply_is_split_at_the_dari(self):
+        self.assertEqual(
+            tts.split_sentences("আপনার অর্ডার আগামীকাল পৌঁছাবে। আর কিছু জানতে চান?"),
+            ["আপনার অর্ডার আগামীকাল পৌঁছাবে।", "আর কিছু জানতে চান?"],
+        )
+
+    def test_streamed_reply_is_cut_as_sentences_complete(self):
+        received = []
+
+        async def text():
+            for chunk in ["Sure. Your order", " ships tomorrow! Any", "thing else I can help with?"]:
+                received.append(chunk)
+                yield chunk
+
+        async def run():
+            return [(sentence, len(received)) async for sentence in tts.stream_sentences(text())]
+
+        # the first sentence is out before the rest of the reply was generated
+        self.assertEqual(
+            asyncio.run(run()),
+            [("Sure. Your order ships tomorrow!", 2), ("Anything else I can help with?", 3)],
+        )
+
+    def test_sentences_are_synthesized_ahead_and_yielded_in_order(self):
+        calls = []
+
+        def synthesize(text, voice):
+            calls.append((text, voice))
+            return b"" if voice == "broken" else text.encode()
+
+        async def run():
+            stream = tts.synthesize_sentences(["one.", "two.", "three."], ["broken", "fallback"], synthesize)
+            return [audio async for _, audio in stream]
+
+        self.assertEqual(asyncio.run(run()), [b"one.", b"two.", b"three."])
+        # the voice that worked is kept for the rest of the reply
+        self.assertEqual(calls, [("one.", "broken"), ("one.", "fallback"), ("two.", "fallback"), ("three.", "fallback")])
+
+    def test_synthesis_starts_before_the_reply_is_complete(self):
+        calls = []
+
+        async def run():
+            rest = asyncio.Event()
+
+            async def sentences():
+                yield "First sentence."
+                await rest.wait()
+                yield "Second sentence."
+
+            stream = tts.synthesize_sentences(sentences(), ["voice"], lambda text, voice: calls.append(text) or b"x")
+            first = await anext(stream)
+            synthesized_early = list(calls)
+            rest.set()
+            return first, synthesized_early, [pair async for pair in stream]
+
+        first, synthesized_early, rest = asyncio.run(run())
+        self.assertEqual(first, ("First sentence.", b"x"))
+        self.assertEqual((synthesized_early, rest), (["First sentence."], [("Second sentence.", b"x")]))
+
+    def test_heard_text_stops_where_playback_was_cut(self):
+        spoken = [("Your order ships tomorrow.", 0, 1000), ("Anything else I can help with?", 1000, 2000)]
+        self.assertEqual(tts.heard_text(spoken, 2000), "Your order ships tomorrow. Anything else I can help with?")
+        self.assertEqual(tts.heard_text(spoken, 1000), "Your order ships tomorrow.")
+        self.assertEqual(tts.heard_text(spoken, 1500), "Your order ships tomorrow. Anything else…")
+        self.assertEqual(tts.heard_text(spoken, 10), "")
+
+    def test_marks_release_queued_audio(self):
+        clock = FakeClock()
+        pacer = tts.PlaybackPacer(lead_ms=200, chunk_ms=100, clock=clock)
+        marks = [pacer.sent(800) for _ in range(4)]
+        self.assertEqual(pacer.queued_ms(), 400)
+        self.assertTrue(pacer.on_mark(marks[1]))
+        self.assertEqual(pacer.queued_ms(), 200)
+        # an earlier mark arriving late changes nothing
+        self.assertFalse(pacer.on_mark(marks[0]))
+
+    def test_clock_keeps_playback_moving_without_marks(self):
+        clock = FakeClock()
+        pacer = tts.PlaybackPacer(lead_ms=200, chunk_ms=100, clock=clock)
+        pacer.sent(4000)  # 500 ms
+        clock.now = 0.3
+        # 300 ms have played by the clock, trusted 200 ms late
+        self.assertEqual(pacer.queued_ms(), 400)
+        clock.now = 10
+        self.assertEqual(pacer.queued_ms(), 200)
+
+    def test_reset_ignores_marks_of_cleared_audio(self):
+        pacer = tts.PlaybackPacer(lead_ms=200, chunk_ms=100, clock=FakeClock())
+        mark = pacer.sent(800)
+        pacer.reset()
+        self.assertFalse(pacer.on_mark(mark))
+        self.assertEqual(pacer.queued_ms(), 0)
+
+
+class BargeInTests(SimpleTestCase):
+    def test_caller_speech_cancels_playback_and_clears_twilio(self):
+        from apps.call.consumers import TwilioStreamConsumer
+
+        async def run():
+            consumer = TwilioStreamConsumer()
+            consumer.stream_sid = "MZ1"
+            consumer.call_sid = "CA1"
+            consumer.assistant = consumer.transcript = object()
+            consumer.asr = LocalASR()
+            consumer.endpointer = _endpointer()
+            consumer.turns = deque()
+            consumer.turn_ready = asyncio.Event()
+            consumer.pacer = tts.PlaybackPacer(lead_ms=200, chunk_ms=100)
+            consumer.barge_in_ms = 100
+            consumer.playback_task = asyncio.create_task(asyncio.sleep(10))
+            playback = consumer.playback_task
+            sent = []
+
+            async def send(text_data=None, bytes_data=None, close=False):
+                sent.append(json.loads(text_data))
+
+            consumer.send = send
+            payload = base64.b64encode(SPEECH).decode()
+            for _ in range(10):
+                await consumer._handle_media({"payload": payload})
+            await asyncio.sleep(0)
+            return playback.cancelled(), consumer.playback_task, sent
+
+        cancelled, playback_task, sent = asyncio.run(run())
+        self.assertTrue(cancelled)
+        self.assertIsNone(playback_task)
+        self.assertEqual(sent, [{"event": "clear", "streamSid": "MZ1"}])
+
+
+def _reply_consumer(workflow=None, on_send=None):
+    """A TwilioStreamConsumer past its start event, as far as replying to a turn needs."""
+    from apps.call.consumers import TwilioStreamConsumer
+
+    consumer = TwilioStreamConsumer()
+    consumer.stream_sid = "MZ1"
+    consumer.call_sid = "CA1"
+    consumer.assistant = SimpleNamespace(id=1, voice="voice")
+    consumer.transcript = SimpleNamespace(id=1)
+    consumer.workflow = workflow
+    consumer.pacer = tts.PlaybackPacer(lead_ms=100, chunk_ms=100)
+    consumer.playback_task = None
+    consumer.barge_in_at_ms = 0.0
+    consumer.turns = deque()
+    consumer.turn_ready = asyncio.Event()
+    consumer.last_text = ""
+    consumer.unanswered_text = ""
+
+    async def send(text_data=None, bytes_data=None, close=False):
+        if on_send:
+            on_send(json.loads(text_data))
+
+    consumer.send = send
+    return consumer
+
+
+class ReplyTranscriptTests(SimpleTestCase):
+    def setUp(self):
+        from apps.call import consumers
+
+        self.saved = []
+        self.synthesized = []
+
+        def synthesize(text, voice, cache=False):
+            self.synthesized.append(text)
+            return b"\xff" * 800
+
+        for context in (
+            mock.patch.object(consumers, "get_history", return_value=[]),
+            mock.patch.object(consumers, "get_assistant_mamory", return_value={}),
+            mock.patch.object(consumers, "save_transcript_chunks", lambda *args: self.saved.append(args[1:3])),
+            mock.patch.object(tts, "is_configured", return_value=True),
+            mock.patch.object(tts, "synthesize_mulaw", synthesize),
+        ):
+            self.enterContext(context)
+
+    def _workflow(self, *chunks, fail=False, **assistant):
+        """The real assistant workflow over an LLM that streams chunks (and then fails, with fail=True)."""
+        async def astream(prompt):
+            for chunk in chunks:
+                yield SimpleNamespace(content=chunk)
+            if fail:
+                raise RuntimeError("LLM connection reset")
+
+        fields = dict(
+            temperature=0.5, max_tokens=100, system_prompt="Be brief.",
+            crisis_keywords_prompt="", crisis_keywords="", files=SimpleNamespace(all=lambda: []),
+        )
+        fields.update(assistant)
+        with mock.patch.object(assistant_workflow, "ChatOpenAI", lambda **kwargs: SimpleNamespace(astream=astream)):
+            return assistant_workflow.compile_dynamic_agent(SimpleNamespace(**fields))
+
+    def _reply(self, workflow, text):
+        async def run():
+            await _reply_consumer(workflow)._handle_llm_and_reply(text)
+
+        asyncio.run(run())
+
+    def test_streamed_reply_is_synthesized_sentence_by_sentence(self):
+        workflow = self._workflow('{"reply": "Your order ships', ' tomorrow. Anything else', ' I can help with?"}')
+        self._reply(workflow, "When does my order arrive?")
+        self.assertEqual(self.synthesized, ["Your order ships tomorrow.", "Anything else I can help with?"])
+        self.assertEqual(self.saved, [("When does my order arrive?", "Your order ships tomorrow. Anything else I can help with?")])
+
+    def test_crisis_answer_is_spoken_whole(self):
+        workflow = self._workflow('{"reply": "unused"}', crisis_keywords_prompt="Please call 999 now. Help is there.")
+        self._reply(workflow, "I want to die")
+        self.assertEqual(self.synthesized, ["Please call 999 now.", "Help is there."])
+        self.assertEqual(self.saved, [("I want to die", "Please call 999 now. Help is there.")])
+
+    def test_llm_failure_mid_reply_ends_with_the_fallback(self):
+        from apps.call.consumers import FALLBACK_REPLY
+
+        workflow = self._workflow('{"reply": "Your order ships tomorrow. It will', fail=True)
+        self._reply(workflow, "When does my order arrive?")
+        # the cut-off "It will" is not spoken
+        self.assertEqual(self.synthesized, ["Your order ships tomorrow.", FALLBACK_REPLY])
+        self.assertEqual(self.saved, [("When does my order arrive?", f"Your order ships tomorrow. {FALLBACK_REPLY}")])
+
+    def test_llm_failure_before_any_text_is_answered_by_the_workflow(self):
+        workflow = self._workflow(fail=True)
+        self._reply(workflow, "When does my order arrive?")
+        self.assertEqual(self.synthesized, ["I’m having trouble responding right now."])
+
+    def test_barge_in_saves_only_the_part_that_was_played(self):
+        marks = []
+
+        async def run():
+            second_sentence = asyncio.Event()
+
+            def on_send(event):
+                if event["event"] == "mark":
+                    marks.append(event["mark"]["name"])
+                    if len(marks) == 2:
+                        second_sentence.set()
+
+            workflow = self._workflow('{"reply": "Your order ships tomorrow. ', 'Anything else I can help with?"}')
+            consumer = _reply_consumer(workflow, on_send)
+            turn = asyncio.create_task(consumer._handle_llm_and_reply("When does my order arrive?"))
+            await second_sentence.wait()
+            # Twilio played the first sentence, then the caller spoke over the second
+            consumer.pacer.on_mark(marks[0])
+            await consumer._barge_in()
+            await turn
+
+        asyncio.run(run())
+        self.assertEqual(self.saved, [("When does my order arrive?", "Your order ships tomorrow.")])
+
+
+    def test_barge_in_before_any_audio_carries_the_text_into_the_next_turn(self):
+        calls = []
+
+        async def astream(prompt):
+            calls.append(prompt)
+            if len(calls) == 1:
+                try:
+                    # still thinking when the caller goes on talking
+                    await asyncio.Event().wait()
+                finally:
+                    calls.append("cancelled")
+            yield SimpleNamespace(content='{"reply": "Your refund is on its way."}')
+
+        fields = dict(
+            temperature=0.5, max_tokens=100, system_prompt="Be brief.",
+            crisis_keywords_prompt="", crisis_keywords="", files=SimpleNamespace(all=lambda: []),
+        )
+        with mock.patch.object(assistant_workflow, "ChatOpenAI", lambda **kwargs: SimpleNamespace(astream=astream)):
+            workflow = assistant_workflow.compile_dynamic_agent(SimpleNamespace(**fields))
+
+        async def run():
+            consumer = _reply_consumer(workflow)
+            turn = asyncio.create_task(consumer._handle_llm_and_reply("I need a refund"))
+            while not calls:
+                await asyncio.sleep(0.01)
+            await consumer._barge_in()
+            # the abandoned reply is not waited for
+            await asyncio.wait_for(turn, 1)
+            unanswered = consumer.unanswered_text
+
+            consumer.turns.append(asyncio.ensure_future(asyncio.sleep(0, result="for order twelve")))
+            processing = asyncio.create_task(consumer._process_turns())
+            while not self.saved:
+                await asyncio.sleep(0.01)
+            processing.cancel()
+            return unanswered, calls[1]
+
+        unanswered, after_first = asyncio.run(run())
+        self.assertEqual((unanswered, after_first), ("I need a refund", "cancelled"))
+        self.assertEqual(self.saved, [("I need a refund for order twelve", "Your refund is on its way.")])
+
+
+    def test_unanswered_text_is_stored_when_the_call_ends(self):
+        async def run():
+            consumer = _reply_consumer()
+            consumer.asr = consumer.processing_task = None
+            consumer.unanswered_text = "I need a refund"
+            await consumer.disconnect(1000)
+
+        asyncio.run(run())
+        self.assertEqual(self.saved, [("I need a refund", "")])
+
+
+class FakeSynthesizer:
+    def __init__(self, voice, fmt):
+        self.voice, self.fmt = voice, fmt
+        self.spoken = []
+
+    def speak_text_async(self, text):
+        self.spoken.append(text)
+        result = mock.Mock(reason=speech_synthesis.speechsdk.ResultReason.SynthesizingAudioCompleted)
+        result.audio_data = f"{self.fmt}:{self.voice}:{text}".encode()
+        return mock.Mock(get=mock.Mock(return_value=result))
+
+
+class SpeechSynthesisTests(SimpleTestCase):
+    def setUp(self):
+        cache_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.created = []
+
+        def new_synthesizer(voice, fmt):
+            self.created.append(FakeSynthesizer(voice, fmt))
+            return self.created[-1]
+
+        for context in (
+            override_settings(CALL_TTS_CACHE_ROOT=cache_root, CALL_TTS_POOL_SIZE=2),
+            mock.patch.object(speech_synthesis, "AZURE_SPEECH_KEY", "key"),
+            mock.patch.object(speech_synthesis, "AZURE_SPEECH_REGION", "region"),
+            mock.patch.object(speech_synthesis, "_new_synthesizer", new_synthesizer),
+            mock.patch.dict(speech_synthesis._pools, clear=True),
+        ):
+            self.enterContext(context)
+
+    def test_synthesizers_are_reused_per_voice_and_format(self):
+        speech_synthesis.synthesize("one", "voice-a")
+        speech_synthesis.synthesize("two", "voice-a")
+        speech_synthesis.synthesize("three", "voice-a", speech_synthesis.FORMAT_WAV)
+        self.assertEqual(len(self.created), 2)
+        self.assertEqual(self.created[0].spoken, ["one", "two"])
+
+    def test_cached_phrase_skips_synthesis(self):
+        first = speech_synthesis.synthesize("Hello there", "voice-a", cache=True)
+        second = speech_synthesis.synthesize("Hello there", "voice-a", cache=True)
+        self.assertEqual(first, second)
+        self.assertEqual(self.created[0].spoken, ["Hello there"])
+        # another voice or format is a different phrase
+        speech_synthesis.synthesize("Hello there", "voice-b", cache=True)
+        speech_synthesis.synthesize("Hello there", "voice-a", speech_synthesis.FORMAT_MP3, cache=True)
+        self.assertEqual(sum(len(s.spoken) for s in self.created), 3)
+
+    def test_uncached_replies_are_not_stored(self):
+        speech_synthesis.synthesize("Your order ships tomorrow", "voice-a")
+        self.assertIsNone(speech_synthesis.cached_audio("Your order ships tomorrow", "voice-a", speech_synthesis.FORMAT_MULAW))
+
+    def test_prune_drops_only_unused_phrases(self):
+        speech_synthesis.synthesize("Old intro", "voice-a", cache=True)
+        speech_synthesis.synthesize("Fallback", "voice-a", cache=True)
+        old = speech_synthesis.cache_path("Old intro", "voice-a", speech_synthesis.FORMAT_MULAW)
+        fallback = speech_synthesis.cache_path("Fallback", "voice-a", speech_synthesis.FORMAT_MULAW)
+        for path in (old, fallback):
+            os.utime(path, (0, 0))
+        # a hit keeps the phrase alive
+        speech_synthesis.cached_audio("Fallback", "voice-a", speech_synthesis.FORMAT_MULAW)
+
+        self.assertEqual(speech_synthesis.prune_cache(max_age=3600), 1)
+        self.assertFalse(old.exists())
+        self.assertTrue(fallback.exists())
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "campaign-tests"}})
+class CampaignTests(SimpleTestCase):
+    def test_csv_row_maps_known_headers(self):
+        row = {"Name": " Rahim ", "Phone_Number": "+8801700000000", "Business Type": "Retail", "extra": "x", None: ["y"]}
+        self.assertEqual(campaigns.row_fields(row), {
+            "name": "Rahim",
+            "to_number": "+8801700000000",
+            "designation": "",
+            "company": "",
+            "business_type": "Retail",
+        })
+
+    def test_dial_slots_hold_the_rate_per_number(self):
+        now = [100.0]
+        waits = []
+
+        def sleep(seconds):
+            waits.append(round(seconds, 3))
+            now[0] += seconds
+
+        for _ in range(3):
+            campaigns.take_dial_slot("n1", cps=2, clock=lambda: now[0], sleep=sleep)
+        # another number has its own budget
+        campaigns.take_dial_slot("n2", cps=2, clock=lambda: now[0], sleep=sleep)
+        self.assertEqual(waits, [0.5, 0.5])
+        self.assertEqual(now[0], 101.0)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "campaign-db-tests"}})
+class CampaignStatusTests(TestCase):
+    def setUp(self):
+        self.enterContext(mock.patch.dict("os.environ", {"TWILIO_AUTH": "auth-token"}))
+        owner = get_user_model().objects.create_user(email="caller@example.com", password="pw")
+        self.campaign = OutboundCampaign.objects.create(
+            owner=owner,
+            assistant=Assistant.objects.create(owner=owner, name="Caller"),
+            phone_number=PhoneNumber.objects.create(user=owner, phone_number="+15550000001"),
+            file="call_campaigns/list.csv",
+            status=OutboundCampaign.STATUS_RUNNING,
+            status_callback_url="https://example.com/api/call/twilio/campaign-status/",
+        )
+        self.call = OutboundCampaignCall.objects.create(
+            campaign=self.campaign, row_number=1, to_number="+15550000002",
+            status=OutboundCampaignCall.STATUS_ACTIVE, call_sid="CA1",
+        )
+
+    def _post(self, params, signature=None):
+        url = campaigns.status_callback_url(self.call)
+        if signature is None:
+            signature = RequestValidator("auth-token").compute_signature(url, params)
+        return self.client.post(
+            f"{reverse('call_campaign_status')}?call={self.call.pk}", params, HTTP_X_TWILIO_SIGNATURE=signature
+        )
+
+    def test_unsigned_callback_is_rejected(self):
+        response = self._post({"CallSid": "CA1", "CallStatus": "completed"}, signature="forged")
+        self.assertEqual(response.status_code, 403)
+        self.call.refresh_from_db()
+        self.assertEqual(self.call.status, OutboundCampaignCall.STATUS_ACTIVE)
+
+    def test_callback_must_name_the_rows_call_sid(self):
+        self.assertEqual(self._post({"CallSid": "CA-other", "CallStatus": "completed"}).status_code, 204)
+        self.call.refresh_from_db()
+        self.assertEqual(self.call.status, OutboundCampaignCall.STATUS_ACTIVE)
+
+        self.assertEqual(self._post({"CallSid": "CA1", "CallStatus": "completed"}).status_code, 204)
+        self.call.refresh_from_db()
+        self.assertEqual((self.call.status, self.call.call_status), (OutboundCampaignCall.STATUS_COMPLETED, "completed"))
+
+    def test_status_reported_before_the_sid_is_stored_is_applied_by_the_dialer(self):
+        OutboundCampaignCall.objects.filter(pk=self.call.pk).update(status=OutboundCampaignCall.STATUS_DIALING, call_sid=None)
+        self.assertFalse(campaigns.record_call_status(self.call.pk, "CA9", "no-answer"))
+
+        self.call.refresh_from_db()
+        with mock.patch.object(campaigns, "synthesize_speech_memory", return_value=(None, "audio-1")), \
+                mock.patch.object(campaigns, "_twilio") as twilio:
+            twilio.return_value.calls.create.return_value = SimpleNamespace(sid="CA9")
+            campaigns._dial(self.campaign, self.call)
+        self.call.refresh_from_db()
+        self.assertEqual((self.call.status, self.call.call_sid), (OutboundCampaignCall.STATUS_FAILED, "CA9"))
+
+    def test_only_a_fixed_intro_uses_the_phrase_cache(self):
+        calls = []
+        for message in ("Hello <NAME>, your order shipped", "Your order shipped"):
+            self.campaign.message = message
+            with mock.patch.object(campaigns, "synthesize_speech_memory", return_value=(None, "audio-1")) as synth, \
+                    mock.patch.object(campaigns, "_twilio") as twilio:
+                twilio.return_value.calls.create.return_value = SimpleNamespace(sid="CA2")
+                campaigns._dial(self.campaign, self.call)
+            calls.append(synth.call_args)
+        self.assertEqual(calls[0].args[0], "Hello , your order shipped")
+        self.assertEqual([call.kwargs["cache"] for call in calls], [False, True])
+
+    def test_campaign_without_a_live_runner_is_dispatched_again(self):
+        OutboundCampaign.objects.filter(pk=self.campaign.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=10))
+        with mock.patch.object(campaigns, "_dispatch") as dispatch:
+            self.assertEqual(campaigns.revive_stale(), 1)
+            dispatch.assert_called_once_with("run", self.campaign.pk)
+
+            OutboundCampaign.objects.filter(pk=self.campaign.pk).update(heartbeat_at=timezone.now())
+            self.assertEqual(campaigns.revive_stale(), 0)
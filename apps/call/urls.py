@@ -7,6 +7,10 @@ urlpatterns = [
     path("twilio/start_call/", views.StartCallView.as_view(), name="start_call"),
     path("twilio/voice/", TwilioVoiceWebhookAPIView.as_view(), name="twilio_voice_webhook"),
     path("call_campaign/", views.CallCampaignAPIView.as_view(), name="call_campaign"),
+    path("call_campaign/<int:pk>/", views.OutboundCampaignProgressAPIView.as_view(), name="call_campaign_progress"),
+    path("call_campaign/<int:pk>/pause/", views.OutboundCampaignPauseAPIView.as_view(), name="call_campaign_pause"),
+    path("call_campaign/<int:pk>/resume/", views.OutboundCampaignResumeAPIView.as_view(), name="call_campaign_resume"),
+    path("twilio/campaign-status/", views.OutboundCampaignStatusWebhookAPIView.as_view(), name="call_campaign_status"),
 
     path("call-logs/stats/", views.CallLogStatsAPIView.as_view(), name="call_logs_stats"),
     path("call-logs/",  views.CallLogListAPIView.as_view(), name="call_logs_list"),
@@ -5,9 +5,7 @@ from apps.settings.models import CallCostPerMinute
 from apps.assistant.models import Assistant
 from decimal import Decimal
 from apps.transaction.utils import create_transaction
-from io import BytesIO
-import wave
-import azure.cognitiveservices.speech as speechsdk
+from .services import speech_synthesis
 import os
 import uuid
 
@@ -54,46 +52,23 @@ def add_call_cost(duration, profile):
 
 
 
-AZURE_SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY")
-AZURE_SPEECH_REGION = os.getenv("AZURE_SPEECH_REGION")
-
-
 AUDIO_FOLDER = "audio_files"
 
 os.makedirs(AUDIO_FOLDER, exist_ok=True)
 
-def synthesize_speech_memory(text,unique_id, voice_id="bn-BD-PradeepNeural"):
+def synthesize_speech_memory(text,unique_id, voice_id="bn-BD-PradeepNeural", cache=False):
     if unique_id is None:
         unique_id = str(uuid.uuid4())
     if "+" in unique_id:
         unique_id = unique_id.replace("+", "P")
-    raw_file = os.path.join(AUDIO_FOLDER, f"audio_raw_{unique_id}.raw")
     wav_file_path = os.path.join(AUDIO_FOLDER, f"audio_{unique_id}.wav")
-    raw_file_path = os.path.join(AUDIO_FOLDER, f"audio_raw_{unique_id}.raw")
-
-    for file_path in [wav_file_path, raw_file_path]:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print("Deleted existing file:", file_path)
 
-    # Azure TTS config (same as before)
-    speech_config = speechsdk.SpeechConfig(subscription=AZURE_SPEECH_KEY, region=AZURE_SPEECH_REGION)
-    speech_config.speech_synthesis_voice_name = voice_id
-    audio_config = speechsdk.audio.AudioOutputConfig(filename=raw_file)
-    synthesizer = speechsdk.SpeechSynthesizer(speech_config, audio_config)
-
-    result = synthesizer.speak_text_async(text).get()
-    if result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted:
+    # cache=True only for text that repeats across recipients (an intro without <NAME>)
+    audio = speech_synthesis.synthesize(text, voice_id, speech_synthesis.FORMAT_WAV, cache=cache)
+    if not audio:
         return None, None
 
-    # Convert to WAV
-    with open(raw_file, "rb") as f:
-        pcm_data = f.read()
-
-    with wave.open(wav_file_path, "wb") as wav_file:
-        wav_file.setnchannels(1)
-        wav_file.setsampwidth(2)
-        wav_file.setframerate(16000)
-        wav_file.writeframes(pcm_data)
+    with open(wav_file_path, "wb") as wav_file:
+        wav_file.write(audio)
 
-    return wav_file_path, unique_id
\ No newline at end of file
+    return wav_file_path, unique_id
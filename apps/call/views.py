@@ -7,13 +7,18 @@ from apps.assistant.models import Assistant
 from django.shortcuts import get_object_or_404
 from .models import CallLog, CallCampaign
 from .serializers import CallLogSerializer
+from utils.pagination import AutoPagination, KeysetPaginator
 from twilio.rest import Client
 from . utils import synthesize_speech_memory
 from apps.phone_number.models import PhoneNumber
-import os,io,csv
+import os
 from apps.orders.models import Order
 
 from .voice_xml_builder import GetXML
+from .models import OutboundCampaign, OutboundCampaignCall
+from .services import campaigns
+from django.conf import settings
+from django.urls import reverse
 
 PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL")
 
@@ -74,84 +79,31 @@ class CallCampaignAPIView(APIView):
             )
 
         # ---------- CSV BULK PROCESSING ----------
+        # rows are parsed and dialed in the background (services/campaigns.py)
         csv_file = request.FILES.get("file")
         if not csv_file:
             return Response({"error": "CSV file is required"}, status=400)
 
-        try:
-            data = csv_file.read().decode("utf-8")
-        except:
-            return Response({"error": "Invalid CSV encoding"}, status=400)
-
-        io_string = io.StringIO(data)
-        reader = csv.DictReader(io_string)
-
-        total_calls = 0
-        failed = 0
-
-        number_id = request.data.get("number_id")
-        fron_obj = PhoneNumber.objects.get(id=number_id)
-        from_number = fron_obj.phone_number
-
-        base_url = f"{request.scheme}://{request.get_host()}"
-        base_url = "https://cornelia-preindulgent-leigh.ngrok-free.dev"
-
-        for row in reader:
-            print(row)
-
-            name = row.get("name") or row.get("Name")
-            to_number = row.get("number") or row.get("phone") or row.get("phone_number")
-            designation = row.get("designation") or row.get("job") 
-            company = row.get("company")
-            business_type = row.get("business type") or row.get("business_type") or row.get("type")
-
-            if not to_number:
-                failed += 1
-                continue
-
-            try:
-                if "<NAME>" in text:
-                    text = text.replace("<NAME>", name)
-                file_path, audio_id = synthesize_speech_memory(text, to_number)
-
-                call = client.calls.create(
-                    to=to_number,
-                    from_=from_number,
-                    url=f"{base_url}/voice?id={audio_id}",
-                    record=True
-                )
-
-                try:
-                    print(f"Assistant found: {assistant}, calling {to_number}, from {from_number}, text: {text}")
-                    CallLog.objects.create(
-                        assistant=assistant,
-                        call_sid=call.sid,
-                        call_status="ringing",
-                        direction="outbound",
-                        caller=from_number,
-                        callee=to_number,
-                    )
-                    CallCampaign.objects.create(
-                        phone_number=to_number,
-                        name=name,
-                        designation=designation,
-                        company=company,
-                        business_type=business_type,
-                    )
-                except Exception as e:
-                    print(e)
-                    pass
-
-                total_calls += 1
-
-            except Exception as e:
-                failed += 1
-
+        phone_number = PhoneNumber.objects.filter(id=request.data.get("number_id"), user=request.user).first()
+        if not phone_number:
+            return Response({"error": "Phone number not found"}, status=400)
+
+        status_callback_url = request.build_absolute_uri(reverse("call_campaign_status"))
+        if PUBLIC_BASE_URL:
+            status_callback_url = f"{PUBLIC_BASE_URL.rstrip('/')}{reverse('call_campaign_status')}"
+
+        campaign = campaigns.start_campaign(
+            request.user,
+            assistant,
+            phone_number,
+            csv_file,
+            voice_url=settings.CALL_CAMPAIGN_VOICE_URL,
+            status_callback_url=status_callback_url,
+        )
         return Response({
-            "status": "bulk_complete",
-            "success_calls": total_calls,
-            "failed": failed
-        })
+            "status": "queued",
+            "campaign": campaigns.progress(campaign),
+        }, status=status.HTTP_202_ACCEPTED)
 
     # -----------------------------------------------------------
     # HANDLE SINGLE CALL
@@ -206,6 +158,54 @@ class CallCampaignAPIView(APIView):
 
 
 
+class OutboundCampaignProgressAPIView(APIView):
+    """Live progress of a bulk call campaign (also pushed over the notification websocket)."""
+
+    def get(self, request, pk):
+        campaign = get_object_or_404(OutboundCampaign, pk=pk, owner=request.user)
+        return Response({"data": campaigns.progress(campaign)})
+
+
+class OutboundCampaignPauseAPIView(APIView):
+    def post(self, request, pk):
+        campaign = get_object_or_404(OutboundCampaign, pk=pk, owner=request.user)
+        if not campaigns.pause(campaign):
+            return Response({"error": f"A {campaign.status} campaign cannot be paused"}, status=409)
+        return Response({"data": campaigns.progress(campaign)})
+
+
+class OutboundCampaignResumeAPIView(APIView):
+    def post(self, request, pk):
+        campaign = get_object_or_404(OutboundCampaign, pk=pk, owner=request.user)
+        if not campaigns.resume(campaign):
+            return Response({"error": f"A {campaign.status} campaign cannot be resumed"}, status=409)
+        return Response({"data": campaigns.progress(campaign)})
+
+
+class OutboundCampaignStatusWebhookAPIView(APIView):
+    """Twilio status callback of campaign calls: frees the caller id's line when a call ends."""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        call_id = request.GET.get("call", "")
+        call = None
+        if call_id.isdigit():
+            call = OutboundCampaignCall.objects.select_related("campaign").filter(pk=call_id).first()
+        if call is None:
+            return HttpResponse(status=404)
+
+        if not campaigns.valid_twilio_signature(
+            campaigns.status_callback_url(call),
+            request.POST.dict(),
+            request.headers.get("X-Twilio-Signature", ""),
+        ):
+            return HttpResponse(status=403)
+
+        campaigns.record_call_status(call.pk, request.POST.get("CallSid"), request.POST.get("CallStatus"))
+        return HttpResponse(status=204)
+
+
 class CallLogStatsAPIView(APIView):
     """
     Returns call logs grouped by assistant and call status
@@ -250,17 +250,33 @@ class CallLogListAPIView(APIView):
         protocol = request.META.get('HTTP_X_FORWARDED_PROTO', 'http')
         base_url = f"{protocol}://{request.META['HTTP_HOST']}"
         call_logs = CallLog.objects.filter(assistant__owner=request.user).order_by("-created_at")
+
+        # opt-in keyset paging (?pagination=cursor / ?cursor=); default stays the full list
+        meta = None
+        if AutoPagination().wants_cursor(request):
+            paginator = KeysetPaginator(ordering="-created_at", page_size=min(AutoPagination().get_page_size(request), AutoPagination.max_page_size))
+            page = paginator.paginate_queryset(call_logs, request)
+            meta = {
+                "count": paginator.get_count(call_logs),
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+            }
+            call_logs = page
+
         serializer = CallLogSerializer(call_logs, many=True).data
         data=[]
         for call_log in serializer:
             call_log["recording_url"] = f"{base_url}/api/play/{call_log['record_sid']}/"
             data.append(call_log)
-        return Response({
+        payload = {
             "status": "success",
             "status_code": status.HTTP_200_OK,
             "message": "Call logs fetched successfully.",
             "data": data
-            }, status=status.HTTP_200_OK)
+            }
+        if meta is not None:
+            payload["meta"] = meta
+        return Response(payload, status=status.HTTP_200_OK)
     
 class CallLogDetailSingleAPIView(APIView):
     """
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html, format_html_join, escape
 from unfold.admin import ModelAdmin as UnfoldModelAdmin
-from .models import Conversation, Message
+from .models import Conversation, KnowledgeDocument, Message
 
 # =========================
 # Message Inline
@@ -158,6 +158,23 @@ class MessageAdmin(UnfoldModelAdmin):
     attachments_preview.short_description = "Attachments"
 
 
+# =========================
+# Knowledge Base
+# =========================
+@admin.register(KnowledgeDocument)
+class KnowledgeDocumentAdmin(UnfoldModelAdmin):
+    list_display = ("id", "owner", "source", "title", "chunk_count", "indexed_at", "updated_at")
+    list_filter = ("source",)
+    search_fields = ("title", "owner__email")
+    raw_id_fields = ("owner", "assistant_file")
+    readonly_fields = ("content_hash", "indexed_at", "created_at", "updated_at")
+
+    def chunk_count(self, obj: KnowledgeDocument):
+        return obj.chunks.count()
+
+    chunk_count.short_description = "Chunks"
+
+
 def _render_attachments(attachments):
     attachment_urls = []
     for att in attachments or []:
@@ -4,17 +4,21 @@ import json
 import os
 import logging
 import re
-from typing import List, Dict, Any, Optional, TypedDict
+import time
+from typing import Annotated, List, Dict, Any, Optional, TypedDict
 
 from dotenv import load_dotenv
+from django.db import connection as db_connection
 
 from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
 from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from . import knowledge_base
 from .services.attachment_loader import download_images
-from .services.ocr import analyze_image  # ✅ OCR + Vision Caption (must exist)
+from .services.embedding_cache import get_cached_embeddings
+from .services.ocr import analyze_images  # ✅ OCR + Vision Caption (must exist)
 from langchain_tools.inventory_tools import search_inventory_products, list_inventory_products
 from langchain_tools.order_tools import create_order
 
@@ -28,6 +32,12 @@ logger = logging.getLogger(__name__)
 # ----------------------------------
 # STATE
 # ----------------------------------
+def _merge_dicts(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    merged = dict(left or {})
+    merged.update(right or {})
+    return merged
+
+
 class ChatBotState(TypedDict, total=False):
     user_query: str
     chat_history: List[Dict[str, Any]]
@@ -50,6 +60,11 @@ class ChatBotState(TypedDict, total=False):
     # language control
     language: str  # "bn" or "en"
 
+    # single-call router output (see route_node)
+    route: Dict[str, Any]
+    # per-node latency in ms
+    timings: Annotated[Dict[str, float], _merge_dicts]
+
 # ----------------------------------
 # KNOWLEDGE BASE / VECTOR STORE
 # ----------------------------------
@@ -64,12 +79,28 @@ KNOWLEDGE_BASE = [
 def build_vector_store(documents: List[str]) -> FAISS:
     splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
     docs = splitter.create_documents(documents)
-    embeddings = OpenAIEmbeddings()
+    embeddings = get_cached_embeddings()
     return FAISS.from_documents(docs, embeddings)
 
 @lru_cache(maxsize=1)
 def get_vector_store() -> FAISS:
-    return build_vector_store(KNOWLEDGE_BASE)
+    """
+    Shared fallback store (no owner). Built once and saved next to the per-owner
+    indexes, so other workers load it from disk instead of re-embedding.
+    """
+    path = knowledge_base.global_store_path()
+    if path.exists():
+        try:
+            return FAISS.load_local(str(path), get_cached_embeddings(), allow_dangerous_deserialization=True)
+        except Exception as e:
+            logger.warning(f"Saved vector store unreadable, rebuilding: {e}")
+    store = build_vector_store(KNOWLEDGE_BASE)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        store.save_local(str(path))
+    except OSError as e:
+        logger.warning(f"Could not save vector store to {path}: {e}")
+    return store
 
 
 # ----------------------------------
@@ -434,6 +465,201 @@ def _format_inventory_list_response(result: Dict[str, Any], lang: str) -> str:
 
     return "\n".join(lines).strip()
 
+# ----------------------------------
+# ROUTER (rule-based pre-classifier + single LLM call)
+# ----------------------------------
+# opening greetings only: "ok"/"thanks" mid-conversation may be confirming an order
+_GREETING_WORDS = {
+    "hi", "hii", "hello", "hey", "helo", "hlw", "hola", "yo",
+    "salam", "assalamualaikum", "assalamu alaikum", "asalamualaikum", "slm",
+    "good morning", "good afternoon", "good evening",
+    "হাই", "হ্যালো", "হেলো", "সালাম", "আসসালামু আলাইকুম",
+}
+# emoji / pictograph code points (with ZWJ, variation selector and keycap joiners); not plain punctuation
+_EMOJI_ONLY_RE = re.compile(
+    r"^[\s\u200d\ufe0f\u20e3\u2190-\u21FF\u2300-\u23FF\u2600-\u27BF\u2B00-\u2BFF\U0001F000-\U0001FAFF]+$"
+)
+
+_GREETING_REPLIES = {
+    "bn": "হ্যালো! আমি কীভাবে আপনাকে সাহায্য করতে পারি?",
+    "en": "Hello! How can I help you today?",
+}
+_LANGUAGE_CHOICE_REPLIES = {
+    "bn": "ঠিক আছে, আমরা বাংলায় কথা বলব। আমি কীভাবে সাহায্য করতে পারি?",
+    "en": "Sure, let's continue in English. How can I help you?",
+}
+
+
+def _empty_route(language: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "kind": "llm",
+        "language": language,
+        "flagged": False,
+        "inventory_intent": "none",
+        "order_intent": "none",
+        "order": {},
+    }
+
+
+def _has_earlier_turns(chat_history: Optional[List[Dict[str, Any]]], user_query: str) -> bool:
+    # callers store the incoming message before loading history, so it is usually the last turn
+    turns = list(chat_history or [])
+    if turns and turns[-1].get("role") == "user" and (turns[-1].get("content") or "").strip() == user_query.strip():
+        turns.pop()
+    return bool(turns)
+
+
+def _is_sticker_attachment(attachment: Dict[str, Any]) -> bool:
+    payload = attachment.get("payload") or {}
+    return bool(payload.get("sticker_id") or attachment.get("sticker_id") or attachment.get("type") == "sticker")
+
+
+def _prefilter_route(
+    user_query: str,
+    attachments: List[Dict[str, Any]],
+    chat_history: Optional[List[Dict[str, Any]]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Cheap rule-based pass. Returns a finished route (no LLM needed) for
+    opening greetings (only when there is no history yet), stickers/emoji-only
+    messages and bare language-choice replies.
+    """
+    text = (user_query or "").strip()
+    normalized = re.sub(r"[!.,?\s]+", " ", text.lower()).strip()
+    attachments = attachments or []
+    only_stickers = bool(attachments) and all(_is_sticker_attachment(a) for a in attachments)
+    if attachments and not only_stickers:
+        return None
+
+    if not text or _EMOJI_ONLY_RE.match(text):
+        if only_stickers or text:
+            route = _empty_route(_guess_language(text))
+            route["kind"] = "sticker"
+            return route
+        return None
+
+    if len(normalized) > 40:
+        return None
+
+    lang_choice = _detect_language_choice(text)
+    if lang_choice and len(normalized.split()) <= 3:
+        route = _empty_route(lang_choice)
+        route["kind"] = "language_choice"
+        return route
+
+    if normalized in _GREETING_WORDS and not _has_earlier_turns(chat_history, text):
+        route = _empty_route(_guess_language(text))
+        route["kind"] = "greeting"
+        return route
+
+    return None
+
+
+def _route_message_llm(user_query: str, chat_history: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    One structured-output call that replaces the separate moderation,
+    inventory-intent, order-intent and order-extraction calls.
+    Returns None when the call fails so callers can fall back.
+    """
+    llm = ChatOpenAI(
+        model=os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini"),
+        temperature=0.0,
+        max_tokens=500,
+    ).bind(response_format={"type": "json_object"})
+
+    system = (
+        "You are the router for a retail/commerce chat assistant. "
+        "Classify the current user message and extract order details in one pass. "
+        "Return JSON only with exactly these keys:\n"
+        "{"
+        "\"language\": \"bn\"|\"en\", "
+        "\"flagged\": boolean, "
+        "\"inventory_intent\": \"list\"|\"search\"|\"none\", "
+        "\"order_intent\": \"create\"|\"none\", "
+        "\"order\": {"
+        "\"customer\": string|null, "
+        "\"location\": string|null, "
+        "\"contact\": string|null, "
+        "\"platform\": \"FACEBOOK\"|\"INSTAGRAM\"|\"TIKTOK\"|\"WEBSITE\"|null, "
+        "\"items\": [{\"product_name\": string, \"quantity\": integer, \"color\": string|null, "
+        "\"size\": string|null, \"weight\": string|null, \"notes\": string|null}]"
+        "}"
+        "}.\n"
+        "- language: bn if the user writes Bangla (script or romanized), otherwise en.\n"
+        "- flagged=true only for clearly disallowed requests (sexual content involving minors, "
+        "violence/terrorism instructions, weapons). Normal shopping questions are never flagged.\n"
+        "- inventory_intent=list if the user asks to show/list all products or to send the list again; "
+        "search if they mention a specific product, brand, size, color, SKU-like code, or ask price/availability "
+        "for a particular item; otherwise none.\n"
+        "- order_intent=create only if the user is trying to place/confirm a new order now; "
+        "none for order tracking/status/cancel requests and general product questions.\n"
+        "- order: fill only when order_intent=create, otherwise {}. If unknown use null or []. "
+        "Never invent phone number or address. Quantity must be integer >= 1.\n"
+        "Handle Bangla and English."
+    )
+
+    user = (
+        f"Current user message:\n{user_query}\n\n"
+        f"Recent chat:\n{_build_recent_chat_snippet(chat_history) or '(none)'}"
+    )
+
+    try:
+        resp = llm.invoke(
+            [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ]
+        )
+        parsed = _extract_json(getattr(resp, "content", "") or "")
+    except Exception as e:
+        logger.exception(f"Router call failed: {e}")
+        return None
+
+    if not isinstance(parsed, dict):
+        return None
+
+    route = _empty_route(parsed.get("language") if parsed.get("language") in {"bn", "en"} else None)
+    route["flagged"] = parsed.get("flagged") is True
+    if parsed.get("inventory_intent") in {"list", "search", "none"}:
+        route["inventory_intent"] = parsed["inventory_intent"]
+    if parsed.get("order_intent") in {"create", "none"}:
+        route["order_intent"] = parsed["order_intent"]
+    if route["order_intent"] == "create" and isinstance(parsed.get("order"), dict):
+        route["order"] = parsed["order"]
+    return route
+
+
+def _timed(name: str, fn):
+    """Wrap a graph node so its wall time lands in state["timings"][name] (ms)."""
+    def wrapper(state: ChatBotState) -> ChatBotState:
+        started = time.perf_counter()
+        result = fn(state)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        if result is None:
+            result = {}
+        result["timings"] = {name: elapsed_ms}
+        return result
+
+    wrapper.__name__ = getattr(fn, "__name__", name)
+    return wrapper
+
+
+def _closing_db_connection(fn):
+    """
+    Parallel branches run on LangGraph's short-lived executor threads; close the
+    Django connection such a thread opened so it doesn't leak when the thread exits.
+    """
+    def wrapper(state: ChatBotState) -> ChatBotState:
+        had_connection = db_connection.connection is not None
+        try:
+            return fn(state)
+        finally:
+            if not had_connection:
+                db_connection.close()
+
+    wrapper.__name__ = getattr(fn, "__name__", "node")
+    return wrapper
+
 # ----------------------------------
 # NODE 0: LANGUAGE GATE (hard rule)
 # ----------------------------------
@@ -482,46 +708,91 @@ def moderation_node(state: ChatBotState) -> ChatBotState:
 
     return state
 
+# ----------------------------------
+# ROUTE NODE (pre-classifier, then one LLM call)
+# ----------------------------------
+def route_node(state: ChatBotState) -> ChatBotState:
+    user_query = state.get("user_query", "") or ""
+    attachments = state.get("attachments", []) or []
+
+    route = _prefilter_route(user_query, attachments, state.get("chat_history", []) or [])
+    if route is not None:
+        lang = state.get("language") or route.get("language") or "en"
+        if route["kind"] == "language_choice":
+            lang = route["language"]
+            state["response"] = _LANGUAGE_CHOICE_REPLIES[lang]
+        elif route["kind"] == "greeting":
+            state["response"] = _GREETING_REPLIES[lang]
+        else:
+            # stickers / emoji-only: nothing to answer
+            state["response"] = ""
+        state["language"] = lang
+        state["force_response"] = True
+        state["route"] = route
+        return state
+
+    if not user_query.strip():
+        state["route"] = _empty_route(state.get("language"))
+        return state
+
+    route = _route_message_llm(user_query, state.get("chat_history", []) or [])
+    if route is None:
+        # router failed: let the nodes fall back to their own classifiers
+        return state
+
+    if not state.get("language") and route.get("language"):
+        state["language"] = route["language"]
+
+    if route.get("flagged"):
+        state["flagged"] = True
+        if state.get("language") == "bn":
+            state["response"] = "দুঃখিত, আমি এই অনুরোধে সাহায্য করতে পারব না।"
+        else:
+            state["response"] = "Sorry, I can’t help with that request."
+
+    state["route"] = route
+    return state
+
 # ----------------------------------
 # PROCESS IMAGES NODE (OCR + Vision Caption)
 # ----------------------------------
 def process_images_node(state: ChatBotState) -> ChatBotState:
+    # parallel branch: return only the keys this node owns
     attachments = state.get("attachments", []) or []
     if not attachments:
-        state["attachment_text"] = ""
-        return state
+        return {"attachment_text": ""}
 
     # Download images safely
     try:
         images = download_images(attachments)
     except Exception as e:
         logger.exception(f"download_images failed: {e}")
-        state["attachment_text"] = ""
-        return state
+        return {"attachment_text": ""}
 
     if not images:
         logger.warning("No images downloaded from attachments.")
-        state["attachment_text"] = ""
-        return state
+        return {"attachment_text": ""}
+
+    try:
+        results = analyze_images(images)
+    except Exception as e:
+        logger.exception(f"analyze_images failed: {e}")
+        results = [e] * len(images)
 
     extracted_blocks = []
-    for i, img in enumerate(images, start=1):
-        img_bytes = img.get("bytes")
-        content_type = img.get("content_type", "image/jpeg")
+    for i, (img, result) in enumerate(zip(images, results), start=1):
         url = img.get("url", "")
 
-        if not img_bytes:
+        if result is None:
             extracted_blocks.append(f"[IMAGE {i}]\nURL: {url}\n[ERROR] Missing image bytes.\n")
             continue
 
-        try:
-            result = analyze_image(image_bytes=img_bytes, content_type=content_type)
+        if isinstance(result, Exception):
+            caption = ""
+            ocr_text = f"[IMAGE_ANALYSIS_ERROR] {type(result).__name__}: {result}"
+        else:
             caption = (result.get("caption") or "").strip()
             ocr_text = (result.get("ocr_text") or "").strip()
-        except Exception as e:
-            logger.exception(f"analyze_image failed for image {i}: {e}")
-            caption = ""
-            ocr_text = f"[IMAGE_ANALYSIS_ERROR] {type(e).__name__}: {e}"
 
         extracted_blocks.append(
             f"""[IMAGE {i}]
@@ -535,48 +806,52 @@ URL: {url}
 """
         )
 
-    state["attachment_text"] = "\n\n".join(extracted_blocks).strip()
-    return state
+    return {"attachment_text": "\n\n".join(extracted_blocks).strip()}
 
 # ----------------------------------
 # RETRIEVAL NODE (RAG)
 # ----------------------------------
 def retrieve_context_node(state: ChatBotState) -> ChatBotState:
+    # parallel branch: return only the keys this node owns
     query = state.get("user_query", "") or ""
     if not query.strip():
-        state["retrieved_docs"] = []
-        state["context"] = ""
-        state["sources"] = []
-        return state
+        return {"retrieved_docs": [], "context": "", "sources": []}
 
+    owner_user_id = state.get("owner_user_id")
     try:
-        vector_store = get_vector_store()
-        docs = vector_store.similarity_search(query, k=4)
+        if owner_user_id:
+            docs = knowledge_base.search(owner_user_id, query, k=4)
+        else:
+            docs = get_vector_store().similarity_search(query, k=4)
     except Exception as e:
         logger.exception(f"Vector search failed: {e}")
         docs = []
 
-    state["retrieved_docs"] = docs
-    state["context"] = "\n\n".join(getattr(d, "page_content", "") for d in docs if d)
-    state["sources"] = _clean_sources(docs)
-    return state
+    return {
+        "retrieved_docs": docs,
+        "context": "\n\n".join(getattr(d, "page_content", "") for d in docs if d),
+        "sources": _clean_sources(docs),
+    }
 
 
 # ----------------------------------
 # INVENTORY CONTEXT NODE (tools)
 # ----------------------------------
 def inventory_context_node(state: ChatBotState) -> ChatBotState:
+    # parallel branch: return only the keys this node owns
     user_query = state.get("user_query", "") or ""
     chat_history = state.get("chat_history", []) or []
     owner_user_id = state.get("owner_user_id")
     if not owner_user_id:
-        state["inventory_context"] = ""
-        return state
+        return {"inventory_context": ""}
 
-    intent = _detect_inventory_intent_llm(user_query, chat_history)
+    route = state.get("route")
+    if route is not None:
+        intent = route.get("inventory_intent") or "none"
+    else:
+        intent = _detect_inventory_intent_llm(user_query, chat_history)
     if intent == "none":
-        state["inventory_context"] = ""
-        return state
+        return {"inventory_context": ""}
 
     list_mode = intent == "list"
 
@@ -597,23 +872,22 @@ def inventory_context_node(state: ChatBotState) -> ChatBotState:
             })
     except Exception as e:
         logger.exception(f"Inventory tool failed: {e}")
-        state["inventory_context"] = ""
-        return state
-
-    state["inventory_result"] = result
+        return {"inventory_context": ""}
 
     if list_mode:
         lang = state.get("language") or _guess_language(user_query)
-        state["response"] = _format_inventory_list_response(result, lang)
-        state["force_response"] = True
-        state["inventory_context"] = ""
-        return state
+        return {
+            "inventory_result": result,
+            "response": _format_inventory_list_response(result, lang),
+            "force_response": True,
+            "inventory_context": "",
+        }
 
     try:
-        state["inventory_context"] = json.dumps(result, ensure_ascii=False)
+        inventory_context = json.dumps(result, ensure_ascii=False)
     except Exception:
-        state["inventory_context"] = str(result)
-    return state
+        inventory_context = str(result)
+    return {"inventory_result": result, "inventory_context": inventory_context}
 
 
 # ----------------------------------
@@ -629,11 +903,18 @@ def order_context_node(state: ChatBotState) -> ChatBotState:
     if not owner_user_id or not user_query.strip():
         return state
 
-    intent = _detect_order_intent_llm(user_query, chat_history)
+    route = state.get("route")
+    if route is not None:
+        intent = route.get("order_intent") or "none"
+    else:
+        intent = _detect_order_intent_llm(user_query, chat_history)
     if intent != "create":
         return state
 
-    payload = _extract_order_payload_llm(user_query, chat_history)
+    if route is not None and route.get("order"):
+        payload = route["order"]
+    else:
+        payload = _extract_order_payload_llm(user_query, chat_history)
 
     customer = _clean_text(payload.get("customer"), 255)
     location = _clean_text(payload.get("location"), 255)
@@ -801,13 +1082,16 @@ _GRAPH = None
 def compile_rag_chatbot():
     graph = StateGraph(ChatBotState)
 
-    graph.add_node("language_gate", language_gate_node)
-    graph.add_node("moderation", moderation_node)
-    graph.add_node("process_images", process_images_node)
-    graph.add_node("retrieve", retrieve_context_node)
-    graph.add_node("inventory_context", inventory_context_node)
-    graph.add_node("order_context", order_context_node)
-    graph.add_node("generate", generate_answer_node)
+    graph.add_node("language_gate", _timed("language_gate", language_gate_node))
+    graph.add_node("moderation", _timed("moderation", moderation_node))
+    graph.add_node("route", _timed("route", route_node))
+    # the context branches run in parallel on executor threads; retrieval (KnowledgeChunk rows)
+    # and the inventory tools use the ORM there, image analysis does not
+    graph.add_node("process_images", _timed("process_images", process_images_node))
+    graph.add_node("retrieve", _timed("retrieve", _closing_db_connection(retrieve_context_node)))
+    graph.add_node("inventory_context", _timed("inventory_context", _closing_db_connection(inventory_context_node)))
+    graph.add_node("order_context", _timed("order_context", order_context_node))
+    graph.add_node("generate", _timed("generate", generate_answer_node))
 
     graph.set_entry_point("language_gate")
 
@@ -822,17 +1106,33 @@ def compile_rag_chatbot():
     )
 
     def route_after_moderation(state: ChatBotState):
-        return END if state.get("flagged") else "process_images"
+        return END if state.get("flagged") else "route"
 
     graph.add_conditional_edges(
         "moderation",
         route_after_moderation,
-        {END: END, "process_images": "process_images"},
+        {END: END, "route": "route"},
+    )
+
+    # image analysis, RAG retrieval and inventory lookup are independent:
+    # fan out to all three and join before order_context
+    context_branches = ["process_images", "retrieve", "inventory_context"]
+
+    def route_after_router(state: ChatBotState):
+        if state.get("flagged"):
+            return END
+        # pre-classified greetings / stickers / language choice need nothing else
+        if state.get("force_response") and (state.get("route") or {}).get("kind") not in (None, "llm"):
+            return END
+        return context_branches
+
+    graph.add_conditional_edges(
+        "route",
+        route_after_router,
+        [END, *context_branches],
     )
 
-    graph.add_edge("process_images", "retrieve")
-    graph.add_edge("retrieve", "inventory_context")
-    graph.add_edge("inventory_context", "order_context")
+    graph.add_edge(context_branches, "order_context")
     graph.add_edge("order_context", "generate")
     graph.add_edge("generate", END)
 
@@ -866,9 +1166,15 @@ def chatbot_reply(
         "sources": [],
         "flagged": False,
         "force_response": False,
+        "timings": {},
     }
 
+    started = time.perf_counter()
     result = _GRAPH.invoke(initial_state)
+    timings = dict(result.get("timings") or {})
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    route_kind = (result.get("route") or {}).get("kind", "fallback")
+    logger.info("chatbot_reply route=%s timings_ms=%s", route_kind, timings)
 
     return {
         "reply": result.get("response"),
@@ -876,4 +1182,6 @@ def chatbot_reply(
         "success": not (result.get("flagged", False) and bool(result.get("response"))),
         "inventory_result": result.get("inventory_result"),
         "order_result": result.get("order_result"),
+        "route": route_kind,
+        "timings": timings,
     }
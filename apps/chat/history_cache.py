@@ -0,0 +1,150 @@
+"""
+Bounded, incrementally maintained chat history per conversation.
+
+The cache entry holds the last CHAT_HISTORY_WINDOW turns plus a rolling text
+summary of the turns that fell out of the window, so building the prompt
+history costs O(window) no matter how old the conversation is.
+"""
+import logging
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+ROLE_MAP = {
+    "customer": "user",
+    "bot": "assistant",
+    "seller": "user",
+}
+
+CACHE_KEY = "chat_history:{conversation_id}"
+SUMMARY_LINE_CHARS = 200
+
+
+def _window_size() -> int:
+    return max(1, getattr(settings, "CHAT_HISTORY_WINDOW", 20))
+
+
+def _summary_limit() -> int:
+    return max(0, getattr(settings, "CHAT_HISTORY_SUMMARY_CHARS", 1500))
+
+
+def _cache_timeout() -> int:
+    return getattr(settings, "CHAT_HISTORY_CACHE_TIMEOUT", 60 * 60 * 24 * 7)
+
+
+def _key(conversation_id) -> str:
+    return CACHE_KEY.format(conversation_id=conversation_id)
+
+
+def _lock(conversation_id):
+    lock = getattr(cache, "lock", None)
+    if lock is None:
+        return nullcontext()
+    return lock(f"{_key(conversation_id)}:lock", timeout=5, blocking_timeout=2)
+
+
+def message_to_turn(message) -> dict:
+    content = message.text or ""
+    if message.sender_type == "seller":
+        content = f"Seller: {content}"
+    return {
+        "role": ROLE_MAP.get(message.sender_type, "user"),
+        "content": content,
+        "time": message.created_at.isoformat(),
+    }
+
+
+def _fold_summary(summary: str, evicted: list) -> str:
+    """Append evicted turns to the rolling summary and keep only its newest tail."""
+    lines = [summary] if summary else []
+    for turn in evicted:
+        content = " ".join((turn.get("content") or "").split())
+        if not content:
+            continue
+        lines.append(f"{turn.get('role')}: {content[:SUMMARY_LINE_CHARS]}")
+    folded = "\n".join(lines)
+    limit = _summary_limit()
+    if len(folded) <= limit:
+        return folded
+    tail = folded[-limit:]
+    # don't start the summary mid-line
+    newline = tail.find("\n")
+    return tail[newline + 1:] if newline != -1 else tail
+
+
+def _trim(state: dict) -> dict:
+    window = _window_size()
+    turns = state["turns"]
+    if len(turns) > window:
+        evicted, state["turns"] = turns[:-window], turns[-window:]
+        state["summary"] = _fold_summary(state.get("summary") or "", evicted)
+    return state
+
+
+def _load_from_db(conversation) -> dict:
+    window = _window_size()
+    # one extra window of older messages seeds the rolling summary
+    recent = list(
+        conversation.messages.order_by("-created_at", "-id")[: window * 2]
+    )
+    recent.reverse()
+    turns = [message_to_turn(msg) for msg in recent]
+    return _trim({"turns": turns, "summary": ""})
+
+
+def _as_history(state: dict) -> list:
+    history = []
+    summary = (state.get("summary") or "").strip()
+    if summary:
+        history.append({
+            "role": "system",
+            "content": f"Summary of earlier messages in this conversation:\n{summary}",
+        })
+    history.extend(state.get("turns") or [])
+    return history
+
+
+def get_history(conversation) -> list:
+    key = _key(conversation.id)
+    try:
+        state = cache.get(key)
+    except Exception as exc:
+        logger.warning("Chat history cache read failed for conversation=%s: %s", conversation.id, exc)
+        return _as_history(_load_from_db(conversation))
+
+    if state is None:
+        state = _load_from_db(conversation)
+        try:
+            cache.set(key, state, timeout=_cache_timeout())
+        except Exception as exc:
+            logger.warning("Chat history cache write failed for conversation=%s: %s", conversation.id, exc)
+    return _as_history(state)
+
+
+def append_message(message) -> None:
+    """
+    Push one freshly stored message into the cached window.
+    A missing entry is left alone: the next read rebuilds it from the DB.
+    """
+    conversation_id = message.conversation_id
+    key = _key(conversation_id)
+    try:
+        with _lock(conversation_id):
+            state = cache.get(key)
+            if state is None:
+                return
+            state["turns"].append(message_to_turn(message))
+            cache.set(key, _trim(state), timeout=_cache_timeout())
+    except Exception as exc:
+        logger.warning("Chat history cache append failed for conversation=%s: %s", conversation_id, exc)
+        invalidate(conversation_id)
+
+
+def invalidate(conversation_id) -> None:
+    try:
+        cache.delete(_key(conversation_id))
+    except Exception as exc:
+        logger.warning("Chat history cache invalidate failed for conversation=%s: %s", conversation_id, exc)
@@ -0,0 +1,360 @@
+"""
+Per-owner knowledge base for the chatbot.
+
+Documents (shop policies, FAQs, assistant file uploads) are chunked and
+embedded once. Vectors go into one FAISS index file per owner under
+CHAT_KB_ROOT, keyed by KnowledgeChunk.id; chunk text stays in the DB.
+
+Writers take a file lock, patch the index (remove old ids / add new ones) and
+atomically replace the file; re-chunking a document happens under the same
+lock, so two indexers of one document cannot both replace its chunks. Readers
+memory-map the file (IO_FLAG_MMAP_IFC, which maps the flat vector codes too)
+and reopen it only when its mtime changes, so every worker on the host shares
+one copy in the page cache and never embeds anything at start-up.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from .services.embedding_cache import CachedEmbeddings, get_cached_embeddings
+
+logger = logging.getLogger(__name__)
+
+TEXT_FILE_EXTENSIONS = {".txt", ".md", ".csv", ".json", ".html", ".htm"}
+
+# least recently searched owner first; capped at CHAT_KB_READER_CACHE_SIZE
+_readers: "OrderedDict[str, Tuple[int, faiss.Index]]" = OrderedDict()
+_readers_lock = threading.Lock()
+
+
+# ----------------------------------
+# Settings / paths
+# ----------------------------------
+def _root() -> Path:
+    return Path(getattr(settings, "CHAT_KB_ROOT", Path(settings.BASE_DIR) / "var" / "knowledge_base"))
+
+
+def _reader_cache_size() -> int:
+    return max(1, getattr(settings, "CHAT_KB_READER_CACHE_SIZE", 64))
+
+
+def index_path(owner_id) -> Path:
+    return _root() / f"owner_{owner_id}.faiss"
+
+
+def global_store_path() -> Path:
+    return _root() / "global"
+
+
+@contextmanager
+def _write_lock(owner_id):
+    path = index_path(owner_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# ----------------------------------
+# Chunking / embedding
+# ----------------------------------
+@lru_cache(maxsize=1)
+def get_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=getattr(settings, "CHAT_KB_CHUNK_SIZE", 500),
+        chunk_overlap=getattr(settings, "CHAT_KB_CHUNK_OVERLAP", 50),
+    )
+
+
+def get_embeddings() -> CachedEmbeddings:
+    return get_cached_embeddings()
+
+
+def split_text(text: str) -> List[str]:
+    return [chunk for chunk in get_splitter().split_text(text or "") if chunk.strip()]
+
+
+def _as_matrix(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype="float32")
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    # inner product on unit vectors == cosine similarity
+    faiss.normalize_L2(matrix)
+    return matrix
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+# ----------------------------------
+# Document text
+# ----------------------------------
+def _read_pdf(file_obj) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        logger.warning("pypdf is not installed, skipping PDF knowledge file")
+        return ""
+    reader = PdfReader(file_obj)
+    return "\n\n".join((page.extract_text() or "") for page in reader.pages)
+
+
+def read_assistant_file(assistant_file) -> str:
+    field = assistant_file.file
+    if not field:
+        return ""
+    ext = os.path.splitext(field.name or "")[1].lower()
+    try:
+        with field.open("rb") as fh:
+            if ext == ".pdf":
+                return _read_pdf(fh)
+            if ext in TEXT_FILE_EXTENSIONS:
+                return fh.read().decode("utf-8", errors="ignore")
+    except Exception as e:
+        logger.warning(f"Could not read knowledge file {field.name}: {e}")
+        return ""
+    logger.info(f"Unsupported knowledge file type skipped: {field.name}")
+    return ""
+
+
+def document_text(document) -> str:
+    if document.source == document.SOURCE_FILE and document.assistant_file_id:
+        return read_assistant_file(document.assistant_file)
+    if document.title and document.content:
+        return f"{document.title}\n{document.content}"
+    return document.content or ""
+
+
+# ----------------------------------
+# Index I/O
+# ----------------------------------
+def _load_for_write(owner_id, dim: int) -> "faiss.Index":
+    path = index_path(owner_id)
+    if path.exists():
+        index = faiss.read_index(str(path))
+        if index.d == dim:
+            return index
+        logger.warning(f"KB index for owner={owner_id} has dim {index.d}, expected {dim}; starting fresh")
+    return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+
+def _save(owner_id, index) -> None:
+    path = index_path(owner_id)
+    tmp = path.with_suffix(f".tmp{os.getpid()}")
+    faiss.write_index(index, str(tmp))
+    os.replace(tmp, path)
+
+
+def _remove_ids(index, ids: List[int]) -> None:
+    if ids and index.ntotal:
+        index.remove_ids(np.asarray(ids, dtype="int64"))
+
+
+def apply_changes(owner_id, remove_ids: List[int] = None, add_ids: List[int] = None, vectors=None) -> None:
+    """Patch the owner's index file in place: drop remove_ids, then add (add_ids, vectors)."""
+    remove_ids = list(remove_ids or [])
+    add_ids = list(add_ids or [])
+    if not remove_ids and not add_ids:
+        return
+    with _write_lock(owner_id):
+        _apply_locked(owner_id, remove_ids, add_ids, vectors)
+
+
+def _apply_locked(owner_id, remove_ids: List[int], add_ids: List[int], vectors) -> None:
+    # caller holds _write_lock(owner_id)
+    if not remove_ids and not add_ids:
+        return
+    matrix = _as_matrix(vectors) if add_ids else None
+    path = index_path(owner_id)
+    if matrix is None and not path.exists():
+        return
+    dim = matrix.shape[1] if matrix is not None else faiss.read_index(str(path)).d
+    index = _load_for_write(owner_id, dim)
+    _remove_ids(index, remove_ids)
+    if matrix is not None:
+        index.add_with_ids(matrix, np.asarray(add_ids, dtype="int64"))
+    _save(owner_id, index)
+
+
+def get_reader(owner_id) -> Optional["faiss.Index"]:
+    """
+    Memory-mapped, read-only view of the owner's index; reopened when the file
+    changes. The least recently searched owners are closed past
+    CHAT_KB_READER_CACHE_SIZE.
+    """
+    key = str(owner_id)
+    path = index_path(owner_id)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        with _readers_lock:
+            _readers.pop(key, None)
+        return None
+
+    with _readers_lock:
+        cached = _readers.get(key)
+        if cached and cached[0] == mtime:
+            _readers.move_to_end(key)
+            return cached[1]
+
+    # IO_FLAG_MMAP alone still copies an IndexFlat's codes into this process
+    index = faiss.read_index(str(path), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    with _readers_lock:
+        _readers[key] = (mtime, index)
+        _readers.move_to_end(key)
+        while len(_readers) > _reader_cache_size():
+            _readers.popitem(last=False)
+    return index
+
+
+# ----------------------------------
+# Document lifecycle
+# ----------------------------------
+def index_document(document, force: bool = False) -> int:
+    """
+    (Re)chunk and embed one document and patch its owner's index.
+    Unchanged text is skipped unless force=True. Returns the number of chunks indexed.
+    """
+    from .models import KnowledgeChunk
+
+    text = document_text(document)
+    digest = text_hash(text)
+    if not force and document.indexed_at and document.content_hash == digest:
+        return 0
+
+    chunks = split_text(text)
+    vectors = get_embeddings().embed_documents(chunks) if chunks else []
+
+    # one lock around the chunk swap and the index patch: a second indexer of the
+    # same document waits, then replaces the chunks the first one committed
+    with _write_lock(document.owner_id):
+        with transaction.atomic():
+            old_ids = list(document.chunks.values_list("id", flat=True))
+            document.chunks.all().delete()
+            created = KnowledgeChunk.objects.bulk_create([
+                KnowledgeChunk(document=document, position=i, text=chunk)
+                for i, chunk in enumerate(chunks)
+            ])
+            new_ids = [chunk.id for chunk in created]
+
+        # the hash is only recorded once the index file has the new vectors,
+        # so a failed write gets retried on the next save
+        _apply_locked(document.owner_id, old_ids, new_ids, vectors)
+
+    document.content_hash = digest
+    document.indexed_at = timezone.now()
+    type(document).objects.filter(pk=document.pk).update(
+        content_hash=document.content_hash,
+        indexed_at=document.indexed_at,
+    )
+
+    logger.info(f"KB indexed document={document.pk} owner={document.owner_id} chunks={len(new_ids)}")
+    return len(new_ids)
+
+
+def index_document_by_id(document_id, force: bool = False) -> int:
+    from .models import KnowledgeDocument
+
+    document = KnowledgeDocument.objects.select_related("assistant_file").filter(pk=document_id).first()
+    if document is None:
+        return 0
+    return index_document(document, force=force)
+
+
+def remove_chunks(owner_id, chunk_ids: List[int]) -> None:
+    if chunk_ids:
+        apply_changes(owner_id, remove_ids=chunk_ids)
+
+
+def rebuild_owner(owner_id) -> int:
+    """Drop the owner's index and re-embed every document from scratch."""
+    from .models import KnowledgeDocument
+
+    with _write_lock(owner_id):
+        index_path(owner_id).unlink(missing_ok=True)
+    total = 0
+    for document in KnowledgeDocument.objects.select_related("assistant_file").filter(owner_id=owner_id):
+        total += index_document(document, force=True)
+    return total
+
+
+def _is_queue_mode() -> bool:
+    return (getattr(settings, "CHAT_KB_INDEX_MODE", "inline") or "").lower() == "queue"
+
+
+def schedule_index(document) -> None:
+    """
+    Index after commit: on a Celery worker in queue mode, otherwise in-process on
+    the saved instance (so its content_hash/indexed_at stay current in memory).
+    """
+    if _is_queue_mode():
+        try:
+            from .tasks import index_knowledge_document
+
+            index_knowledge_document.delay(document.pk)
+            return
+        except Exception as e:
+            logger.exception(f"KB enqueue failed, indexing inline: {e}")
+    try:
+        index_document(document)
+    except Exception as e:
+        logger.exception(f"KB indexing failed for document={document.pk}: {e}")
+
+
+# ----------------------------------
+# Retrieval
+# ----------------------------------
+def search(owner_id, query: str, k: int = 4) -> List[Document]:
+    from .models import KnowledgeChunk
+
+    if not owner_id or not (query or "").strip():
+        return []
+    index = get_reader(owner_id)
+    if index is None or index.ntotal == 0:
+        return []
+
+    query_vector = _as_matrix(get_embeddings().embed_query(query))
+    if query_vector.shape[1] != index.d:
+        logger.warning(f"KB query dim {query_vector.shape[1]} != index dim {index.d} for owner={owner_id}")
+        return []
+
+    scores, ids = index.search(query_vector, min(k, index.ntotal))
+    hits = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i != -1]
+    if not hits:
+        return []
+
+    chunks = KnowledgeChunk.objects.select_related("document").in_bulk([i for i, _ in hits])
+    docs = []
+    for chunk_id, score in hits:
+        chunk = chunks.get(chunk_id)
+        if chunk is None:
+            continue
+        docs.append(Document(
+            page_content=chunk.text,
+            metadata={
+                "source": chunk.document.title or chunk.document.get_source_display(),
+                "document_id": chunk.document_id,
+                "chunk_id": chunk_id,
+                "score": score,
+            },
+        ))
+    return docs
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.chat.knowledge_base import get_embeddings, rebuild_owner
+from apps.chat.models import KnowledgeDocument
+
+
+class Command(BaseCommand):
+    help = "Re-embed knowledge documents and rewrite the per-owner FAISS index files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", type=int, action="append", help="Owner user id (repeatable). Default: all owners")
+
+    def handle(self, *args, **options):
+        owner_ids = options.get("owner") or (
+            KnowledgeDocument.objects.values_list("owner_id", flat=True).distinct()
+        )
+        for owner_id in owner_ids:
+            chunks = rebuild_owner(owner_id)
+            self.stdout.write(self.style.SUCCESS(f"Owner {owner_id}: indexed {chunks} chunks"))
+        stats = get_embeddings().stats()
+        self.stdout.write(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses")
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0005_assistanthistory'),
+        ('chat', '0012_alter_conversation_platform_alter_message_platform'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('policy', 'Shop policy'), ('faq', 'FAQ'), ('file', 'Assistant file'), ('note', 'Note')], default='note', max_length=20)),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('content', models.TextField(blank=True)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('indexed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('assistant_file', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='knowledge_document', to='assistant.assistantfile')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='knowledge_documents', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='KnowledgeChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('text', models.TextField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='chat.knowledgedocument')),
+            ],
+            options={
+                'ordering': ['document_id', 'position'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='knowledgedocument',
+            index=models.Index(fields=['owner', 'source'], name='chat_knowle_owner_i_7961c5_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_knowledgedocument_knowledgechunk_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'created_at', 'id'], name='chat_messag_convers_d98477_idx'),
+        ),
+    ]
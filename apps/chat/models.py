@@ -1,4 +1,5 @@
 from django.db import models
+from django.conf import settings
 from apps.social.models import SocialAccount
 
 
@@ -80,4 +81,72 @@ class Message(models.Model):
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # keyset paging / latest-window reads per conversation
+            models.Index(fields=["conversation", "created_at", "id"]),
+        ]
     
+
+
+class KnowledgeDocument(models.Model):
+    """
+    A piece of owner-provided reference text (shop policy, FAQ, uploaded file)
+    that the chatbot retrieves from. Chunks + vectors live in KnowledgeChunk and
+    the owner's on-disk FAISS index (see apps.chat.knowledge_base).
+    """
+    SOURCE_POLICY = "policy"
+    SOURCE_FAQ = "faq"
+    SOURCE_FILE = "file"
+    SOURCE_NOTE = "note"
+
+    SOURCE_CHOICES = [
+        (SOURCE_POLICY, "Shop policy"),
+        (SOURCE_FAQ, "FAQ"),
+        (SOURCE_FILE, "Assistant file"),
+        (SOURCE_NOTE, "Note"),
+    ]
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="knowledge_documents"
+    )
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default=SOURCE_NOTE)
+    title = models.CharField(max_length=255, blank=True)
+    content = models.TextField(blank=True)
+    assistant_file = models.OneToOneField(
+        "assistant.AssistantFile",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="knowledge_document"
+    )
+
+    # sha256 of the text that is currently indexed; unchanged text is not re-embedded
+    content_hash = models.CharField(max_length=64, blank=True)
+    indexed_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "source"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_source_display()}: {self.title or self.pk}"
+
+
+class KnowledgeChunk(models.Model):
+    """One embedded chunk; its primary key is the vector id in the owner's FAISS index."""
+    document = models.ForeignKey(
+        KnowledgeDocument,
+        on_delete=models.CASCADE,
+        related_name="chunks"
+    )
+    position = models.PositiveIntegerField(default=0)
+    text = models.TextField()
+
+    class Meta:
+        ordering = ["document_id", "position"]
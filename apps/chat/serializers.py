@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Conversation, Message
+from .models import Conversation, KnowledgeDocument, Message
 
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -37,3 +37,15 @@ class ConversationSerializer(serializers.ModelSerializer):
         else:
             path = f"/ws/chat/{obj.id}/"
         return f"{scheme}://{host}{path}"
+
+
+class KnowledgeDocumentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = KnowledgeDocument
+        fields = ["id", "source", "title", "content", "assistant_file", "indexed_at", "created_at", "updated_at"]
+        read_only_fields = ["assistant_file", "indexed_at", "created_at", "updated_at"]
+
+    def validate_source(self, value):
+        if value == KnowledgeDocument.SOURCE_FILE:
+            raise serializers.ValidationError("File documents are created from assistant uploads.")
+        return value
@@ -1,26 +1,91 @@
 # services/attachment_loader.py
-from typing import List, Dict, Any
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
+
 import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
 
-def download_images(attachments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_TIMEOUT = 15
+CHUNK_SIZE = 64 * 1024
+
+
+def _max_bytes() -> int:
+    return getattr(settings, "CHAT_ATTACHMENT_MAX_BYTES", 8 * 1024 * 1024)
+
+
+def _max_workers() -> int:
+    return max(1, getattr(settings, "CHAT_ATTACHMENT_WORKERS", 4))
+
+
+@lru_cache(maxsize=1)
+def get_http_session() -> requests.Session:
+    """One pooled session per process so attachment downloads reuse TCP/TLS connections."""
+    session = requests.Session()
+    workers = _max_workers()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers * 2)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-    images = []
+
+def _image_urls(attachments: List[Dict[str, Any]]) -> List[str]:
+    urls = []
     for att in attachments or []:
         if att.get("type") != "image":
             continue
-
         payload = att.get("payload") or {}
         url = payload.get("url")
-        if not url:
-            continue
+        if url:
+            urls.append(url)
+    return urls
+
 
-        r = requests.get(url, timeout=15)
-        r.raise_for_status()
+def download_image(url: str, max_bytes: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Stream one image, aborting once it exceeds max_bytes (CHAT_ATTACHMENT_MAX_BYTES
+    by default). Returns None for oversized or failed downloads.
+    """
+    if max_bytes is None:
+        max_bytes = _max_bytes()
+    try:
+        with get_http_session().get(url, timeout=DOWNLOAD_TIMEOUT, stream=True) as r:
+            r.raise_for_status()
 
-        content_type = r.headers.get("content-type", "image/jpeg")
-        # sometimes content-type includes charset etc
-        content_type = content_type.split(";")[0].strip().lower() or "image/jpeg"
+            declared = r.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                logger.warning("Attachment skipped, %s bytes exceeds cap: %s", declared, url)
+                return None
 
-        images.append({"bytes": r.content, "content_type": content_type, "url": url})
+            body = bytearray()
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                body.extend(chunk)
+                if len(body) > max_bytes:
+                    logger.warning("Attachment skipped, body exceeds %s bytes: %s", max_bytes, url)
+                    return None
 
-    return images
+            content_type = r.headers.get("content-type", "image/jpeg")
+    except requests.RequestException as e:
+        logger.warning("Attachment download failed for %s: %s", url, e)
+        return None
+
+    # sometimes content-type includes charset etc
+    content_type = content_type.split(";")[0].strip().lower() or "image/jpeg"
+    return {"bytes": bytes(body), "content_type": content_type, "url": url}
+
+
+def download_images(attachments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Download all image attachments concurrently, keeping attachment order."""
+    urls = _image_urls(attachments)
+    if not urls:
+        return []
+    if len(urls) == 1:
+        results = [download_image(urls[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(_max_workers(), len(urls))) as pool:
+            results = list(pool.map(download_image, urls))
+    return [img for img in results if img]
@@ -0,0 +1,111 @@
+# services/embedding_cache.py
+"""
+Content-addressed cache in front of OpenAIEmbeddings.
+
+Vectors are stored in the Django cache (Redis) under model + SHA-256 of the
+text, packed as float32 bytes. A batch is looked up with one get_many, the
+misses go to the API in a single embed_documents call and are written back
+with one set_many, so re-indexing only pays for chunks that actually changed.
+"""
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "emb"
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, underlying: Embeddings, namespace: str = None, timeout: int = None):
+        self.underlying = underlying
+        self.namespace = namespace or getattr(underlying, "model", None) or type(underlying).__name__
+        self.timeout = timeout
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # -------------------------
+    # keys / packing
+    # -------------------------
+    def key_for(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{self.namespace}:{digest}"
+
+    @staticmethod
+    def _pack(vector: List[float]) -> bytes:
+        return np.asarray(vector, dtype="float32").tobytes()
+
+    @staticmethod
+    def _unpack(raw: bytes) -> List[float]:
+        return np.frombuffer(raw, dtype="float32").tolist()
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    # -------------------------
+    # cache I/O (a cache outage degrades to plain API calls)
+    # -------------------------
+    def _get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        try:
+            return cache.get_many(keys)
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+            return {}
+
+    def _set_many(self, values: Dict[str, bytes]) -> None:
+        try:
+            cache.set_many(values, timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    # -------------------------
+    # Embeddings interface
+    # -------------------------
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        keys = [self.key_for(text) for text in texts]
+        found = self._get_many(list(dict.fromkeys(keys)))
+
+        vectors: Dict[str, List[float]] = {key: self._unpack(raw) for key, raw in found.items()}
+        # one API call for all distinct misses in the batch
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        if missing:
+            fresh = self.underlying.embed_documents(list(missing.values()))
+            vectors.update(zip(missing.keys(), fresh))
+            self._set_many({key: self._pack(vectors[key]) for key in missing})
+
+        self._count(hits=len(texts) - len(missing), misses=len(missing))
+        logger.debug(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+@lru_cache(maxsize=1)
+def get_cached_embeddings() -> CachedEmbeddings:
+    return CachedEmbeddings(
+        OpenAIEmbeddings(),
+        timeout=getattr(settings, "CHAT_EMBEDDING_CACHE_TIMEOUT", 60 * 60 * 24 * 30),
+    )
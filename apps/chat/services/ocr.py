@@ -1,10 +1,34 @@
-
 import os
 import base64
-from typing import Optional, Dict, Any
+import hashlib
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Dict, Any, List
+
+from django.conf import settings
+from django.core.cache import cache
 from openai import OpenAI
 
+logger = logging.getLogger(__name__)
+
+
+def _vision_model() -> str:
+    return getattr(settings, "OPENAI_VISION_MODEL", "gpt-4o-mini")
+
+def _max_image_side() -> int:
+    return getattr(settings, "CHAT_IMAGE_MAX_SIDE", 1024)
 
+def _analysis_cache_timeout() -> int:
+    return getattr(settings, "CHAT_IMAGE_ANALYSIS_CACHE_TIMEOUT", 60 * 60 * 24 * 7)
+
+def _analysis_workers() -> int:
+    return max(1, getattr(settings, "CHAT_IMAGE_ANALYSIS_WORKERS", 4))
+
+
+@lru_cache(maxsize=1)
 def _get_openai_client() -> OpenAI:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
@@ -15,40 +39,49 @@ def _to_data_url(image_bytes: bytes, content_type: str) -> str:
     b64 = base64.b64encode(image_bytes).decode("utf-8")
     return f"data:{content_type};base64,{b64}"
 
-def run_ocr(image_bytes: bytes, content_type: str = "image/jpeg") -> str:
+def downscale_image(image_bytes: bytes, content_type: str = "image/jpeg", max_side: Optional[int] = None):
     """
-    Extract all visible text (Bangla/English), including serial/model/barcode text if present.
+    Shrink the image so its longest side is at most max_side (CHAT_IMAGE_MAX_SIDE by
+    default) before base64 encoding.
+    Returns (bytes, content_type); the input is returned untouched if it is already
+    small enough or cannot be decoded.
     """
-    data_url = _to_data_url(image_bytes, content_type)
+    try:
+        from PIL import Image
+    except ImportError:
+        return image_bytes, content_type
 
-    client = _get_openai_client()
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": "Extract ALL visible text from this image. Include Bangla/English. If there are barcodes/serial/model numbers, include them exactly."},
-                    {"type": "image_url", "image_url": {"url": data_url}},
-                ],
-            }
-        ],
-    )
+    if max_side is None:
+        max_side = _max_image_side()
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            if max(img.size) <= max_side:
+                return image_bytes, content_type
+            img.thumbnail((max_side, max_side))
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=85, optimize=True)
+            return out.getvalue(), "image/jpeg"
+    except Exception as e:
+        logger.warning(f"Image downscale failed, sending original: {e}")
+        return image_bytes, content_type
 
-    return (resp.choices[0].message.content or "").strip()
+def _image_cache_key(image_bytes: bytes) -> str:
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    return f"chat_image_analysis:{_vision_model()}:{digest}"
 
-def run_vision_caption(image_bytes: bytes, content_type: str = "image/jpeg") -> str:
+def run_ocr_and_caption(image_bytes: bytes, content_type: str = "image/jpeg") -> Dict[str, str]:
     """
-    Understand the image even if there is no text: identify product/object, brand/model guesses,
-    key visible attributes, and anything helpful for 'is this available?' type queries.
+    OCR + vision caption in a single request (JSON mode).
     """
     data_url = _to_data_url(image_bytes, content_type)
 
     client = _get_openai_client()
     resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0.2,
+        model=_vision_model(),
+        temperature=0,
+        response_format={"type": "json_object"},
         messages=[
             {
                 "role": "user",
@@ -56,11 +89,13 @@ def run_vision_caption(image_bytes: bytes, content_type: str = "image/jpeg") ->
                     {
                         "type": "text",
                         "text": (
-                            "Describe what is in this image for product identification.\n"
-                            "- What product/object is it?\n"
-                            "- Brand/model if you can infer (say 'not sure' if uncertain)\n"
-                            "- Key visible features (color, size, packaging, label, type)\n"
-                            "- If multiple items, summarize them\n"
+                            "Analyze this image for a retail chat assistant and return JSON only: "
+                            "{\"ocr_text\": string, \"caption\": string}.\n"
+                            "ocr_text: ALL visible text from the image, Bangla/English. If there are "
+                            "barcodes/serial/model numbers, include them exactly. Empty string if none.\n"
+                            "caption: describe the image for product identification - what product/object it is, "
+                            "brand/model if you can infer (say 'not sure' if uncertain), key visible features "
+                            "(color, size, packaging, label, type), and a summary if there are multiple items. "
                             "Keep it concise but informative."
                         ),
                     },
@@ -70,22 +105,69 @@ def run_vision_caption(image_bytes: bytes, content_type: str = "image/jpeg") ->
         ],
     )
 
-    return (resp.choices[0].message.content or "").strip()
+    content = (resp.choices[0].message.content or "").strip()
+    try:
+        parsed = json.loads(content)
+    except ValueError:
+        parsed = {"ocr_text": "", "caption": content}
+    return {
+        "ocr_text": str(parsed.get("ocr_text") or "").strip(),
+        "caption": str(parsed.get("caption") or "").strip(),
+    }
 
 def analyze_image(image_bytes: bytes, content_type: str = "image/jpeg") -> Dict[str, Any]:
     """
-    Do both OCR + Vision caption. Returns dict.
+    OCR + Vision caption for one image. Results are cached by the SHA-256 of the
+    original bytes, so the same product photo is only analysed once.
     """
-    ocr_text = ""
-    caption = ""
+    cache_key = _image_cache_key(image_bytes)
+    try:
+        cached = cache.get(cache_key)
+    except Exception:
+        cached = None
+    if cached:
+        return {**cached, "content_type": content_type, "cached": True}
+
+    small_bytes, small_type = downscale_image(image_bytes, content_type)
     try:
-        ocr_text = run_ocr(image_bytes, content_type=content_type)
+        result = run_ocr_and_caption(small_bytes, content_type=small_type)
     except Exception as e:
-        ocr_text = f"[OCR_ERROR] {type(e).__name__}: {e}"
+        # not cached: a transient API error shouldn't stick to this image
+        return {
+            "ocr_text": f"[OCR_ERROR] {type(e).__name__}: {e}",
+            "caption": f"[VISION_ERROR] {type(e).__name__}: {e}",
+            "content_type": content_type,
+        }
 
     try:
-        caption = run_vision_caption(image_bytes, content_type=content_type)
+        cache.set(cache_key, result, timeout=_analysis_cache_timeout())
     except Exception as e:
-        caption = f"[VISION_ERROR] {type(e).__name__}: {e}"
+        logger.warning(f"Image analysis cache write failed: {e}")
+
+    return {**result, "content_type": content_type}
+
+def analyze_images(images: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Analyze downloaded images concurrently. Returns one result per input image
+    (None when the image had no bytes), in the same order.
+    """
+    def _analyze(img: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        img_bytes = img.get("bytes")
+        if not img_bytes:
+            return None
+        return analyze_image(image_bytes=img_bytes, content_type=img.get("content_type", "image/jpeg"))
+
+    # identical photos in one message are analysed once
+    unique: Dict[str, Dict[str, Any]] = {}
+    keys = []
+    for img in images:
+        key = hashlib.sha256(img.get("bytes") or b"").hexdigest()
+        unique.setdefault(key, img)
+        keys.append(key)
 
-    return {"ocr_text": ocr_text, "caption": caption, "content_type": content_type}
+    if len(unique) <= 1:
+        results = {key: _analyze(img) for key, img in unique.items()}
+    else:
+        with ThreadPoolExecutor(max_workers=min(_analysis_workers(), len(unique))) as pool:
+            results = dict(zip(unique.keys(), pool.map(_analyze, unique.values())))
+    return [results[key] for key in keys]
@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.assistant.models import AssistantFile
+
+from . import history_cache, knowledge_base
+from .models import KnowledgeDocument, Message
+
+
+@receiver(post_save, sender=Message)
+def sync_chat_history_cache(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: history_cache.append_message(instance))
+    else:
+        transaction.on_commit(lambda: history_cache.invalidate(instance.conversation_id))
+
+
+@receiver(post_delete, sender=Message)
+def drop_chat_history_cache(sender, instance, **kwargs):
+    transaction.on_commit(lambda: history_cache.invalidate(instance.conversation_id))
+
+
+# ----------------------------------
+# Knowledge base
+# ----------------------------------
+@receiver(post_save, sender=KnowledgeDocument)
+def index_knowledge_document(sender, instance, **kwargs):
+    transaction.on_commit(lambda: knowledge_base.schedule_index(instance))
+
+
+@receiver(pre_delete, sender=KnowledgeDocument)
+def unindex_knowledge_document(sender, instance, **kwargs):
+    # chunk rows are gone by post_delete, so collect their vector ids now
+    owner_id = instance.owner_id
+    chunk_ids = list(instance.chunks.values_list("id", flat=True))
+    transaction.on_commit(lambda: knowledge_base.remove_chunks(owner_id, chunk_ids))
+
+
+@receiver(pre_save, sender=AssistantFile)
+def remember_assistant_file_source(sender, instance, update_fields=None, **kwargs):
+    # only a new upload (or a move to another assistant) changes the knowledge document
+    if instance.pk is None:
+        instance._knowledge_changed = True
+    elif update_fields is not None and not {"file", "assistant"} & set(update_fields):
+        instance._knowledge_changed = False
+    else:
+        old = sender.objects.filter(pk=instance.pk).values_list("file", "assistant_id").first()
+        instance._knowledge_changed = old != (instance.file.name, instance.assistant_id)
+
+
+@receiver(post_save, sender=AssistantFile)
+def sync_assistant_file_knowledge(sender, instance, created, **kwargs):
+    if not created and not getattr(instance, "_knowledge_changed", True):
+        return
+    KnowledgeDocument.objects.update_or_create(
+        assistant_file=instance,
+        defaults={
+            "owner_id": instance.assistant.owner_id,
+            "source": KnowledgeDocument.SOURCE_FILE,
+            "title": (instance.file.name or "").rsplit("/", 1)[-1][:255],
+        },
+    )
@@ -0,0 +1,16 @@
+import logging
+
+from celery import shared_task
+
+from .knowledge_base import index_document_by_id
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def index_knowledge_document(document_id, force=False):
+    """Chunk, embed and index one KnowledgeDocument (CHAT_KB_INDEX_MODE=queue)."""
+    try:
+        index_document_by_id(document_id, force=force)
+    except Exception as exc:
+        logger.exception("[KB][WORKER] indexing failed for document=%s: %s", document_id, exc)
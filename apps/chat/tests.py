@@ -1,3 +1,345 @@
-from django.test import TestCase
+import fcntl
+import io
+import tempfile
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import faiss
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import NotFound
+
+from apps.assistant.models import Assistant, AssistantFile
+from apps.chat import chat_bot, history_cache, knowledge_base
+from apps.chat.models import KnowledgeChunk, KnowledgeDocument
+from apps.chat.services import attachment_loader, ocr
+from apps.chat.services.embedding_cache import CachedEmbeddings
+from utils.pagination import KeysetPaginator
+
+
+@override_settings(CHAT_HISTORY_WINDOW=3, CHAT_HISTORY_SUMMARY_CHARS=60)
+class HistoryCacheTests(SimpleTestCase):
+    def _turns(self, count):
+        return [{"role": "user", "content": f"message {i}", "time": ""} for i in range(count)]
+
+    def test_window_keeps_latest_turns_and_folds_the_rest(self):
+        state = history_cache._trim({"turns": self._turns(5), "summary": ""})
+        self.assertEqual([t["content"] for t in state["turns"]], ["message 2", "message 3", "message 4"])
+        self.assertIn("user: message 0", state["summary"])
+        self.assertIn("user: message 1", state["summary"])
+
+    def test_summary_is_bounded(self):
+        state = {"turns": [], "summary": ""}
+        for i in range(50):
+            state["turns"].append({"role": "user", "content": f"message {i}", "time": ""})
+            state = history_cache._trim(state)
+        self.assertLessEqual(len(state["summary"]), 60)
+        self.assertTrue(state["summary"].startswith("user: "))
+        self.assertIn("message 46", state["summary"])
+
+    def test_history_prepends_summary_as_system_turn(self):
+        history = history_cache._as_history({"turns": self._turns(1), "summary": "user: hi"})
+        self.assertEqual(history[0]["role"], "system")
+        self.assertEqual(history[1]["content"], "message 0")
+
+
+class PrefilterRouteTests(SimpleTestCase):
+    def test_greeting_and_language_choice_skip_the_llm(self):
+        self.assertEqual(chat_bot._prefilter_route("Hello!", [])["kind"], "greeting")
+        self.assertEqual(chat_bot._prefilter_route("হাই", [])["language"], "bn")
+        route = chat_bot._prefilter_route("Bangla", [])
+        self.assertEqual((route["kind"], route["language"]), ("language_choice", "bn"))
+
+    def test_sticker_only_message(self):
+        attachments = [{"type": "image", "payload": {"sticker_id": 369239263222822}}]
+        self.assertEqual(chat_bot._prefilter_route("", attachments)["kind"], "sticker")
+
+    def test_emoji_only_message_is_a_sticker(self):
+        self.assertEqual(chat_bot._prefilter_route("👍🏽", [])["kind"], "sticker")
+        self.assertEqual(chat_bot._prefilter_route("❤️ 😊", [])["kind"], "sticker")
+
+    def test_real_questions_go_to_the_router(self):
+        self.assertIsNone(chat_bot._prefilter_route("hi, do you have the red t-shirt in XL?", []))
+        self.assertIsNone(chat_bot._prefilter_route("hi", [{"type": "image", "payload": {"url": "x"}}]))
+
+    def test_acknowledgements_are_not_greetings(self):
+        for text in ("ok", "Okay", "k", "thanks", "thank you", "thx", "ঠিক আছে", "ধন্যবাদ"):
+            self.assertIsNone(chat_bot._prefilter_route(text, []), text)
+
+    def test_greeting_mid_conversation_goes_to_the_router(self):
+        history = [{"role": "assistant", "content": "Shall I confirm the order?"}, {"role": "user", "content": "hello"}]
+        self.assertIsNone(chat_bot._prefilter_route("hello", [], history))
+        # the incoming message itself is already stored when history is loaded
+        self.assertEqual(chat_bot._prefilter_route("hello", [], [{"role": "user", "content": "hello"}])["kind"], "greeting")
+
+    def test_punctuation_only_is_not_a_sticker(self):
+        for text in ("???", "...", "!?"):
+            self.assertIsNone(chat_bot._prefilter_route(text, []), text)
+
+
+class KnowledgeBaseIndexTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(CHAT_KB_ROOT=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_incremental_add_and_remove(self):
+        knowledge_base.apply_changes(7, add_ids=[1, 2], vectors=[[1.0, 0.0], [0.0, 1.0]])
+        reader = knowledge_base.get_reader(7)
+        self.assertEqual(reader.ntotal, 2)
+        _, ids = reader.search(knowledge_base._as_matrix([0.1, 0.9]), 1)
+        self.assertEqual(ids[0][0], 2)
+
+        knowledge_base.apply_changes(7, remove_ids=[2], add_ids=[3], vectors=[[0.6, 0.8]])
+        reader = knowledge_base.get_reader(7)
+        self.assertEqual(reader.ntotal, 2)
+        _, ids = reader.search(knowledge_base._as_matrix([0.1, 0.9]), 1)
+        self.assertEqual(ids[0][0], 3)
+
+    @override_settings(CHAT_KB_READER_CACHE_SIZE=2)
+    def test_reader_cache_evicts_the_least_recently_searched_owner(self):
+        for owner_id in (7, 8, 9):
+            knowledge_base.apply_changes(owner_id, add_ids=[1], vectors=[[1.0, 0.0]])
+        self.addCleanup(knowledge_base._readers.clear)
+        knowledge_base._readers.clear()
+
+        knowledge_base.get_reader(7)
+        knowledge_base.get_reader(8)
+        knowledge_base.get_reader(7)
+        knowledge_base.get_reader(9)
+        self.assertEqual(list(knowledge_base._readers), ["7", "9"])
+
+    def test_reader_maps_the_vectors_instead_of_copying_them(self):
+        knowledge_base.apply_changes(7, add_ids=[1, 2], vectors=[[1.0, 0.0], [0.0, 1.0]])
+        self.addCleanup(knowledge_base._readers.clear)
+        reader = knowledge_base.get_reader(7)
+        # owned codes would be a private heap copy in every worker
+        self.assertFalse(faiss.downcast_index(reader.index).codes.is_owned)
+
+    def test_owners_are_isolated(self):
+        knowledge_base.apply_changes(7, add_ids=[1], vectors=[[1.0, 0.0]])
+        self.assertIsNone(knowledge_base.get_reader(8))
+        self.assertEqual(knowledge_base.search(8, "anything"), [])
+
+
+class AssistantFileKnowledgeTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        owner = get_user_model().objects.create_user(email="kb@example.com", password="pw")
+        self.assistant = Assistant.objects.create(owner=owner, name="Helper")
+        self.file = AssistantFile.objects.create(
+            assistant=self.assistant, file=SimpleUploadedFile("faq.txt", b"Returns within 7 days.")
+        )
+
+    def test_upload_creates_the_knowledge_document(self):
+        document = KnowledgeDocument.objects.get(assistant_file=self.file)
+        self.assertEqual((document.owner_id, document.title), (self.assistant.owner_id, "faq.txt"))
+
+    def test_saves_that_keep_the_file_leave_the_document_alone(self):
+        with mock.patch.object(KnowledgeDocument.objects, "update_or_create") as update:
+            self.file.save()
+            self.file.save(update_fields=["updated_at"])
+        update.assert_not_called()
+
+    def test_replacing_the_file_retitles_the_document(self):
+        self.file.file = SimpleUploadedFile("shipping.txt", b"Ships in 2 days.")
+        self.file.save()
+        self.assertEqual(KnowledgeDocument.objects.get(assistant_file=self.file).title, "shipping.txt")
+
+
+class KnowledgeDocumentIndexTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(CHAT_KB_ROOT=tmp.name))
+        self.addCleanup(knowledge_base._readers.clear)
+        owner = get_user_model().objects.create_user(email="kb@example.com", password="pw")
+        self.document = KnowledgeDocument.objects.create(owner=owner, title="Returns", content="Returns within 7 days.")
+        self.embeddings = _CountingEmbeddings()
+        self.enterContext(mock.patch.object(knowledge_base, "get_embeddings", return_value=self.embeddings))
+
+    def _lock_is_free(self):
+        with open(f"{knowledge_base.index_path(self.document.owner_id)}.lock", "w") as fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            fcntl.flock(fh, fcntl.LOCK_UN)
+            return True
+
+    def test_chunks_are_swapped_under_the_owner_write_lock(self):
+        seen = []
+        bulk_create = KnowledgeChunk.objects.bulk_create
+
+        def spy(*args, **kwargs):
+            seen.append(self._lock_is_free())
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(KnowledgeChunk.objects, "bulk_create", side_effect=spy):
+            knowledge_base.index_document(self.document)
+        self.assertEqual(seen, [False])
+        self.assertTrue(self._lock_is_free())
+
+    def test_reindexing_replaces_chunks_and_vectors(self):
+        knowledge_base.index_document(self.document)
+        knowledge_base.index_document(self.document, force=True)
+
+        chunk_ids = list(self.document.chunks.values_list("id", flat=True))
+        self.assertEqual(len(chunk_ids), 1)
+        self.assertEqual(knowledge_base.get_reader(self.document.owner_id).ntotal, 1)
+
+
+class _FakeImageResponse:
+    def __init__(self, body, headers=None):
+        self.body = body
+        self.headers = headers or {"content-type": "image/png"}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ImageAttachmentSettingsTests(SimpleTestCase):
+    def _png(self, size):
+        out = io.BytesIO()
+        Image.new("RGB", size, "red").save(out, format="PNG")
+        return out.getvalue()
+
+    def _download(self, body):
+        session = mock.Mock(get=mock.Mock(return_value=_FakeImageResponse(body)))
+        with mock.patch.object(attachment_loader, "get_http_session", return_value=session):
+            return attachment_loader.download_image("https://cdn.example.com/a.png")
+
+    def test_download_cap_is_read_from_settings(self):
+        with override_settings(CHAT_ATTACHMENT_MAX_BYTES=64):
+            self.assertIsNone(self._download(b"x" * 65))
+            self.assertEqual(self._download(b"x" * 64)["bytes"], b"x" * 64)
+
+    @override_settings(CHAT_IMAGE_MAX_SIDE=16)
+    def test_downscale_uses_the_configured_side(self):
+        small, content_type = ocr.downscale_image(self._png((64, 32)), "image/png")
+        with Image.open(io.BytesIO(small)) as img:
+            self.assertEqual(img.size, (16, 8))
+        self.assertEqual(content_type, "image/jpeg")
+
+    @override_settings(OPENAI_VISION_MODEL="vision-test", CHAT_IMAGE_ANALYSIS_CACHE_TIMEOUT=60)
+    def test_analysis_is_cached_per_configured_model(self):
+        image = self._png((8, 8))
+        result = {"ocr_text": "SKU-1", "caption": "a red square"}
+        with mock.patch.object(ocr, "run_ocr_and_caption", return_value=result) as run, \
+                mock.patch.object(ocr.cache, "set", wraps=ocr.cache.set) as cache_set:
+            ocr.analyze_image(image, "image/png")
+            self.assertTrue(ocr.analyze_image(image, "image/png")["cached"])
+
+        self.assertEqual(run.call_count, 1)
+        key = cache_set.call_args.args[0]
+        self.assertTrue(key.startswith("chat_image_analysis:vision-test:"))
+        self.assertEqual(cache_set.call_args.kwargs["timeout"], 60)
+
+
+class _CountingEmbeddings:
+    model = "fake-embedding"
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class EmbeddingCacheTests(SimpleTestCase):
+    def test_only_misses_hit_the_api_in_one_batch(self):
+        underlying = _CountingEmbeddings()
+        embeddings = CachedEmbeddings(underlying, namespace="test-batch")
+
+        first = embeddings.embed_documents(["a", "bb", "a"])
+        self.assertEqual(underlying.calls, [["a", "bb"]])
+        self.assertEqual(first, [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]])
+
+        second = embeddings.embed_documents(["bb", "ccc"])
+        self.assertEqual(underlying.calls[-1], ["ccc"])
+        self.assertEqual(second, [[2.0, 1.0], [3.0, 1.0]])
+        self.assertEqual(embeddings.stats(), {"hits": 2, "misses": 3})
+
+    def test_keys_are_scoped_by_model(self):
+        a = CachedEmbeddings(_CountingEmbeddings(), namespace="model-a")
+        b = CachedEmbeddings(_CountingEmbeddings(), namespace="model-b")
+        self.assertNotEqual(a.key_for("same text"), b.key_for("same text"))
+
+
+class MessageCursorTests(SimpleTestCase):
+    def test_cursor_round_trips_position_and_direction(self):
+        paginator = KeysetPaginator(ordering="-created_at")
+        created = datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+        token = paginator.encode_cursor(SimpleNamespace(created_at=created, pk=42), reverse=True)
+        self.assertEqual(paginator.decode_cursor(token), (created, 42, True))
+
+    def test_invalid_cursor_is_rejected(self):
+        with self.assertRaises(NotFound):
+            KeysetPaginator().decode_cursor("not-a-cursor")
+
+
+class ContextFanOutTests(TestCase):
+    def test_branches_run_in_parallel_and_close_their_db_connections(self):
+        opened, closed = {}, set()
+        barrier = threading.Barrier(2, timeout=5)
+        connection_class = type(connections["default"])
+        close = connection_class.close
+
+        def record_close(connection):
+            closed.add(threading.get_ident())
+            close(connection)
+
+        def orm_branch(name):
+            def run(*args, **kwargs):
+                # both branches are in flight at once, each on its own thread
+                barrier.wait()
+                connections["default"].ensure_connection()
+                opened[name] = threading.get_ident()
+                return [] if name == "retrieve" else {"products": []}
+            return run
+
+        route = {"kind": "llm", "inventory_intent": "search", "order_intent": "none"}
+        patches = (
+            mock.patch.object(chat_bot, "language_gate_node", lambda state: state),
+            mock.patch.object(chat_bot, "moderation_node", lambda state: state),
+            mock.patch.object(chat_bot, "route_node", lambda state: {**state, "route": route}),
+            mock.patch.object(chat_bot, "generate_answer_node", lambda state: {**state, "response": "ok"}),
+            mock.patch.object(chat_bot.knowledge_base, "search", orm_branch("retrieve")),
+            mock.patch.object(chat_bot, "search_inventory_products", SimpleNamespace(invoke=orm_branch("inventory"))),
+            mock.patch.object(connection_class, "close", record_close),
+        )
+        for patch in patches:
+            self.enterContext(patch)
+
+        result = chat_bot.compile_rag_chatbot().invoke(
+            {"user_query": "red shoes", "chat_history": [], "owner_user_id": 1, "attachments": [], "timings": {}}
+        )
+
+        self.assertEqual(result["response"], "ok")
+        self.assertEqual(set(opened), {"retrieve", "inventory"})
+        self.assertNotEqual(opened["retrieve"], opened["inventory"])
+        # connections opened on executor threads are closed by the branch that opened them
+        caller = threading.get_ident()
+        self.assertEqual({thread for thread in opened.values() if thread != caller} - closed, set())
@@ -5,4 +5,6 @@ urlpatterns = [
     path("", views.ConversationListAPIView.as_view()),
     path("<int:conversation_id>/messages/", views.MessageAPIView.as_view()),
     path("<int:conversation_id>/mark-read/", views.MarkMessagesReadAPIView.as_view()),
+    path("knowledge/", views.KnowledgeDocumentListCreateAPIView.as_view()),
+    path("knowledge/<int:document_id>/", views.KnowledgeDocumentDetailAPIView.as_view()),
 ]
\ No newline at end of file
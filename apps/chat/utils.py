@@ -3,6 +3,7 @@ from django.utils import timezone
 from apps.social.models import FacebookPage
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from . import history_cache
 from .models import Conversation, Message
 from .chat_bot import chatbot_reply
 
@@ -116,27 +117,8 @@ def get_or_create_conversation(external_user_id: str, page: FacebookPage, user_d
 
 
 def get_chat_history(conversation: Conversation) -> list:
-    
-    ROLE_MAP = {
-        "customer": "user",
-        "bot": "assistant",
-        "seller": "user",
-    }
-    history = []
-
-    for msg in conversation.messages.all().order_by("created_at"):
-        role = ROLE_MAP.get(msg.sender_type, "user")
-        content = msg.text
-        if msg.sender_type == "seller":
-            content = f"Seller: {content}"
-
-        history.append({
-            "role": role,
-            "content": content,
-            "time": msg.created_at.isoformat(),
-        })
-
-    return history
+    """Last CHAT_HISTORY_WINDOW turns (plus a rolling summary), served from the history cache."""
+    return history_cache.get_history(conversation)
 
 
 def store_chat_message(
@@ -153,19 +135,18 @@ def store_chat_message(
 ) -> None:
     try:
         message = Message.objects.create(
-        conversation=conversation,
-        sender_type=sender_type,
-        platform=conversation.platform,
-        message_id=message_id,
-        is_sent=is_sent,
-        is_read=is_read,
+            conversation=conversation,
+            sender_type=sender_type,
+            platform=conversation.platform,
+            message_id=message_id,
+            is_sent=is_sent,
+            is_read=is_read,
+            text=text or "",
+            attachments=attachments or [],
+            sender_name=sender_name,
+            sender_profile_pic=sender_profile_pic,
+            sender_metadata=sender_metadata or {},
         )
-        message.text = text or ""
-        message.attachments = attachments or []
-        message.sender_name = sender_name
-        message.sender_profile_pic = sender_profile_pic
-        message.sender_metadata = sender_metadata or {}
-        message.save()
         conversation.last_message_at = timezone.now()
         conversation.save(update_fields=["last_message_at"])
         send_to_socket(conversation, message)
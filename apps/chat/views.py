@@ -4,8 +4,8 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 
-from .models import Conversation, Message
-from .serializers import ConversationSerializer, MessageSerializer
+from .models import Conversation, KnowledgeDocument, Message
+from .serializers import ConversationSerializer, KnowledgeDocumentSerializer, MessageSerializer
 
 
 
@@ -20,6 +20,7 @@ class ConversationListAPIView(APIView):
 
 
 class MessageAPIView(APIView):
+    cursor_ordering = "-created_at"
 
     def get(self, request, conversation_id):
         conversation = get_object_or_404(
@@ -28,9 +29,13 @@ class MessageAPIView(APIView):
             social_account__user=request.user
         )
 
-        messages = Message.objects.filter(conversation=conversation).order_by("-created_at")
-        serializer = MessageSerializer(messages, many=True, context={"request": request})
-        return self.success(data=serializer.data, message="Messages retrieved successfully")
+        messages = Message.objects.filter(conversation=conversation).order_by("-created_at", "-id")
+        return self.paginated(
+            messages,
+            MessageSerializer,
+            message="Messages retrieved successfully",
+            context={"request": request},
+        )
     
 class MarkMessagesReadAPIView(APIView):
     def post(self, request, conversation_id):
@@ -50,4 +55,30 @@ class MarkMessagesReadAPIView(APIView):
     
 
 
+class KnowledgeDocumentListCreateAPIView(APIView):
+    def get(self, request):
+        documents = KnowledgeDocument.objects.filter(owner=request.user).order_by("-updated_at")
+        serializer = KnowledgeDocumentSerializer(documents, many=True)
+        return self.success(data=serializer.data, message="Knowledge documents retrieved successfully")
+
+    def post(self, request):
+        serializer = KnowledgeDocumentSerializer(data=request.data)
+        if not serializer.is_valid():
+            return self.error(message="Invalid knowledge document", errors=serializer.errors)
+        serializer.save(owner=request.user)
+        return self.success(data=serializer.data, message="Knowledge document created", status_code=status.HTTP_201_CREATED)
+
+
+class KnowledgeDocumentDetailAPIView(APIView):
+    def patch(self, request, document_id):
+        document = get_object_or_404(KnowledgeDocument, id=document_id, owner=request.user)
+        serializer = KnowledgeDocumentSerializer(document, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return self.error(message="Invalid knowledge document", errors=serializer.errors)
+        serializer.save()
+        return self.success(data=serializer.data, message="Knowledge document updated")
 
+    def delete(self, request, document_id):
+        document = get_object_or_404(KnowledgeDocument, id=document_id, owner=request.user)
+        document.delete()
+        return self.success(message="Knowledge document deleted")
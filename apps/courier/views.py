@@ -85,11 +85,13 @@ class CourierOrderListCreateAPIView(APIView):
                 status="collected"
             )
         else:
-            orders = None
-        data = CourierOrderListSerializer(orders, many=True).data
-        return self.success(
-            data=data,
-            message="Courier order list fetched successfully" if data else "No couriers assigned to this user",
+            orders = CourierOrder.objects.none()
+        orders = orders.select_related("order", "courier").order_by("-created_at", "-id")
+        return self.paginated(
+            orders,
+            CourierOrderListSerializer,
+            message="Courier order list fetched successfully",
+            empty_message="No couriers assigned to this user",
             meta={"action": "user-courier-list"}
         )
         
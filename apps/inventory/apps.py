@@ -1,4 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _ensure_search_indexes(sender, using="default", **kwargs):
+    from .search import ensure_search_indexes
+
+    ensure_search_indexes(using=using)
 
 
 class InventoryConfig(AppConfig):
@@ -7,3 +14,4 @@ class InventoryConfig(AppConfig):
     
     def ready(self):
         import apps.inventory.signals
+        post_migrate.connect(_ensure_search_indexes, sender=self)
@@ -0,0 +1,118 @@
+"""
+Bulk product creation.
+
+Creating a product one row at a time costs a handful of queries per variant
+(insert, SKU update, stock row, stock item, plus the signal work). Here a whole
+import is validated up front by the caller and then written with one
+bulk_create per table and one batched SKU update per model, inside a single
+transaction.
+
+bulk_create sends no post_save signals, so the work signals.py would have done
+is scheduled explicitly, once per call: barcode/QR rendering (codes.py), the
+search index refresh (search.py) and the owner's chatbot inventory cache.
+"""
+import csv
+import io
+import logging
+from typing import Dict, List
+
+from django.db import transaction
+
+from . import codes, search
+from .inventory_cache import invalidate_owner
+from .models import Product, ProductItem, Stock, StockItem, item_sku, product_sku
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+PRODUCT_FIELDS = ("product", "brand", "short_description", "status", "image")
+ITEM_FIELDS = ("size", "color", "quantity", "unit_cost", "sell_price")
+
+
+# ----------------------------------
+# Writing
+# ----------------------------------
+def bulk_create_products(vendor, products: List[Dict]) -> List[Product]:
+    """
+    Create products with their variants and opening stock. `products` are
+    validated dicts of Product fields plus "items", a list of dicts of
+    ProductItem fields; every item's quantity is its opening stock.
+    """
+    if not products:
+        return []
+
+    with transaction.atomic():
+        created = [
+            Product(vendor=vendor, **{f: data[f] for f in PRODUCT_FIELDS if data.get(f) is not None})
+            for data in products
+        ]
+        Product.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        for product in created:
+            product.sku = product_sku(vendor.shop_name, product.product, product.pk)
+        Product.objects.bulk_update(created, ["sku"], batch_size=BATCH_SIZE)
+
+        variants = [
+            [ProductItem(product=product, **{f: item.get(f) for f in ITEM_FIELDS}) for item in data["items"]]
+            for product, data in zip(created, products)
+        ]
+        items = [item for group in variants for item in group]
+        ProductItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+        for item in items:
+            item.sku = item_sku(vendor.shop_name, item.product.product, item.color, item.size, item.pk)
+        ProductItem.objects.bulk_update(items, ["sku"], batch_size=BATCH_SIZE)
+
+        stocks = []
+        for product, group in zip(created, variants):
+            total = sum(item.quantity or 0 for item in group)
+            # Stock.save() computes balance; bulk_create does not call it
+            stocks.append(Stock(product=product, opening=total, balance=total))
+        Stock.objects.bulk_create(stocks, batch_size=BATCH_SIZE)
+
+        StockItem.objects.bulk_create(
+            [
+                StockItem(stock=stock, product_item=item, opening=item.quantity or 0)
+                for stock, group in zip(stocks, variants)
+                for item in group
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        product_ids = [product.pk for product in created]
+        codes.schedule_render_many(product_ids=product_ids, item_ids=[item.pk for item in items])
+        search.schedule_refresh_many(product_ids)
+        invalidate_owner(vendor.owner_id)
+
+    logger.info(f"Created {len(created)} products with {len(items)} items for vendor={vendor.pk}")
+    return created
+
+
+# ----------------------------------
+# CSV import
+# ----------------------------------
+def products_from_csv(file) -> List[Dict]:
+    """
+    Group the rows of a product CSV (one row per variant) into product dicts in
+    the shape ProductImportSerializer validates. Rows with the same product name
+    belong to one product; its first row supplies brand, description and status.
+    """
+    content = file.read()
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+
+    products: Dict[str, Dict] = {}
+    for row in csv.DictReader(io.StringIO(content)):
+        # cells past the header end up under the None key; they are ignored
+        row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k is not None}
+        if not any(row.values()):
+            continue
+        name = row.get("product", "")
+        product = products.get(name)
+        if product is None:
+            product = products[name] = {
+                f: row[f] for f in PRODUCT_FIELDS if f != "image" and row.get(f)
+            }
+            product["product"] = name
+            product["items"] = []
+        product["items"].append({f: row[f] for f in ITEM_FIELDS if f in row})
+    return list(products.values())
@@ -0,0 +1,168 @@
+"""
+Barcode / QR images for products and variants.
+
+SKUs are assigned synchronously (signals.py); the PNGs are not. Saves only
+record the row in a per-thread batch, and after commit the whole batch is
+rendered off the request path: on a Celery worker when
+INVENTORY_CODES_MODE="queue", otherwise on a small in-process thread pool.
+
+Images are content addressed: the file name is a digest of the SKU (and the
+renderer version), so a render that already happened (retry, backfill, another
+worker) is found in storage and only linked. Anything read before its job ran
+is rendered on first access (`code_url`).
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Set
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from .models import Product, ProductItem
+from .utils import generate_barcode, generate_qr
+
+logger = logging.getLogger(__name__)
+
+# bump when the rendering changes, so cached files are not reused
+RENDER_VERSION = "v1"
+
+KINDS = {
+    "barcode": ("barcodes", generate_barcode),
+    "qr_code": ("qrcodes", generate_qr),
+}
+MODELS = {"product": Product, "item": ProductItem}
+
+_local = threading.local()
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _mode() -> str:
+    return (getattr(settings, "INVENTORY_CODES_MODE", "thread") or "").lower()
+
+
+# ----------------------------------
+# Rendering
+# ----------------------------------
+def code_path(kind: str, sku: str) -> str:
+    folder, _ = KINDS[kind]
+    digest = hashlib.sha256(f"{RENDER_VERSION}:{kind}:{sku}".encode("utf-8")).hexdigest()
+    return f"{folder}/{digest[:2]}/{digest}.png"
+
+
+def render_code(kind: str, sku: str) -> str:
+    """Storage name of the image for sku, rendering and storing it only if missing."""
+    path = code_path(kind, sku)
+    if not default_storage.exists(path):
+        _, render = KINDS[kind]
+        saved = default_storage.save(path, render(sku))
+        if saved != path:
+            # lost a race with another renderer, keep the canonical file
+            default_storage.delete(saved)
+    return path
+
+
+def render_instances(instances: Iterable) -> int:
+    """Fill barcode/qr_code on the given rows that have a SKU but no image yet (one write per model)."""
+    changed = {}
+    for instance in instances:
+        if not instance.sku:
+            continue
+        missing = [kind for kind in KINDS if not getattr(instance, kind)]
+        for kind in missing:
+            setattr(instance, kind, render_code(kind, instance.sku))
+        if missing:
+            changed.setdefault(type(instance), []).append(instance)
+
+    # only the image columns are written: no signals, no overwriting of fields saved meanwhile
+    for model, rows in changed.items():
+        model.objects.bulk_update(rows, list(KINDS), batch_size=500)
+    return sum(len(rows) for rows in changed.values())
+
+
+def render_batch(product_ids: Iterable[int] = (), item_ids: Iterable[int] = ()) -> int:
+    done = 0
+    for key, ids in (("product", product_ids), ("item", item_ids)):
+        ids = list(ids)
+        if ids:
+            rows = MODELS[key].objects.filter(pk__in=ids).only("id", "sku", "barcode", "qr_code")
+            done += render_instances(rows)
+    return done
+
+
+def code_url(instance, kind: str):
+    """URL of the image, rendered now if the background job has not got to it yet."""
+    field = getattr(instance, kind)
+    if not field and instance.sku:
+        render_instances([instance])
+        field = getattr(instance, kind)
+    return field.url if field else None
+
+
+# ----------------------------------
+# Scheduling
+# ----------------------------------
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "INVENTORY_CODES_WORKERS", 2),
+                    thread_name_prefix="inventory-codes",
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _run_in_thread(product_ids, item_ids):
+    try:
+        render_batch(product_ids, item_ids)
+    except Exception as e:
+        logger.exception(f"Code rendering failed for products={product_ids} items={item_ids}: {e}")
+    finally:
+        # pool threads are long lived; do not keep their DB connections open
+        connections.close_all()
+
+
+def _dispatch(product_ids, item_ids):
+    if _mode() == "queue":
+        try:
+            from .tasks import render_product_codes
+
+            render_product_codes.delay(product_ids, item_ids)
+            return
+        except Exception as e:
+            logger.exception(f"Code rendering enqueue failed, using a thread: {e}")
+    _get_executor().submit(_run_in_thread, product_ids, item_ids)
+
+
+def _flush():
+    batch: Dict[str, Set[int]] = getattr(_local, "batch", None)
+    _local.batch = None
+    if batch and (batch["product"] or batch["item"]):
+        _dispatch(sorted(batch["product"]), sorted(batch["item"]))
+
+
+def schedule_render(instance) -> None:
+    """Queue images for a Product or ProductItem; everything saved in one transaction goes as one batch."""
+    if isinstance(instance, Product):
+        schedule_render_many(product_ids=[instance.pk])
+    else:
+        schedule_render_many(item_ids=[instance.pk])
+
+
+def schedule_render_many(product_ids: Iterable[int] = (), item_ids: Iterable[int] = ()) -> None:
+    """Same as schedule_render for rows written with bulk_create (which sends no signals)."""
+    batch = getattr(_local, "batch", None)
+    if batch is None:
+        batch = _local.batch = {"product": set(), "item": set()}
+    batch["product"].update(product_ids)
+    batch["item"].update(item_ids)
+    # the first callback to run takes the whole batch, the rest find it empty
+    transaction.on_commit(_flush)
@@ -0,0 +1,130 @@
+"""
+Versioned per-owner cache for chatbot inventory lookups.
+
+Every owner has a version counter in Redis. Lookup results (the serialized
+product summaries) are stored under owner + version + arguments, both in a
+small in-process LRU and in Redis. Inventory/order signals bump the version,
+which orphans every older entry at once, so a repeat lookup costs one Redis
+GET for the version and no database queries.
+
+The in-process LRU stores and hands out deep copies, so a caller that edits
+its result cannot change what the next lookup in the worker returns.
+"""
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "inventory_version:{owner_id}"
+RESULT_KEY = "inventory_lookup:{owner_id}:{version}:{digest}"
+
+_local: "OrderedDict[str, tuple]" = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _timeout() -> int:
+    return getattr(settings, "INVENTORY_CACHE_TIMEOUT", 60 * 60)
+
+
+def _local_size() -> int:
+    return getattr(settings, "INVENTORY_CACHE_LOCAL_SIZE", 256)
+
+
+# -------------------------
+# Versions
+# -------------------------
+def get_version(owner_id) -> int:
+    key = VERSION_KEY.format(owner_id=owner_id)
+    version = cache.get(key)
+    if version is None:
+        # never restart at a small number: entries from a lost counter must stay unreachable
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(owner_id) -> None:
+    if not owner_id:
+        return
+    key = VERSION_KEY.format(owner_id=owner_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+    except Exception as exc:
+        logger.warning("Inventory cache invalidation failed for owner=%s: %s", owner_id, exc)
+
+
+def invalidate_owner(owner_id) -> None:
+    """Bump the owner's version once the current transaction commits."""
+    if owner_id:
+        transaction.on_commit(lambda: bump_version(owner_id))
+
+
+# -------------------------
+# Local LRU
+# -------------------------
+def _local_get(key: str):
+    with _local_lock:
+        entry = _local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del _local[key]
+            return None
+        _local.move_to_end(key)
+    return copy.deepcopy(value)
+
+
+def _local_set(key: str, value) -> None:
+    value = copy.deepcopy(value)
+    with _local_lock:
+        _local[key] = (time.monotonic() + _timeout(), value)
+        _local.move_to_end(key)
+        while len(_local) > _local_size():
+            _local.popitem(last=False)
+
+
+# -------------------------
+# Lookup
+# -------------------------
+def cached_lookup(owner_id, params: Dict[str, Any], loader: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    try:
+        version = get_version(owner_id)
+    except Exception as exc:
+        logger.warning("Inventory cache unavailable, querying DB: %s", exc)
+        return loader()
+
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+    key = RESULT_KEY.format(owner_id=owner_id, version=version, digest=digest)
+
+    result = _local_get(key)
+    if result is not None:
+        return result
+
+    try:
+        result = cache.get(key)
+    except Exception as exc:
+        logger.warning("Inventory cache read failed for owner=%s: %s", owner_id, exc)
+        result = None
+
+    if result is None:
+        result = loader()
+        try:
+            cache.set(key, result, timeout=_timeout())
+        except Exception as exc:
+            logger.warning("Inventory cache write failed for owner=%s: %s", owner_id, exc)
+
+    _local_set(key, result)
+    return result
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventory.search import ensure_search_indexes, index_available, rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search rows (and database search indexes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--product", type=int, action="append", help="Product id (repeatable). Default: all products")
+
+    def handle(self, *args, **options):
+        if not index_available():
+            raise CommandError("The product search table does not exist; run `migrate --run-syncdb` first")
+        ensure_search_indexes()
+        count = rebuild(options.get("product"))
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products"))
@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from apps.vendor.models import Vendor
 from django.contrib.auth import get_user_model
@@ -10,10 +11,21 @@ User=get_user_model()
 
 
 def clean_text(text, length):
-    text = re.sub(r"[^A-Za-z0-9]", "", text)
+    text = re.sub(r"[^A-Za-z0-9]", "", text or "")
     return text.upper()[:length]
 
 
+def product_sku(shop_name, product_name, pk):
+    return f"FL-{clean_text(shop_name, 2)}-{clean_text(product_name, 3)}-{pk:06d}"
+
+
+def item_sku(shop_name, product_name, color, size, pk):
+    return (
+        f"FL-{clean_text(shop_name, 2)}-{clean_text(product_name, 3)}"
+        f"-{clean_text(color, 3)}-{clean_text(size, 3)}-{pk:04d}"
+    )
+
+
 class Product(models.Model):
     STATUS_CHOICES = (
         ('published', 'Published'),
@@ -44,10 +56,7 @@ class Product(models.Model):
         super().save(*args, **kwargs)
 
         if is_new and not self.sku:
-            vendor_code = clean_text(self.vendor.shop_name, 2)
-            product_code = clean_text(self.product, 3)
-
-            self.sku = f"FL-{vendor_code}-{product_code}-{self.id:06d}"
+            self.sku = product_sku(self.vendor.shop_name, self.product, self.id)
 
             super().save(update_fields=["sku"])
             
@@ -67,6 +76,33 @@ class ProductItem(models.Model):
     
     def __str__(self):
         return f"{self.product.sku} - {self.size} - {self.color}"
+
+    @property
+    def barcode_url(self):
+        from .codes import code_url
+        return code_url(self, "barcode")
+
+    @property
+    def qr_code_url(self):
+        from .codes import code_url
+        return code_url(self, "qr_code")
+
+
+class ProductSearch(models.Model):
+    """
+    Denormalized search row per product (name, brand, SKUs, variant sizes/colors).
+    Maintained by apps.inventory.search; the full-text/trigram indexes on it are
+    database specific and created after migrate (search.ensure_search_indexes).
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name="search")
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name="+")
+    status = models.CharField(max_length=20, db_index=True)
+    document = models.TextField(default="", blank=True)
+    # PostgreSQL only; stays NULL elsewhere
+    search_vector = SearchVectorField(null=True, blank=True)
+
+    def __str__(self):
+        return f"search:{self.product_id}"
     
 
 
@@ -0,0 +1,240 @@
+"""
+Product full-text search.
+
+Each Product has one ProductSearch row whose `document` holds the product name,
+brand, SKU and every variant's SKU/size/color. Signals keep it current.
+
+- PostgreSQL: `search_vector` (tsvector, 'simple' config) with a GIN index for
+  ranked prefix matching, plus a pg_trgm GIN index on `document` for substring
+  (partial SKU) matches.
+- SQLite (tests and local runs): an external-content FTS5 table kept in sync by
+  triggers, ranked by bm25.
+- Anything else: icontains on the single `document` column.
+
+The inventory app has no migration package, so `migrate` only creates the
+ProductSearch table with --run-syncdb. Until it exists, searches fall back to
+icontains over Product and its variants, and refreshes are skipped.
+"""
+import logging
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connection, connections, transaction
+from django.db.models import F, Q
+
+from .models import Product, ProductSearch
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = "simple"
+
+_local = threading.local()
+_available: Dict[str, bool] = {}
+
+
+def tokenize(query: str) -> List[str]:
+    # Indic vowel signs are not \w, so the Bengali/Devanagari blocks are added explicitly
+    tokens = re.findall(r"[\w\u0900-\u09FF]+", (query or "").lower())
+    return list(dict.fromkeys(t for t in tokens if len(t) > 1))
+
+
+def index_available(using: str = "default") -> bool:
+    """Whether the ProductSearch table exists (checked once per process and database)."""
+    if using not in _available:
+        _available[using] = ProductSearch._meta.db_table in connections[using].introspection.table_names()
+    return _available[using]
+
+
+# ----------------------------------
+# Maintenance
+# ----------------------------------
+def build_document(product: Product) -> str:
+    parts = [product.product, product.brand, product.sku]
+    for item in product.items.all():
+        parts.extend([item.sku, item.size, item.color])
+    return " ".join(p.strip() for p in parts if p and p.strip())
+
+
+def refresh_product(product_id: int) -> None:
+    product = Product.objects.filter(pk=product_id).prefetch_related("items").first()
+    if product is None:
+        ProductSearch.objects.filter(pk=product_id).delete()
+        return
+
+    ProductSearch.objects.update_or_create(
+        product_id=product.pk,
+        defaults={
+            "vendor_id": product.vendor_id,
+            "status": product.status,
+            "document": build_document(product),
+        },
+    )
+    if connection.vendor == "postgresql":
+        ProductSearch.objects.filter(pk=product.pk).update(
+            search_vector=SearchVector("document", config=SEARCH_CONFIG)
+        )
+
+
+def _flush():
+    product_ids: Set[int] = getattr(_local, "product_ids", None)
+    _local.product_ids = None
+    if not product_ids or not index_available():
+        return
+    try:
+        rebuild(sorted(product_ids))
+    except Exception as e:
+        logger.exception(f"Product search refresh failed for {len(product_ids)} products: {e}")
+
+
+def schedule_refresh(product_id: int) -> None:
+    schedule_refresh_many([product_id])
+
+
+def schedule_refresh_many(product_ids: Iterable[int]) -> None:
+    """Refresh after commit; every product touched in one transaction is refreshed once."""
+    pending = getattr(_local, "product_ids", None)
+    if pending is None:
+        pending = _local.product_ids = set()
+    pending.update(pid for pid in product_ids if pid is not None)
+    # the first callback to run takes the whole batch, the rest find it empty; ids of a
+    # rolled back transaction ride along with the thread's next commit (a refresh is idempotent)
+    transaction.on_commit(_flush)
+
+
+def rebuild(product_ids: Optional[Iterable[int]] = None) -> int:
+    qs = Product.objects.all()
+    if product_ids is not None:
+        qs = qs.filter(pk__in=list(product_ids))
+    count = 0
+    for product_id in qs.values_list("pk", flat=True).iterator():
+        refresh_product(product_id)
+        count += 1
+    return count
+
+
+def _fts_table() -> str:
+    return f"{ProductSearch._meta.db_table}_fts"
+
+
+def ensure_search_indexes(using: str = "default") -> None:
+    """Create the database specific search indexes (idempotent, run after migrate)."""
+    from django.db import connections
+
+    conn = connections[using]
+    table = ProductSearch._meta.db_table
+    if table not in conn.introspection.table_names():
+        return
+
+    with conn.cursor() as cursor:
+        if conn.vendor == "postgresql":
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_vector_gin ON {table} USING GIN (search_vector)")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_document_trgm ON {table} USING GIN (document gin_trgm_ops)"
+            )
+        elif conn.vendor == "sqlite":
+            fts = _fts_table()
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"document, content='{table}', content_rowid='product_id')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, document) VALUES (new.product_id, new.document); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, document) VALUES ('delete', old.product_id, old.document); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, document) VALUES ('delete', old.product_id, old.document); "
+                f"INSERT INTO {fts}(rowid, document) VALUES (new.product_id, new.document); END"
+            )
+
+
+# ----------------------------------
+# Query
+# ----------------------------------
+def _base_queryset(vendor_ids, status: Optional[str]):
+    qs = ProductSearch.objects.filter(vendor_id__in=vendor_ids)
+    if status:
+        qs = qs.filter(status=status)
+    return qs
+
+
+def _search_postgres(qs, query: str, tokens: List[str], limit: int) -> Tuple[List[int], int]:
+    # tokens are word characters only, so they are safe inside a raw tsquery
+    tsquery = SearchQuery(" | ".join(f"{t}:*" for t in tokens), search_type="raw", config=SEARCH_CONFIG)
+    qs = qs.filter(Q(search_vector=tsquery) | Q(document__icontains=query.strip()))
+    total = qs.count()
+    ids = list(
+        qs.annotate(rank=SearchRank(F("search_vector"), tsquery) + TrigramWordSimilarity(query, "document"))
+        .order_by("-rank", "-product_id")
+        .values_list("product_id", flat=True)[:limit]
+    )
+    return ids, total
+
+
+def _search_sqlite(qs, tokens: List[str], limit: int) -> Tuple[List[int], int]:
+    # for tests and local runs; production search runs on PostgreSQL
+    fts = _fts_table()
+    match = " OR ".join(f'"{t}"*' for t in tokens)
+    # the vendor/status filter and the limit stay in SQL: nothing is loaded per catalog row
+    candidates, params = qs.values("product_id").query.sql_with_params()
+    where = f"{fts} MATCH %s AND rowid IN ({candidates})"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {fts} WHERE {where} ORDER BY bm25({fts}), rowid DESC LIMIT %s",
+            [match, *params, limit],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"SELECT COUNT(*) FROM {fts} WHERE {where}", [match, *params])
+        total = cursor.fetchone()[0]
+    return ids, total
+
+
+def _search_products(vendor_ids, query: str, tokens: List[str], status: Optional[str], limit: int) -> Tuple[List[int], int]:
+    # no search table yet: the original icontains lookups over products and their variants
+    match = Q()
+    for term in [query.strip(), *tokens]:
+        match |= (
+            Q(product__icontains=term)
+            | Q(brand__icontains=term)
+            | Q(sku__icontains=term)
+            | Q(items__sku__icontains=term)
+            | Q(items__size__icontains=term)
+            | Q(items__color__icontains=term)
+        )
+    qs = Product.objects.filter(vendor__in=vendor_ids).filter(match)
+    if status:
+        qs = qs.filter(status=status)
+    qs = qs.distinct()
+    return list(qs.order_by("-created").values_list("pk", flat=True)[:limit]), qs.count()
+
+
+def _search_fallback(qs, tokens: List[str], limit: int) -> Tuple[List[int], int]:
+    match = Q()
+    for tok in tokens:
+        match |= Q(document__icontains=tok)
+    qs = qs.filter(match)
+    return list(qs.order_by("-product_id").values_list("product_id", flat=True)[:limit]), qs.count()
+
+
+def search_product_ids(vendor_ids, query: str, status: Optional[str] = None, limit: int = 8) -> Tuple[List[int], int]:
+    """Best-first product ids matching query within the given vendors, plus the total match count."""
+    tokens = tokenize(query)
+    if not tokens:
+        return [], 0
+
+    if not index_available():
+        return _search_products(vendor_ids, query, tokens, status, limit)
+
+    qs = _base_queryset(vendor_ids, status)
+    if connection.vendor == "postgresql":
+        return _search_postgres(qs, query, tokens, limit)
+    if connection.vendor == "sqlite":
+        return _search_sqlite(qs, tokens, limit)
+    return _search_fallback(qs, tokens, limit)
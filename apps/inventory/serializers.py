@@ -247,8 +247,9 @@ class StockItemSerializer(serializers.ModelSerializer):
     available = serializers.ReadOnlyField()
     value = serializers.ReadOnlyField()
     attributes = serializers.SerializerMethodField()
-    barcode = serializers.URLField(source="product_item.barcode.url")
-    qr_code = serializers.URLField(source="product_item.qr_code.url")
+    # rendered on first access if the background job has not run yet
+    barcode = serializers.URLField(source="product_item.barcode_url")
+    qr_code = serializers.URLField(source="product_item.qr_code_url")
     price = serializers.DecimalField(max_digits=10, decimal_places=2, source="product_item.sell_price")
     cost_price = serializers.DecimalField(max_digits=10, decimal_places=2, source="product_item.unit_cost")
     sku = serializers.CharField(source="product_item.sku", read_only=True)
@@ -464,3 +465,26 @@ class ProductPurchaseItemMiniSerializer(serializers.ModelSerializer):
         model = ProductPurchaseItem
         fields = ["id", "quantity", "product"]
         
+
+
+class ProductImportItemSerializer(serializers.ModelSerializer):
+    """One variant of a bulk-created product; its quantity is the opening stock."""
+
+    class Meta:
+        model = ProductItem
+        fields = ("size", "color", "quantity", "unit_cost", "sell_price")
+        extra_kwargs = {
+            "quantity": {"required": True, "allow_null": False, "min_value": 0},
+            "unit_cost": {"required": True, "allow_null": False},
+            "sell_price": {"required": True, "allow_null": False},
+            "size": {"required": True},
+            "color": {"required": True},
+        }
+
+
+class ProductImportSerializer(serializers.ModelSerializer):
+    items = ProductImportItemSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        model = Product
+        fields = ("product", "brand", "short_description", "status", "image", "items")
@@ -1,52 +1,99 @@
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Product, ProductItem, Stock, StockItem, PurchaseReturnItem
+from .models import Product, ProductItem, Stock, StockItem, PurchaseReturnItem, item_sku, product_sku
 from django.db import transaction
+from apps.vendor.models import Vendor
+from . import search
+from .inventory_cache import invalidate_owner
 
 
-from .utils import generate_barcode, generate_qr
+from .codes import schedule_render
 import re
 def clean_text(text, length):
-    text = re.sub(r"[^A-Za-z0-9]", "", text)
+    text = re.sub(r"[^A-Za-z0-9]", "", text or "")
     return text.upper()[:length]
 
 
+# SKUs are assigned here, synchronously; barcode/QR images are rendered after
+# commit in one batch per transaction (codes.py)
 @receiver(post_save, sender=Product)
 def generate_sku_and_codes(sender, instance, created, **kwargs):
     if created and not instance.sku:
-        vendor_code = clean_text(instance.vendor.shop_name, 2)
-        product_code = clean_text(instance.product, 3)
-
-        sku = f"FL-{vendor_code}-{product_code}-{instance.id:06d}"
+        sku = product_sku(instance.vendor.shop_name, instance.product, instance.id)
 
         instance.sku = sku
-        instance.barcode = generate_barcode(sku)
-        instance.qr_code = generate_qr(sku)
+        Product.objects.filter(pk=instance.pk).update(sku=sku)
 
-        instance.save(update_fields=["sku", "barcode", "qr_code"])
+    if created:
+        schedule_render(instance)
         
         
         
 @receiver(post_save, sender=ProductItem)
 def generate_sku_and_codes_item(sender, instance, created, **kwargs):
     if created and not instance.sku:
-        vendor_code = clean_text(instance.product.vendor.shop_name, 2)
-        product_code = clean_text(instance.product.product, 3)
-        size_code = clean_text(instance.size, 3)
-        color_code = clean_text(instance.color, 3)
-
-        sku = f"FL-{vendor_code}-{product_code}-{color_code}-{size_code}-{instance.id:04d}"
+        product = instance.product
+        sku = item_sku(product.vendor.shop_name, product.product, instance.color, instance.size, instance.id)
 
         instance.sku = sku
-        instance.barcode = generate_barcode(sku)
-        instance.qr_code = generate_qr(sku)
+        ProductItem.objects.filter(pk=instance.pk).update(sku=sku)
 
-        instance.save(update_fields=["sku", "barcode", "qr_code"])
+    if created:
+        schedule_render(instance)
         
 
 
 
+# keep the product search index in sync (runs after commit)
+@receiver(post_save, sender=Product)
+def refresh_product_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {"barcode", "qr_code"}:
+        return
+    search.schedule_refresh(instance.pk)
+
+
+@receiver(post_save, sender=ProductItem)
+@receiver(post_delete, sender=ProductItem)
+def refresh_product_search_for_item(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {"barcode", "qr_code"}:
+        return
+    search.schedule_refresh(instance.product_id)
+
+
+# chatbot inventory snapshot: any stock-visible change bumps the owner's version
+def _owner_for_product(product_id):
+    return Product.objects.filter(pk=product_id).values_list("vendor__owner_id", flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_inventory_cache_for_product(sender, instance, **kwargs):
+    invalidate_owner(Vendor.objects.filter(pk=instance.vendor_id).values_list("owner_id", flat=True).first())
+
+
+@receiver(post_save, sender=ProductItem)
+@receiver(post_delete, sender=ProductItem)
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def invalidate_inventory_cache_for_stock(sender, instance, **kwargs):
+    invalidate_owner(_owner_for_product(instance.product_id))
+
+
+@receiver(post_save, sender=StockItem)
+@receiver(post_delete, sender=StockItem)
+def invalidate_inventory_cache_for_stock_item(sender, instance, **kwargs):
+    invalidate_owner(
+        Stock.objects.filter(pk=instance.stock_id).values_list("product__vendor__owner_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def invalidate_inventory_cache_for_vendor(sender, instance, **kwargs):
+    invalidate_owner(instance.owner_id)
+
+
 @receiver(post_save, sender=PurchaseReturnItem)
 def update_stock_on_purchase_return(sender, instance, created, **kwargs):
     if not created:
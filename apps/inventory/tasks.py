@@ -0,0 +1,16 @@
+import logging
+
+from celery import shared_task
+
+from .codes import render_batch
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def render_product_codes(product_ids, item_ids):
+    """Render missing barcode/QR images for a batch of products and variants (INVENTORY_CODES_MODE=queue)."""
+    try:
+        render_batch(product_ids, item_ids)
+    except Exception as exc:
+        logger.exception("[CODES][WORKER] rendering failed for products=%s items=%s: %s", product_ids, item_ids, exc)
@@ -1,3 +1,391 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.inventory import catalog, codes, inventory_cache, search
+from apps.inventory.models import Product, ProductItem, Stock, StockItem, item_sku, product_sku
+from apps.inventory.serializers import ProductSerializer
+from apps.inventory.views import ProductImportAPIView, ProductListAPIView
+from utils.pagination import AutoPagination
+from utils.response import ApiResponse
+from apps.vendor.models import Vendor
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def make_vendor(email="owner@example.com", shop_name="Dhaka Hub"):
+    owner = get_user_model().objects.create_user(email=email, password="pw")
+    return Vendor.objects.create(
+        owner=owner,
+        shop_name=shop_name,
+        shop_description="",
+        business_email=email,
+        business_phone="01700000000",
+        business_address="Dhaka",
+        business_registration_number="R-1",
+        tax_id="T-1",
+        business_type="retail",
+        years_in_business=1,
+        bank_name="Bank",
+        account_holder_name="Owner",
+        account_number="1",
+        routing_number="1",
+    )
+
+
+class ProductSearchDocumentTests(SimpleTestCase):
+    def test_tokenize_keeps_unicode_and_drops_noise(self):
+        self.assertEqual(search.tokenize("Red  জুতা, red a 42!"), ["red", "জুতা", "42"])
+
+    def test_document_covers_product_and_variants(self):
+        items = [
+            SimpleNamespace(sku="FL-DH-RUN-RED-42-0001", size="42", color="Red"),
+            SimpleNamespace(sku=None, size="", color="Blue"),
+        ]
+        product = SimpleNamespace(
+            product="Running Shoe", brand="Nike", sku="FL-DH-RUN-000001",
+            items=SimpleNamespace(all=lambda: items),
+        )
+        self.assertEqual(
+            search.build_document(product),
+            "Running Shoe Nike FL-DH-RUN-000001 FL-DH-RUN-RED-42-0001 42 Red Blue",
+        )
+
+
+class ProductSearchRefreshTests(SimpleTestCase):
+    def setUp(self):
+        search._local.product_ids = None
+
+    def test_products_touched_in_one_transaction_are_refreshed_once(self):
+        callbacks = []
+        with mock.patch.object(search.transaction, "on_commit", callbacks.append), \
+                mock.patch.object(search, "index_available", return_value=True), \
+                mock.patch.object(search, "rebuild") as rebuild:
+            for product_id in (7, 7, 9, 7):
+                search.schedule_refresh(product_id)
+            search.schedule_refresh_many([9, 11])
+            for callback in callbacks:
+                callback()
+        rebuild.assert_called_once_with([7, 9, 11])
+
+    def test_refresh_is_skipped_without_the_search_table(self):
+        callbacks = []
+        with mock.patch.object(search.transaction, "on_commit", callbacks.append), \
+                mock.patch.object(search, "index_available", return_value=False), \
+                mock.patch.object(search, "rebuild") as rebuild:
+            search.schedule_refresh(7)
+            callbacks[0]()
+        rebuild.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ProductSearchFallbackTests(TestCase):
+    def test_search_without_the_index_table_uses_product_lookups(self):
+        vendor = make_vendor()
+        shoe = Product.objects.create(vendor=vendor, product="Running Shoe", status="published")
+        ProductItem.objects.create(product=shoe, size="42", color="Red")
+        Product.objects.create(vendor=vendor, product="Cap", status="published")
+
+        with mock.patch.dict(search._available, {"default": False}):
+            ids, total = search.search_product_ids(Vendor.objects.filter(pk=vendor.pk), "red", status="published")
+        self.assertEqual((ids, total), ([shoe.pk], 1))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@skipUnless(connection.vendor == "sqlite", "the FTS5 path only runs on SQLite")
+class ProductSearchSqliteTests(TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, search._local, "product_ids", None)
+        self.vendor = make_vendor()
+        other = make_vendor("other@example.com", "Other Shop")
+        self.shoes = [
+            Product.objects.create(vendor=self.vendor, product=f"Red Shoe {i}", status="published") for i in range(3)
+        ]
+        Product.objects.create(vendor=self.vendor, product="Red Cap", status="draft")
+        Product.objects.create(vendor=other, product="Red Shoe", status="published")
+        search.rebuild()
+
+    def test_vendor_status_and_limit_are_applied_in_the_query(self):
+        vendors = Vendor.objects.filter(pk=self.vendor.pk)
+        with mock.patch.dict(search._available, {"default": True}), CaptureQueriesContext(connection) as queries:
+            ids, total = search.search_product_ids(vendors, "red shoe", status="published", limit=2)
+
+        self.assertEqual(total, 3)
+        self.assertEqual(len(ids), 2)
+        self.assertLessEqual(set(ids), {p.pk for p in self.shoes})
+        self.assertTrue(all("LIMIT" in q["sql"] or "COUNT" in q["sql"] for q in queries))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ProductListPaginationTests(TestCase):
+    def setUp(self):
+        self.vendor = make_vendor()
+        for name in ("Cap", "Shoe", "Belt"):
+            Product.objects.create(vendor=self.vendor, product=name, status="published")
+
+    def get(self, **params):
+        request = APIRequestFactory().get("/api/list/products/", params)
+        force_authenticate(request, user=self.vendor.owner)
+        return ProductListAPIView.as_view()(request)
+
+    def test_page_reuses_the_paginator_count_for_the_total(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(page_size=2)
+        counts = [q["sql"] for q in queries if "COUNT(" in q["sql"].upper()]
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(response.data["meta"]["total"], 3)
+        self.assertEqual(len(response.data["data"]["items"]), 2)
+        self.assertEqual(response.data["data"]["pagination"]["page_count"], 2)
+
+    def test_page_size_zero_returns_every_row(self):
+        response = self.get(page_size=0)
+        body = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(len(body["data"]["items"]), 3)
+        self.assertEqual(body["data"]["pagination"]["count"], 3)
+        self.assertEqual(body["meta"]["total"], 3)
+
+    def test_serialized_page_without_pagination_returns_every_row(self):
+        request = ProductListAPIView().initialize_request(APIRequestFactory().get("/", {"page_size": 0}))
+        data = AutoPagination().get_serialized_page(
+            request, Product.objects.order_by("id"), ProductSerializer, context={"request": request}
+        )
+        self.assertEqual(data["pagination"]["count"], 3)
+        self.assertEqual([item["product"] for item in data["items"]], ["Cap", "Shoe", "Belt"])
+
+
+class StreamSuccessTests(SimpleTestCase):
+    def test_empty_stream_uses_the_empty_message_and_count(self):
+        response = ApiResponse.stream_success(
+            message="found", chunks=iter([]), meta={"action": "x"},
+            empty_message="nothing", meta_count_key="total",
+        )
+        body = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(body["message"], "nothing")
+        self.assertEqual(body["meta"], {"action": "x", "total": 0})
+        self.assertEqual(body["data"]["items"], [])
+
+    def test_asynchronous_stream_yields_chunk_by_chunk(self):
+        pulled = []
+
+        def chunks():
+            for batch in ([{"id": 1}, {"id": 2}], [{"id": 3}]):
+                pulled.append(len(batch))
+                yield batch
+
+        response = ApiResponse.stream_success(chunks=chunks(), asynchronous=True)
+        self.assertTrue(response.is_async)
+
+        async def collect():
+            return [part async for part in response.streaming_content]
+
+        parts = asyncio.run(collect())
+        body = json.loads(b"".join(parts))
+        self.assertEqual([item["id"] for item in body["data"]["items"]], [1, 2, 3])
+        self.assertEqual(body["data"]["pagination"]["count"], 3)
+        self.assertEqual(len(parts), 4)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class InventoryCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = 0
+
+    def _loader(self):
+        self.calls += 1
+        return {"success": True, "products": [], "call": self.calls}
+
+    def test_repeat_lookup_is_served_from_cache(self):
+        first = inventory_cache.cached_lookup(41, {"query": "shoe"}, self._loader)
+        second = inventory_cache.cached_lookup(41, {"query": "shoe"}, self._loader)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first, second)
+
+        inventory_cache.cached_lookup(41, {"query": "sandal"}, self._loader)
+        self.assertEqual(self.calls, 2)
+
+    def test_version_bump_invalidates_only_that_owner(self):
+        inventory_cache.cached_lookup(42, {"query": ""}, self._loader)
+        inventory_cache.cached_lookup(43, {"query": ""}, self._loader)
+        inventory_cache.bump_version(42)
+
+        result = inventory_cache.cached_lookup(42, {"query": ""}, self._loader)
+        inventory_cache.cached_lookup(43, {"query": ""}, self._loader)
+        self.assertEqual(result["call"], 3)
+        self.assertEqual(self.calls, 3)
+
+    def test_callers_get_their_own_copy(self):
+        first = inventory_cache.cached_lookup(44, {"query": ""}, self._loader)
+        first["products"].append({"name": "edited by the caller"})
+
+        second = inventory_cache.cached_lookup(44, {"query": ""}, self._loader)
+        second["success"] = False
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(inventory_cache.cached_lookup(44, {"query": ""}, self._loader)["products"], [])
+        self.assertTrue(inventory_cache.cached_lookup(44, {"query": ""}, self._loader)["success"])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class InventoryCacheInvalidationTests(TestCase):
+    def setUp(self):
+        vendor = make_vendor()
+        self.owner_id = vendor.owner_id
+        product = Product.objects.create(vendor=vendor, product="Running Shoe", status="published")
+        self.stock = Stock.objects.create(product=product, opening=5)
+        self.stock_item = StockItem.objects.create(
+            stock=self.stock, product_item=ProductItem.objects.create(product=product, size="42"), opening=5
+        )
+
+    def assertBumps(self, delete):
+        version = inventory_cache.get_version(self.owner_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            delete()
+        self.assertGreater(inventory_cache.get_version(self.owner_id), version)
+
+    def test_deleting_a_stock_item_invalidates_the_owner(self):
+        self.assertBumps(self.stock_item.delete)
+
+    def test_deleting_a_stock_invalidates_the_owner(self):
+        self.assertBumps(self.stock.delete)
+
+
+class ProductCodeTests(SimpleTestCase):
+    def test_paths_are_content_addressed_by_sku(self):
+        self.assertEqual(codes.code_path("barcode", "FL-DH-RUN-000001"), codes.code_path("barcode", "FL-DH-RUN-000001"))
+        self.assertNotEqual(codes.code_path("barcode", "FL-DH-RUN-000001"), codes.code_path("barcode", "FL-DH-RUN-000002"))
+        self.assertTrue(codes.code_path("qr_code", "FL-DH-RUN-000001").startswith("qrcodes/"))
+
+    def test_rows_without_sku_are_not_rendered(self):
+        self.assertEqual(codes.render_instances([SimpleNamespace(sku=None, barcode=None, qr_code=None)]), 0)
+
+
+class ProductImportTests(SimpleTestCase):
+    def test_csv_rows_are_grouped_by_product(self):
+        upload = io.BytesIO(
+            b"\xef\xbb\xbfProduct,Brand,Size,Color,Quantity,Unit_Cost,Sell_Price\n"
+            b"Mug,Acme,S,White,5,1.00,2.00\n"
+            b",,,,,,\n"
+            b"Cap,,One,Red,2,1.00,3.00\n"
+            b"Mug,Other,L,Black,6,1.00,2.00\n"
+        )
+        products = catalog.products_from_csv(upload)
+        self.assertEqual([p["product"] for p in products], ["Mug", "Cap"])
+        self.assertEqual(products[0]["brand"], "Acme")
+        self.assertNotIn("brand", products[1])
+        self.assertEqual([i["size"] for i in products[0]["items"]], ["S", "L"])
+        self.assertEqual(products[1]["items"][0]["quantity"], "2")
+
+    def test_sku_format(self):
+        self.assertEqual(product_sku("Dhaka Hub", "Run Shoe", 7), "FL-DH-RUN-000007")
+        self.assertEqual(item_sku("Dhaka Hub", "Run Shoe", "Red", None, 12), "FL-DH-RUN-RED--0012")
+
+
+def import_row(name="Running Shoe", items=None, **fields):
+    return {
+        "product": name, "status": "published", **fields,
+        "items": items or [{"size": "42", "color": "Red", "quantity": 5, "unit_cost": "10.00", "sell_price": "15.00"}],
+    }
+
+
+class _ImportTestCase(TestCase):
+    def setUp(self):
+        self.vendor = make_vendor()
+        # scheduled render/refresh ids are thread-local; do not leak them into other tests
+        self.addCleanup(setattr, codes._local, "batch", None)
+        self.addCleanup(setattr, search._local, "product_ids", None)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BulkCreateProductsTests(_ImportTestCase):
+    def test_products_get_variants_opening_stock_and_skus(self):
+        created = catalog.bulk_create_products(self.vendor, [
+            import_row(items=[
+                {"size": "42", "color": "Red", "quantity": 5},
+                {"size": "43", "color": "Red", "quantity": 3},
+            ]),
+            import_row("Cap", items=[{"size": "One", "color": "Blue", "quantity": 0}]),
+        ])
+
+        shoe = Product.objects.get(pk=created[0].pk)
+        self.assertEqual(shoe.sku, product_sku("Dhaka Hub", "Running Shoe", shoe.pk))
+        self.assertEqual((shoe.stock.opening, shoe.stock.balance), (8, 8))
+        self.assertEqual(
+            sorted(StockItem.objects.filter(stock=shoe.stock).values_list("product_item__size", "opening")),
+            [("42", 5), ("43", 3)],
+        )
+        for item in ProductItem.objects.filter(product__in=created):
+            self.assertEqual(item.sku, item_sku("Dhaka Hub", item.product.product, item.color, item.size, item.pk))
+
+    def test_duplicate_names_and_variants_get_distinct_skus(self):
+        Product.objects.create(vendor=self.vendor, product="Running Shoe", status="published")
+        same = {"size": "42", "color": "Red", "quantity": 1}
+        catalog.bulk_create_products(self.vendor, [import_row(items=[same, same]), import_row(items=[same])])
+
+        product_skus = list(Product.objects.values_list("sku", flat=True))
+        item_skus = list(ProductItem.objects.values_list("sku", flat=True))
+        self.assertEqual(len(product_skus), 3)
+        self.assertEqual(len(set(product_skus)), 3)
+        self.assertEqual(len(item_skus), 3)
+        self.assertEqual(len(set(item_skus)), 3)
+
+    def test_failure_part_way_leaves_nothing_behind(self):
+        with mock.patch.object(StockItem.objects, "bulk_create", side_effect=IntegrityError("stock item")), \
+                self.captureOnCommitCallbacks() as callbacks, self.assertRaises(IntegrityError):
+            catalog.bulk_create_products(self.vendor, [import_row(), import_row("Cap")])
+
+        self.assertEqual(callbacks, [])
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(ProductItem.objects.exists())
+        self.assertFalse(Stock.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ProductImportAPIViewTests(_ImportTestCase):
+    def post(self, data, format="json"):
+        request = APIRequestFactory().post("/api/inventory/products/import/", data, format=format)
+        force_authenticate(request, user=self.vendor.owner)
+        return ProductImportAPIView.as_view()(request)
+
+    def test_json_import_creates_every_product(self):
+        response = self.post({"vendor_id": self.vendor.pk, "products": [import_row(), import_row("Cap")]})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["data"]["created"], response.data["data"]["items"]), (2, 2))
+        skus = [row["sku"] for row in response.data["data"]["products"]]
+        self.assertEqual(skus, list(Product.objects.order_by("pk").values_list("sku", flat=True)))
+
+    def test_csv_import_with_repeated_rows(self):
+        upload = SimpleUploadedFile("products.csv", (
+            b"Product,Size,Color,Quantity,Unit_Cost,Sell_Price\n"
+            b"Mug,S,White,5,1.00,2.00\n"
+            b"Mug,S,White,5,1.00,2.00\n"
+        ), content_type="text/csv")
+        response = self.post({"vendor_id": self.vendor.pk, "file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["data"]["items"], 2)
+        self.assertEqual(len(set(ProductItem.objects.values_list("sku", flat=True))), 2)
+        self.assertEqual(Product.objects.get().stock.opening, 10)
+
+    def test_one_invalid_product_rejects_the_whole_import(self):
+        bad = import_row("Cap", items=[{"size": "One", "color": "Blue", "quantity": -1, "unit_cost": "1", "sell_price": "2"}])
+        response = self.post({"vendor_id": self.vendor.pk, "products": [import_row(), bad]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("quantity", str(response.data))
+        self.assertFalse(Product.objects.exists())
+
+    def test_vendor_of_another_owner_is_rejected(self):
+        other = make_vendor("other@example.com", "Other Shop")
+        response = self.post({"vendor_id": other.pk, "products": [import_row()]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Product.objects.exists())
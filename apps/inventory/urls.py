@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
     ProductCreateAPIView,
+    ProductImportAPIView,
     ProductListAPIView,
     ProductPurchaseAPIView,
     ProductDetailAPIView,
@@ -15,6 +16,7 @@ from .views import (
 urlpatterns = [
     # product
     path('products/create/', ProductCreateAPIView.as_view()),
+    path('products/import/', ProductImportAPIView.as_view()),
     path('list/products/', ProductListAPIView.as_view()),
     path('products/<int:pk>/', ProductDetailAPIView.as_view()),
 
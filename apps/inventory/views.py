@@ -8,8 +8,11 @@ from .serializers import ProductPurchaseForReturnSerializer, ProductPurchaseItem
 
 from .serializers import (
     ProductSerializer,
-    ProductPurchaseSerializer
+    ProductPurchaseSerializer,
+    ProductImportSerializer,
 )
+from .catalog import bulk_create_products, products_from_csv
+import csv
 import json
 
 from django.db import transaction
@@ -17,7 +20,6 @@ from django.db import transaction
 class ProductCreateAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
-    @transaction.atomic
     def post(self, request):
         data = request.data
 
@@ -65,19 +67,7 @@ class ProductCreateAPIView(APIView):
                 status_code=status.HTTP_400_BAD_REQUEST
             )
 
-        product = Product.objects.create(
-            vendor=vendor,
-            product=data.get("product"),
-            short_description=data.get("short_description"),
-            brand=data.get("brand"),
-            status=data.get("status", "draft"),
-            image=data.get("image"),
-        )
-
-
-        total_quantity = 0
-        product_items = []
-
+        # everything is validated before the first write
         for index, item in enumerate(items):
             required_fields = ["size", "color", "quantity", "unit_cost", "sell_price"]
             missing = [f for f in required_fields if f not in item]
@@ -88,44 +78,23 @@ class ProductCreateAPIView(APIView):
                     status_code=status.HTTP_400_BAD_REQUEST
                 )
 
-            quantity = int(item.get("quantity", 0))
-            total_quantity += quantity
-
-            obj=ProductItem.objects.create(
-                product=product,
-                size=item["size"],
-                color=item["color"],
-                quantity=quantity,
-                unit_cost=item["unit_cost"],
-                sell_price=item["sell_price"],
-            )
-            product_items.append(obj)
-
-
-        stock, _ = Stock.objects.get_or_create(
-            product=product,
-            defaults={
-                "opening": total_quantity,
-                "purchase": 0,
-                "customer_return": 0,
-                "sales": 0,
-                "supplier_return": 0,
-                "damage": 0,
-                "balance": total_quantity,
-                "amount": 0,
-            }
-        )
-
-        
-        for item in product_items:
-            stock_item, _ = StockItem.objects.get_or_create(
-                stock=stock,
-                product_item=item,
+        serializer = ProductImportSerializer(data={
+            "product": data.get("product"),
+            "short_description": data.get("short_description"),
+            "brand": data.get("brand"),
+            "status": data.get("status", "draft"),
+            "image": data.get("image"),
+            "items": items,
+        })
+        if not serializer.is_valid():
+            return self.error(
+                message="Invalid data",
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
             )
-            stock_item.opening += item.quantity
-            stock_item.save()
-        
 
+        product = bulk_create_products(vendor, [serializer.validated_data])[0]
+        total_quantity = sum(item["quantity"] for item in serializer.validated_data["items"])
 
         return self.success(
             message="Product created successfully",
@@ -138,6 +107,82 @@ class ProductCreateAPIView(APIView):
             status_code=status.HTTP_201_CREATED
         )
 
+
+class ProductImportAPIView(APIView):
+    """Create many products at once from JSON ({"vendor_id", "products": [...]}) or a CSV upload ("file")."""
+
+    permission_classes = [IsAuthenticated]
+    max_items = 5000
+
+    def post(self, request):
+        vendor = Vendor.objects.filter(
+            id=request.data.get("vendor_id"),
+            owner=request.user
+        ).first()
+
+        if not vendor:
+            return self.error(
+                message="Invalid vendor or vendor does not belong to you",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        upload = request.FILES.get("file")
+        if upload:
+            try:
+                products = products_from_csv(upload)
+            except (UnicodeDecodeError, csv.Error):
+                return self.error(
+                    message="Invalid CSV file",
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            products = request.data.get("products")
+            if isinstance(products, str):
+                try:
+                    products = json.loads(products)
+                except json.JSONDecodeError:
+                    return self.error(
+                        message="Invalid JSON format for products",
+                        status_code=status.HTTP_400_BAD_REQUEST
+                    )
+
+        if not isinstance(products, list) or not products:
+            return self.error(
+                message="A non-empty list of products is required",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        item_count = sum(
+            len(p.get("items") or []) for p in products if isinstance(p, dict) and isinstance(p.get("items"), list)
+        )
+        if item_count > self.max_items:
+            return self.error(
+                message=f"At most {self.max_items} items per import",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = ProductImportSerializer(data=products, many=True)
+        if not serializer.is_valid():
+            return self.error(
+                message="Invalid data",
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        created = bulk_create_products(vendor, serializer.validated_data)
+        return self.success(
+            message="Products imported successfully",
+            data={
+                "created": len(created),
+                "items": item_count,
+                "products": [
+                    {"id": product.id, "product": product.product, "sku": product.sku}
+                    for product in created
+                ],
+            },
+            status_code=status.HTTP_201_CREATED
+        )
+
 class ProductListAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -148,7 +193,7 @@ class ProductListAPIView(APIView):
 
         products = Product.objects.filter(
             vendor__owner=request.user
-        ).order_by("-created")
+        ).select_related("vendor").prefetch_related("items").order_by("-created", "-id")
 
         if vendor_id:
             products = products.filter(
@@ -165,12 +210,12 @@ class ProductListAPIView(APIView):
         if status_filter:
             products = products.filter(status=status_filter)
 
-        serializer = ProductSerializer(products, many=True, context={'request': request})
-        return self.success(
+        return self.paginated(
+            products,
+            ProductSerializer,
             message="Product list fetched successfully",
-            data=serializer.data,
-            status_code=status.HTTP_200_OK,
-            meta={"total": products.count()}
+            context={'request': request},
+            meta_count_key="total",
         )
         
 class ProductDetailAPIView(APIView):
@@ -356,15 +401,13 @@ class StockListAPIView(APIView):
     def get(self, request):
         stocks = Stock.objects.filter(
             product__vendor__owner=request.user
-        ).order_by("-updated_at")
-        
-        serializer = StockSerializer(stocks, many=True)
+        ).select_related("product").order_by("-updated_at", "-id")
 
-        return self.success(
+        return self.paginated(
+            stocks,
+            StockSerializer,
             message="Stock list fetched",
-            data=serializer.data,
-            status_code=status.HTTP_200_OK,
-            meta={"total": stocks.count()}
+            meta_count_key="total",
         )
         
 class StockDetailAPIView(APIView):
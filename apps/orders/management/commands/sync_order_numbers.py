@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.orders.order_numbers import sync_allocator
+
+
+class Command(BaseCommand):
+    help = "Move the order number allocator past every existing order id"
+
+    def handle(self, *args, **options):
+        value = sync_allocator()
+        self.stdout.write(self.style.SUCCESS(f"Next order number >= {value}"))
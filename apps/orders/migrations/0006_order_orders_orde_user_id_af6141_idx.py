@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_ordercallconfirmation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'order_status', 'created_at', 'id'], name='orders_orde_user_id_af6141_idx'),
+        ),
+    ]
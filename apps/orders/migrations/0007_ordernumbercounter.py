@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+PREFIX = "FL"
+FIRST_NUMBER = 1001
+SEQUENCE_NAME = "orders_order_number_seq"
+SEQUENCE_CACHE = 20
+
+
+def seed_allocator(apps, schema_editor):
+    """Start the allocator after the highest existing order number, compared as integers."""
+    Order = apps.get_model("orders", "Order")
+    OrderNumberCounter = apps.get_model("orders", "OrderNumberCounter")
+
+    highest = FIRST_NUMBER - 1
+    for order_id in Order.objects.filter(order_id__startswith=f"{PREFIX}-").values_list("order_id", flat=True).iterator():
+        tail = order_id.split("-", 1)[1]
+        if tail.isdigit():
+            highest = max(highest, int(tail))
+    next_value = highest + 1
+
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME} START WITH {next_value} CACHE {SEQUENCE_CACHE}"
+        )
+        schema_editor.execute(f"SELECT setval('{SEQUENCE_NAME}', {next_value}, false)")
+    else:
+        OrderNumberCounter.objects.update_or_create(prefix=PREFIX, defaults={"next_value": next_value})
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_orders_orde_user_id_af6141_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberCounter',
+            fields=[
+                ('prefix', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(seed_allocator, drop_sequence),
+    ]
@@ -1,6 +1,5 @@
 from django.db import models
 from django.contrib.auth import get_user_model
-from django.db.models import Max
 User = get_user_model()
 
 BRAND_PREFIX = "FL"
@@ -46,6 +45,11 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "order_status", "created_at", "id"]),
+        ]
+
     def __str__(self):
         return self.order_id
 
@@ -56,21 +60,27 @@ class Order(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.order_id:
-            last_order = Order.objects.filter(
-                order_id__startswith=f"{BRAND_PREFIX}-"
-            ).aggregate(
-                max_id=Max('order_id')
-            )['max_id']
-
-            if last_order:
-                last_number = int(last_order.split('-')[1])
-                self.order_id = f"{BRAND_PREFIX}-{last_number + 1}"
-            else:
-                self.order_id = f"{BRAND_PREFIX}-1001"
+            from .order_numbers import next_order_id
+
+            self.order_id = next_order_id()
 
         super().save(*args, **kwargs)
 
 
+class OrderNumberCounter(models.Model):
+    """
+    Next unused order number per prefix, for databases without the PostgreSQL
+    sequence and for non-default prefixes. Each order takes one number by
+    incrementing the row inside its own transaction (see order_numbers.py)
+    instead of scanning orders for the maximum.
+    """
+    prefix = models.CharField(max_length=10, primary_key=True)
+    next_value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.prefix}: {self.next_value}"
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     product_name = models.CharField(max_length=255)
@@ -0,0 +1,94 @@
+"""
+Order number allocation.
+
+Order ids are "<BRAND_PREFIX>-<n>" with a numeric n, handed out by:
+
+- PostgreSQL: the `orders_order_number_seq` sequence. nextval() is O(1), never
+  blocks other transactions and is not rolled back, and the sequence is created
+  with CACHE so every connection reserves a block of numbers at a time.
+- Anything else: the OrderNumberCounter row, incremented inside the caller's
+  transaction (a rolled back order gives its number back).
+
+Numbers are unique but not gap-free, and with per-connection blocks they are
+not strictly chronological across workers.
+"""
+import logging
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import BRAND_PREFIX, Order, OrderNumberCounter
+
+logger = logging.getLogger(__name__)
+
+FIRST_NUMBER = 1001
+SEQUENCE_NAME = "orders_order_number_seq"
+SEQUENCE_CACHE = 20
+
+
+def format_order_id(number: int, prefix: str = BRAND_PREFIX) -> str:
+    return f"{prefix}-{number}"
+
+
+def parse_order_number(order_id: str, prefix: str = BRAND_PREFIX):
+    head, _, tail = (order_id or "").partition("-")
+    if head != prefix or not tail.isdigit():
+        return None
+    return int(tail)
+
+
+def seed_value(prefix: str = BRAND_PREFIX) -> int:
+    """One past the highest existing number, compared as integers (FL-10000 > FL-9999)."""
+    highest = FIRST_NUMBER - 1
+    ids = Order.objects.filter(order_id__startswith=f"{prefix}-").values_list("order_id", flat=True)
+    for order_id in ids.iterator():
+        number = parse_order_number(order_id, prefix)
+        if number is not None and number > highest:
+            highest = number
+    return highest + 1
+
+
+def _next_from_sequence() -> int:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(%s)", [SEQUENCE_NAME])
+        return cursor.fetchone()[0]
+
+
+def _next_from_counter(prefix: str) -> int:
+    counter = OrderNumberCounter.objects.filter(prefix=prefix)
+    with transaction.atomic():
+        # the UPDATE takes the row lock first, so concurrent callers queue up here
+        if not counter.update(next_value=F("next_value") + 1):
+            OrderNumberCounter.objects.get_or_create(prefix=prefix, defaults={"next_value": seed_value(prefix)})
+            counter.update(next_value=F("next_value") + 1)
+        return counter.values_list("next_value", flat=True).get() - 1
+
+
+def next_order_id(prefix: str = BRAND_PREFIX) -> str:
+    if connection.vendor == "postgresql" and prefix == BRAND_PREFIX:
+        return format_order_id(_next_from_sequence(), prefix)
+    return format_order_id(_next_from_counter(prefix), prefix)
+
+
+def sync_allocator(prefix: str = BRAND_PREFIX) -> int:
+    """Move the allocator past every existing order id (after imports or manual ids)."""
+    value = seed_value(prefix)
+    if connection.vendor == "postgresql" and prefix == BRAND_PREFIX:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME} START WITH {FIRST_NUMBER} CACHE {SEQUENCE_CACHE}"
+            )
+            cursor.execute(
+                # last_value already covers blocks cached by other connections
+                f"SELECT setval(%s, GREATEST(%s, (SELECT last_value + 1 FROM {SEQUENCE_NAME})), false)",
+                [SEQUENCE_NAME, value],
+            )
+    else:
+        with transaction.atomic():
+            counter, created = OrderNumberCounter.objects.select_for_update().get_or_create(
+                prefix=prefix, defaults={"next_value": value}
+            )
+            if not created and counter.next_value < value:
+                OrderNumberCounter.objects.filter(prefix=prefix).update(next_value=value)
+    logger.info(f"Order number allocator for {prefix} synced, next >= {value}")
+    return value
@@ -7,6 +7,8 @@ from django.dispatch import receiver
 
 from .models import Order
 
+from apps.inventory.inventory_cache import invalidate_owner
+
 from apps.call.services.next_gen_services import make_a_call
 
 logger = logging.getLogger(__name__)
@@ -31,3 +33,9 @@ def create_order_confirmation_call(sender, instance, created, **kwargs):
             logger.exception("Order confirmation call trigger failed for order id=%s", order_id)
 
     transaction.on_commit(_trigger_after_commit)
+
+
+@receiver(post_save, sender=Order)
+def invalidate_inventory_cache(sender, instance, **kwargs):
+    # orders move stock for the seller; drop their cached inventory lookups
+    invalidate_owner(instance.user_id)
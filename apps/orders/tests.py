@@ -1,3 +1,81 @@
-from django.test import TestCase
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase
+
+from .models import Order
+from .order_numbers import format_order_id, next_order_id, parse_order_number, sync_allocator
+
+
+def make_order(user, order_id=""):
+    return Order.objects.create(
+        user=user, order_id=order_id, customer="Rahim", location="Dhaka",
+        contact="01700000000", order_amount="100.00", platform="WEBSITE",
+    )
+
+
+class OrderNumberTests(SimpleTestCase):
+    def test_numbers_compare_as_integers(self):
+        ids = ["FL-9999", "FL-10000", "FL-1001"]
+        self.assertEqual(max(parse_order_number(i) for i in ids), 10000)
+
+    def test_foreign_or_malformed_ids_are_ignored(self):
+        self.assertIsNone(parse_order_number("XX-1001"))
+        self.assertIsNone(parse_order_number("FL-12a"))
+        self.assertIsNone(parse_order_number(""))
+
+    def test_format_round_trips(self):
+        self.assertEqual(parse_order_number(format_order_id(10001)), 10001)
+
+
+class CounterAllocationTests(TestCase):
+    """The OrderNumberCounter path; a non-default prefix uses it on every database."""
+
+    def test_numbers_continue_after_the_highest_existing_id(self):
+        user = get_user_model().objects.create_user(email="orders@example.com", password="pw")
+        make_order(user, "TS-1500")
+        make_order(user, "TS-999")
+
+        self.assertEqual([next_order_id("TS"), next_order_id("TS")], ["TS-1501", "TS-1502"])
+
+    def test_rolled_back_order_gives_its_number_back(self):
+        first = next_order_id("TS")
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            next_order_id("TS")
+            raise RuntimeError("order rejected")
+        self.assertEqual(parse_order_number(next_order_id("TS"), "TS"), parse_order_number(first, "TS") + 1)
+
+    def test_sync_moves_past_imported_ids(self):
+        user = get_user_model().objects.create_user(email="orders@example.com", password="pw")
+        next_order_id("TS")
+        make_order(user, "TS-40000")
+
+        self.assertEqual(sync_allocator("TS"), 40001)
+        self.assertEqual(next_order_id("TS"), "TS-40001")
+
+
+@skipUnless(connection.vendor == "postgresql", "orders_order_number_seq only exists on PostgreSQL")
+class SequenceAllocationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="orders@example.com", password="pw")
+
+    def test_orders_draw_distinct_increasing_numbers(self):
+        numbers = [parse_order_number(make_order(self.user).order_id) for _ in range(5)]
+        self.assertEqual(numbers, sorted(set(numbers)))
+
+    def test_rolled_back_numbers_are_not_reused(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            lost = parse_order_number(next_order_id())
+            raise RuntimeError("order rejected")
+        self.assertGreater(parse_order_number(next_order_id()), lost)
+
+    def test_sync_moves_the_sequence_past_imported_ids(self):
+        make_order(self.user, "FL-900000")
+        self.assertEqual(sync_allocator(), 900001)
+        self.assertGreaterEqual(parse_order_number(make_order(self.user).order_id), 900001)
+
+    def test_sync_never_moves_the_sequence_back(self):
+        ahead = parse_order_number(next_order_id())
+        sync_allocator()
+        self.assertGreater(parse_order_number(next_order_id()), ahead)
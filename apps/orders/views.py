@@ -9,6 +9,7 @@ from .services import book_order_to_active_courier
 
 
 class OrderListAPIView(APIView):
+    cursor_ordering = "-created_at"
 
     def get(self, request, *args, **kwargs):
         order_type = kwargs.get('type')
@@ -23,9 +24,9 @@ class OrderListAPIView(APIView):
             user=request.user,
             order_status=status_map.get(order_type)
         ) if order_type in status_map else Order.objects.none()
+        orders = orders.select_related("call_confirmation").order_by("-created_at", "-id")
 
-        serializer = OrderListSerializer(orders, many=True)
-        return self.success(data=serializer.data)
+        return self.paginated(orders, OrderListSerializer)
 
 
 class OrderDetailAPIView(APIView):
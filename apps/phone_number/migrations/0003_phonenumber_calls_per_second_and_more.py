@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('phone_number', '0002_phonenumber_friendly_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='phonenumber',
+            name='calls_per_second',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='phonenumber',
+            name='max_concurrent_calls',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -15,6 +15,10 @@ class PhoneNumber(models.Model):
     number_sid = models.CharField(max_length=50, unique=True, null=True)
     
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+
+    # outbound campaign limits for this caller id; empty uses CALL_CAMPAIGN_MAX_CONCURRENT / CALL_CAMPAIGN_CPS
+    max_concurrent_calls = models.PositiveIntegerField(blank=True, null=True)
+    calls_per_second = models.FloatField(blank=True, null=True)
     
     def __str__(self):
         return f"Phone Number: {self.phone_number} for User: {self.user.email}"
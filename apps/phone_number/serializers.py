@@ -4,4 +4,4 @@ from .models import PhoneNumber
 class PhoneNumberSerializer(serializers.ModelSerializer):
     class Meta:
         model = PhoneNumber
-        fields = ['id', 'phone_number', 'friendly_name', 'verified']
\ No newline at end of file
+        fields = ['id', 'phone_number', 'friendly_name', 'verified', 'max_concurrent_calls', 'calls_per_second']
\ No newline at end of file
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PublishConfig(AppConfig):
     name = 'apps.publish'
+
+    def ready(self):
+        import apps.publish.signals
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.publish.services.post_index import backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild the platform post id -> SocialPost index from SocialPost.post_ids"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--post", type=int, action="append", help="SocialPost id (repeatable). Default: all posts")
+
+    def handle(self, *args, **options):
+        count = backfill(options.get("post"))
+        self.stdout.write(self.style.SUCCESS(f"Indexed platform post ids of {count} posts"))
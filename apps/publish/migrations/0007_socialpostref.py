@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_refs(apps, schema_editor):
+    """Index the platform post ids of existing posts; the oldest post wins a duplicate id."""
+    SocialPost = apps.get_model("publish", "SocialPost")
+    SocialPostRef = apps.get_model("publish", "SocialPostRef")
+
+    refs = []
+    for post in SocialPost.objects.exclude(post_ids=[]).only("id", "post_ids").order_by("pk").iterator():
+        seen = set()
+        for item in post.post_ids or []:
+            if not isinstance(item, dict):
+                continue
+            platform = str(item.get("platform") or "")
+            value = item.get("post_id")
+            for pid in value if isinstance(value, list) else [value]:
+                if pid is not None and not isinstance(pid, (dict, list)) and str(pid):
+                    if (platform, str(pid)) not in seen:
+                        seen.add((platform, str(pid)))
+                        refs.append(SocialPostRef(post_id=post.pk, platform=platform, external_id=str(pid)))
+        if len(refs) >= 500:
+            SocialPostRef.objects.bulk_create(refs, ignore_conflicts=True)
+            refs = []
+    SocialPostRef.objects.bulk_create(refs, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publish', '0006_comment_attachments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SocialPostRef',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(blank=True, max_length=50)),
+                ('external_id', models.CharField(db_index=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='external_refs', to='publish.socialpost')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('platform', 'external_id'), name='uniq_social_post_ref')],
+            },
+        ),
+        migrations.RunPython(backfill_refs, migrations.RunPython.noop),
+    ]
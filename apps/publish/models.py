@@ -48,6 +48,23 @@ class SocialPost(models.Model):
     @property
     def total_comments(self):
         return self.comments.count()
+
+
+class SocialPostRef(models.Model):
+    """Platform post id -> SocialPost, derived from SocialPost.post_ids (see services/post_index.py)."""
+    post = models.ForeignKey(SocialPost, on_delete=models.CASCADE, related_name="external_refs")
+    platform = models.CharField(max_length=50, blank=True)
+    external_id = models.CharField(max_length=255, db_index=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["platform", "external_id"], name="uniq_social_post_ref"),
+        ]
+
+    def __str__(self):
+        return f"{self.platform}:{self.external_id} -> Post {self.post_id}"
     
 
 class PostMediaFile(models.Model):
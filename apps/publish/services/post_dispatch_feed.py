@@ -7,6 +7,7 @@ from django.utils.dateparse import parse_datetime
 from django.core.files.base import ContentFile
 from ..models import SocialPost, Comment, SubComment, Reaction, PostMediaFile
 from apps.social.models import FacebookPage, SocialAccount, SocialPlatform
+from .post_index import find_post
 
 
 def _normalize_post_id(post_id):
@@ -21,28 +22,7 @@ def get_post(post_id):
     post_id = _normalize_post_id(post_id)
     if not post_id:
         return None
-
-    qs = SocialPost.objects.filter(post_ids__contains=[{"post_id": post_id}])
-    post = qs.first()
-    if post:
-        return post
-
-    qs = SocialPost.objects.filter(post_ids__contains=[{"post_id": [post_id]}])
-    post = qs.first()
-    if post:
-        return post
-
-    for candidate in SocialPost.objects.exclude(post_ids=[]).only("id", "post_ids"):
-        for item in candidate.post_ids or []:
-            pid = item.get("post_id")
-            if isinstance(pid, list):
-                if post_id in [str(x) for x in pid]:
-                    return candidate
-            elif pid is not None and str(pid) == post_id:
-                return candidate
-    
-
-    return None
+    return find_post(post_id)
 
 
 def get_or_create_post(post_id, page_id=None, platform="facebook", platform_user_id=None):
@@ -0,0 +1,80 @@
+"""
+Reverse lookup from platform post ids to SocialPost.
+
+SocialPost.post_ids is a JSON list of per-platform publish results, where
+"post_id" is a string or a list of strings. Webhooks (comments, reactions)
+only know the platform's id, and JSON containment cannot use an index for
+that, so every id is mirrored into SocialPostRef (platform, external_id),
+which answers the lookup with a single indexed probe.
+
+The refs are rewritten whenever post_ids is saved (signals.py); the
+`backfill_post_refs` command rebuilds them for existing posts.
+"""
+import logging
+from typing import Iterable, Optional, Set, Tuple
+
+from django.db import transaction
+
+from ..models import SocialPost, SocialPostRef
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def extract_refs(post_ids) -> Set[Tuple[str, str]]:
+    """(platform, external_id) for every platform post id in a post_ids list."""
+    refs = set()
+    for item in post_ids or []:
+        if not isinstance(item, dict):
+            continue
+        platform = str(item.get("platform") or "")
+        value = item.get("post_id")
+        for pid in value if isinstance(value, list) else [value]:
+            if pid is not None and not isinstance(pid, (dict, list)) and str(pid):
+                refs.add((platform, str(pid)))
+    return refs
+
+
+def sync_post(post: SocialPost) -> None:
+    """Make the post's refs match its post_ids."""
+    wanted = extract_refs(post.post_ids)
+    with transaction.atomic():
+        current = {
+            (platform, external_id): pk
+            for pk, platform, external_id in SocialPostRef.objects.filter(post=post).values_list(
+                "pk", "platform", "external_id"
+            )
+        }
+        stale = [pk for ref, pk in current.items() if ref not in wanted]
+        if stale:
+            SocialPostRef.objects.filter(pk__in=stale).delete()
+        missing = wanted - current.keys()
+        if missing:
+            # an id already indexed for another post keeps pointing there (first one wins)
+            SocialPostRef.objects.bulk_create(
+                [SocialPostRef(post=post, platform=platform, external_id=pid) for platform, pid in missing],
+                ignore_conflicts=True,
+            )
+
+
+def find_post(external_id, platform: Optional[str] = None) -> Optional[SocialPost]:
+    refs = SocialPostRef.objects.filter(external_id=str(external_id))
+    if platform:
+        refs = refs.filter(platform=platform)
+    ref = refs.select_related("post").order_by("pk").first()
+    return ref.post if ref else None
+
+
+def backfill(post_ids: Iterable[int] = None) -> int:
+    """Rebuild the refs of the given posts (default: all). Returns the number of posts indexed."""
+    posts = SocialPost.objects.exclude(post_ids=[]).only("id", "post_ids").order_by("pk")
+    if post_ids is not None:
+        posts = posts.filter(pk__in=list(post_ids))
+
+    count = 0
+    for post in posts.iterator(chunk_size=BATCH_SIZE):
+        sync_post(post)
+        count += 1
+    logger.info(f"Indexed platform post ids of {count} posts")
+    return count
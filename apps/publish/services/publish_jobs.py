@@ -0,0 +1,269 @@
+"""
+Background multi-platform publishing.
+
+A publish request only marks each platform's entry in SocialPost.post_ids as
+"pending" and returns. After commit, every platform is published as its own
+job, concurrently: on Celery workers when SOCIAL_PUBLISH_MODE="queue",
+otherwise on an in-process thread pool. A post to three platforms then takes
+as long as the slowest one instead of the sum of all of them.
+
+Each job retries transient failures with exponential backoff. Only errors
+where the platform cannot have created the post are retried (is_transient), so a
+retry never posts twice. Each job records its progress on its own entry
+(running -> retrying -> success / failed) under a row lock, so concurrent jobs
+never overwrite each other's results. Every finished platform is pushed to the
+author's notification websocket group; the publish-status endpoint reads the
+same entries.
+
+Entries carry the time their job was started. One still unfinished after
+SOCIAL_PUBLISH_STALE_SECONDS belongs to a job that died with its worker
+(recycle, deploy) and no longer counts as in progress, so the post can be
+published again. start_publish checks that under the post's row lock, so of
+two concurrent publish requests only one starts jobs.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from facebook_business.exceptions import FacebookRequestError
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+from apps.notification.utils import send_realtime_notification
+from ..models import SocialPost
+from .publish_service import (
+    ACTION_CREATE,
+    ACTION_PUBLISH,
+    PublishError,
+    failed_entry,
+    publish_to_platform,
+    replace_entry,
+)
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_RETRYING = "retrying"
+STATUS_SUCCESS = "success"
+STATUS_FAILED = "failed"
+IN_PROGRESS = (STATUS_PENDING, STATUS_RUNNING, STATUS_RETRYING)
+
+EVENT_TYPE = "social_post_publish"
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _mode() -> str:
+    return (getattr(settings, "SOCIAL_PUBLISH_MODE", "thread") or "").lower()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "SOCIAL_PUBLISH_WORKERS", 6),
+                    thread_name_prefix="social-publish",
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _in_pool(fn: Callable, *args):
+    try:
+        return fn(*args)
+    finally:
+        # pool threads are long lived; do not keep their DB connections open
+        connections.close_all()
+
+
+class PublishInProgress(Exception):
+    """start_publish found live jobs for the post; carries its post_ids."""
+
+    def __init__(self, post_ids):
+        super().__init__("Social post publishing is already in progress")
+        self.post_ids = post_ids
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Failures a retry cannot turn into a duplicate post: no connection could be
+    opened (connect timeout, refused, DNS), or the Graph API flags the error as
+    transient. A read timeout or a connection aborted mid-request is not one of
+    them: the platform may already have the request and have created the post.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = error.args[0] if error.args else None
+        # requests wraps connect failures in MaxRetryError; ProtocolError comes unwrapped
+        reason = getattr(reason, "reason", reason)
+        return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+    if isinstance(error, FacebookRequestError):
+        return bool(error.api_transient_error())
+    return False
+
+
+# ----------------------------------
+# Progress
+# ----------------------------------
+def _is_live(item, now) -> bool:
+    if item.get("status") not in IN_PROGRESS:
+        return False
+    started_at = parse_datetime(item.get("started_at") or "")
+    stale_after = timedelta(seconds=getattr(settings, "SOCIAL_PUBLISH_STALE_SECONDS", 1800))
+    # entries without a start time predate it and were left by jobs that are gone
+    return started_at is not None and now - started_at < stale_after
+
+
+def is_in_progress(post: SocialPost) -> bool:
+    now = timezone.now()
+    return any(_is_live(item, now) for item in post.post_ids or [])
+
+
+def _merged(post_ids, entry):
+    """entry on top of the platform's current one; keeps its post_id/draft_id, drops a stale error."""
+    current = next((item for item in post_ids or [] if item.get("platform") == entry["platform"]), {})
+    merged = {k: v for k, v in current.items() if k != "error"}
+    merged.update(entry)
+    return merged
+
+
+def _record(post_id, entry, action=None, platforms=(), merge=True):
+    """
+    Store one platform's entry (a success replaces it, anything else is merged
+    into it). When it was the last one of the job to finish, also settle
+    is_published for a publish job. Returns (post, finished).
+    """
+    with transaction.atomic():
+        post = SocialPost.objects.select_for_update().get(pk=post_id)
+        post.post_ids = replace_entry(post.post_ids, _merged(post.post_ids, entry) if merge else entry)
+        update_fields = ["post_ids"]
+
+        statuses = {item.get("platform"): item.get("status") for item in post.post_ids}
+        finished = bool(platforms) and not any(statuses.get(name) in IN_PROGRESS for name in platforms)
+        if finished and action == ACTION_PUBLISH:
+            post.is_published = all(statuses.get(name) == STATUS_SUCCESS for name in platforms)
+            update_fields.append("is_published")
+        post.save(update_fields=update_fields)
+    return post, finished
+
+
+def _notify(post, entry, finished):
+    try:
+        send_realtime_notification(post.author_id, {
+            "type": EVENT_TYPE,
+            "post_id": post.pk,
+            "platform": entry["platform"],
+            "status": entry["status"],
+            "entry": entry,
+            "finished": finished,
+            "is_published": post.is_published,
+        })
+    except Exception as e:
+        logger.warning(f"Publish event for post={post.pk} not delivered: {e}")
+
+
+# ----------------------------------
+# Jobs
+# ----------------------------------
+def run_platform(post_id, user_id, platform_name, media_urls, action=ACTION_CREATE, platforms=()):
+    """Publish one platform of a post with retry/backoff and record the outcome."""
+    retries = max(1, getattr(settings, "SOCIAL_PUBLISH_RETRIES", 3))
+    backoff = getattr(settings, "SOCIAL_PUBLISH_BACKOFF", 2)
+    platforms = list(platforms) or [platform_name]
+
+    post = SocialPost.objects.filter(pk=post_id).first()
+    user = User.objects.filter(pk=user_id).first()
+    if post is None or user is None:
+        logger.warning(f"Publish job dropped: post={post_id} user={user_id} no longer exists")
+        return
+
+    _record(post_id, {"platform": platform_name, "status": STATUS_RUNNING, "attempt": 1})
+    entry = None
+    for attempt in range(1, retries + 1):
+        try:
+            entry = publish_to_platform(user, post, platform_name, media_urls, action)
+            break
+        except PublishError as e:
+            entry = failed_entry(platform_name, e)
+            break
+        except Exception as e:
+            logger.warning(f"Publishing post={post_id} to {platform_name} failed (attempt {attempt}/{retries}): {e}")
+            if attempt == retries or not is_transient(e):
+                entry = failed_entry(platform_name, e)
+                break
+            _record(post_id, {
+                "platform": platform_name,
+                "status": STATUS_RETRYING,
+                "attempt": attempt + 1,
+                "error": str(e),
+            })
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+    post, finished = _record(post_id, entry, action, platforms, merge=entry["status"] != STATUS_SUCCESS)
+    _notify(post, entry, finished)
+
+
+def _dispatch(post_id, user_id, platform_names, media_urls, action):
+    for name in platform_names:
+        if _mode() == "queue":
+            try:
+                from ..tasks import publish_platform
+
+                publish_platform.delay(post_id, user_id, name, media_urls, action, platform_names)
+                continue
+            except Exception as e:
+                logger.exception(f"Publish enqueue failed for post={post_id} platform={name}, using a thread: {e}")
+        _get_executor().submit(_in_pool, _run_logged, post_id, user_id, name, media_urls, action, platform_names)
+
+
+def _run_logged(*args):
+    try:
+        run_platform(*args)
+    except Exception as e:
+        logger.exception(f"Publish job failed for post={args[0]} platform={args[2]}: {e}")
+
+
+def start_publish(user, post, platform_names, media_urls, action=ACTION_CREATE) -> list:
+    """
+    Mark the platforms pending and start one job per platform after commit.
+    Returns the post's post_ids as stored; raises PublishInProgress when earlier
+    jobs for the post are still live.
+    """
+    platform_names = list(dict.fromkeys(platform_names))
+    with transaction.atomic():
+        locked = SocialPost.objects.select_for_update().get(pk=post.pk)
+        if is_in_progress(locked):
+            raise PublishInProgress(locked.post_ids)
+        post_ids = locked.post_ids or []
+        for name in platform_names:
+            # the previous post_id stays: publishing a draft needs it
+            post_ids = replace_entry(post_ids, _merged(post_ids, {
+                "platform": name,
+                "status": STATUS_PENDING,
+                "started_at": timezone.now().isoformat(),
+            }))
+        locked.post_ids = post_ids
+        locked.save(update_fields=["post_ids"])
+        post.post_ids = post_ids
+
+        transaction.on_commit(
+            lambda: _dispatch(post.pk, user.pk, platform_names, list(media_urls), action)
+        )
+    return post_ids
@@ -34,7 +34,7 @@ def _resolve_tiktok_token(account):
     return account.access_token or account.long_lived_token or account.user_access_token
 
 
-def _resolve_media_urls(post):
+def resolve_media_urls(post):
     urls = []
     for media in post.media.all():
         file_url = media.file.url
@@ -46,38 +46,56 @@ def _resolve_media_urls(post):
     return urls
 
 
-def _replace_or_append_post_id(post_ids, platform_name, post_id, extra=None):
-    extra = extra or {}
+# ----------------------------------
+# post_ids entries
+# ----------------------------------
+def success_entry(platform_name, post_id, extra=None):
+    payload = {
+        "platform": platform_name,
+        "post_id": post_id,
+        "status": "success",
+    }
+    payload.update(extra or {})
+    return payload
+
+
+def failed_entry(platform_name, error):
+    return {
+        "platform": platform_name,
+        "status": "failed",
+        "error": str(error)
+    }
+
+
+def replace_entry(post_ids, entry):
+    """post_ids with the entry of entry["platform"] replaced, or appended if it has none."""
     updated = []
     replaced = False
     for item in post_ids or []:
-        if item.get("platform") == platform_name:
-            payload = {
-                "platform": platform_name,
-                "post_id": post_id,
-                "status": "success",
-            }
-            payload.update(extra)
-            updated.append(payload)
+        if item.get("platform") == entry["platform"]:
+            updated.append(dict(entry))
             replaced = True
         else:
             updated.append(item)
     if not replaced:
-        payload = {
-            "platform": platform_name,
-            "post_id": post_id,
-            "status": "success",
-        }
-        payload.update(extra)
-        updated.append(payload)
+        updated.append(dict(entry))
     return updated
 
 
-def publish_to_platforms(user, post, platforms, media_urls):
-    post_ids = []
+# ----------------------------------
+# One platform
+# ----------------------------------
+class PublishError(Exception):
+    """A platform failure that retrying cannot fix (missing account/page, unsupported platform)."""
+
+
+ACTION_CREATE = "create"
+ACTION_PUBLISH = "publish"
+
+
+def build_caption(post):
     hashtags = format_hashtags(post.hashtags)
-    print(hashtags)
-    caption = F"""
+    return F"""
     {post.caption}
     
     .
@@ -86,79 +104,135 @@ def publish_to_platforms(user, post, platforms, media_urls):
     {hashtags}
     """
 
-    for platform in platforms:
-        try:
-            account = SocialAccount.objects.get(
-                user=user,
-                platform=platform.name
-            )
-
-            if platform.name == "facebook":
-                page = FacebookPage.objects.filter(
-                    social_account=account,
-                    is_active=True
-                ).first()
-
-                if not page:
-                    raise Exception("Facebook page not found")
-
-                post_id = publish_fb_post(
-                    page_id=page.page_id,
-                    page_access_token=page.page_access_token,
-                    message=caption,
-                    image_urls=media_urls,
-                    publish=post.is_published
-                )
-                post.page_access_token = page.page_access_token
-                post.save()
-            elif platform.name == "instagram":
-                ig = InstagramAccount.objects.filter(
-                    user=user,
-                    social_account=account,
-                    is_active=True
-                ).first()
-
-                if not ig:
-                    raise Exception("Instagram account not found")
-
-                post_id = create_ig_post(
-                    ig_user_id=ig.ig_user_id,
-                    access_token=account.long_lived_token,
-                    caption=caption,
-                    media_urls=media_urls,
-                    publish=post.is_published
-                )
-
-            elif platform.name == "tiktok":
-                token = _resolve_tiktok_token(account)
-                result = create_tiktok_post(
-                    access_token=token,
-                    caption=caption,
-                    media_urls=media_urls,
-                    publish=post.is_published,
-                )
-                post_id = result.get("publish_id")
-
-            else:
-                raise Exception("Unsupported platform")
-
-            payload = {
-                "platform": platform.name,
-                "post_id": post_id,
-                "status": "success"
-            }
-            if platform.name == "tiktok":
-                payload["details"] = result.get("raw", {})
-            post_ids.append(payload)
-
-        except Exception as e:
-            post_ids.append({
-                "platform": platform.name,
-                "status": "failed",
-                "error": str(e)
-            })
-
-    return post_ids
+
+def _get_account(user, platform_name):
+    try:
+        return SocialAccount.objects.get(user=user, platform=platform_name)
+    except SocialAccount.DoesNotExist:
+        raise PublishError(f"{platform_name} account not found")
+
+
+def _create_on_platform(user, post, platform_name, media_urls):
+    """New post on one platform (draft unless post.is_published). Returns its post_ids entry."""
+    account = _get_account(user, platform_name)
+    caption = build_caption(post)
+    result = None
+
+    if platform_name == "facebook":
+        page = FacebookPage.objects.filter(
+            social_account=account,
+            is_active=True
+        ).first()
+
+        if not page:
+            raise PublishError("Facebook page not found")
+
+        post_id = publish_fb_post(
+            page_id=page.page_id,
+            page_access_token=page.page_access_token,
+            message=caption,
+            image_urls=media_urls,
+            publish=post.is_published
+        )
+        # a column update: other platforms are writing post_ids at the same time
+        post.page_access_token = page.page_access_token
+        type(post).objects.filter(pk=post.pk).update(page_access_token=page.page_access_token)
+    elif platform_name == "instagram":
+        ig = InstagramAccount.objects.filter(
+            user=user,
+            social_account=account,
+            is_active=True
+        ).first()
+
+        if not ig:
+            raise PublishError("Instagram account not found")
+
+        post_id = create_ig_post(
+            ig_user_id=ig.ig_user_id,
+            access_token=account.long_lived_token,
+            caption=caption,
+            media_urls=media_urls,
+            publish=post.is_published
+        )
+
+    elif platform_name == "tiktok":
+        token = _resolve_tiktok_token(account)
+        result = create_tiktok_post(
+            access_token=token,
+            caption=caption,
+            media_urls=media_urls,
+            publish=post.is_published,
+        )
+        post_id = result.get("publish_id")
+
+    else:
+        raise PublishError("Unsupported platform")
+
+    if platform_name == "tiktok":
+        return success_entry(platform_name, post_id, {"details": result.get("raw", {})})
+    return success_entry(platform_name, post_id)
+
+
+def _publish_on_platform(user, post, platform_name, media_urls):
+    """Publish an existing (draft) post on one platform. Returns its post_ids entry."""
+    account = _get_account(user, platform_name)
+
+    if platform_name == "facebook":
+        page = FacebookPage.objects.filter(
+            user=user,
+            social_account=account,
+            is_active=True
+        ).first()
+
+        if not page:
+            raise PublishError("Facebook page not found")
+        fb_post_id = publish_fb_post(
+            page_id=page.page_id,
+            page_access_token=page.page_access_token,
+            message=post.caption,
+            image_urls=media_urls,
+            publish=True
+        )
+        return success_entry("facebook", fb_post_id)
+
+    if platform_name == "instagram":
+        ig = InstagramAccount.objects.filter(
+            user=user,
+            social_account=account,
+            is_active=True
+        ).first()
+
+        if not ig:
+            raise PublishError("Instagram account not found")
+        ig_post_id = get_draft_post_id(post.post_ids, "instagram")
+        if not ig_post_id:
+            raise PublishError("Instagram draft post not found")
+        ig_publish_res = publish_ig_post(ig.ig_user_id, ig_post_id, account.long_lived_token)
+        published_id = (
+            ig_publish_res.get("id")
+            if isinstance(ig_publish_res, dict)
+            else ig_post_id
+        )
+        return success_entry("instagram", published_id, {"draft_id": ig_post_id})
+
+    if platform_name == "tiktok":
+        token = _resolve_tiktok_token(account)
+        result = create_tiktok_post(
+            access_token=token,
+            caption=post.caption,
+            media_urls=media_urls,
+            publish=True,
+        )
+        return success_entry("tiktok", result.get("publish_id"), {"details": result.get("raw", {})})
+
+    raise PublishError("Unsupported platform")
+
+
+def publish_to_platform(user, post, platform_name, media_urls, action=ACTION_CREATE):
+    """Run one platform of a publish; returns its post_ids entry and raises on failure."""
+    if action == ACTION_PUBLISH:
+        return _publish_on_platform(user, post, platform_name, media_urls)
+    return _create_on_platform(user, post, platform_name, media_urls)
 
 
 def get_platform_post_id(post_ids, platform_name):
@@ -168,99 +242,9 @@ def get_platform_post_id(post_ids, platform_name):
     return None
 
 
-def publish_post(user, post):
-    publish_results = []
-    all_success = True
-    media_urls = _resolve_media_urls(post)
-    existing_post_ids = post.post_ids or []
-
-    for platform in post.platforms.all():
-        try:
-            account = SocialAccount.objects.get(
-                user=user,
-                platform=platform.name
-            )
-            if platform.name == "facebook":
-                page = FacebookPage.objects.filter(
-                    user=user,
-                    social_account=account,
-                    is_active=True
-                ).first()
-
-                if not page:
-                    raise Exception("Facebook page not found")
-                fb_post_id = publish_fb_post(
-                    page_id=page.page_id,
-                    page_access_token=page.page_access_token,
-                    message=post.caption,
-                    image_urls=media_urls,
-                    publish=True
-                )
-                existing_post_ids = _replace_or_append_post_id(
-                    existing_post_ids,
-                    "facebook",
-                    fb_post_id,
-                )
-            elif platform.name == "instagram":
-                ig = InstagramAccount.objects.filter(
-                    user=user,
-                    social_account=account,
-                    is_active=True
-                ).first()
-
-                if not ig:
-                    raise Exception("Instagram account not found")
-                ig_post_id = get_platform_post_id(post.post_ids, "instagram")
-                if not ig_post_id:
-                    raise Exception("Instagram draft post not found")
-                ig_publish_res = publish_ig_post(ig.ig_user_id, ig_post_id, account.long_lived_token)
-                published_id = (
-                    ig_publish_res.get("id")
-                    if isinstance(ig_publish_res, dict)
-                    else ig_post_id
-                )
-                existing_post_ids = _replace_or_append_post_id(
-                    existing_post_ids,
-                    "instagram",
-                    published_id,
-                    extra={"draft_id": ig_post_id},
-                )
-                
-            elif platform.name == "tiktok":
-                token = _resolve_tiktok_token(account)
-                result = create_tiktok_post(
-                    access_token=token,
-                    caption=post.caption,
-                    media_urls=media_urls,
-                    publish=True,
-                )
-                publish_id = result.get("publish_id")
-                existing_post_ids = _replace_or_append_post_id(
-                    existing_post_ids,
-                    "tiktok",
-                    publish_id,
-                    extra={"details": result.get("raw", {})},
-                )
-
-            else:
-                raise Exception("Unsupported platform")
-
-            publish_results.append({
-                "platform": platform.name,
-                "status": "success",
-            })
-        except Exception as e:
-            all_success = False
-            publish_results.append({
-                "platform": platform.name,
-                "status": "failed",
-                "error": str(e),
-            })
-
-    post.post_ids = existing_post_ids
-    post.save(update_fields=["post_ids"])
-    return {
-        "success": all_success,
-        "results": publish_results,
-        "post_ids": existing_post_ids,
-    }
+def get_draft_post_id(post_ids, platform_name):
+    """The draft id to publish, whatever the entry's status (queued, or a failed earlier publish)."""
+    for item in post_ids or []:
+        if item.get("platform") == platform_name:
+            return item.get("draft_id") or item.get("post_id")
+    return None
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import SocialPost
+from .services import post_index
+
+
+# keep the platform post id index in step with SocialPost.post_ids
+@receiver(post_save, sender=SocialPost)
+def sync_post_refs(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and "post_ids" not in update_fields):
+        return
+    if created and not instance.post_ids:
+        return
+    post_index.sync_post(instance)
@@ -0,0 +1,19 @@
+import logging
+
+from celery import shared_task
+
+from .services.publish_jobs import run_platform
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def publish_platform(post_id, user_id, platform_name, media_urls, action, platforms):
+    """
+    Publishes one platform of a post (SOCIAL_PUBLISH_MODE=queue); retries run inside the job.
+    Not acks_late: a redelivered job could publish the same post twice.
+    """
+    try:
+        run_platform(post_id, user_id, platform_name, media_urls, action, platforms)
+    except Exception as exc:
+        logger.exception("[PUBLISH][WORKER] post=%s platform=%s failed: %s", post_id, platform_name, exc)
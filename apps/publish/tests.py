@@ -1,3 +1,183 @@
-from django.test import TestCase
+import importlib
+from datetime import timedelta
+from http.client import RemoteDisconnected
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from urllib3.exceptions import MaxRetryError, NameResolutionError, NewConnectionError, ProtocolError
+
+from apps.publish.services import post_index
+from apps.publish.services.post_dispatch_feed import get_post
+from apps.publish.services.post_index import extract_refs
+from apps.publish.models import SocialPost, SocialPostRef
+from apps.publish.services import publish_jobs
+from apps.publish.services.publish_jobs import PublishInProgress, _merged, is_in_progress, is_transient, start_publish
+from apps.publish.views import SocialPostdetailView
+from apps.publish.services.publish_service import get_draft_post_id, replace_entry, success_entry
+
+
+class PostIndexTests(SimpleTestCase):
+    def test_refs_cover_string_and_list_post_ids(self):
+        post_ids = [
+            {"platform": "facebook", "post_id": ["123_456", "123_789"], "status": "success"},
+            {"platform": "tiktok", "post_id": 998877, "status": "success"},
+            {"platform": "instagram", "status": "failed", "error": "Instagram account not found"},
+        ]
+        self.assertEqual(
+            extract_refs(post_ids),
+            {("facebook", "123_456"), ("facebook", "123_789"), ("tiktok", "998877")},
+        )
+
+    def test_malformed_entries_are_skipped(self):
+        self.assertEqual(extract_refs([None, "x", {"platform": "tiktok", "post_id": {"id": 1}}]), set())
+        self.assertEqual(extract_refs(None), set())
+
+
+class PostIndexSyncTests(TestCase):
+    def setUp(self):
+        self.author = get_user_model().objects.create_user(email="author@example.com", password="pw")
+
+    def _post(self, post_ids=()):
+        return SocialPost.objects.create(author=self.author, caption="Eid sale", post_ids=list(post_ids))
+
+    def test_saving_post_ids_keeps_the_refs_in_step(self):
+        post = self._post([{"platform": "facebook", "post_id": ["123_456", "123_789"], "status": "success"}])
+        self.assertEqual(get_post("123_456"), post)
+        self.assertEqual(get_post(["123_789"]), post)
+
+        post.post_ids = [{"platform": "facebook", "post_id": "123_999", "status": "success"}]
+        post.save()
+        self.assertIsNone(get_post("123_456"))
+        self.assertEqual(get_post("123_999"), post)
+
+        post.post_ids = []
+        post.save(update_fields=["post_ids"])
+        self.assertIsNone(get_post("123_999"))
+        self.assertFalse(SocialPostRef.objects.exists())
+
+    def test_saves_that_skip_post_ids_leave_the_refs_alone(self):
+        post = self._post([{"platform": "tiktok", "post_id": 998877, "status": "success"}])
+        post.post_ids = []
+        with self.assertNumQueries(1):
+            post.save(update_fields=["caption"])
+        self.assertEqual(get_post("998877"), post)
+
+    def test_lookup_by_platform_and_first_post_wins(self):
+        first = self._post([{"platform": "facebook", "post_id": "555", "status": "success"}])
+        self._post([{"platform": "facebook", "post_id": "555", "status": "success"}])
+        tiktok = self._post([{"platform": "tiktok", "post_id": "555", "status": "success"}])
+
+        self.assertEqual(post_index.find_post("555", "facebook"), first)
+        self.assertEqual(post_index.find_post("555", "tiktok"), tiktok)
+        self.assertEqual(get_post("555"), first)
+        self.assertIsNone(post_index.find_post("555", "instagram"))
+
+    def test_backfills_rebuild_refs_of_existing_posts(self):
+        post = self._post([{"platform": "facebook", "post_id": "123_456", "status": "success"}])
+        SocialPostRef.objects.all().delete()
+        self.assertIsNone(get_post("123_456"))
+
+        migration = importlib.import_module("apps.publish.migrations.0007_socialpostref")
+        migration.backfill_refs(django_apps, None)
+        self.assertEqual(get_post("123_456"), post)
+
+        SocialPostRef.objects.all().delete()
+        self.assertEqual(post_index.backfill(), 1)
+        self.assertEqual(get_post("123_456"), post)
+
+
+class PublishProgressTests(SimpleTestCase):
+    def test_replace_entry_keeps_other_platforms_in_place(self):
+        post_ids = [
+            {"platform": "facebook", "status": "pending"},
+            {"platform": "tiktok", "status": "pending"},
+        ]
+        updated = replace_entry(post_ids, success_entry("facebook", "123_456"))
+        self.assertEqual([item["platform"] for item in updated], ["facebook", "tiktok"])
+        self.assertEqual(updated[0], {"platform": "facebook", "post_id": "123_456", "status": "success"})
+        self.assertEqual(post_ids[0]["status"], "pending")
+
+    def test_progress_keeps_the_draft_id(self):
+        post_ids = [{"platform": "instagram", "post_id": "draft-1", "status": "failed", "error": "boom"}]
+        pending = _merged(post_ids, {"platform": "instagram", "status": "pending"})
+        self.assertEqual(pending, {"platform": "instagram", "post_id": "draft-1", "status": "pending"})
+        self.assertEqual(get_draft_post_id([pending], "instagram"), "draft-1")
+
+
+@override_settings(SOCIAL_PUBLISH_STALE_SECONDS=600)
+class PublishStalenessTests(SimpleTestCase):
+    def _post(self, **entry):
+        return SimpleNamespace(post_ids=[{"platform": "facebook", **entry}])
+
+    def test_recent_job_is_in_progress(self):
+        started_at = (timezone.now() - timedelta(seconds=30)).isoformat()
+        self.assertTrue(is_in_progress(self._post(status="running", started_at=started_at)))
+
+    def test_job_left_by_a_dead_worker_is_not(self):
+        started_at = (timezone.now() - timedelta(hours=1)).isoformat()
+        self.assertFalse(is_in_progress(self._post(status="pending", started_at=started_at)))
+        self.assertFalse(is_in_progress(self._post(status="retrying")))
+
+    def test_only_undelivered_requests_are_retried(self):
+        # the shapes requests raises: connect failures wrapped in MaxRetryError
+        refused = NewConnectionError(None, "Connection refused")
+        unresolved = NameResolutionError("graph.facebook.com", None, "no such host")
+        for reason in (refused, unresolved):
+            self.assertTrue(is_transient(requests.ConnectionError(MaxRetryError(None, "/", reason))))
+        self.assertTrue(is_transient(requests.exceptions.ConnectTimeout("no route")))
+        self.assertFalse(is_transient(requests.exceptions.ReadTimeout("no answer")))
+        self.assertFalse(is_transient(ValueError("TikTok publish init failed")))
+
+    def test_connection_aborted_mid_request_is_not_retried(self):
+        aborted = ProtocolError("Connection aborted.", RemoteDisconnected("Remote end closed connection without response"))
+        self.assertFalse(is_transient(requests.ConnectionError(aborted)))
+        self.assertFalse(is_transient(requests.ConnectionError("Connection aborted.")))
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    SOCIAL_PUBLISH_STALE_SECONDS=600,
+)
+class StartPublishTests(TestCase):
+    def setUp(self):
+        self.author = get_user_model().objects.create_user(email="author@example.com", password="pw")
+        started_at = timezone.now().isoformat()
+        self.post = SocialPost.objects.create(
+            author=self.author, caption="Eid sale",
+            post_ids=[{"platform": "facebook", "status": "running", "started_at": started_at}],
+        )
+        self.dispatch = self.enterContext(mock.patch.object(publish_jobs, "_dispatch"))
+
+    def test_live_jobs_block_a_second_start_under_the_row_lock(self):
+        stored = list(self.post.post_ids)
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(PublishInProgress) as raised:
+            start_publish(self.author, self.post, ["facebook"], [])
+
+        self.assertEqual(raised.exception.post_ids, stored)
+        self.assertEqual(SocialPost.objects.get(pk=self.post.pk).post_ids, stored)
+        self.dispatch.assert_not_called()
+
+    def test_publish_request_during_a_live_job_is_a_conflict(self):
+        request = APIRequestFactory().patch(f"/api/publish/post/{self.post.pk}/", {"is_published": True}, format="json")
+        force_authenticate(request, user=self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = SocialPostdetailView.as_view()(request, post_id=self.post.pk)
+
+        self.assertEqual(response.status_code, 409)
+        self.dispatch.assert_not_called()
+
+    def test_stale_jobs_do_not_block(self):
+        SocialPost.objects.filter(pk=self.post.pk).update(post_ids=[
+            {"platform": "facebook", "status": "running", "started_at": (timezone.now() - timedelta(hours=1)).isoformat()},
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            post_ids = start_publish(self.author, self.post, ["facebook"], [])
+
+        self.assertEqual(post_ids[0]["status"], "pending")
+        self.dispatch.assert_called_once()
@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (SocialPostView, SocialMediaGalleryView, SocialPostPublishView
                     ,PlatformPageListView, SocialPlatformListView, SocialPostdetailView, GeneratePostCaption,
+                    SocialPostPublishStatusView,
                     demoImage, PostInsightsView
                     )
 
@@ -9,6 +10,7 @@ urlpatterns = [
     path("post/", SocialPostView.as_view()),
     path("insights/<int:post_id>/", PostInsightsView.as_view()),
     path("post/<int:post_id>/", SocialPostdetailView.as_view()),
+    path("post/<int:post_id>/publish-status/", SocialPostPublishStatusView.as_view()),
     path("media/", SocialMediaGalleryView.as_view()),
     path("publish/", SocialPostPublishView.as_view()),
     path("pages/", PlatformPageListView.as_view()),
@@ -17,7 +17,8 @@ from .utils.publish_Facebook_post import publish_fb_post, get_post_insights
 from .utils.instagram_post import create_ig_post
 from .utils.tiktok_post import get_tiktok_post_details
 from .services.media_service import save_media_files
-from .services.publish_service import publish_to_platforms, publish_post
+from .services.publish_service import ACTION_PUBLISH, resolve_media_urls
+from .services.publish_jobs import PublishInProgress, is_in_progress, start_publish
 from .services.post_generations import generate_caption, generate_hashtags, generate_image
 
 
@@ -88,16 +89,14 @@ class SocialPostView(APIView):
                 for media in post.media.all()
             ]
 
-            post_ids = publish_to_platforms(
-                request.user, post, platforms, media_urls
+            # platforms are published in the background once the post is committed
+            post_ids = start_publish(
+                request.user, post, [platform.name for platform in platforms], media_urls
             )
 
-            post.post_ids = post_ids
-            post.save(update_fields=["post_ids"])
-
         return self.success(
-            message="Social post created successfully",
-            status_code=status.HTTP_201_CREATED,
+            message="Social post created, publishing in progress",
+            status_code=status.HTTP_202_ACCEPTED,
             data={"post_id": post.id, "platform_posts": post_ids}
         )
         
@@ -180,22 +179,53 @@ class SocialPostdetailView(APIView):
                 },
             )
 
-        post.is_published = True
-        res = publish_post(request.user, post)
-        if isinstance(res, dict) and res.get("success"):
-            post.save()
-            return self.success(
-                message="Social post published successfully",
-                status_code=status.HTTP_200_OK,
-                data=res
+        # is_published is set by the publish job once every platform has succeeded
+        try:
+            post_ids = start_publish(
+                request.user,
+                post,
+                [platform.name for platform in post.platforms.all()],
+                resolve_media_urls(post),
+                action=ACTION_PUBLISH,
             )
+        except PublishInProgress as e:
+            return self.error(
+                message="Social post publishing is already in progress",
+                status_code=status.HTTP_409_CONFLICT,
+                errors={"post_ids": e.post_ids or []},
+            )
+        return self.success(
+            message="Social post publishing started",
+            status_code=status.HTTP_202_ACCEPTED,
+            data={
+                "success": True,
+                "results": [],
+                "post_ids": post_ids,
+            },
+        )
+
 
-        post.is_published = False
-        post.save(update_fields=["is_published"])
-        return self.error(
-            message="Social post publishing failed",
-            errors={"results": (res or {}).get("results", [])} if isinstance(res, dict) else None,
-            status_code=status.HTTP_400_BAD_REQUEST,
+class SocialPostPublishStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, post_id):
+        post = SocialPost.objects.filter(id=post_id, author=request.user).only(
+            "id", "is_published", "post_ids"
+        ).first()
+        if not post:
+            return self.error(
+                message="Social post not found",
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+        return self.success(
+            message="Social post publish status fetched successfully",
+            status_code=status.HTTP_200_OK,
+            data={
+                "post_id": post.id,
+                "in_progress": is_in_progress(post),
+                "is_published": post.is_published,
+                "platforms": post.post_ids or [],
+            },
         )
         
         
@@ -0,0 +1,20 @@
+import logging
+
+from celery import shared_task
+
+from .webhook_queue import run_webhook_event
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(acks_late=True, ignore_result=True)
+def process_webhook_event(kind, page_id, payload):
+    """
+    Drains one webhook event from its partition queue (social_webhooks.<n>).
+    Run one single-concurrency worker per partition to keep per-conversation order.
+    No automatic retry: a retried event would be re-queued behind newer messages.
+    """
+    try:
+        run_webhook_event(kind, page_id, payload)
+    except Exception as exc:
+        logger.exception("[WEBHOOK][WORKER] %s event processing error: %s", kind, exc)
@@ -1,3 +1,5 @@
+from unittest import mock
+
 from django.test import SimpleTestCase, override_settings
 from django.urls import resolve
 
@@ -7,6 +9,13 @@ from apps.social.views import (
     TikTokWebhook,
     WhatsAppBusinessAccountListView,
 )
+from apps.social.webhook_queue import (
+    EVENT_MESSAGING,
+    EVENT_WHATSAPP,
+    ingest_meta_webhook,
+    iter_meta_events,
+    partition_for,
+)
 
 
 class SocialRoutesTests(SimpleTestCase):
@@ -33,3 +42,53 @@ class SocialRoutesTests(SimpleTestCase):
     def test_whatsapp_accounts_route_exists(self):
         match = resolve("/api/social/whatsapp/accounts/")
         self.assertIs(match.func.view_class, WhatsAppBusinessAccountListView)
+
+
+class WebhookQueueTests(SimpleTestCase):
+    def test_whatsapp_change_is_split_per_customer(self):
+        payload = {
+            "entry": [{
+                "id": "waba-1",
+                "changes": [{
+                    "field": "messages",
+                    "value": {
+                        "metadata": {"phone_number_id": "pn-1"},
+                        "messages": [
+                            {"from": "111", "id": "m1"},
+                            {"from": "222", "id": "m2"},
+                            {"from": "111", "id": "m3"},
+                        ],
+                    },
+                }],
+            }],
+        }
+        events = list(iter_meta_events(payload))
+        self.assertEqual([e[0] for e in events], [EVENT_WHATSAPP, EVENT_WHATSAPP])
+        first = events[0][2]["value"]
+        self.assertEqual([m["id"] for m in first["messages"]], ["m1", "m3"])
+        self.assertEqual(first["metadata"], {"phone_number_id": "pn-1"})
+        self.assertEqual(events[0][3], "wa:pn-1:111")
+
+    def test_messaging_events_partition_by_conversation(self):
+        payload = {
+            "entry": [{
+                "id": "page-1",
+                "messaging": [
+                    {"sender": {"id": "psid-1"}, "message": {"text": "hi"}},
+                    {"recipient": {"id": "psid-1"}, "read": {"watermark": 1}},
+                ],
+            }],
+        }
+        events = list(iter_meta_events(payload))
+        self.assertEqual({e[0] for e in events}, {EVENT_MESSAGING})
+        self.assertEqual(events[0][3], events[1][3])
+        self.assertEqual(partition_for(events[0][3], 8), partition_for(events[1][3], 8))
+
+    @override_settings(SOCIAL_WEBHOOK_INGEST_MODE="queue")
+    def test_queue_mode_enqueues_without_dispatching(self):
+        payload = {"entry": [{"id": "page-1", "messaging": [{"sender": {"id": "psid-1"}, "message": {}}]}]}
+        with mock.patch("apps.social.webhook_queue._enqueue") as enqueue, \
+                mock.patch("apps.social.webhook_queue.run_webhook_event") as run:
+            self.assertEqual(ingest_meta_webhook(payload), 1)
+        enqueue.assert_called_once()
+        run.assert_not_called()
@@ -29,12 +29,7 @@ from .serializers import (
     WhatsAppBusinessAccountSerializer,
 )
 from .utils import get_long_lived_token
-from .webhook_helper import (
-    dispatch_feed,
-    dispatch_messaging,
-    dispatch_tiktok_feed,
-    dispatch_whatsapp_messages,
-)
+from .webhook_queue import ingest_meta_webhook, ingest_tiktok_webhook
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -686,19 +681,7 @@ class FacebookWebhook(APIView):
     def post(self, request, *args, **kwargs):
         data = request.data
         try:
-            for entry in data.get("entry", []):
-                page_id = entry.get("id")
-
-                for change in entry.get("changes", []):
-                    field = change.get("field")
-                    if field == "feed":
-                        dispatch_feed(page_id, change)
-                    elif field == "messages":
-                        dispatch_whatsapp_messages(entry, change)
-
-                for event in entry.get("messaging", []):
-                    dispatch_messaging(page_id, event)
-
+            ingest_meta_webhook(data)
         except Exception as exc:
             logger.exception("Facebook webhook processing error: %s", exc)
             # Meta wants 200 even if you fail processing
@@ -720,11 +703,10 @@ class InstagramWebhook(APIView):
         return Response("Invalid token", status=403)
 
     def post(self, request):
-        data = request.data
-        for entry in data.get("entry", []):
-            page_id = entry.get("id")
-            for event in entry.get("messaging", []):
-                dispatch_messaging(page_id, event)
+        try:
+            ingest_meta_webhook(request.data, include_changes=False)
+        except Exception as exc:
+            logger.exception("Instagram webhook processing error: %s", exc)
         return Response("EVENT_RECEIVED")
 
 
@@ -749,7 +731,7 @@ class TikTokWebhook(APIView):
 
     def post(self, request):
         try:
-            dispatch_tiktok_feed(request.data)
+            ingest_tiktok_webhook(request.data)
         except Exception as exc:
             logger.exception("TikTok webhook processing error: %s", exc)
         return Response("EVENT_RECEIVED", status=status.HTTP_200_OK)
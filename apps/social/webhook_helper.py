@@ -6,6 +6,7 @@ from django.utils import timezone
 from apps.chat.chat_bot import chatbot_reply
 from apps.chat.models import Conversation, Message
 from apps.chat.utils import (
+    get_chat_history,
     handle_message,
     mark_messages_delivered,
     mark_messages_read,
@@ -618,11 +619,14 @@ MESSAGING_DISPATCH = {
 }
 
 
-def dispatch_messaging(page_id: str, event: dict):
+def messaging_user_id(event: dict):
     if "delivery" in event or "read" in event:
-        user_id = (event.get("recipient") or {}).get("id")
-    else:
-        user_id = (event.get("sender") or {}).get("id")
+        return (event.get("recipient") or {}).get("id")
+    return (event.get("sender") or {}).get("id")
+
+
+def dispatch_messaging(page_id: str, event: dict):
+    user_id = messaging_user_id(event)
 
     if not user_id:
         logger.warning(f"[MSG] sender missing: {event}")
@@ -656,24 +660,6 @@ def _get_or_create_whatsapp_social_account(wa_account):
     )
 
 
-def _build_conversation_history(conversation):
-    role_map = {
-        "customer": "user",
-        "bot": "assistant",
-        "seller": "user",
-    }
-    history = []
-    for msg in conversation.messages.all().order_by("created_at"):
-        history.append(
-            {
-                "role": role_map.get(msg.sender_type, "user"),
-                "content": msg.text or "",
-                "time": msg.created_at.isoformat(),
-            }
-        )
-    return history
-
-
 def _store_whatsapp_message(
     conversation,
     sender_type,
@@ -796,7 +782,7 @@ def _process_whatsapp_messages(social_account, wa_account, phone_number_id, valu
         if not text or not conversation.is_bot_active:
             continue
 
-        history = _build_conversation_history(conversation)
+        history = get_chat_history(conversation)
         bot_payload = chatbot_reply(
             text,
             history,
@@ -0,0 +1,179 @@
+import logging
+import zlib
+
+from django.conf import settings
+
+from .webhook_helper import (
+    _normalize_tiktok_events,
+    dispatch_feed,
+    dispatch_messaging,
+    dispatch_tiktok_feed,
+    dispatch_whatsapp_messages,
+    messaging_user_id,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUE_PREFIX = "social_webhooks"
+
+EVENT_FEED = "feed"
+EVENT_MESSAGING = "messaging"
+EVENT_WHATSAPP = "whatsapp"
+EVENT_TIKTOK = "tiktok"
+
+
+# -------------------------
+# Event handlers (shared by inline mode and the Celery worker)
+# -------------------------
+def _run_feed(page_id, payload):
+    dispatch_feed(page_id, payload)
+
+
+def _run_messaging(page_id, payload):
+    dispatch_messaging(page_id, payload)
+
+
+def _run_whatsapp(page_id, payload):
+    dispatch_whatsapp_messages({"id": page_id}, payload)
+
+
+def _run_tiktok(page_id, payload):
+    dispatch_tiktok_feed(payload)
+
+
+EVENT_HANDLERS = {
+    EVENT_FEED: _run_feed,
+    EVENT_MESSAGING: _run_messaging,
+    EVENT_WHATSAPP: _run_whatsapp,
+    EVENT_TIKTOK: _run_tiktok,
+}
+
+
+def run_webhook_event(kind: str, page_id, payload):
+    handler = EVENT_HANDLERS.get(kind)
+    if handler is None:
+        logger.warning("[WEBHOOK] unknown event kind=%s page=%s", kind, page_id)
+        return
+    handler(page_id, payload)
+
+
+# -------------------------
+# Payload splitting
+# -------------------------
+def _split_whatsapp_change(change: dict):
+    """
+    A single WhatsApp change can carry messages/statuses for several customers.
+    Split it so each customer gets its own event (and its own partition).
+    """
+    value = change.get("value") or {}
+    messages = value.get("messages") or []
+    statuses = value.get("statuses") or []
+    if not messages and not statuses:
+        return [("", change)]
+
+    base = {k: v for k, v in value.items() if k not in ("messages", "statuses")}
+    groups = {}
+    for message in messages:
+        group = groups.setdefault(message.get("from") or "", {"messages": [], "statuses": []})
+        group["messages"].append(message)
+    for status_payload in statuses:
+        group = groups.setdefault(status_payload.get("recipient_id") or "", {"messages": [], "statuses": []})
+        group["statuses"].append(status_payload)
+
+    return [
+        (wa_id, {**change, "value": {**base, **parts}})
+        for wa_id, parts in groups.items()
+    ]
+
+
+def iter_meta_events(data: dict, include_changes: bool = True):
+    """
+    Flatten a Facebook/Instagram/WhatsApp webhook body into
+    (kind, page_id, payload, partition_key) tuples, in delivery order.
+    """
+    for entry in (data or {}).get("entry", []) or []:
+        page_id = entry.get("id")
+
+        changes = entry.get("changes", []) if include_changes else []
+        for change in changes or []:
+            field = change.get("field")
+            if field == "feed":
+                value = change.get("value") or {}
+                yield EVENT_FEED, page_id, change, f"feed:{page_id}:{value.get('post_id') or ''}"
+            elif field == "messages":
+                phone_number_id = ((change.get("value") or {}).get("metadata") or {}).get("phone_number_id")
+                for wa_id, sub_change in _split_whatsapp_change(change):
+                    yield EVENT_WHATSAPP, page_id, sub_change, f"wa:{phone_number_id}:{wa_id}"
+
+        for event in entry.get("messaging", []) or []:
+            yield EVENT_MESSAGING, page_id, event, f"msg:{page_id}:{messaging_user_id(event) or ''}"
+
+
+def iter_tiktok_events(data):
+    for event in _normalize_tiktok_events(data):
+        video = event.get("video") if isinstance(event.get("video"), dict) else {}
+        post_key = (
+            event.get("post_id")
+            or event.get("video_id")
+            or event.get("item_id")
+            or video.get("id")
+            or ""
+        )
+        yield EVENT_TIKTOK, None, [event], f"tiktok:{post_key}"
+
+
+# -------------------------
+# Partitioning / enqueue
+# -------------------------
+def partition_for(key: str, partitions: int = None) -> int:
+    """Stable across processes (unlike hash()), so one conversation always lands on one queue."""
+    partitions = max(1, partitions or getattr(settings, "SOCIAL_WEBHOOK_PARTITIONS", 1))
+    return zlib.crc32((key or "").encode("utf-8")) % partitions
+
+
+def queue_name_for(key: str) -> str:
+    return f"{QUEUE_PREFIX}.{partition_for(key)}"
+
+
+def is_queue_mode() -> bool:
+    return (getattr(settings, "SOCIAL_WEBHOOK_INGEST_MODE", "inline") or "").lower() == "queue"
+
+
+def _enqueue(kind, page_id, payload, partition_key):
+    from .tasks import process_webhook_event
+
+    process_webhook_event.apply_async(
+        args=(kind, page_id, payload),
+        queue=queue_name_for(partition_key),
+    )
+
+
+def ingest_events(events):
+    """
+    Queue mode: persist every event to its partition queue and return immediately.
+    Inline mode (or broker down): process in the request like before.
+    """
+    queue_mode = is_queue_mode()
+    count = 0
+    for kind, page_id, payload, partition_key in events:
+        count += 1
+        if queue_mode:
+            try:
+                _enqueue(kind, page_id, payload, partition_key)
+                continue
+            except Exception as exc:
+                logger.exception("[WEBHOOK] enqueue failed, processing inline: %s", exc)
+
+        try:
+            run_webhook_event(kind, page_id, payload)
+        except Exception as exc:
+            logger.exception("[WEBHOOK] %s event processing error: %s", kind, exc)
+    return count
+
+
+def ingest_meta_webhook(data: dict, include_changes: bool = True):
+    return ingest_events(iter_meta_events(data, include_changes=include_changes))
+
+
+def ingest_tiktok_webhook(data):
+    return ingest_events(iter_tiktok_events(data))
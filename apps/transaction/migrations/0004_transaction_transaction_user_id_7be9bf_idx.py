@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0003_alter_transaction_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='transaction_user_id_7be9bf_idx'),
+        ),
+    ]
@@ -33,6 +33,11 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at", "id"]),
+        ]
+
     def __str__(self):
         return f"{self.transaction_id} - {self.status} - {self.amount}"
     
\ No newline at end of file
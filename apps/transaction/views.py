@@ -3,6 +3,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from utils.pagination import AutoPagination, KeysetPaginator
 from django.utils.dateparse import parse_datetime
 from django.db.models import Q
 from .models import Transaction
@@ -70,6 +71,26 @@ class TransactionView(APIView):
             if end:
                 queryset = queryset.filter(created_at__lte=end)
 
+        # === CURSOR PAGINATION (opt-in: ?pagination=cursor / ?cursor=) ===
+        if AutoPagination().wants_cursor(request):
+            paginator = KeysetPaginator(
+                ordering="-created_at",
+                page_size=min(StandardPagination().get_page_size(request) or 10, StandardPagination.max_page_size),
+            )
+            page = paginator.paginate_queryset(queryset, request)
+            serializer = TransactionSerializer(page, many=True)
+            return Response({
+                "status": "success",
+                "status_code": status.HTTP_200_OK,
+                "message": "Transactions fetched successfully.",
+                "meta": {
+                    "count": paginator.get_count(queryset),
+                    "next": paginator.get_next_link(),
+                    "previous": paginator.get_previous_link(),
+                },
+                "data": serializer.data
+            })
+
         # === PAGINATION ===
         paginator = StandardPagination()
         page = paginator.paginate_queryset(queryset, request)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class UserConfig(AppConfig):
     name = 'apps.user'
+
+    def ready(self):
+        import apps.user.signals
@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from middleware.utils.auth_state import bump_version
+
+from .models import User
+
+
+def _invalidate_after_commit(user_id):
+    if user_id:
+        transaction.on_commit(lambda: bump_version(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # deactivation, role or profile changes must not be served from the auth cache
+    _invalidate_after_commit(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_blacklisted_user(sender, instance, created, **kwargs):
+    if created:
+        _invalidate_after_commit(instance.token.user_id)
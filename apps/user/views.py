@@ -4,7 +4,8 @@ from rest_framework_simplejwt.tokens import RefreshToken, TokenError
 from utils.base_view import BaseAPIView as APIView
 from utils.permission import IsAdmin, RolePermission, IsOwnerOrParentHierarchy
 from rest_framework.permissions import IsAuthenticated
-from middleware.cryptography import encrypt_token
+from middleware.cryptography import decrypt_token, encrypt_token
+from middleware.utils.auth_state import ACCESS_COOKIE, REFRESH_COOKIE, revoke_access_token
 from django.contrib.auth import get_user_model
 from django.template.context_processors import request
 from datetime import datetime, timedelta
@@ -214,19 +215,24 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             # Get refresh token from cookie
-            refresh_token = request.COOKIES.get("refresh")
+            refresh_token = decrypt_token(request.COOKIES.get(REFRESH_COOKIE))
             if refresh_token:
                 token = RefreshToken(refresh_token)
                 token.blacklist()  # Invalidate refresh token
 
+            # the access token stays signed until it expires; reject it from now on
+            access_token = decrypt_token(request.COOKIES.get(ACCESS_COOKIE))
+            if access_token:
+                revoke_access_token(access_token)
+
             # Delete cookies
             response = self.success(
                 message="Logged out successfully",
                 status_code=status.HTTP_200_OK,
                 meta={"action": "logout"}
             )
-            response.delete_cookie("xJq93kL1")
-            response.delete_cookie("rT7u1Vb8")
+            response.delete_cookie(ACCESS_COOKIE)
+            response.delete_cookie(REFRESH_COOKIE)
 
             return response
 
@@ -3,10 +3,11 @@ from __future__ import annotations
 import re
 from typing import Dict, Any, List, Optional
 
-from django.db.models import Q
 from langchain_core.tools import tool
 
+from apps.inventory.inventory_cache import cached_lookup
 from apps.inventory.models import Product, Stock
+from apps.inventory.search import search_product_ids, tokenize as search_tokenize
 from apps.vendor.models import Vendor
 
 
@@ -15,34 +16,6 @@ def _tokenize_query(query: str) -> List[str]:
     return [t for t in tokens if len(t) > 1]
 
 
-def _build_product_query(query: str) -> Q:
-    query = (query or "").strip()
-    if not query:
-        return Q()
-
-    tokens = _tokenize_query(query)
-    q = (
-        Q(product__icontains=query)
-        | Q(brand__icontains=query)
-        | Q(sku__icontains=query)
-        | Q(items__sku__icontains=query)
-        | Q(items__size__icontains=query)
-        | Q(items__color__icontains=query)
-    )
-
-    for tok in tokens:
-        q |= (
-            Q(product__icontains=tok)
-            | Q(brand__icontains=tok)
-            | Q(sku__icontains=tok)
-            | Q(items__sku__icontains=tok)
-            | Q(items__size__icontains=tok)
-            | Q(items__color__icontains=tok)
-        )
-
-    return q
-
-
 def _get_vendor_queryset(user_id: int, vendor_id: Optional[int] = None):
     qs = Vendor.objects.filter(owner_id=user_id, is_active=True)
     if vendor_id:
@@ -124,31 +97,56 @@ def _search_inventory_products(
     if not user_id:
         return {"error": "user_id is required"}
 
+    # served from the per-owner snapshot until inventory/order signals bump its version
+    params = {
+        "query": (query or "").strip(),
+        "limit": limit,
+        "vendor_id": vendor_id,
+        "status": status,
+        "variant_limit": variant_limit,
+    }
+    return cached_lookup(
+        user_id,
+        params,
+        lambda: _load_inventory_products(user_id=user_id, **params),
+    )
+
+
+def _load_inventory_products(
+    user_id: int,
+    query: str = "",
+    limit: int = 8,
+    vendor_id: Optional[int] = None,
+    status: Optional[str] = "published",
+    variant_limit: int = 5,
+) -> Dict[str, Any]:
     vendors = _get_vendor_queryset(user_id, vendor_id=vendor_id)
     if not vendors.exists():
         return {"error": "No active vendor found for this user"}
 
+    limit = max(1, min(limit, 50))
     qs = (
         Product.objects
-        .filter(vendor__in=vendors)
         .select_related("vendor", "stock")
         .prefetch_related("items")
-        .order_by("-created")
     )
 
-    if status:
-        qs = qs.filter(status=status)
-
-    if query:
-        qs = qs.filter(_build_product_query(query)).distinct()
-
-    total = qs.count()
-    qs = qs[:max(1, min(limit, 50))]
+    if search_tokenize(query):
+        # ranked ids from the product search index, then one fetch for the page
+        product_ids, total = search_product_ids(vendors, query, status=status, limit=limit)
+        by_id = qs.in_bulk(product_ids)
+        page = [by_id[pid] for pid in product_ids if pid in by_id]
+    else:
+        qs = qs.filter(vendor__in=vendors).order_by("-created")
+        if status:
+            qs = qs.filter(status=status)
+        total = qs.count()
+        page = list(qs[:limit])
 
     query_tokens = _tokenize_query(query)
     products = [
         _serialize_product(p, query_tokens=query_tokens, variant_limit=variant_limit)
-        for p in qs
+        for p in page
     ]
 
     return {
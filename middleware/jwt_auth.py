@@ -1,11 +1,8 @@
 from django.http import JsonResponse
-from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
-from rest_framework_simplejwt.exceptions import TokenError
-from rest_framework.permissions import AllowAny
-from django.urls import resolve
-from django.http import JsonResponse
 from datetime import datetime, timedelta
-from .cryptography import decrypt_token, encrypt_token
+from .cryptography import encrypt_token
+from .utils.auth_state import ACCESS_COOKIE, resolve_auth
+from .utils.route_classifier import RouteClassifier
 import uuid
 
 
@@ -29,55 +26,36 @@ class JWTAuthMiddleware:
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.routes = RouteClassifier(self.WHITELIST)
 
     def __call__(self, request):
-        # Skip JWT check for whitelisted paths
-        if any(request.path.startswith(path) for path in self.WHITELIST):
+        # Whitelisted paths and AllowAny views skip the JWT check
+        if self.routes.is_public(request.path_info):
             response = self.get_response(request)
-            return response or self._unauthorized("Authentication required")
-        
-        resolver_match = resolve(request.path)
-        view_class = getattr(resolver_match.func, "view_class", None)
-
-        if view_class:
-            permissions = getattr(view_class, "permission_classes", [])
-            if any(p is AllowAny for p in permissions):
-                response = self.get_response(request)
-                return response or self._unauthorized("Authentication required")
+            return self._set_refreshed_cookie(request, response or self._unauthorized("Authentication required"))
 
-        access_token = decrypt_token(request.COOKIES.get("xJq93kL1"))
-        refresh_token = decrypt_token(request.COOKIES.get("rT7u1Vb8"))
-
-        try:
-            if access_token:
-                AccessToken(access_token)
-            elif refresh_token:
-                refresh = RefreshToken(refresh_token)
-                access_token = str(refresh.access_token)
-                # Set cookie later after getting response
-            else:
-                return self._unauthorized("Authentication required")
-        except TokenError:
-            try:
-                refresh = RefreshToken(refresh_token)
-                access_token = str(refresh.access_token)
-            except TokenError:
+        state = resolve_auth(request)
+        if state.user is None:
+            if state.expired:
                 return self._unauthorized("Session expired. Please login again")
+            return self._unauthorized("Authentication required")
 
-        # Call the view
         response = self.get_response(request) or self._unauthorized("Authentication required")
+        return self._set_refreshed_cookie(request, response)
 
-        # If we created a new access token, set cookie
-        if access_token:
+    def _set_refreshed_cookie(self, request, response):
+        # only when the access token was re-minted from the refresh cookie, and
+        # never over a cookie the view set or deleted itself (login/logout)
+        state = getattr(request, "jwt_auth", None)
+        if state is not None and state.refreshed and ACCESS_COOKIE not in response.cookies:
             response.set_cookie(
-                key="xJq93kL1",
-                value=encrypt_token(access_token),
+                key=ACCESS_COOKIE,
+                value=encrypt_token(state.access_token),
                 httponly=True,
                 secure=request.is_secure(),
                 samesite="Lax",
                 expires=datetime.utcnow() + timedelta(weeks=99999)
             )
-
         return response
 
 
@@ -1,27 +1,39 @@
+import logging
+import time
 import uuid
 from django.utils.deprecation import MiddlewareMixin
-from .utils.request_csv_logger import log_to_csv
+from .utils.access_log import log_request
 from .utils.ip import get_client_ip
 
+logger = logging.getLogger(__name__)
+
 
 class RequestLogMiddleware(MiddlewareMixin):
     def process_request(self, request):
         request.request_id = str(uuid.uuid4())
         request.client_ip = get_client_ip(request)
+        request._log_started_at = time.perf_counter()
 
     def process_response(self, request, response):
         try:
-            log_to_csv(
+            started = getattr(request, "_log_started_at", None)
+            duration_ms = round((time.perf_counter() - started) * 1000, 1) if started else None
+
+            data = getattr(response, "data", None)
+            user = getattr(request, "user", None)
+            log_request(
                 request_id=getattr(request, "request_id", None),
                 ip=getattr(request, "client_ip", None),
                 method=request.method,
                 path=request.path,
                 status=response.status_code,
-                message=response.data.get("message", None),
-                user_email=request.user.email if request.user.is_authenticated else None,
+                duration_ms=duration_ms,
+                message=data.get("message") if isinstance(data, dict) else None,
+                user_email=user.email if user is not None and user.is_authenticated else None,
             )
         except Exception:
-            pass
+            # never let access logging break the response
+            logger.exception("Request log failed for %s %s", request.method, request.path)
 
         # SAME RESPONSE — nothing modified
         return response
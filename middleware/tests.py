@@ -0,0 +1,142 @@
+import os
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from middleware.cryptography import encrypt_token
+from middleware.utils import auth_state
+from middleware.utils.access_log import AccessLogWriter
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "auth-state-tests"}}
+
+
+class AccessLogRetentionTests(SimpleTestCase):
+    def setUp(self):
+        self.root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(
+            REQUEST_LOG_PATH=str(self.root / "request_logs.{pid}.csv"),
+            REQUEST_LOG_MAX_AGE=3600,
+            REQUEST_LOG_MAX_FILES=2,
+            REQUEST_LOG_FLUSH_INTERVAL=0.05,
+        ))
+
+    def _file(self, name, age=0):
+        path = self.root / name
+        path.write_text("timestamp\r\n")
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+        return path
+
+    def _writer(self):
+        writer = AccessLogWriter()
+        self.addCleanup(writer.close)
+        return writer
+
+    def test_files_of_other_pids_are_pruned_by_age_and_count(self):
+        dead_worker = self._file("request_logs.101.csv", age=7200)
+        live_worker = self._file("request_logs.102.csv", age=60)
+        rotated = [
+            self._file(f"request_logs.10{i}.csv.2026101{i}T000000000000", age=600 - i * 100)
+            for i in range(4)
+        ]
+        writer = self._writer()
+
+        self.assertEqual(writer.prune(), 3)
+        self.assertFalse(dead_worker.exists())
+        self.assertTrue(live_worker.exists())
+        # the two newest rotated files are kept, whichever worker wrote them
+        self.assertEqual([path.exists() for path in rotated], [False, False, True, True])
+
+    def test_first_write_of_a_worker_prunes_what_earlier_workers_left(self):
+        stale = self._file("request_logs.1.csv.20260101T000000000000", age=7200)
+        writer = self._writer()
+        writer.put({"request_id": "r1", "path": "/"})
+        writer.close()
+
+        self.assertFalse(stale.exists())
+        self.assertIn(",r1,", writer.path.read_text())
+
+    def test_own_live_file_is_never_pruned(self):
+        writer = self._writer()
+        own = self._file(writer.path.name, age=7200)
+        writer.prune()
+        self.assertTrue(own.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AuthStateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        auth_state._local.clear()
+        self.user = get_user_model().objects.create_user(email="member@example.com", password="pw")
+        self.refresh = RefreshToken.for_user(self.user)
+
+    def _resolve(self, access=None, refresh=None):
+        request = RequestFactory().get("/")
+        if access is not None:
+            request.COOKIES[auth_state.ACCESS_COOKIE] = encrypt_token(str(access))
+        if refresh is not None:
+            request.COOKIES[auth_state.REFRESH_COOKIE] = encrypt_token(str(refresh))
+        return auth_state.resolve_auth(request)
+
+    def _expired_access(self):
+        access = AccessToken.for_user(self.user)
+        access.set_exp(lifetime=-timedelta(seconds=1))
+        return access
+
+    def test_cached_user_holds_no_password_hash(self):
+        access = self.refresh.access_token
+        self.assertEqual(self._resolve(access).user.pk, self.user.pk)
+
+        with self.assertNumQueries(0):
+            user = self._resolve(access).user
+        self.assertEqual(user.email, "member@example.com")
+        cached = [value for key, (_, value) in auth_state._local.items() if key.startswith("auth_user_fields:")]
+        self.assertEqual(len(cached), 1)
+        self.assertNotIn("password", cached[0])
+
+        # read on demand, and saved without it
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password("pw"))
+        user = self._resolve(access).user
+        user.role = "admin"
+        user.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("pw"))
+        self.assertEqual(self.user.role, "admin")
+
+    def test_expired_access_without_refresh_is_rejected(self):
+        state = self._resolve(self._expired_access())
+        self.assertIsNone(state.user)
+        self.assertTrue(state.expired)
+
+    def test_expired_access_is_reminted_from_the_refresh_cookie(self):
+        state = self._resolve(self._expired_access(), self.refresh)
+        self.assertEqual(state.user.pk, self.user.pk)
+        self.assertTrue(state.refreshed)
+        self.assertEqual(str(AccessToken(state.access_token)["user_id"]), str(self.user.pk))
+
+    def test_logout_rejects_both_cookies(self):
+        access = self.refresh.access_token
+        self.assertIsNotNone(self._resolve(access, self.refresh).user)
+
+        self.refresh.blacklist()
+        auth_state.revoke_access_token(str(access))
+        state = self._resolve(access, self.refresh)
+        self.assertIsNone(state.user)
+        self.assertTrue(state.expired)
+
+    def test_deactivated_user_is_not_served_from_the_cache(self):
+        access = self.refresh.access_token
+        self.assertIsNotNone(self._resolve(access).user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertIsNone(self._resolve(access).user)
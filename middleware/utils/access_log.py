@@ -0,0 +1,290 @@
+"""
+Non-blocking access log.
+
+Requests push a row onto a bounded in-process queue (rows are dropped and
+counted when it is full, the request never waits). One writer thread per
+process drains the queue in batches and appends to a CSV or JSONL file,
+rotating it by size and/or age. By default each process writes its own file
+(`{pid}` in the path), so rows from different workers never interleave;
+REQUEST_LOG_SINK="logger" hands rows to the `request_log` logger instead,
+for a shared sink configured in LOGGING.
+
+Worker pids change with every restart, so retention looks at the files of
+all pids (`{pid}` -> `*`): on start and after each rotation, files not
+written to for REQUEST_LOG_MAX_AGE are deleted, and only the newest
+REQUEST_LOG_MAX_FILES rotated files are kept.
+"""
+import atexit
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+sink_logger = logging.getLogger("request_log")
+
+DROP_REPORT_INTERVAL = 30
+
+FIELDS = [
+    "timestamp",
+    "request_id",
+    "ip",
+    "method",
+    "path",
+    "status",
+    "duration_ms",
+    "message",
+    "user_email",
+]
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class AccessLogWriter:
+    def __init__(self):
+        self.path_template = str(_setting("REQUEST_LOG_PATH", "logs/request_logs.{pid}.csv"))
+        self.format = (_setting("REQUEST_LOG_FORMAT", "csv") or "csv").lower()
+        self.sink = (_setting("REQUEST_LOG_SINK", "file") or "file").lower()
+        self.batch_size = max(1, _setting("REQUEST_LOG_BATCH_SIZE", 200))
+        self.flush_interval = _setting("REQUEST_LOG_FLUSH_INTERVAL", 1.0)
+        self.max_bytes = _setting("REQUEST_LOG_MAX_BYTES", 50 * 1024 * 1024)
+        self.rotate_interval = _setting("REQUEST_LOG_ROTATE_INTERVAL", 24 * 60 * 60)
+        self.backup_count = _setting("REQUEST_LOG_BACKUP_COUNT", 7)
+        self.max_age = _setting("REQUEST_LOG_MAX_AGE", 7 * 24 * 60 * 60)
+        self.max_files = _setting("REQUEST_LOG_MAX_FILES", 50)
+
+        self.queue = queue.Queue(maxsize=max(1, _setting("REQUEST_LOG_QUEUE_SIZE", 10000)))
+        self.pid = os.getpid()
+        self.dropped = 0
+        self.written = 0
+        self._reported_dropped = 0
+        self._reported_at = 0.0
+        self._file = None
+        self._opened_at = 0.0
+        self._thread = threading.Thread(target=self._run, name="access-log-writer", daemon=True)
+        self._thread.start()
+
+    # -------------------------
+    # producer side
+    # -------------------------
+    def put(self, row: dict) -> bool:
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stats(self) -> dict:
+        return {"queued": self.queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+    def close(self, timeout: float = 2.0) -> None:
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    # -------------------------
+    # writer thread
+    # -------------------------
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+            stop = item is None
+            if item:
+                batch.append(item)
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            if batch:
+                try:
+                    self._write(batch)
+                    self.written += len(batch)
+                except Exception as exc:
+                    logger.warning("Access log write failed, %s rows lost: %s", len(batch), exc)
+            self._report_drops()
+
+            if stop:
+                self._close_file()
+                return
+
+    def _report_drops(self):
+        now = time.monotonic()
+        if self.dropped != self._reported_dropped and now - self._reported_at >= DROP_REPORT_INTERVAL:
+            self._reported_at = now
+            logger.warning(
+                "Access log queue full: %s rows dropped (total %s)",
+                self.dropped - self._reported_dropped,
+                self.dropped,
+            )
+            self._reported_dropped = self.dropped
+
+    def _encode(self, batch) -> str:
+        if self.format == "jsonl":
+            return "".join(json.dumps(row, separators=(",", ":"), default=str) + "\n" for row in batch)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow([row.get(field) for field in FIELDS])
+        return buffer.getvalue()
+
+    def _write(self, batch):
+        if self.sink == "logger":
+            for row in batch:
+                sink_logger.info(json.dumps(row, separators=(",", ":"), default=str))
+            return
+
+        self._maybe_rotate()
+        if self._file is None:
+            self._open()
+        self._file.write(self._encode(batch))
+        self._file.flush()
+
+    # -------------------------
+    # files / rotation
+    # -------------------------
+    @property
+    def path(self) -> Path:
+        return self._path_for(self.pid)
+
+    def _path_for(self, pid) -> Path:
+        path = Path(self.path_template.format(pid=pid))
+        if self.format == "jsonl" and path.suffix == ".csv":
+            path = path.with_suffix(".jsonl")
+        if not path.is_absolute():
+            path = Path(settings.BASE_DIR) / path
+        return path
+
+    def _header(self) -> str:
+        return ",".join(FIELDS) + "\r\n"
+
+    def _open(self):
+        path = self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not self._opened_at:
+            # first file of this process: clear out what earlier workers left behind
+            self.prune()
+        if self.format == "csv" and path.exists() and path.stat().st_size:
+            # an older column layout would make the appended rows unreadable
+            with open(path, newline="") as existing:
+                if existing.readline() != self._header():
+                    self._rotate_file(path)
+
+        is_new = not path.exists() or path.stat().st_size == 0
+        self._file = open(path, mode="a", newline="", encoding="utf-8")
+        self._opened_at = time.time()
+        if is_new and self.format == "csv":
+            self._file.write(self._header())
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _maybe_rotate(self):
+        if self._file is None:
+            return
+        too_big = self.max_bytes and self._file.tell() >= self.max_bytes
+        too_old = self.rotate_interval and time.time() - self._opened_at >= self.rotate_interval
+        if too_big or too_old:
+            self._close_file()
+            self._rotate_file(self.path)
+
+    def _rotate_file(self, path: Path):
+        if not path.exists():
+            return
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        os.replace(path, path.with_name(f"{path.name}.{stamp}"))
+        if self.backup_count:
+            backups = sorted(path.parent.glob(f"{path.name}.*"))
+            for old in backups[:-self.backup_count]:
+                old.unlink(missing_ok=True)
+        self.prune()
+
+    def prune(self) -> int:
+        """Apply retention to the log files of every pid; returns how many were deleted."""
+        if "{pid}" not in Path(self.path_template).name:
+            return 0
+        pattern = self._path_for("*")
+        own = self.path
+        files = []
+        for candidate in pattern.parent.glob(f"{pattern.name}*"):
+            try:
+                files.append((candidate.stat().st_mtime, candidate))
+            except OSError:
+                continue
+
+        doomed = set()
+        if self.max_age:
+            cutoff = time.time() - self.max_age
+            # a live file of another worker is only this old when that worker is gone (or idle that long)
+            doomed.update(path for mtime, path in files if mtime < cutoff and path != own)
+        if self.max_files:
+            rotated = sorted(
+                # live files end in the template's suffix, rotated ones in a timestamp
+                ((mtime, path) for mtime, path in files if path.suffix != pattern.suffix),
+                reverse=True,
+            )
+            doomed.update(path for _, path in rotated[self.max_files:])
+
+        removed = 0
+        for path in doomed:
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> AccessLogWriter:
+    """One writer per process; a forked worker gets a fresh queue and thread."""
+    global _writer
+    writer = _writer
+    if writer is not None and writer.pid == os.getpid():
+        return writer
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = AccessLogWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def log_request(request_id, ip, method, path, status, duration_ms=None, message=None, user_email=None) -> bool:
+    return get_writer().put({
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "request_id": request_id,
+        "ip": ip,
+        "method": method,
+        "path": path,
+        "status": status,
+        "duration_ms": duration_ms,
+        "message": message,
+        "user_email": user_email,
+    })
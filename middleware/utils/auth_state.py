@@ -0,0 +1,284 @@
+"""
+Single-pass cookie JWT authentication.
+
+`resolve_auth(request)` decrypts and validates the auth cookies once and stores
+the result on the request, where both JWTAuthMiddleware and DRF's
+CookieJWTAuthentication pick it up.
+
+Validated access cookies are cached (local LRU + Redis) by the digest of the
+encrypted cookie value until the token expires, and users by id + per-user
+version. Every hit still costs one Redis round trip, which reads the user's
+version and the access token's revocation marker, so a logout or blacklist is
+seen by all workers on the next request.
+
+Only a projection of the user is cached: its concrete field values without
+the password hash. Each request gets a fresh instance built from it as if it
+had been loaded with .defer("password"), so reading the password, or a
+save(), goes to the database and never writes back a missing hash.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from ..cryptography import decrypt_token
+
+logger = logging.getLogger(__name__)
+
+ACCESS_COOKIE = "xJq93kL1"
+REFRESH_COOKIE = "rT7u1Vb8"
+
+TOKEN_KEY = "auth_token:{digest}"
+USER_KEY = "auth_user_fields:{user_id}:{version}"
+VERSION_KEY = "auth_version:{user_id}"
+REVOKED_KEY = "auth_revoked:{jti}"
+
+# never cached, loaded from the database when read
+UNCACHED_USER_FIELDS = ("password",)
+
+_local: "OrderedDict[str, tuple]" = OrderedDict()
+_local_lock = threading.Lock()
+
+
+@dataclass
+class AuthState:
+    user: Optional[object] = None
+    # set (with refreshed=True) when a new access token was minted from the
+    # refresh cookie and must be sent back
+    access_token: Optional[str] = None
+    refreshed: bool = False
+    # cookies were present but none of them could be used
+    expired: bool = False
+
+
+def _token_timeout() -> int:
+    return getattr(settings, "AUTH_TOKEN_CACHE_TIMEOUT", 5 * 60)
+
+
+def _user_timeout() -> int:
+    return getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 60)
+
+
+def _local_size() -> int:
+    return getattr(settings, "AUTH_CACHE_LOCAL_SIZE", 1024)
+
+
+# -------------------------
+# Local LRU
+# -------------------------
+def _local_get(key: str):
+    with _local_lock:
+        entry = _local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del _local[key]
+            return None
+        _local.move_to_end(key)
+        return value
+
+
+def _local_set(key: str, value, timeout: float) -> None:
+    with _local_lock:
+        _local[key] = (time.monotonic() + timeout, value)
+        _local.move_to_end(key)
+        while len(_local) > _local_size():
+            _local.popitem(last=False)
+
+
+def _local_delete(key: str) -> None:
+    with _local_lock:
+        _local.pop(key, None)
+
+
+# -------------------------
+# Versions / revocation
+# -------------------------
+def bump_version(user_id) -> None:
+    """Drop every cached copy of the user (profile change, logout, blacklist)."""
+    if not user_id:
+        return
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+    except Exception as exc:
+        logger.warning("Auth cache invalidation failed for user=%s: %s", user_id, exc)
+
+
+def revoke_access_token(token: str) -> None:
+    """Reject this access token until it expires, even though its signature is still valid."""
+    try:
+        payload = AccessToken(token, verify=False).payload
+    except TokenError:
+        return
+    jti = payload.get("jti")
+    ttl = int(payload.get("exp", 0) - time.time())
+    if jti and ttl > 0:
+        try:
+            cache.set(REVOKED_KEY.format(jti=jti), 1, timeout=ttl)
+        except Exception as exc:
+            logger.warning("Auth cache revoke failed for jti=%s: %s", jti, exc)
+    bump_version(payload.get("user_id"))
+
+
+def _session_info(user_id, jti):
+    """(version, revoked) in one round trip; (None, False) when the cache is down."""
+    version_key = VERSION_KEY.format(user_id=user_id)
+    revoked_key = REVOKED_KEY.format(jti=jti)
+    try:
+        found = cache.get_many([version_key, revoked_key])
+        version = found.get(version_key)
+        if version is None:
+            cache.add(version_key, time.time_ns(), timeout=None)
+            version = cache.get(version_key)
+        return version, revoked_key in found
+    except Exception as exc:
+        logger.warning("Auth cache unavailable, validating without it: %s", exc)
+        return None, False
+
+
+# -------------------------
+# Tokens / users
+# -------------------------
+def _digest(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:32]
+
+
+def _validate_access(cookie: str) -> Optional[dict]:
+    """
+    {"user_id", "jti", "exp"} for a valid encrypted access cookie, else None.
+    Only the claims are cached, never the decrypted token.
+    """
+    key = TOKEN_KEY.format(digest=_digest(cookie))
+    claims = _local_get(key)
+    if claims is None:
+        try:
+            claims = cache.get(key)
+        except Exception:
+            claims = None
+
+    if claims is None:
+        token = decrypt_token(cookie)
+        if not token:
+            return None
+        try:
+            payload = AccessToken(token).payload
+        except TokenError:
+            return None
+        claims = {
+            "user_id": payload.get("user_id"),
+            "jti": payload.get("jti"),
+            "exp": payload.get("exp"),
+        }
+        ttl = min(_token_timeout(), int(claims["exp"] - time.time()))
+        if ttl > 0:
+            try:
+                cache.set(key, claims, timeout=ttl)
+            except Exception as exc:
+                logger.warning("Auth cache write failed: %s", exc)
+
+    remaining = claims["exp"] - time.time()
+    if remaining <= 0:
+        _local_delete(key)
+        return None
+    _local_set(key, claims, min(_token_timeout(), remaining))
+    return claims
+
+
+def _user_fields():
+    User = get_user_model()
+    return [f.attname for f in User._meta.concrete_fields if f.attname not in UNCACHED_USER_FIELDS]
+
+
+def _user_from_fields(values: dict):
+    User = get_user_model()
+    names = list(values)
+    # from_db marks the fields that are not given as deferred
+    return User.from_db("default", names, [values[name] for name in names])
+
+
+def _load_user(user_id, version):
+    User = get_user_model()
+    if version is None:
+        return User.objects.filter(id=user_id).first()
+
+    key = USER_KEY.format(user_id=user_id, version=version)
+    values = _local_get(key)
+    if values is None:
+        try:
+            values = cache.get(key)
+        except Exception:
+            values = None
+    if values is None:
+        values = User.objects.filter(id=user_id).values(*_user_fields()).first()
+        if values is None:
+            return None
+        try:
+            cache.set(key, values, timeout=_user_timeout())
+        except Exception as exc:
+            logger.warning("Auth cache write failed for user=%s: %s", user_id, exc)
+    _local_set(key, values, _user_timeout())
+    # a new instance per request: nothing is shared between them
+    return _user_from_fields(values)
+
+
+def _user_for_claims(claims):
+    version, revoked = _session_info(claims["user_id"], claims["jti"])
+    if revoked:
+        return None
+    user = _load_user(claims["user_id"], version)
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+def _authenticate(request) -> AuthState:
+    access_cookie = request.COOKIES.get(ACCESS_COOKIE)
+    refresh_cookie = request.COOKIES.get(REFRESH_COOKIE)
+    if not access_cookie and not refresh_cookie:
+        return AuthState()
+
+    if access_cookie:
+        claims = _validate_access(access_cookie)
+        if claims:
+            user = _user_for_claims(claims)
+            if user is not None:
+                return AuthState(user=user)
+
+    refresh_token = decrypt_token(refresh_cookie)
+    if refresh_token:
+        try:
+            # also checks the blacklist
+            access = RefreshToken(refresh_token).access_token
+        except TokenError:
+            access = None
+        if access is not None:
+            claims = {"user_id": access.get("user_id"), "jti": access.get("jti")}
+            user = _user_for_claims(claims)
+            if user is not None:
+                return AuthState(user=user, access_token=str(access), refreshed=True)
+
+    return AuthState(expired=True)
+
+
+def resolve_auth(request) -> AuthState:
+    """Authenticate the request from its cookies, once; later calls return the same state."""
+    # DRF passes its Request wrapper; the state lives on the underlying HttpRequest
+    request = getattr(request, "_request", request)
+    state = getattr(request, "jwt_auth", None)
+    if state is None:
+        state = _authenticate(request)
+        request.jwt_auth = state
+    return state
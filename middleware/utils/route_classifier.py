@@ -0,0 +1,173 @@
+"""
+Public/protected classification of request paths for JWTAuthMiddleware.
+
+The URLconf is flattened once into its endpoints (in Django's resolution order)
+and indexed in a trie on the literal leading path segments of each pattern
+("/api/orders/<int:id>/details/" lives under api -> orders). A path only tests
+the handful of endpoints along its own trie branch, in order, instead of a
+full `resolve()`, and results are kept in an LRU per path.
+
+Custom path converters can reject a regex match in `to_python`, so endpoints
+that use them are confirmed with a real `resolve()`.
+"""
+import logging
+import re
+import threading
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from django.urls import URLResolver, get_resolver, resolve
+from django.urls.converters import DEFAULT_CONVERTERS
+from django.urls.exceptions import Resolver404
+from rest_framework.permissions import AllowAny
+
+logger = logging.getLogger(__name__)
+
+ANCHORS_END = (r"\Z", "$")
+REGEX_SYNTAX = set(".^$*+?{}[]|()")
+
+BUILTIN_CONVERTERS = tuple(type(c) for c in DEFAULT_CONVERTERS.values())
+
+
+def is_public_view(callback) -> bool:
+    view_class = getattr(callback, "view_class", None)
+    if not view_class:
+        return False
+    permissions = getattr(view_class, "permission_classes", [])
+    return any(p is AllowAny for p in permissions)
+
+
+def _strip(part: str) -> Tuple[str, bool]:
+    """Pattern fragment without its anchors, and whether it ended anchored."""
+    if part.startswith("^"):
+        part = part[1:]
+    for anchor in ANCHORS_END:
+        if part.endswith(anchor) and not part.endswith("\\" + anchor):
+            return part[: -len(anchor)], True
+    return part, False
+
+
+def _literal_segments(regex: str) -> List[str]:
+    """Complete path segments at the start of regex that match only themselves."""
+    if "|" in regex:
+        # a top-level alternation can match other prefixes, keep it at the root
+        return []
+    literal = []
+    i = 0
+    while i < len(regex):
+        char = regex[i]
+        if char == "\\":
+            if i + 1 < len(regex) and not regex[i + 1].isalnum():
+                literal.append(regex[i + 1])
+                i += 2
+                continue
+            break
+        if char in REGEX_SYNTAX:
+            break
+        literal.append(char)
+        i += 1
+    # a quantifier applies to the character before it, which is then not literal
+    if i < len(regex) and regex[i] in "*+?{" and literal:
+        literal.pop()
+    prefix = "".join(literal)
+    return [s for s in prefix[: prefix.rfind("/") + 1].split("/") if s]
+
+
+def _path_segments(path: str) -> List[str]:
+    return [s for s in path[: path.rfind("/") + 1].split("/") if s]
+
+
+def _flatten(resolver, prefix: str = "", converters=()) -> List[Tuple[str, bool, bool]]:
+    """(full regex, is_public, needs_resolve) for every endpoint, in resolution order."""
+    endpoints = []
+    for pattern in resolver.url_patterns:
+        part, anchored = _strip(pattern.pattern.regex.pattern)
+        pattern_converters = converters + tuple(getattr(pattern.pattern, "converters", {}).values())
+        if isinstance(pattern, URLResolver):
+            endpoints.extend(_flatten(pattern, prefix + part, pattern_converters))
+            continue
+        custom = any(not isinstance(c, BUILTIN_CONVERTERS) for c in pattern_converters)
+        regex = prefix + part + (r"\Z" if anchored else "")
+        endpoints.append((regex, is_public_view(pattern.callback), custom))
+    return endpoints
+
+
+class _Node:
+    __slots__ = ("children", "endpoints")
+
+    def __init__(self):
+        self.children = {}
+        self.endpoints = []
+
+
+class RouteClassifier:
+    def __init__(self, whitelist=(), cache_size: int = 4096):
+        self.whitelist = re.compile("|".join(re.escape(p) for p in whitelist)) if whitelist else None
+        self._lock = threading.Lock()
+        self._root: Optional[_Node] = None
+        # (compiled regex or None, is_public, needs_resolve) by resolution order
+        self._endpoints: List[Tuple[Optional[re.Pattern], bool, bool]] = []
+        self.is_public = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _build(self):
+        resolver = get_resolver()
+        root_prefix, _ = _strip(resolver.pattern.regex.pattern)
+        root = _Node()
+        endpoints = []
+        for index, (regex, public, custom) in enumerate(_flatten(resolver, root_prefix)):
+            try:
+                compiled = re.compile(regex)
+            except re.error:
+                compiled, custom = None, True
+            endpoints.append((compiled, public, custom))
+
+            node = root
+            for segment in _literal_segments(regex):
+                node = node.children.setdefault(segment, _Node())
+            node.endpoints.append(index)
+
+        self._endpoints = endpoints
+        self._root = root
+        logger.info("Route classifier built for %s endpoints", len(endpoints))
+
+    def _get_root(self) -> _Node:
+        if self._root is None:
+            with self._lock:
+                if self._root is None:
+                    self._build()
+        return self._root
+
+    @staticmethod
+    def _resolve_public(path: str) -> bool:
+        try:
+            return is_public_view(resolve(path).func)
+        except Resolver404:
+            # nothing to protect; Django answers 404 itself
+            return True
+
+    def _classify(self, path: str) -> bool:
+        if self.whitelist is not None and self.whitelist.match(path):
+            return True
+
+        node = self._get_root()
+        candidates = list(node.endpoints)
+        for segment in _path_segments(path):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            candidates.extend(node.endpoints)
+
+        # Django takes the first endpoint in URLconf order that matches
+        for index in sorted(candidates):
+            compiled, public, custom = self._endpoints[index]
+            if compiled is None:
+                return self._resolve_public(path)
+            if compiled.match(path):
+                return self._resolve_public(path) if custom else public
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._root = None
+            self._endpoints = []
+            self.is_public.cache_clear()
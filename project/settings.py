@@ -240,6 +240,97 @@ CHANNEL_LAYERS = {
 }
 
 
+# ------------------------------------------------------------------------------
+# Celery (background jobs)
+# ------------------------------------------------------------------------------
+CELERY_BROKER_URL = env("CELERY_BROKER_URL", "redis://127.0.0.1:6379/3")
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BROKER_TRANSPORT_OPTIONS = {"visibility_timeout": env_int("CELERY_VISIBILITY_TIMEOUT", 3600)}
+
+# "inline" processes webhook events inside the request, "queue" hands them to Celery.
+SOCIAL_WEBHOOK_INGEST_MODE = env("SOCIAL_WEBHOOK_INGEST_MODE", "inline")
+SOCIAL_WEBHOOK_PARTITIONS = env_int("SOCIAL_WEBHOOK_PARTITIONS", 4)
+
+
+# ------------------------------------------------------------------------------
+# Chatbot
+# ------------------------------------------------------------------------------
+CHAT_HISTORY_WINDOW = env_int("CHAT_HISTORY_WINDOW", 20)
+CHAT_HISTORY_SUMMARY_CHARS = env_int("CHAT_HISTORY_SUMMARY_CHARS", 1500)
+CHAT_HISTORY_CACHE_TIMEOUT = env_int("CHAT_HISTORY_CACHE_TIMEOUT", 60 * 60 * 24 * 7)
+
+# Per-owner FAISS indexes live here; must be shared by every worker on the host.
+CHAT_KB_ROOT = env("CHAT_KB_ROOT", str(BASE_DIR / "var" / "knowledge_base"))
+CHAT_KB_CHUNK_SIZE = env_int("CHAT_KB_CHUNK_SIZE", 500)
+CHAT_KB_CHUNK_OVERLAP = env_int("CHAT_KB_CHUNK_OVERLAP", 50)
+# Memory-mapped indexes kept open per worker, least recently searched owner evicted first.
+CHAT_KB_READER_CACHE_SIZE = env_int("CHAT_KB_READER_CACHE_SIZE", 64)
+# "inline" embeds right after the save commits, "queue" hands it to a Celery worker.
+CHAT_KB_INDEX_MODE = env("CHAT_KB_INDEX_MODE", "inline")
+# Embedding vectors cached by model + sha256(text); re-indexing only embeds changed chunks.
+CHAT_EMBEDDING_CACHE_TIMEOUT = env_int("CHAT_EMBEDDING_CACHE_TIMEOUT", 60 * 60 * 24 * 30)
+# Image attachments: download cap and pool size, then OpenAI vision analysis
+# (longest side sent, result cache lifetime, concurrent calls per message).
+CHAT_ATTACHMENT_MAX_BYTES = env_int("CHAT_ATTACHMENT_MAX_BYTES", 8 * 1024 * 1024)
+CHAT_ATTACHMENT_WORKERS = env_int("CHAT_ATTACHMENT_WORKERS", 4)
+OPENAI_VISION_MODEL = env("OPENAI_VISION_MODEL", "gpt-4o-mini")
+CHAT_IMAGE_MAX_SIDE = env_int("CHAT_IMAGE_MAX_SIDE", 1024)
+CHAT_IMAGE_ANALYSIS_CACHE_TIMEOUT = env_int("CHAT_IMAGE_ANALYSIS_CACHE_TIMEOUT", 60 * 60 * 24 * 7)
+CHAT_IMAGE_ANALYSIS_WORKERS = env_int("CHAT_IMAGE_ANALYSIS_WORKERS", 4)
+# Chatbot inventory lookups, versioned per owner and invalidated by inventory/order signals.
+INVENTORY_CACHE_TIMEOUT = env_int("INVENTORY_CACHE_TIMEOUT", 60 * 60)
+INVENTORY_CACHE_LOCAL_SIZE = env_int("INVENTORY_CACHE_LOCAL_SIZE", 256)
+# Product/variant barcode + QR images are rendered after commit, in batches:
+# "thread" uses an in-process pool, "queue" hands the batch to a Celery worker.
+INVENTORY_CODES_MODE = env("INVENTORY_CODES_MODE", "thread")
+INVENTORY_CODES_WORKERS = env_int("INVENTORY_CODES_WORKERS", 2)
+# Social posts are published in the background, one job per platform:
+# "thread" uses an in-process pool, "queue" hands each platform to a Celery worker.
+SOCIAL_PUBLISH_MODE = env("SOCIAL_PUBLISH_MODE", "thread")
+SOCIAL_PUBLISH_WORKERS = env_int("SOCIAL_PUBLISH_WORKERS", 6)
+# Attempts per platform, with exponential backoff starting at SOCIAL_PUBLISH_BACKOFF seconds.
+SOCIAL_PUBLISH_RETRIES = env_int("SOCIAL_PUBLISH_RETRIES", 3)
+SOCIAL_PUBLISH_BACKOFF = env_int("SOCIAL_PUBLISH_BACKOFF", 2)
+# A platform still publishing after this long was left by a dead job and may be published again.
+SOCIAL_PUBLISH_STALE_SECONDS = env_int("SOCIAL_PUBLISH_STALE_SECONDS", 1800)
+# Twilio media streams: "stream" keeps one Deepgram websocket per call (batch if it cannot
+# connect), "batch" posts each turn, "local" is an offline stand-in.
+CALL_ASR_MODE = env("CALL_ASR_MODE", "stream")
+CALL_ASR_FINALIZE_TIMEOUT_MS = env_int("CALL_ASR_FINALIZE_TIMEOUT_MS", 800)
+CALL_ASR_CONNECT_TIMEOUT = env_int("CALL_ASR_CONNECT_TIMEOUT", 5)
+CALL_ASR_BATCH_TIMEOUT = env_int("CALL_ASR_BATCH_TIMEOUT", 15)
+# Caller turns are closed on silence (energy VAD over an adaptive noise floor).
+CALL_VAD_MIN_RMS = env_int("CALL_VAD_MIN_RMS", 300)
+CALL_VAD_START_MS = env_int("CALL_VAD_START_MS", 60)
+CALL_VAD_END_SILENCE_MS = env_int("CALL_VAD_END_SILENCE_MS", 700)
+CALL_VAD_MAX_TURN_MS = env_int("CALL_VAD_MAX_TURN_MS", 15000)
+# Replies are sent in CALL_TTS_CHUNK_MS chunks with about CALL_TTS_LEAD_MS queued at Twilio;
+# CALL_BARGE_IN_MS of caller speech during a reply cuts it off.
+CALL_TTS_CHUNK_MS = env_int("CALL_TTS_CHUNK_MS", 100)
+CALL_TTS_LEAD_MS = env_int("CALL_TTS_LEAD_MS", 400)
+CALL_BARGE_IN_MS = env_int("CALL_BARGE_IN_MS", 200)
+# Warm Azure synthesizers kept per (voice, format) in each process; audio of fixed phrases
+# (campaign intros, fallback reply, voice previews) is cached here by content hash and
+# pruned once unused for CALL_TTS_CACHE_MAX_AGE_DAYS.
+CALL_TTS_POOL_SIZE = env_int("CALL_TTS_POOL_SIZE", 4)
+CALL_TTS_CACHE_ROOT = env("CALL_TTS_CACHE_ROOT", str(BASE_DIR / "var" / "tts_cache"))
+CALL_TTS_CACHE_MAX_AGE_DAYS = env_int("CALL_TTS_CACHE_MAX_AGE_DAYS", 30)
+# Bulk call campaigns dial in the background: "thread" in-process, "queue" on Celery workers.
+CALL_CAMPAIGN_MODE = env("CALL_CAMPAIGN_MODE", "thread")
+CALL_CAMPAIGN_RUNNERS = env_int("CALL_CAMPAIGN_RUNNERS", 4)
+CALL_CAMPAIGN_DIAL_WORKERS = env_int("CALL_CAMPAIGN_DIAL_WORKERS", 4)
+CALL_CAMPAIGN_SLICE_SECONDS = env_int("CALL_CAMPAIGN_SLICE_SECONDS", 240)
+# A running campaign whose runner has not beaten for this long is dispatched again.
+CALL_CAMPAIGN_STALE_SECONDS = env_int("CALL_CAMPAIGN_STALE_SECONDS", 120)
+# Per caller id, unless set on the PhoneNumber; a call not reported ended frees its line after the timeout.
+CALL_CAMPAIGN_MAX_CONCURRENT = env_int("CALL_CAMPAIGN_MAX_CONCURRENT", 10)
+CALL_CAMPAIGN_CPS = env_int("CALL_CAMPAIGN_CPS", 1)
+CALL_CAMPAIGN_CALL_TIMEOUT = env_int("CALL_CAMPAIGN_CALL_TIMEOUT", 600)
+# Host serving the campaign intro audio (/voice?id=...).
+CALL_CAMPAIGN_VOICE_URL = env("CALL_CAMPAIGN_VOICE_URL", "https://cornelia-preindulgent-leigh.ngrok-free.dev")
+
+
 # ------------------------------------------------------------------------------
 # DRF & JWT
 # ------------------------------------------------------------------------------
@@ -275,6 +366,13 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Cookie auth is validated once per request (middleware.utils.auth_state).
+# Validated access cookies are cached until they expire (capped here), users per
+# id + version; logout, blacklisting and user saves invalidate them.
+AUTH_TOKEN_CACHE_TIMEOUT = env_int("AUTH_TOKEN_CACHE_TIMEOUT", 5 * 60)
+AUTH_USER_CACHE_TIMEOUT = env_int("AUTH_USER_CACHE_TIMEOUT", 60)
+AUTH_CACHE_LOCAL_SIZE = env_int("AUTH_CACHE_LOCAL_SIZE", 1024)
+
 
 # ------------------------------------------------------------------------------
 # Static & Media
@@ -310,6 +408,8 @@ USE_TZ = True
 CRYPTO_SECRET_KEY = env("CRYPTO_SECRET_KEY", "")
 
 OPENAI_API_KEY = env("OPENAI_API_KEY", "")
+# LLM requests a worker process runs at once for websocket replies (web and calls)
+ASSISTANT_LLM_CONCURRENCY = env_int("ASSISTANT_LLM_CONCURRENCY", 16)
 GOOGLE_API_KEY = env("GOOGLE_API_KEY", "")
 GROQ_API_KEY = env("GROQ_API_KEY", "")
 AZURE_SPEECH_KEY = env("AZURE_SPEECH_KEY", "")
@@ -403,6 +503,21 @@ PAYSTATION_CALLBACK_URL = env("PAYSTATION_CALLBACK_URL", "")
 # ------------------------------------------------------------------------------
 # Logging
 # ------------------------------------------------------------------------------
+# Access log (middleware.request_log). {pid} gives every worker its own file;
+# REQUEST_LOG_SINK="logger" sends rows to the "request_log" logger instead.
+REQUEST_LOG_PATH = env("REQUEST_LOG_PATH", "logs/request_logs.{pid}.csv")
+REQUEST_LOG_FORMAT = env("REQUEST_LOG_FORMAT", "csv")  # csv | jsonl
+REQUEST_LOG_SINK = env("REQUEST_LOG_SINK", "file")  # file | logger
+REQUEST_LOG_QUEUE_SIZE = env_int("REQUEST_LOG_QUEUE_SIZE", 10000)
+REQUEST_LOG_BATCH_SIZE = env_int("REQUEST_LOG_BATCH_SIZE", 200)
+REQUEST_LOG_FLUSH_INTERVAL = float(env("REQUEST_LOG_FLUSH_INTERVAL", "1.0"))
+REQUEST_LOG_MAX_BYTES = env_int("REQUEST_LOG_MAX_BYTES", 50 * 1024 * 1024)
+REQUEST_LOG_ROTATE_INTERVAL = env_int("REQUEST_LOG_ROTATE_INTERVAL", 24 * 60 * 60)
+REQUEST_LOG_BACKUP_COUNT = env_int("REQUEST_LOG_BACKUP_COUNT", 7)
+# Retention over the files of all pids, since pids change with every restart.
+REQUEST_LOG_MAX_AGE = env_int("REQUEST_LOG_MAX_AGE", 7 * 24 * 60 * 60)
+REQUEST_LOG_MAX_FILES = env_int("REQUEST_LOG_MAX_FILES", 50)
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -418,6 +533,11 @@ LOGGING = {
             "level": "INFO",
             "propagate": False,
         },
+        "request_log": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
 
@@ -1,3 +1,4 @@
+from django.core.handlers.asgi import ASGIRequest
 from rest_framework.views import APIView
 from rest_framework.pagination import PageNumberPagination
 from rest_framework import status
@@ -27,6 +28,8 @@ from .pagination import AutoPagination
 
 class BaseAPIView(APIView):
     pagination_class = AutoPagination
+    # set to e.g. "-created_at" to let clients opt into keyset paging (?pagination=cursor)
+    cursor_ordering = None
 
     def success(self, message="Success", data=None, extra_data=None, meta=None, cookies=None, status_code=status.HTTP_200_OK):
 
@@ -49,6 +52,54 @@ class BaseAPIView(APIView):
             cookies=cookies
         )
 
+    def paginated(self, queryset, serializer_class, message="Success", context=None, extra_data=None, meta=None, status_code=status.HTTP_200_OK, empty_message=None, meta_count_key=None):
+        """
+        Paginate a queryset in the database and serialize only the requested page.
+        page_size=max (or 0) streams every row instead of building one big list.
+        empty_message / meta_count_key reuse the paginator's count, so callers
+        need no extra exists()/count() query for "nothing found" or a total.
+        """
+        paginator = self.pagination_class()
+        paginator.request = self.request
+
+        if self.cursor_ordering and paginator.wants_cursor(self.request):
+            data = paginator.get_cursor_page(
+                self.request, queryset, serializer_class, ordering=self.cursor_ordering, context=context
+            )
+            if extra_data:
+                data.update(extra_data)
+            return ApiResponse.success(
+                message=empty_message if empty_message is not None and not data["items"] else message,
+                data=data,
+                status_code=status_code,
+                meta=meta,
+            )
+
+        if paginator.wants_all(self.request):
+            return ApiResponse.stream_success(
+                message=message,
+                chunks=paginator.iter_serialized(queryset, serializer_class, context=context),
+                status_code=status_code,
+                meta=meta,
+                extra_data=extra_data,
+                empty_message=empty_message,
+                meta_count_key=meta_count_key,
+                asynchronous=isinstance(self.request._request, ASGIRequest),
+            )
+
+        data = paginator.get_serialized_page(self.request, queryset, serializer_class, context=context)
+        count = data["pagination"]["count"]
+        if extra_data:
+            data.update(extra_data)
+        if meta_count_key:
+            meta = {**(meta or {}), meta_count_key: count}
+        return ApiResponse.success(
+            message=empty_message if empty_message is not None and not count else message,
+            data=data,
+            status_code=status_code,
+            meta=meta,
+        )
+
     def error(self, message="Error", errors=None, meta=None, data=None, status_code=status.HTTP_400_BAD_REQUEST):
         return ApiResponse.error(
             message=message,
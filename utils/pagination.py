@@ -1,4 +1,130 @@
+import base64
+import json
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+STREAM_CHUNK_SIZE = 500
+
+
+# ----------------------------------
+# Keyset (cursor) pagination
+# ----------------------------------
+def estimate_count(queryset):
+    """Planner row estimate on PostgreSQL (no COUNT(*) scan); exact count elsewhere."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination on (field, id), e.g. ordering="-created_at" pages newest first.
+    Cursors are opaque base64 tokens holding the boundary row's (field, id) and the
+    direction, so every page is an index range scan no matter how deep it is.
+    """
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+
+    def __init__(self, ordering="-created_at", page_size=10):
+        self.descending = ordering.startswith("-")
+        self.field = ordering.lstrip("-")
+        self.page_size = max(1, page_size or 1)
+        self.request = None
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    # -------------------------
+    # tokens
+    # -------------------------
+    def encode_cursor(self, obj, reverse=False):
+        value = getattr(obj, self.field)
+        payload = {
+            "v": value.isoformat() if hasattr(value, "isoformat") else value,
+            "id": obj.pk,
+            "r": 1 if reverse else 0,
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, token):
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            payload = json.loads(raw)
+            value = payload["v"]
+            if isinstance(value, str):
+                value = parse_datetime(value) or value
+            return value, payload["id"], bool(payload.get("r"))
+        except (ValueError, TypeError, KeyError):
+            raise NotFound("Invalid cursor")
+
+    # -------------------------
+    # paging
+    # -------------------------
+    def _after(self, value, pk, forward):
+        # "after" in the requested direction of travel
+        newer = forward != self.descending
+        op = "gt" if newer else "lt"
+        return Q(**{f"{self.field}__{op}": value}) | Q(**{self.field: value, f"pk__{op}": pk})
+
+    def _ordering(self, forward):
+        ascending = forward != self.descending
+        prefix = "" if ascending else "-"
+        return [f"{prefix}{self.field}", f"{prefix}pk"]
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        token = request.query_params.get(self.cursor_query_param)
+        reverse = False
+        if token:
+            value, pk, reverse = self.decode_cursor(token)
+            queryset = queryset.filter(self._after(value, pk, forward=not reverse))
+
+        rows = list(queryset.order_by(*self._ordering(forward=not reverse))[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        has_next = has_more if not reverse else True
+        has_previous = bool(token) if not reverse else has_more
+        self.next_cursor = self.encode_cursor(rows[-1]) if rows and has_next else None
+        self.previous_cursor = self.encode_cursor(rows[0], reverse=True) if rows and has_previous else None
+        return rows
+
+    def get_count(self, queryset):
+        mode = (self.request.query_params.get(self.count_query_param) or "").lower() if self.request else ""
+        if mode == "exact":
+            return queryset.count()
+        if mode == "approx":
+            return estimate_count(queryset)
+        return None
+
+    def _link(self, token):
+        if not token:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, "page")
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+
 
 class AutoPagination(PageNumberPagination):
     page_size = 10
@@ -12,7 +138,8 @@ class AutoPagination(PageNumberPagination):
             return self.max_page_size
 
         try:
-            return int(raw_page_size)
+            # 0 (or less) means "no pagination", like page_size=max
+            return max(0, int(raw_page_size))
         except (TypeError, ValueError):
             return self.page_size
 
@@ -57,3 +184,74 @@ class AutoPagination(PageNumberPagination):
                 "previous": self.get_previous_link(),
             }
         }
+
+    # ---- queryset path: slice in the DB, serialize only the page ----
+    def wants_all(self, request):
+        page_size = self.get_page_size(request)
+        return not page_size or page_size >= self.max_page_size
+
+    def get_serialized_page(self, request, queryset, serializer_class, context=None):
+        page = self.paginate_queryset(queryset, request)
+
+        # No pagination (ALL data)
+        if page is None:
+            items = serializer_class(queryset, many=True, context=context).data
+            return {
+                "items": items,
+                "pagination": {
+                    "count": len(items),
+                    "page": 1,
+                    "page_count": 1,
+                    "page_size": len(items),
+                    "next": None,
+                    "previous": None,
+                }
+            }
+
+        items = serializer_class(page, many=True, context=context).data
+        return {
+            "items": items,
+            "pagination": {
+                "count": self.page.paginator.count,
+                "page": self.page.number,
+                "page_count": self.page.paginator.num_pages,
+                "page_size": self.get_page_size(request),
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+            }
+        }
+
+    def iter_serialized(self, queryset, serializer_class, context=None, chunk_size=STREAM_CHUNK_SIZE):
+        """Serialize the whole queryset chunk by chunk (page_size=max) without materializing it."""
+        chunk = []
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) >= chunk_size:
+                yield serializer_class(chunk, many=True, context=context).data
+                chunk = []
+        if chunk:
+            yield serializer_class(chunk, many=True, context=context).data
+
+    # ---- opt-in cursor mode: ?pagination=cursor or ?cursor=<token> ----
+    def wants_cursor(self, request):
+        params = request.query_params
+        return KeysetPaginator.cursor_query_param in params or params.get("pagination") == "cursor"
+
+    def get_cursor_page(self, request, queryset, serializer_class, ordering="-created_at", context=None):
+        page_size = min(self.get_page_size(request) or self.page_size, self.max_page_size)
+        keyset = KeysetPaginator(ordering=ordering, page_size=page_size)
+        rows = keyset.paginate_queryset(queryset, request)
+        return {
+            "items": serializer_class(rows, many=True, context=context).data,
+            "pagination": {
+                # null unless ?count=exact or ?count=approx
+                "count": keyset.get_count(queryset),
+                "page": None,
+                "page_count": None,
+                "page_size": page_size,
+                "next": keyset.get_next_link(),
+                "previous": keyset.get_previous_link(),
+                "next_cursor": keyset.next_cursor,
+                "previous_cursor": keyset.previous_cursor,
+            }
+        }
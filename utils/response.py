@@ -1,7 +1,11 @@
+import json
 import uuid
 from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
 
 
 class ApiResponse:
@@ -35,6 +39,80 @@ class ApiResponse:
 
         return response
 
+    @staticmethod
+    def stream_success(
+        message="Success",
+        chunks=(),
+        status_code=status.HTTP_200_OK,
+        meta=None,
+        extra_data=None,
+        empty_message=None,
+        meta_count_key=None,
+        asynchronous=False,
+    ):
+        """
+        Same envelope as success() with data = {"items": [...], "pagination": {...}},
+        but items are written chunk by chunk as they are serialized.
+
+        message and meta go after data, so they can depend on the row count:
+        empty_message replaces message when nothing was written, and
+        meta[meta_count_key] is set to the count. Under ASGI pass
+        asynchronous=True: Django buffers a sync iterator there in full before
+        sending it, so the chunks are pulled one by one via sync_to_async instead.
+        """
+        def _dumps(value):
+            return json.dumps(value, cls=JSONEncoder, ensure_ascii=False)
+
+        def _body():
+            head = {
+                "status": "success",
+                "status_code": status_code,
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "request_id": str(uuid.uuid4()),
+            }
+            yield _dumps(head)[:-1] + ', "data": {"items": ['
+
+            count = 0
+            for items in chunks:
+                if not items:
+                    continue
+                encoded = ", ".join(_dumps(item) for item in items)
+                yield (", " if count else "") + encoded
+                count += len(items)
+
+            data_tail = {
+                "pagination": {
+                    "count": count,
+                    "page": 1,
+                    "page_count": 1,
+                    "page_size": count,
+                    "next": None,
+                    "previous": None,
+                },
+                **(extra_data or {}),
+            }
+            tail_meta = dict(meta or {})
+            if meta_count_key:
+                tail_meta[meta_count_key] = count
+            tail = {
+                "message": empty_message if empty_message is not None and not count else message,
+                "meta": tail_meta,
+            }
+            yield "], " + _dumps(data_tail)[1:] + ", " + _dumps(tail)[1:]
+
+        if not asynchronous:
+            return StreamingHttpResponse(_body(), status=status_code, content_type="application/json")
+
+        async def _abody(body):
+            # queryset.iterator() keeps its cursor on the thread that opened it;
+            # thread_sensitive pins every step to that same thread
+            step = sync_to_async(next, thread_sensitive=True)
+            done = object()
+            while (piece := await step(body, done)) is not done:
+                yield piece
+
+        return StreamingHttpResponse(_abody(_body()), status=status_code, content_type="application/json")
+
     @staticmethod
     def error(message="Error", errors=None, status_code=status.HTTP_400_BAD_REQUEST, meta=None):
         return Response({